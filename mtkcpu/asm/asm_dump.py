@@ -66,7 +66,9 @@ def dump_asm(
     code = obj.get_section("code").data
     code = bytes_to_u32_arr(code)
     dump_instrs(code)
-    dump_asm_to_S_file(code, toolchain, verbose=verbose)
+    if verbose:
+        # NOTE: fixed file name - it's racy when tests are run in parallel, thus debug only.
+        dump_asm_to_S_file(code, toolchain, verbose=verbose)
     return code
 
 
@@ -3,7 +3,9 @@ import logging
 from pathlib import Path
 from typing import Optional, Callable
 import os
-from amaranth.sim import Simulator
+import re
+import subprocess
+import sys
 from amaranth.build.plat import Platform
 from amaranth.hdl import Module
 
@@ -12,18 +14,26 @@ from mtkcpu.global_config import Config
 from mtkcpu.utils.common import EBRMemConfig, CODE_START_ADDR, MEM_START_ADDR, read_elf
 from mtkcpu.utils.tests.memory import MemoryContents
 from mtkcpu.units.mmio.bspgen import MemMapCodeGen
+from mtkcpu.units.mmio.htif import HtifHost
 from mtkcpu.units.memory_interface import AddressManager
+from mtkcpu.units.loadstore import mmio_address_spaces
 from mtkcpu.utils.linker import write_linker_script
+from mtkcpu.utils.cpu_sim import MtkCpuSim
+from mtkcpu.utils.pysim_cache import PYSIM_CACHE_ENV
+from mtkcpu.utils.columnar_trace import ColumnarTrace
+from mtkcpu.utils.waveform import DEFAULT_TRACE_DIR, TraceConfig, WaveformCapture, default_cpu_traces
 from mtkcpu.cpu.cpu import CPU_Config
 from mtkcpu.utils.tests.dmi_utils import monitor_pc_and_main_fsm
+from mtkcpu.units.pll import PLL_REF_CLK_FREQ, COMMON_CLK_FREQS
 
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__file__)
 
-def get_board_cpu(elf_path : Optional[Path], cpu_config: CPU_Config, num_bytes: Optional[int] = 1024):
+def get_board_mem_config(elf_path : Optional[Path], num_bytes: Optional[int] = 1024, sparse_latency: Optional[int] = None) -> EBRMemConfig:
     """
     If 'num_bytes' is None, it will automatically adjust memory size so that the ELF fits. Useful for simulation.
+    See EBRMemConfig for 'sparse_latency' meaning.
     """
     if elf_path:
         mem = read_elf(elf_path, verbose=False)
@@ -31,7 +41,7 @@ def get_board_cpu(elf_path : Optional[Path], cpu_config: CPU_Config, num_bytes:
         logger.info(f"== read elf: {len(mem)}*4 ()= {len(mem) * 4}) non-bss bytes, max_offset: {hex(max_offset)}")
         num_bytes = num_bytes or (max_offset + 4)
 
-    if num_bytes > 1_000_000:
+    if num_bytes > 1_000_000 and sparse_latency is None:
         logging.warning(f"Huge CPU memory size: {num_bytes}")
 
     if elf_path:
@@ -39,7 +49,8 @@ def get_board_cpu(elf_path : Optional[Path], cpu_config: CPU_Config, num_bytes:
             simulate=True,
             start_addr=CODE_START_ADDR,
             num_bytes=num_bytes,
-            mem_dict=MemoryContents(mem)
+            mem_dict=MemoryContents(mem),
+            sparse_latency=sparse_latency,
         )
     else:
         mem_config = EBRMemConfig(
@@ -47,8 +58,152 @@ def get_board_cpu(elf_path : Optional[Path], cpu_config: CPU_Config, num_bytes:
             mem_content_words=None,
             mem_addr=CODE_START_ADDR,
             simulate=True,
+            sparse_latency=sparse_latency,
         )
-    return MtkCpu(mem_config=mem_config, cpu_config=cpu_config)
+    return mem_config
+
+
+def get_board_cpu(elf_path : Optional[Path], cpu_config: CPU_Config, num_bytes: Optional[int] = 1024, sparse_latency: Optional[int] = None):
+    """
+    See 'get_board_mem_config' for 'num_bytes' and 'sparse_latency' meaning.
+    """
+    return MtkCpu(mem_config=get_board_mem_config(elf_path=elf_path, num_bytes=num_bytes, sparse_latency=sparse_latency), cpu_config=cpu_config)
+
+
+def iss(elf_path: Path, cpu_config: CPU_Config, max_instructions: int, save_checkpoint: Optional[Path] = None):
+    """
+    Runs the ELF on the instruction-set simulator. UART (and HTIF console) output is printed to stdout.
+    With 'save_checkpoint' set, architectural state at the end is stored there (see mtkcpu/iss/checkpoint.py).
+    """
+    import time
+    from mtkcpu.iss.iss import MtkCpuIss
+
+    def uart_tx(byte: int):
+        sys.stdout.write(chr(byte))
+        sys.stdout.flush()
+
+    iss = MtkCpuIss(
+        mem_config=get_board_mem_config(elf_path=elf_path, num_bytes=None),
+        cpu_config=cpu_config,
+        uart_tx_callback=uart_tx,
+    )
+    start = time.perf_counter()
+    reason = iss.run(max_instructions=max_instructions)
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"== ISS stopped ({reason.value}) at pc={hex(iss.pc)} after {iss.steps} instructions, "
+        f"{elapsed:.2f}s ({iss.steps / elapsed / 1e6:.2f} MIPS)"
+        + (f", exit code {iss.exit_code}" if iss.exit_code is not None else "")
+    )
+    if save_checkpoint is not None:
+        from mtkcpu.iss.checkpoint import capture_iss
+        capture_iss(iss).save(save_checkpoint)
+        logger.info(f"== Checkpoint saved to {save_checkpoint}")
+    return iss
+
+
+def sample(elf_path: Path, cpu_config: CPU_Config, config: "SamplingConfig"):
+    """
+    Estimates the number of cycles the ELF takes on MtkCpu, by simulating only samples of it on the RTL,
+    with the rest executed on the instruction-set simulator (see mtkcpu/iss/sampling.py).
+    """
+    import time
+    from mtkcpu.iss.sampling import run_sampled
+    from mtkcpu.units.mmio.htif import elf_symbol
+
+    def uart_tx(byte: int):
+        sys.stdout.write(chr(byte))
+        sys.stdout.flush()
+
+    start = time.perf_counter()
+    res = run_sampled(
+        mem_config=get_board_mem_config(elf_path=elf_path, num_bytes=None),
+        cpu_config=cpu_config,
+        config=config,
+        tohost_addr=elf_symbol(elf_path, "tohost"),
+        uart_tx_callback=uart_tx,
+    )
+    logger.info(f"== Sampled simulation took {time.perf_counter() - start:.2f}s: {res.summary()}")
+    return res
+
+
+def bench_sim(
+        num_cycles: int,
+        names: Optional[list[str]],
+        repeat: int,
+        output: Optional[Path],
+        baseline: Optional[Path],
+        tolerance: float,
+        update_baseline: bool,
+    ) -> bool:
+    """
+    Runs simulation throughput benchmark (see mtkcpu/utils/tests/sim_bench.py).
+    Returns False if any metric regressed compared to the 'baseline'.
+    """
+    from mtkcpu.utils.tests.sim_bench import compare, format_report, load_report, run_sim_bench, save_report
+
+    report = run_sim_bench(num_cycles=num_cycles, names=names, repeat=repeat)
+    print(format_report(report))
+    if output is not None:
+        save_report(report, output)
+        logger.info(f"== Report written to {output}")
+    if update_baseline:
+        save_report(report, baseline)
+        logger.info(f"== Baseline updated: {baseline}")
+        return True
+    if baseline is None:
+        return True
+    if not baseline.exists():
+        logger.warning(f"== Baseline {baseline} not found, nothing to compare with.")
+        return True
+    regressions = compare(report, load_report(baseline), tolerance=tolerance)
+    for r in regressions:
+        logger.error(f"== REGRESSION: {r}")
+    if not regressions:
+        logger.info(f"== No regressions compared to {baseline} (tolerance {tolerance:.0%}).")
+    return not regressions
+
+
+def bench_sw(
+        names: Optional[list[str]],
+        quick: bool,
+        max_cycles: Optional[int],
+        output: Optional[Path],
+        reference: Optional[Path],
+        tolerance: float,
+        update_reference: bool,
+    ) -> bool:
+    """
+    Builds and simulates CoreMark and Dhrystone (see mtkcpu/utils/tests/sw_benchmarks.py), reports their scores.
+    Returns False if any of the benchmarks failed, or its score differs from the 'reference' one.
+    """
+    from mtkcpu.utils.tests.sw_benchmarks import compare, format_report, load_report, run_sw_benchmarks, save_report
+
+    report = run_sw_benchmarks(names=names, quick=quick, max_cycles=max_cycles)
+    print(format_report(report))
+    failed = [name for name, x in report["benchmarks"].items() if x["exit_code"] != 0 or x["score"] is None]
+    for name in failed:
+        logger.error(f"== {name} failed:\n{report['benchmarks'][name]['output']}")
+    if output is not None:
+        save_report(report, output)
+        logger.info(f"== Report written to {output}")
+    if update_reference:
+        if failed:
+            logger.error("== Reference not updated, as some benchmarks failed.")
+            return False
+        save_report(report, reference)
+        logger.info(f"== Reference updated: {reference}")
+        return True
+    if reference is None or not reference.exists():
+        return not failed
+    reference_report = load_report(reference)
+    if reference_report["toolchain"] != report["toolchain"]:
+        logger.error(f"== Reference {reference} comes from different toolchain ({reference_report['toolchain']}), scores can't be compared.")
+        return False
+    differences = compare(report, reference_report, tolerance=tolerance)
+    for d in differences:
+        logger.error(f"== SCORE CHANGED: {d}")
+    return not failed and not differences
 
 
 def get_platform() -> Platform:
@@ -83,7 +238,9 @@ def get_platform() -> Platform:
 
 def uart_process(cpu: MtkCpu):
     def aux():
+        from amaranth.sim.core import Passive
         from mtkcpu.units.mmio.uart import UartTX
+        yield Passive()
         uart_block_matches = [block for (block, _) in cpu.arbiter.mmio_cfg if isinstance(block, UartTX)]
         if len(uart_block_matches) != 1:
             raise ValueError(f"Could not determine UART block! Was expecting one match, got {len(uart_block_matches)} instead! {uart_block_matches}")
@@ -106,32 +263,89 @@ def uart_process(cpu: MtkCpu):
             yield
     return aux
 
-def sim(cpu: MtkCpu, verbose: bool, with_uart: bool, user_processes: list[Callable] = [], regs_verbose: list[int] = []):
-    sim = Simulator(cpu)
-    sim.add_clock(1e-6)
+def sim(
+        cpu: MtkCpu,
+        verbose: bool,
+        with_uart: bool,
+        user_processes: list[Callable] = [],
+        wait_for_user_processes: bool = False,
+        regs_verbose: list[int] = [],
+        lockstep: bool = False,
+        pysim_cache: Optional[Path] = None,
+        trace: TraceConfig = TraceConfig(),
+        trace_dir: Path = DEFAULT_TRACE_DIR,
+        max_cycles: Optional[int] = None,
+        htif: Optional[HtifHost] = None,
+        checkpoint: Optional[Path] = None,
+        cpi_report: Optional[Path] = None,
+    ) -> Optional[int]:
+    """
+    With 'lockstep' set, each retired instruction is checked against the instruction-set simulator.
+    With 'pysim_cache' set, simulator's generated code is stored in (and reused from) that directory.
+    Waveform is captured as specified by 'trace' (none by default) into 'trace_dir'.
+    With 'checkpoint' set, simulation starts from the state stored there (e.g. by 'mtkcpu iss --save_checkpoint'),
+    instead of the reset state.
+    With 'cpi_report' set, cycles are accounted per main FSM state and instruction class (see mtkcpu/utils/cpi_report.py),
+    the table is printed and the JSON report is written there.
+
+    Simulation ends when the firmware exits via HTIF (see mtkcpu/units/mmio/htif.py), or after 'max_cycles'
+    (active 'user_processes', if any, have to return as well).
+    With 'wait_for_user_processes' set, simulation ends when all active 'user_processes' return instead
+    (HTIF process is passive then).
+    Returns the exit code (see HtifHost.status), None if simulation ended before any of those.
+    """
+    cpu_sim = MtkCpuSim(cpu, cache_dir=pysim_cache)
+    processes = []
+
+    if checkpoint is not None:
+        from mtkcpu.iss.checkpoint import Checkpoint, restore_rtl
+        checkpoint = Checkpoint.load(checkpoint)
 
     if with_uart:
-        sim.add_sync_process(uart_process(cpu=cpu))
+        processes.append(uart_process(cpu=cpu))
 
-    if verbose:
-        sim.add_sync_process(monitor_pc_and_main_fsm(cpu=cpu, wait_for_first_haltreq=False, log_fn=print, regs_verbose=regs_verbose))
-    
-    for p in user_processes:
-        # user-defined processes. could be both passive or active.
-        sim.add_sync_process(p)
+    if lockstep:
+        from mtkcpu.iss.lockstep import LockstepChecker
+        processes.append(LockstepChecker(cpu, checkpoint=checkpoint).process)
 
-    with sim.write_vcd("uart.vcd"):
-        sim.run()
+    if cpi_report is not None:
+        from mtkcpu.utils.cpi_report import CpiMonitor
+        cpi_monitor = CpiMonitor(cpu)
+        processes.append(cpi_monitor.process())
 
-def build(
-        elf_path : Optional[Path],
-        do_program: bool,
-        cpu_config: CPU_Config):
-    platform = get_platform()
-    m = get_board_cpu(elf_path=elf_path, cpu_config=cpu_config)
-    platform.build(m, do_program=do_program, nextpnr_opts="--timing-allow-fail")
-    logger.info(f"OK, Design was built successfully, printing out some stats..")
-    timing_report = Path("build/top.tim")
+    # user-defined processes. could be both passive or active.
+    processes.extend(user_processes)
+    if verbose:
+        processes.append(monitor_pc_and_main_fsm(cpu=cpu, wait_for_first_haltreq=False, log_fn=print, regs_verbose=regs_verbose))
+
+    htif = htif or HtifHost(cpu)
+    if max_cycles is not None:
+        htif.max_cycles = max_cycles
+    processes.append(htif.process(passive=wait_for_user_processes))
+
+    waveform = WaveformCapture(name="cpu", traces=default_cpu_traces(cpu), pc=cpu.pc, config=trace, directory=trace_dir)
+    cpu_sim.add_processes(processes)
+    waveform.add_to(cpu_sim.sim)
+    with waveform.capture(cpu_sim.sim):
+        if checkpoint is not None:
+            cpu_sim.execute(restore_rtl(cpu, checkpoint)())
+        cpu_sim.run()
+
+    if htif.timed_out:
+        logger.warning(f"== Simulation timed out after {htif.cycles} cycles ({htif.instret} instructions retired).")
+    elif htif.exit_code is not None:
+        logger.info(f"== Firmware exited with code {htif.exit_code} after {htif.cycles} cycles ({htif.instret} instructions retired).")
+    if cpi_report is not None:
+        print(cpi_monitor.format_table())
+        cpi_monitor.save(cpi_report)
+        logger.info(f"== CPI report written to {cpi_report}")
+    return htif.status if htif.finished else None
+
+def check_timing(timing_report: Path) -> bool:
+    """
+    Parses nextpnr log, prints max. achieved frequency and resources utilisation.
+    Returns True if all clock constraints were met.
+    """
     if not timing_report.exists():
         raise ValueError(f"ERROR: Could not find {timing_report} timing report file in build artifacts!")
     lines = timing_report.open().readlines()
@@ -143,14 +357,52 @@ def build(
         except:
             return None
 
-    max_freq_idx = find_pattern_idx(lines, "Max frequency for clock")
+    # nextpnr reports each clock as e.g. "Max frequency for clock 'clk': 31.23 MHz (PASS at 30.00 MHz)",
+    # and it does it after both placement and routing - the last report for given clock is the final one.
+    final_freq_lines = {}
+    for line in lines:
+        match = re.search(r"Max frequency for clock '([^']+)'", line)
+        if match:
+            final_freq_lines[match.group(1)] = line
     resources_idx = find_pattern_idx(lines, "Info: Device utilisation")
-    if not all([max_freq_idx, resources_idx]):
+    if not final_freq_lines or resources_idx is None:
         raise ValueError(f"Layout of {timing_report} file does not match predefined one!")
-    print(lines[max_freq_idx])
+    print("".join(final_freq_lines.values()))
     print("".join(lines[resources_idx:resources_idx+16])) # TODO probably more lines for different architectures
+    return all("FAIL" not in x for x in final_freq_lines.values())
 
 
+def build(
+        elf_path : Optional[Path],
+        do_program: bool,
+        cpu_config: CPU_Config,
+        timing_allow_fail: bool = False):
+    """
+    Returns True if nextpnr met the requested clock frequency.
+    """
+    platform = get_platform()
+    m = get_board_cpu(elf_path=elf_path, cpu_config=cpu_config)
+    nextpnr_opts = "--timing-allow-fail" if timing_allow_fail else ""
+    timing_report = Path("build/top.tim")
+    try:
+        platform.build(m, do_program=do_program, nextpnr_opts=nextpnr_opts)
+    except subprocess.CalledProcessError:
+        # NOTE: nextpnr exits with error when timing is not met - still print out the report.
+        if timing_report.exists():
+            check_timing(timing_report)
+        logger.error(
+            f"Design could not be built for {cpu_config.clk_freq_hz / 1e6} MHz clock! "
+            "See the report above, or use --timing_allow_fail to ignore timing errors."
+        )
+        raise
+    logger.info(f"OK, Design was built successfully, printing out some stats..")
+    timing_met = check_timing(timing_report)
+    if timing_met:
+        logger.info(f"OK, timing met for requested {cpu_config.clk_freq_hz / 1e6} MHz clock.")
+    else:
+        logger.warning(f"Timing NOT met for requested {cpu_config.clk_freq_hz / 1e6} MHz clock! The design may not work reliably.")
+    return timing_met
+
 
 from amaranth import Elaboratable, Instance
 from amaranth.build.plat import Platform
@@ -177,7 +429,7 @@ def dummy_elaborate(e : Elaboratable, platform : Platform):
             assert isinstance(e, Elaboratable)
             dummy_elaborate(e, platform)
 
-def generate_bsp():
+def generate_bsp(clk_freq_hz: int = PLL_REF_CLK_FREQ, sim_htif: bool = False):
     sw_bsp_path = os.path.join(os.path.dirname(__file__), "..", "..", "sw", "bsp")
     print(f"sw_bsp_path = {sw_bsp_path}")
     Path(sw_bsp_path).mkdir(parents=True, exist_ok=True)
@@ -187,6 +439,7 @@ def generate_bsp():
         with_debug=True,
         pc_reset_value=0xdeadbeef,
         with_virtual_memory=False,
+        clk_freq_hz=clk_freq_hz,
     )
     
     cpu = get_board_cpu(elf_path=None, cpu_config=cpu_config)
@@ -195,7 +448,11 @@ def generate_bsp():
     arbiter = cpu.arbiter
     assert isinstance(arbiter, AddressManager)
     owners, schemes = zip(*arbiter.get_mmio_devices_config())
-    MemMapCodeGen.gen_bsp_sources(owners, schemes)
+    if sim_htif:
+        # HTIF is simulation only, thus not a part of the design elaborated for the platform.
+        htif_scheme = next(x for x in mmio_address_spaces(arbiter.mem_config, sim_htif=True) if x.basename == "htif")
+        schemes = (*schemes, htif_scheme)
+    MemMapCodeGen.gen_bsp_sources(owners, schemes, clk_freq_hz=clk_freq_hz)
 
 def main():
     from argparse import ArgumentParser
@@ -205,8 +462,20 @@ def main():
     
     build_parser = subparsers.add_parser("build", help="Build the IceBreaker bitstream containing full SoC.")
     sim_parser   = subparsers.add_parser("sim", help="Simulate mtkcpu with given ELF. The UART is printed to stdout.")
-    _            = subparsers.add_parser("gen_bsp", help="Generate bsp .c and .h sources, based on SoC address space.")
+    gen_bsp_parser = subparsers.add_parser("gen_bsp", help="Generate bsp .c and .h sources, based on SoC address space.")
     _            = subparsers.add_parser("gen_linker_script", help="Generate linker script, based on SoC address space.")
+    iss_parser   = subparsers.add_parser("iss", help="Run given ELF on fast, functional instruction-set simulator. The UART is printed to stdout.")
+    sample_parser = subparsers.add_parser("sample", help="Estimate cycle count of given ELF, by running most of it on the instruction-set simulator and only periodic samples on the RTL.")
+    bench_sim_parser = subparsers.add_parser("bench-sim", help="Measure simulation throughput on a fixed set of workloads, compare it with the stored baseline.")
+    bench_sw_parser = subparsers.add_parser("bench-sw", help="Build and simulate CoreMark and Dhrystone, report CoreMark/MHz and DMIPS/MHz.")
+    trace2vcd_parser = subparsers.add_parser("trace2vcd", help="Convert trace captured with 'sim --trace npz' to VCD and GTKWave save file.")
+
+    for p in [build_parser, sim_parser, gen_bsp_parser]:
+        p.add_argument("--clk_freq_mhz", type=int, default=PLL_REF_CLK_FREQ // 1_000_000, choices=[x // 1_000_000 for x in COMMON_CLK_FREQS],
+                       help="Frequency of the CPU clock. If different from board's oscillator frequency, PLL is used to generate it.")
+
+    gen_bsp_parser.add_argument("--sim_htif", action="store_true",
+                                help="Define HTIF base address as well, for 'sim_exit' (simulation only, see mtkcpu/units/mmio/htif.py).")
 
     for p in [build_parser, sim_parser]:
         p.add_argument("--no_dm", action="store_true")
@@ -215,8 +484,65 @@ def main():
         p.add_argument("-e", "--elf", type=Path, required=(parser is sim_parser), help="Path to an .elf file to initialize Block RAM with.")
 
     sim_parser.add_argument("-v", "--verbose", action="store_true")
+    sim_parser.add_argument("--lockstep", action="store_true", help="Check each retired instruction against the instruction-set simulator, stop on first divergence.")
+    sim_parser.add_argument("--mem_size_kb", type=int, help="Memory size, by default just big enough for the ELF to fit.")
+    sim_parser.add_argument("--fast_console", action="store_true", help="Simulation-only UART, that sends bytes instantly instead of bit by bit - much faster for firmware that prints a lot.")
+    sim_parser.add_argument("--sparse_mem_latency", type=int, help="Use sparse, simulation-only memory model (allows for multi-megabyte memories) with given access latency in cycles.")
+    sim_parser.add_argument("--pysim_cache", type=Path, help=f"Directory to cache simulator's generated code in, to speed up next runs of the same configuration. {PYSIM_CACHE_ENV} environment variable is used if not set.")
+    sim_parser.add_argument("--trace", type=TraceConfig.parse, default=TraceConfig(), metavar="SPEC",
+                            help="Waveform to capture: 'none' (default), 'full', 'window:<first cycle>:<num cycles>', "
+                                 "'trigger:<pc>[:<cycles before>[:<cycles after>]]', 'ring:<num cycles>' (dumped only if simulation fails) "
+                                 "or 'npz' (compact format for long runs, see 'trace2vcd' command).")
+    sim_parser.add_argument("--trace_dir", type=Path, default=DEFAULT_TRACE_DIR, help="Directory to store the waveform in.")
+    sim_parser.add_argument("--checkpoint", type=Path, help="Start from architectural state saved with 'iss --save_checkpoint' (for the same ELF), instead of the reset state.")
+    sim_parser.add_argument("--cpi_report", "--cpi-report", type=Path, nargs="?", const=Path("cpi_report.json"), metavar="JSON",
+                            help="Account each cycle to the main FSM state and instruction class, print the table at exit and write it as JSON (cpi_report.json by default).")
+    sim_parser.add_argument("--profile", type=Path, nargs="?", const=Path("profile"), metavar="PREFIX",
+                            help="Profile the firmware - print the flat profile at exit, store it with the histogram and folded stacks (for flamegraph tools) "
+                                 "in PREFIX.txt, PREFIX.npz and PREFIX.folded ('profile' by default).")
+    sim_parser.add_argument("--max_cycles", "--max-cycles", type=int, help="Stop the simulation after that many cycles, with exit code 124. "
+                                                                         "By default it runs until the firmware exits via HTIF.")
     
+    iss_parser.add_argument("-e", "--elf", type=Path, required=True, help="Path to an .elf file to be executed.")
+    iss_parser.add_argument("--with_virtual_memory", action="store_true")
+    iss_parser.add_argument("--max_instructions", type=int, default=100_000_000)
+    iss_parser.add_argument("--save_checkpoint", type=Path, help="Save architectural state at the end (e.g. after '--max_instructions'), to be resumed with 'sim --checkpoint'.")
+
+    sample_parser.add_argument("-e", "--elf", type=Path, required=True, help="Path to an .elf file to be executed.")
+    sample_parser.add_argument("--with_virtual_memory", action="store_true")
+    sample_parser.add_argument("--interval", type=int, default=100_000, help="Number of instructions between consecutive samples.")
+    sample_parser.add_argument("--warmup", type=int, default=100, help="Number of instructions simulated on the RTL before each measurement.")
+    sample_parser.add_argument("--window", type=int, default=1_000, help="Number of instructions measured on the RTL in each sample.")
+    sample_parser.add_argument("--skip", type=int, default=0, help="Number of instructions to execute before the region of interest (e.g. boot code).")
+    sample_parser.add_argument("--max_instructions", type=int, help="Length of the region of interest, by default until the firmware exits.")
+    sample_parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the reported intervals.")
+    sample_parser.add_argument("--seed", type=int, default=0, help="Seed for the offset of the first sample.")
+
+    from mtkcpu.utils.tests.sim_bench import DEFAULT_BASELINE, WORKLOADS
+    bench_sim_parser.add_argument("--cycles", type=int, default=20_000, help="Number of cycles to simulate per workload.")
+    bench_sim_parser.add_argument("--workloads", nargs="+", choices=[x.name for x in WORKLOADS], help="Workloads to run, all by default.")
+    bench_sim_parser.add_argument("--repeat", type=int, default=3, help="Run each workload that many times, report the best result.")
+    bench_sim_parser.add_argument("-o", "--output", type=Path, help="Path to write the JSON report to.")
+    bench_sim_parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="JSON report to compare against.")
+    bench_sim_parser.add_argument("--tolerance", type=float, default=0.3, help="Relative slowdown that is still not considered a regression.")
+    bench_sim_parser.add_argument("--update_baseline", action="store_true", help="Store the report as the new baseline, instead of comparing.")
+
+    from mtkcpu.utils.tests.sw_benchmarks import BENCHMARKS, DEFAULT_REFERENCE
+    bench_sw_parser.add_argument("--benchmarks", nargs="+", choices=[x.name for x in BENCHMARKS], help="Benchmarks to run, all by default.")
+    bench_sw_parser.add_argument("--quick", action="store_true", help="Run reduced-size benchmarks (the ones used in tests, and stored in the reference), instead of the standard ones.")
+    bench_sw_parser.add_argument("--max_cycles", type=int, help="Stop each simulation after that many cycles.")
+    bench_sw_parser.add_argument("-o", "--output", type=Path, help="Path to write the JSON report to.")
+    bench_sw_parser.add_argument("--reference", type=Path, default=DEFAULT_REFERENCE, help="JSON report to compare scores against (it has to come from the same toolchain).")
+    bench_sw_parser.add_argument("--tolerance", type=float, default=0.0, help="Relative score (and cycle count) difference that is still not considered a change.")
+    bench_sw_parser.add_argument("--update_reference", action="store_true", help="Store the report as the new reference, instead of comparing.")
+
+    trace2vcd_parser.add_argument("-i", "--input", type=Path, required=True, help="Path to an .npz trace.")
+    trace2vcd_parser.add_argument("-o", "--output", type=Path, help="Path to the .vcd file (.gtkw is stored next to it), by default input path with changed suffix.")
+    trace2vcd_parser.add_argument("--start", type=int, help="First cycle to convert, by default the first one recorded.")
+    trace2vcd_parser.add_argument("--end", type=int, help="Cycle to stop at (exclusive), by default the last one recorded.")
+
     build_parser.add_argument("-p", "--program", action="store_true")
+    build_parser.add_argument("--timing_allow_fail", action="store_true", help="Don't fail the build if requested clock frequency was not met.")
     
     args = parser.parse_args()
 
@@ -226,6 +552,9 @@ def main():
             dev_mode=args.dev_mode,
             pc_reset_value=CODE_START_ADDR,
             with_virtual_memory=args.with_virtual_memory,
+            clk_freq_hz=args.clk_freq_mhz * 1_000_000,
+            sim_fast_console=(args.command == "sim" and args.fast_console),
+            sim_htif=(args.command == "sim"),
         )
 
     if args.command == "build":
@@ -233,16 +562,100 @@ def main():
             elf_path=args.elf,
             do_program=args.program,
             cpu_config=cpu_config,
+            timing_allow_fail=args.timing_allow_fail,
         )
     elif args.command == "sim":
-        cpu = get_board_cpu(elf_path=args.elf, cpu_config=cpu_config, num_bytes=None)
-        sim(
+        cpu = get_board_cpu(
+            elf_path=args.elf,
+            cpu_config=cpu_config,
+            num_bytes=args.mem_size_kb and args.mem_size_kb * 1024,
+            sparse_latency=args.sparse_mem_latency,
+        )
+        profiler = None
+        if args.profile is not None:
+            from mtkcpu.utils.profiler import ElfSymbols, PcProfiler
+            profiler = PcProfiler(cpu, symbols=ElfSymbols(args.elf))
+        exit_code = sim(
             cpu=cpu,
             with_uart=True,
+            user_processes=[profiler.process()] if profiler else [],
             verbose=args.verbose,
+            lockstep=args.lockstep,
+            pysim_cache=args.pysim_cache,
+            trace=args.trace,
+            trace_dir=args.trace_dir,
+            htif=HtifHost.for_elf(cpu, args.elf, max_cycles=args.max_cycles),
+            checkpoint=args.checkpoint,
+            cpi_report=args.cpi_report,
+        )
+        if profiler is not None:
+            print(profiler.format_flat_profile(limit=20))
+            paths = profiler.save(args.profile)
+            logger.info(f"== Profile written to {', '.join(str(x) for x in paths)}")
+        sys.exit(exit_code or 0)
+    elif args.command == "iss":
+        res = iss(
+            elf_path=args.elf,
+            cpu_config=CPU_Config(
+                with_debug=False,
+                dev_mode=False,
+                pc_reset_value=CODE_START_ADDR,
+                with_virtual_memory=args.with_virtual_memory,
+                sim_htif=True,
+            ),
+            max_instructions=args.max_instructions,
+            save_checkpoint=args.save_checkpoint,
+        )
+        sys.exit(res.exit_code or 0)
+    elif args.command == "sample":
+        from mtkcpu.iss.sampling import SamplingConfig
+        sample(
+            elf_path=args.elf,
+            cpu_config=CPU_Config(
+                with_debug=False,
+                dev_mode=False,
+                pc_reset_value=CODE_START_ADDR,
+                with_virtual_memory=args.with_virtual_memory,
+                sim_htif=True,
+            ),
+            config=SamplingConfig(
+                interval=args.interval,
+                warmup=args.warmup,
+                window=args.window,
+                skip=args.skip,
+                max_instructions=args.max_instructions,
+                confidence=args.confidence,
+                seed=args.seed,
+            ),
+        )
+    elif args.command == "bench-sim":
+        ok = bench_sim(
+            num_cycles=args.cycles,
+            names=args.workloads,
+            repeat=args.repeat,
+            output=args.output,
+            baseline=args.baseline,
+            tolerance=args.tolerance,
+            update_baseline=args.update_baseline,
+        )
+        sys.exit(0 if ok else 1)
+    elif args.command == "bench-sw":
+        ok = bench_sw(
+            names=args.benchmarks,
+            quick=args.quick,
+            max_cycles=args.max_cycles,
+            output=args.output,
+            reference=args.reference,
+            tolerance=args.tolerance,
+            update_reference=args.update_reference,
         )
+        sys.exit(0 if ok else 1)
+    elif args.command == "trace2vcd":
+        vcd_path = args.output or args.input.with_suffix(".vcd")
+        ColumnarTrace.load(args.input).to_vcd(vcd_path, vcd_path.with_suffix(".gtkw"), start=args.start, end=args.end)
+        logger.info(f"Written {vcd_path}")
     elif args.command == "gen_bsp":
-        generate_bsp()
+        generate_bsp(clk_freq_hz=args.clk_freq_mhz * 1_000_000, sim_htif=args.sim_htif)
     elif args.command == "gen_linker_script":
         out_path = Config.sw_dir / "common" / "linker.ld"
         mem_addr = MEM_START_ADDR
@@ -12,6 +12,8 @@ from mtkcpu.units.csr.csr import CsrUnit, match_csr
 from mtkcpu.units.csr.csr_handlers import CSR_Write_Handler
 from mtkcpu.units.exception import ExceptionUnit
 from mtkcpu.utils.common import EBRMemConfig
+from mtkcpu.units.csr.types import MtvecModeBits
+from mtkcpu.units.pll import PLL40, PLL_REF_CLK_FREQ
 from mtkcpu.units.adder import AdderUnit, match_adder_unit
 from mtkcpu.units.compare import CompareUnit, match_compare_unit
 from mtkcpu.units.loadstore import (MemoryArbiter, MemoryUnit,
@@ -107,6 +109,23 @@ class CPU_Config:
     # Enable SATP register and enable address translatation in USER mode.
     with_virtual_memory: bool
 
+    # Frequency of 'sync' clock domain. All frequency-dependent blocks (e.g. UART)
+    # derive their parameters from it. When building for a platform and it differs from
+    # the board's oscillator frequency, PLL is instantiated to generate it.
+    clk_freq_hz: int = PLL_REF_CLK_FREQ
+
+    # Simulation only - UART transmits each byte instantly (see SimConsoleTX),
+    # so that firmware printing a lot doesn't spend most of the simulation waiting for it.
+    sim_fast_console: bool = False
+
+    # Simulation only - HTIF region (see mtkcpu/units/mmio/htif.py), for firmware to exit the simulation
+    # with a status code, print to the console and query cycle/instruction counters.
+    sim_htif: bool = False
+
+    # Simulation only - each MMIO slave gets a 'stall' input, that holds off handling of transactions,
+    # for testbenches to inject bus latency (see LatencyInjector).
+    sim_bus_stall: bool = False
+
 class MtkCpu(Elaboratable):
     def __init__(
             self,
@@ -166,6 +185,13 @@ class MtkCpu(Elaboratable):
         comb = m.d.comb
         sync = m.d.sync
 
+        for sim_only in ["sim_fast_console", "sim_htif", "sim_bus_stall"]:
+            if platform is not None and getattr(self.cpu_config, sim_only):
+                raise ValueError(f"'{sim_only}' is simulation only, it cannot be used when building for a platform!")
+
+        if platform is not None and self.cpu_config.clk_freq_hz != platform.default_clk_frequency:
+            m.submodules.pll = PLL40(freq_out=self.cpu_config.clk_freq_hz)
+
         # CPU units used.
         logic = m.submodules.logic = LogicUnit()
         adder = m.submodules.adder = AdderUnit()
@@ -206,6 +232,10 @@ class MtkCpu(Elaboratable):
             with_addr_translation=self.cpu_config.with_virtual_memory,
             csr_unit=csr_unit, # SATP register
             exception_unit=exception_unit, # current privilege mode
+            clk_freq=self.cpu_config.clk_freq_hz,
+            sim_fast_console=self.cpu_config.sim_fast_console,
+            sim_htif=self.cpu_config.sim_htif,
+            sim_bus_stall=self.cpu_config.sim_bus_stall,
         )
 
         if self.cpu_config.with_debug:
@@ -237,7 +267,7 @@ class MtkCpu(Elaboratable):
         pc = self.pc = Signal(32, reset=self.cpu_config.pc_reset_value)
 
         # at most one active_unit at any time
-        active_unit = ActiveUnit()
+        active_unit = self.active_unit = ActiveUnit()
 
         # Register file. Contains two read ports (for rs1, rs2) and one write port.
         regs = self.regs
@@ -247,9 +277,8 @@ class MtkCpu(Elaboratable):
             self.reg_write_port
         ) = m.submodules.reg_write_port = regs.write_port()
 
-        # Timer management.
-        mtime = self.mtime = Signal(32)
-        sync += mtime.eq(mtime + 1)
+        # Timer management - 'mtime' lives in CLINT, non-standard CSR exposes its lower 32 bits.
+        mtime = self.mtime = arbiter.clint.mtime
         comb += csr_unit.mtime.as_view().eq(mtime)
 
         # with m.If(csr_unit.mstatus.mie & csr_unit.mie.mtie):
@@ -397,7 +426,8 @@ class MtkCpu(Elaboratable):
                 csr_unit.func3.eq(funct3),
                 csr_unit.csr_idx.eq(csr_idx),
                 csr_unit.rs1.eq(rs1),
-                csr_unit.rs1val.eq(rs1val),
+                # CSRRWI, CSRRSI and CSRRCI use zero-extended 'rs1' field as an immediate.
+                csr_unit.rs1val.eq(Mux(funct3[2], rs1, rs1val)),
                 csr_unit.rd.eq(rd),
                 csr_unit.en.eq(1),
             ]
@@ -464,6 +494,11 @@ class MtkCpu(Elaboratable):
                     # NOTE: 'Elif' is not accidental here - HALTREQ has higher priority than STEP.
                     sync += dcsr.as_view().cause.eq(DCSR_DM_Entry_Cause.STEP)
                     m.next = "HALTED"
+                with m.Elif(exception_unit.m_irq_pending & ~self.is_debug_mode):
+                    # Interrupts are taken between instructions, 'mepc' points to the next one.
+                    comb += exception_unit.m_take_irq.eq(1)
+                    sync += active_unit.eq(0)
+                    m.next = "TRAP"
                 with m.Else():
                     # maybe next time..
                     m.next = "FETCH"
@@ -488,12 +523,6 @@ class MtkCpu(Elaboratable):
                     m.next = "FETCH"
             
             with m.State("FETCH"):
-                """
-                TODO
-                Timer interrupts are disbled for now, as whole CPU halting mechainsm
-                needs rethinking.
-                """
-                
                 with m.If(pc & 0b11):
                     trap(TrapCause.FETCH_MISALIGNED)
                 with m.Else():
@@ -742,7 +771,14 @@ class MtkCpu(Elaboratable):
                 as there were situations that the ibus.en was high 100% time (e.g. trap and fetch from non-existing mtvec),
                 so that the debug bus couldn't take the bus ownership.
                 """
-                fetch_with_new_pc(Cat(Const(0, 2), self.csr_unit.mtvec.as_view().base))
+                mtvec = self.csr_unit.mtvec.as_view()
+                mcause = self.csr_unit.mcause.as_view()
+                trap_base = Cat(Const(0, 2), mtvec.base)
+                # In vectored mode, asynchronous interrupts jump to 'base + 4 * cause'.
+                with m.If((mtvec.mode == MtvecModeBits.VECTORED) & mcause.interrupt):
+                    fetch_with_new_pc(trap_base + (mcause.ecode << 2))
+                with m.Else():
+                    fetch_with_new_pc(trap_base)
         
         # TODO
         # I would love to have all CPU running/halted manipulation in a single place,
@@ -775,4 +811,8 @@ class MtkCpu(Elaboratable):
             with m.If(self.debug_blink_green):
                 comb += debug_led_g.eq(~ctr[-1])
 
+        if self.cpu_config.sim_htif:
+            # 'instret' counter of the HTIF.
+            comb += arbiter.htif.retire.eq(self.writeback | exception_unit.m_mret)
+
         return m
@@ -0,0 +1,272 @@
+"""
+Architectural checkpoints - state of the CPU (registers, pc, CSRs, privilege mode),
+main memory and peripherals, taken at an instruction boundary.
+
+Checkpoint can be captured from and restored into both the instruction-set simulator
+('capture_iss', 'restore_iss') and MtkCpu RTL simulation ('capture_rtl', 'restore_rtl'),
+so that e.g. boot sequence is fast-forwarded on the ISS, and the code of interest is then simulated
+on the RTL. Micro-architectural state that is not visible to the software is not saved - MtkCpu has no caches,
+nor TLB (each translated access does the page-walk), and the memory arbiter is idle between instructions.
+
+Checkpoints are stored in compressed .npz files, with only non-zero memory words.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from mtkcpu.cpu.priv_isa import CSRIndex, CSRNonStandardIndex
+from mtkcpu.iss.iss import MtkCpuIss
+from mtkcpu.units.mmio.sparse_memory import PAGE_BITS, SparseMemory_Wishbone
+from mtkcpu.utils.common import EBRMemConfig
+
+# Not latched - derived from peripherals' state, thus not restored.
+DERIVED_CSRS = [CSRIndex.MIP, CSRNonStandardIndex.MTIME]
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+@dataclass
+class Checkpoint:
+    pc: int
+    priv: int
+    regs: List[int]
+    # {CSR address: value}
+    csr: Dict[int, int]
+    mem_addr: int
+    mem_size_words: int
+    # {word index: value}, non-zero words only.
+    mem: Dict[int, int]
+    # {'<device basename>.<register>': value}, see 'DEVICE_REGISTERS'.
+    devices: Dict[str, int] = field(default_factory=dict)
+    # Number of instructions executed before the checkpoint (if known).
+    instret: int = 0
+
+    def save(self, path: Path) -> None:
+        mem_idx = np.array(sorted(self.mem), dtype=np.int64)
+        np.savez_compressed(
+            path,
+            info=np.array([CHECKPOINT_FORMAT_VERSION, self.pc, self.priv, self.mem_addr, self.mem_size_words, self.instret], dtype=np.int64),
+            regs=np.array(self.regs, dtype=np.uint32),
+            csr=np.array(sorted(self.csr.items()), dtype=np.int64).reshape(-1, 2),
+            mem_idx=mem_idx,
+            mem_val=np.array([self.mem[x] for x in mem_idx.tolist()], dtype=np.uint32),
+            device_names=np.array(sorted(self.devices)),
+            device_values=np.array([self.devices[x] for x in sorted(self.devices)], dtype=np.uint64),
+        )
+
+    @staticmethod
+    def load(path: Path) -> "Checkpoint":
+        with np.load(path, allow_pickle=False) as f:
+            version, pc, priv, mem_addr, mem_size_words, instret = f["info"].tolist()
+            if version != CHECKPOINT_FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported checkpoint format version {version}, expected {CHECKPOINT_FORMAT_VERSION}.")
+            return Checkpoint(
+                pc=pc,
+                priv=priv,
+                regs=f["regs"].tolist(),
+                csr={k: v for k, v in f["csr"].tolist()},
+                mem_addr=mem_addr,
+                mem_size_words=mem_size_words,
+                mem=dict(zip(f["mem_idx"].tolist(), f["mem_val"].tolist())),
+                devices=dict(zip([str(x) for x in f["device_names"]], f["device_values"].tolist())),
+                instret=instret,
+            )
+
+    def mem_config(self, sparse_latency=None) -> EBRMemConfig:
+        """
+        Memory configuration, that the checkpoint can be restored into.
+        """
+        return EBRMemConfig(
+            mem_size_words=self.mem_size_words,
+            mem_content_words=None,
+            mem_addr=self.mem_addr,
+            simulate=True,
+            sparse_latency=sparse_latency,
+        )
+
+    def check_mem_layout(self, mem_addr: int, mem_size_words: int) -> None:
+        if (mem_addr, mem_size_words) != (self.mem_addr, self.mem_size_words):
+            raise ValueError(
+                f"Checkpoint was taken with {self.mem_size_words} words of memory at {hex(self.mem_addr)}, "
+                f"can't restore it into {mem_size_words} words at {hex(mem_addr)}!"
+            )
+
+
+# Peripherals' registers, that hold the state (as opposed to e.g. the PLIC's claim register).
+DEVICE_REGISTERS = {
+    "uart": ["baud_divisor"],
+    "gpio": ["output", "rise_irq_en", "fall_irq_en"],
+    "clint": ["mtime", "mtimecmp", "msip"],
+    "plic": ["pending", "enable", "threshold", "in_service", "priority"],
+}
+
+
+# -- Instruction-set simulator.
+
+def _iss_devices(iss: MtkCpuIss) -> Dict[str, int]:
+    res = {}
+    for device, registers in DEVICE_REGISTERS.items():
+        for name in registers:
+            value = getattr(iss.devices[device], name)
+            if isinstance(value, list):
+                res.update({f"{device}.{name}_{i}": x for i, x in enumerate(value)})
+            else:
+                res[f"{device}.{name}"] = value
+    return res
+
+
+def capture_iss(iss: MtkCpuIss) -> Checkpoint:
+    ram = iss.devices["ebr"].words
+    return Checkpoint(
+        pc=iss.pc,
+        priv=int(iss.priv),
+        regs=list(iss.regs),
+        csr={addr: iss.csr_read(addr) for addr in iss.csr},
+        mem_addr=iss._ram_base,
+        mem_size_words=len(ram),
+        mem={i: x for i, x in enumerate(ram) if x},
+        devices=_iss_devices(iss),
+        instret=iss.steps,
+    )
+
+
+def restore_iss(iss: MtkCpuIss, ckpt: Checkpoint) -> None:
+    ram = iss.devices["ebr"].words
+    ckpt.check_mem_layout(iss._ram_base, len(ram))
+    ram[:] = [0] * len(ram)
+    for idx, value in ckpt.mem.items():
+        ram[idx] = value
+
+    iss.pc = ckpt.pc
+    iss.priv = ckpt.priv
+    iss.regs[:] = ckpt.regs
+    iss.steps = ckpt.instret
+    iss.halted = False
+    iss.exit_code = None
+    for addr, value in ckpt.csr.items():
+        if addr in iss.csr and addr not in DERIVED_CSRS:
+            iss.csr[addr] = value
+
+    for key, value in ckpt.devices.items():
+        device, name = key.split(".")
+        if device == "clint" and name == "mtime":
+            # 'mtime' is derived from the number of executed instructions.
+            iss.clint.mtime_offset = value - iss.steps
+        elif device == "plic" and name.startswith("priority_"):
+            iss.plic.priority[int(name.split("_")[1])] = value
+        else:
+            setattr(iss.devices[device], name, value)
+    iss.update_priv_state()
+
+
+# -- RTL simulation.
+
+def _rtl_devices(cpu) -> Dict[str, object]:
+    """
+    Signals corresponding to DEVICE_REGISTERS.
+    """
+    arbiter = cpu.arbiter
+    res = {
+        "uart.baud_divisor": arbiter.uart.baud_divisor,
+        "gpio.output": arbiter.gpio.gpio_output,
+        "gpio.rise_irq_en": arbiter.gpio.gpio_rise_irq_en,
+        "gpio.fall_irq_en": arbiter.gpio.gpio_fall_irq_en,
+        "clint.mtime": arbiter.clint.mtime,
+        "clint.mtimecmp": arbiter.clint.mtimecmp,
+        "clint.msip": arbiter.clint.msip,
+        "plic.pending": arbiter.plic.pending,
+        "plic.enable": arbiter.plic.enable,
+        "plic.threshold": arbiter.plic.threshold,
+        "plic.in_service": arbiter.plic.in_service,
+    }
+    for i, signal in enumerate(arbiter.plic.priority):
+        res[f"plic.priority_{i}"] = signal
+    return res
+
+
+def wait_instruction_boundary(cpu):
+    """
+    Waits (in a sync process) until MtkCpu is about to start executing the next instruction.
+    """
+    states = {v: k for k, v in cpu.main_fsm.encoding.items()}
+    while states[(yield cpu.main_fsm.state)] != "CHECK_SHOULD_HALT":
+        yield
+
+
+def capture_rtl(cpu, instret: int = 0):
+    """
+    Generator to be used in a sync process ('ckpt = yield from capture_rtl(cpu)') - waits for
+    the instruction boundary (see 'wait_instruction_boundary') and reads the whole state.
+    Reading the main memory takes a simulator access per word, thus it's not instant for big memories.
+    """
+    yield from wait_instruction_boundary(cpu)
+    owner = cpu.arbiter.ebr
+    mem_config = cpu.mem_config
+    mem = {}
+    if isinstance(owner, SparseMemory_Wishbone):
+        for page_idx, page in owner.storage.pages.items():
+            for offset in np.flatnonzero(page).tolist():
+                mem[(page_idx << PAGE_BITS) + offset] = int(page[offset])
+    else:
+        for idx in range(mem_config.mem_size_words):
+            value = yield owner.mem._array[idx]
+            if value:
+                mem[idx] = value
+
+    regs = []
+    for idx in range(32):
+        regs.append((yield cpu.regs._array[idx]))
+    csr = {}
+    for reg in cpu.csr_unit.csr_regs:
+        csr[int(reg.addr)] = yield reg.my_reg_latch
+    devices = {}
+    for name, signal in _rtl_devices(cpu).items():
+        devices[name] = yield signal
+
+    return Checkpoint(
+        pc=(yield cpu.pc),
+        priv=(yield cpu.exception_unit.current_priv_mode),
+        regs=regs,
+        csr=csr,
+        mem_addr=mem_config.mem_addr,
+        mem_size_words=mem_config.mem_size_words,
+        mem=mem,
+        devices=devices,
+        instret=instret,
+    )
+
+
+def restore_rtl(cpu, ckpt: Checkpoint):
+    """
+    Process to be added with 'sim.add_process' - restores the state before the first clock edge,
+    so that MtkCpu starts from the checkpoint instead of 'pc_reset_value'.
+    """
+    ckpt.check_mem_layout(cpu.mem_config.mem_addr, cpu.mem_config.mem_size_words)
+
+    def aux():
+        owner = cpu.arbiter.ebr
+        if isinstance(owner, SparseMemory_Wishbone):
+            owner.storage.clear()
+            owner.storage.load(ckpt.mem)
+        else:
+            # Words of the initial content, that are zero in the checkpoint.
+            for idx in cpu.mem_config.mem_content_dict():
+                if idx not in ckpt.mem:
+                    yield owner.mem._array[idx].eq(0)
+            for idx, value in ckpt.mem.items():
+                yield owner.mem._array[idx].eq(value)
+
+        for idx, value in enumerate(ckpt.regs):
+            yield cpu.regs._array[idx].eq(value)
+        for reg in cpu.csr_unit.csr_regs:
+            if reg.addr in ckpt.csr and reg.addr not in DERIVED_CSRS:
+                yield reg.my_reg_latch.eq(ckpt.csr[reg.addr])
+        signals = _rtl_devices(cpu)
+        for name, value in ckpt.devices.items():
+            yield signals[name].eq(value)
+        yield cpu.exception_unit.current_priv_mode.eq(ckpt.priv)
+        yield cpu.pc.eq(ckpt.pc)
+    return aux
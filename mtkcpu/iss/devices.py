@@ -0,0 +1,281 @@
+"""
+Functional models of MMIO peripherals, used by the instruction-set simulator.
+All accesses are word-aligned, 'offset' is relative to the region's base address.
+Unknown offsets read as zero and ignore writes.
+"""
+
+from typing import Callable, Dict, List, Optional, Union
+
+from mtkcpu.units.mmio.clint import CLINT_MSIP_OFFSET, CLINT_MTIMECMP_OFFSET, CLINT_MTIME_OFFSET
+from mtkcpu.units.mmio.htif import HTIF_TOHOST, HTIF_FROMHOST, HTIF_PUTCHAR, HTIF_CYCLE, HTIF_INSTRET, SYS_EXIT, SYS_WRITE
+from mtkcpu.units.mmio.gpio import (GPIO_STATE_OFFSET, GPIO_SET_OFFSET, GPIO_CLEAR_OFFSET, GPIO_TOGGLE_OFFSET,
+                                    GPIO_RISE_IRQ_EN_OFFSET, GPIO_FALL_IRQ_EN_OFFSET)
+from mtkcpu.units.mmio.plic import (PLIC_PRIORITY_OFFSET, PLIC_PENDING_OFFSET, PLIC_ENABLE_OFFSET,
+                                    PLIC_THRESHOLD_OFFSET, PLIC_CLAIM_COMPLETE_OFFSET, PLIC_PRIORITY_BITS,
+                                    PLIC_NUM_SOURCES)
+
+
+def bytes_mask(mask: int) -> int:
+    """ Converts 4-bit byte-select mask to 32-bit bit mask. """
+    return sum(0xFF << (8 * i) for i in range(4) if mask & (1 << i))
+
+
+def merge_bytes(old: int, data: int, mask: int) -> int:
+    """ Returns 'old' with byte lanes selected by 4-bit 'mask' replaced with the ones of 'data'. """
+    m = bytes_mask(mask)
+    return (old & ~m) | (data & m)
+
+
+class IssDevice:
+    def read(self, offset: int) -> int:
+        return 0
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        pass
+
+
+class IssRam(IssDevice):
+    def __init__(self, num_words: int, init: Optional[Union[List[int], Dict[int, int]]] = None) -> None:
+        self.words = [0] * num_words
+        if isinstance(init, dict):
+            for idx, word in init.items():
+                self.words[idx] = word
+        elif init is not None:
+            self.words[:len(init)] = init
+
+    def read(self, offset: int) -> int:
+        return self.words[offset >> 2]
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        m = bytes_mask(mask)
+        idx = offset >> 2
+        self.words[idx] = (self.words[idx] & ~m) | (data & m)
+
+
+class IssUart(IssDevice):
+    """
+    Transmission is instantaneous, thus the transmitter is never busy.
+    """
+    def __init__(self, divisor: int, tx_callback: Callable[[int], None]) -> None:
+        self.baud_divisor = divisor
+        self.tx_callback = tx_callback
+
+    # Transmitter idle.
+    interrupt = 1
+
+    def read(self, offset: int) -> int:
+        if offset == 0x10:
+            return self.baud_divisor
+        return 0
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        if offset == 0x8 and mask & 1:
+            self.tx_callback(data & 0xFF)
+        elif offset == 0x10:
+            self.baud_divisor = merge_bytes(self.baud_divisor, data, mask)
+
+
+class IssGpio(IssDevice):
+    """
+    No inputs are modelled - edge latches never get set.
+    """
+    def __init__(self) -> None:
+        self.output = 0
+        self.rise_irq_en = 0
+        self.fall_irq_en = 0
+
+    interrupt = 0
+
+    def read(self, offset: int) -> int:
+        return {
+            GPIO_STATE_OFFSET: self.output,
+            GPIO_RISE_IRQ_EN_OFFSET: self.rise_irq_en,
+            GPIO_FALL_IRQ_EN_OFFSET: self.fall_irq_en,
+        }.get(offset, 0)
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        # Byte lanes not selected by the bus are ignored.
+        data &= bytes_mask(mask)
+        if offset == GPIO_STATE_OFFSET:
+            self.output = merge_bytes(self.output, data, mask)
+        elif offset == GPIO_SET_OFFSET:
+            self.output |= data
+        elif offset == GPIO_CLEAR_OFFSET:
+            self.output &= ~data
+        elif offset == GPIO_TOGGLE_OFFSET:
+            self.output ^= data
+        elif offset == GPIO_RISE_IRQ_EN_OFFSET:
+            self.rise_irq_en = merge_bytes(self.rise_irq_en, data, mask)
+        elif offset == GPIO_FALL_IRQ_EN_OFFSET:
+            self.fall_irq_en = merge_bytes(self.fall_irq_en, data, mask)
+        # 'rise' and 'fall' registers are write-1-to-clear, but they are always zero anyway.
+
+
+class IssClint(IssDevice):
+    """
+    'mtime' is derived from the number of retired instructions (see 'get_time' parameter),
+    so that the simulation stays deterministic.
+    """
+    def __init__(self, get_time: Callable[[], int]) -> None:
+        self.get_time = get_time
+        self.mtime_offset = 0
+        self.mtimecmp = (1 << 64) - 1
+        self.msip = 0
+
+    @property
+    def mtime(self) -> int:
+        return (self.get_time() + self.mtime_offset) & ((1 << 64) - 1)
+
+    @property
+    def timer_interrupt(self) -> int:
+        return int(self.mtime >= self.mtimecmp)
+
+    def read(self, offset: int) -> int:
+        return {
+            CLINT_MSIP_OFFSET: self.msip,
+            CLINT_MTIMECMP_OFFSET: self.mtimecmp & 0xFFFF_FFFF,
+            CLINT_MTIMECMP_OFFSET + 4: self.mtimecmp >> 32,
+            CLINT_MTIME_OFFSET: self.mtime & 0xFFFF_FFFF,
+            CLINT_MTIME_OFFSET + 4: self.mtime >> 32,
+        }.get(offset, 0)
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        lo, hi = 0xFFFF_FFFF, 0xFFFF_FFFF << 32
+        if offset == CLINT_MSIP_OFFSET:
+            self.msip = merge_bytes(self.msip, data, mask) & 1
+        elif offset == CLINT_MTIMECMP_OFFSET:
+            self.mtimecmp = (self.mtimecmp & hi) | merge_bytes(self.mtimecmp & lo, data, mask)
+        elif offset == CLINT_MTIMECMP_OFFSET + 4:
+            self.mtimecmp = (self.mtimecmp & lo) | (merge_bytes(self.mtimecmp >> 32, data, mask) << 32)
+        elif offset in [CLINT_MTIME_OFFSET, CLINT_MTIME_OFFSET + 4]:
+            mtime = self.mtime
+            if offset == CLINT_MTIME_OFFSET:
+                mtime = (mtime & hi) | merge_bytes(mtime & lo, data, mask)
+            else:
+                mtime = (mtime & lo) | (merge_bytes(mtime >> 32, data, mask) << 32)
+            self.mtime_offset = mtime - self.get_time()
+
+
+class IssPlic(IssDevice):
+    """
+    Mirrors PLIC_Wishbone - level-triggered sources, 'get_sources' returns bitmask of active ones.
+    """
+    def __init__(self, get_sources: Callable[[], int], num_sources: int = PLIC_NUM_SOURCES) -> None:
+        self.get_sources = get_sources
+        self.num_sources = num_sources
+        self.priority = [0] * num_sources
+        self.pending = 0
+        self.enable = 0
+        self.threshold = 0
+        self.in_service = 0
+
+    def update_pending(self) -> None:
+        self.pending |= self.get_sources() & ~self.in_service & ~1
+
+    @property
+    def claim_id(self) -> int:
+        self.update_pending()
+        # NOTE: strict comparison and ascending order - on equal priorities, lower ID wins.
+        res, max_priority = 0, self.threshold
+        for i in range(1, self.num_sources):
+            if (self.pending & self.enable & (1 << i)) and self.priority[i] > max_priority:
+                res, max_priority = i, self.priority[i]
+        return res
+
+    @property
+    def external_interrupt(self) -> int:
+        return int(self.claim_id != 0)
+
+    def read(self, offset: int) -> int:
+        if offset == PLIC_CLAIM_COMPLETE_OFFSET:
+            claim_id = self.claim_id
+            if claim_id:
+                self.pending &= ~(1 << claim_id)
+                self.in_service |= 1 << claim_id
+            return claim_id
+        if offset == PLIC_PENDING_OFFSET:
+            self.update_pending()
+            return self.pending
+        if offset == PLIC_ENABLE_OFFSET:
+            return self.enable
+        if offset == PLIC_THRESHOLD_OFFSET:
+            return self.threshold
+        i = (offset - PLIC_PRIORITY_OFFSET) >> 2
+        if offset < PLIC_PENDING_OFFSET and 0 < i < self.num_sources:
+            return self.priority[i]
+        return 0
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        prio_mask = (1 << PLIC_PRIORITY_BITS) - 1
+        if offset == PLIC_CLAIM_COMPLETE_OFFSET:
+            data &= bytes_mask(mask)
+            if data < self.num_sources:
+                self.in_service &= ~(1 << data)
+        elif offset == PLIC_ENABLE_OFFSET:
+            # source 0 is reserved.
+            self.enable = merge_bytes(self.enable, data, mask) & ~1 & ((1 << self.num_sources) - 1)
+        elif offset == PLIC_THRESHOLD_OFFSET:
+            self.threshold = merge_bytes(self.threshold, data, mask) & prio_mask
+        else:
+            i = (offset - PLIC_PRIORITY_OFFSET) >> 2
+            if offset < PLIC_PENDING_OFFSET and 0 < i < self.num_sources:
+                self.priority[i] = merge_bytes(self.priority[i], data, mask) & prio_mask
+
+
+class IssHtif(IssDevice):
+    """
+    See HtifHost - 'cycle' and 'instret' both return the number of executed instructions.
+    Syscall blocks are accessed via 'read_word'/'write_word' (physical addresses).
+    """
+    def __init__(
+            self,
+            get_instret: Callable[[], int],
+            putchar: Callable[[int], None],
+            read_word: Callable[[int], int],
+            write_word: Callable[[int, int], None],
+        ) -> None:
+        self.get_instret = get_instret
+        self.putchar = putchar
+        self.read_word = read_word
+        self.write_word = write_word
+        self.fromhost = 0
+        self.exit_code: Optional[int] = None
+
+    def read(self, offset: int) -> int:
+        instret = self.get_instret()
+        return {
+            HTIF_FROMHOST: self.fromhost,
+            HTIF_CYCLE: instret & 0xFFFF_FFFF,
+            HTIF_CYCLE + 4: instret >> 32,
+            HTIF_INSTRET: instret & 0xFFFF_FFFF,
+            HTIF_INSTRET + 4: instret >> 32,
+        }.get(offset, 0)
+
+    def write(self, offset: int, data: int, mask: int) -> None:
+        if offset == HTIF_TOHOST:
+            self.tohost(data)
+        elif offset == HTIF_FROMHOST:
+            self.fromhost = data
+        elif offset == HTIF_PUTCHAR and mask & 1:
+            self.putchar(data & 0xFF)
+
+    def tohost(self, value: int) -> None:
+        if value & 1:
+            self.exit_code = value >> 1
+            return
+        if not value:
+            return
+        which, arg0, arg1, arg2 = [self.read_word(value + 8 * i) for i in range(4)]
+        result = -38 & 0xFFFF_FFFF # -ENOSYS
+        if which == SYS_EXIT:
+            self.exit_code = arg0
+            result = 0
+        elif which == SYS_WRITE and arg0 in [1, 2]:
+            words = [self.read_word(x) for x in range(arg1 & ~0b11, arg1 + arg2, 4)]
+            data = b"".join(x.to_bytes(4, "little") for x in words)
+            for byte in data[arg1 & 0b11:(arg1 & 0b11) + arg2]:
+                self.putchar(byte)
+            result = arg2
+        self.write_word(value, result)
+        self.write_word(value + 4, 0xFFFF_FFFF if result >> 31 else 0)
+        self.fromhost = 1
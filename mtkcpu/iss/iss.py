@@ -0,0 +1,671 @@
+from dataclasses import dataclass
+from enum import Enum
+from functools import reduce
+from operator import or_
+from typing import Callable, Dict, List, Optional, Tuple
+
+from amaranth.lib import data
+
+from mtkcpu.cpu.cpu import CPU_Config, match_jal, match_jalr, match_branch, match_mret, match_sfence_vma
+from mtkcpu.cpu.isa import Funct3, Funct7, InstrType
+from mtkcpu.cpu.priv_isa import CSRIndex, CSRNonStandardIndex, IrqCause, PrivModeBits, TrapCause
+from mtkcpu.iss.devices import IssClint, IssDevice, IssGpio, IssHtif, IssPlic, IssRam, IssUart
+from mtkcpu.units.adder import match_adder_unit
+from mtkcpu.units.compare import match_compare_unit
+from mtkcpu.units.csr.csr import CsrUnit, match_csr
+from mtkcpu.units.csr.csr_handlers import MISA, MTVAL, MIP, MTIME, DCSR, SATP
+from mtkcpu.units.csr.types import MtvecModeBits
+from mtkcpu.units.loadstore import UART_BAUD_RATE, AddrTranslationIssue, match_loadstore_unit, mmio_address_spaces
+from mtkcpu.units.logic import match_logic_unit
+from mtkcpu.units.memory_interface import MMIOAddressSpace
+from mtkcpu.units.mmio.plic import PLIC_NUM_SOURCES, PLIC_SOURCE_UART, PLIC_SOURCE_GPIO
+from mtkcpu.units.mmio.uart import baud_divisor
+from mtkcpu.units.shifter import match_shifter_unit
+from mtkcpu.units.upper import match_auipc, match_lui
+from mtkcpu.utils.common import EBRMemConfig
+
+MASK32 = 0xFFFF_FFFF
+
+MSTATUS_MIE = 1 << 3
+MSTATUS_MPIE = 1 << 7
+MSTATUS_MPP_OFFSET = 11
+MCAUSE_INTERRUPT = 1 << 31
+
+# Fields that CSR handlers (see csr_handlers.py) latch on write, if not the whole register.
+CSR_WRITABLE_FIELDS: Dict[type, List[str]] = {
+    MISA: [],
+    MTVAL: [],
+    MIP: [],
+    # 'mtime' is driven by CLINT, CSR writes have no effect.
+    MTIME: [],
+    DCSR: ["step", "ebreakm"],
+    SATP: ["ppn", "mode"],
+}
+
+
+def csr_write_mask(handler: type) -> int:
+    if handler not in CSR_WRITABLE_FIELDS:
+        return MASK32
+    layout = data.Layout.cast(handler.layout)
+    return reduce(or_, [((1 << layout[f].width) - 1) << layout[f].offset for f in CSR_WRITABLE_FIELDS[handler]], 0)
+
+
+def sext(value: int, bits: int) -> int:
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+
+class StopReason(str, Enum):
+    MAX_INSTRUCTIONS = "max_instructions"
+    # 'ebreak' executed with 'dcsr.ebreakm' set - MtkCpu would enter Debug Mode.
+    EBREAK = "ebreak"
+    # Jump to itself, with no interrupt that could ever break the loop.
+    IDLE_LOOP = "idle_loop"
+    # Firmware exited via HTIF (see 'exit_code').
+    EXIT = "exit"
+
+
+class AddrTranslationError(Exception):
+    """
+    MtkCpu doesn't implement page-fault exceptions - the page-walk just flags an error
+    (see MemoryArbiter.error_code), and simulation tests fail on it.
+    """
+    def __init__(self, issue: AddrTranslationIssue, vaddr: int) -> None:
+        super().__init__(f"addr translation error: {issue.name} (virtual address {hex(vaddr)})")
+        self.issue = issue
+        self.vaddr = vaddr
+
+
+class _Trap(Exception):
+    def __init__(self, cause: TrapCause, tval: Optional[int] = None) -> None:
+        self.cause = cause
+        self.tval = tval
+
+
+class _Halt(Exception):
+    pass
+
+
+class _Exit(Exception):
+    pass
+
+
+@dataclass
+class IssRetiredInstr:
+    pc: int
+    instr: Optional[int]  # None if fetch failed
+    rd: int               # zero if no register was written
+    rd_val: int
+    store: Optional[Tuple[int, int, int]]  # (physical word address, data, byte mask)
+    trap: Optional[int]   # 'mcause' value if instruction trapped
+
+
+class MtkCpuIss:
+    """
+    Functional (not cycle-accurate) instruction-set simulator of MtkCpu. It mirrors MtkCpu's
+    decoder, CSR set, trap and interrupt handling, and Sv32 address translation,
+    also where those differ from RISC-V specs.
+
+    Memory map is the same as MemoryArbiter's one (see 'mmio_address_spaces'), peripherals are replaced
+    with functional models (see devices.py). As there is no notion of clock cycle,
+    CLINT's 'mtime' is incremented once per executed instruction.
+    """
+
+    def __init__(
+            self,
+            mem_config: EBRMemConfig,
+            cpu_config: CPU_Config,
+            reg_init: Optional[List[int]] = None,
+            uart_tx_callback: Optional[Callable[[int], None]] = None,
+        ):
+        self.cpu_config = cpu_config
+        self.regs = [0] * 32
+        if reg_init is not None:
+            self.regs[1:len(reg_init)] = [x & MASK32 for x in reg_init[1:]]
+        self.pc = cpu_config.pc_reset_value
+        self.priv = PrivModeBits.MACHINE
+        # Number of executed instructions, including ones that trapped.
+        self.steps = 0
+        self.halted = False
+        # Set once firmware exits via HTIF.
+        self.exit_code: Optional[int] = None
+        self.last_store: Optional[Tuple[int, int, int]] = None
+        # Physical address of the last read from a non-RAM device, set by 'step'.
+        self.last_mmio_read: Optional[int] = None
+        self.uart_output = bytearray()
+        self.uart_tx_callback = uart_tx_callback
+
+        handlers = CsrUnit.enabled_csr_regs(with_virtual_memory=cpu_config.with_virtual_memory)
+        self.csr: Dict[int, int] = {x.addr: x.const() for x in handlers}
+        self.csr_write_masks: Dict[int, int] = {x.addr: csr_write_mask(x) for x in handlers}
+
+        self.regions: List[Tuple[int, int, IssDevice]] = []
+        self.devices: Dict[str, IssDevice] = {}
+        for addr_space in mmio_address_spaces(mem_config=mem_config, sim_htif=cpu_config.sim_htif):
+            device = self.create_device(addr_space, mem_config=mem_config, clk_freq=cpu_config.clk_freq_hz)
+            self.devices[addr_space.basename] = device
+            self.regions.append((addr_space.first_valid_addr_incl, addr_space.last_valid_addr_excl, device))
+
+        self.clint: IssClint = self.devices["clint"]
+        self.plic: IssPlic = self.devices["plic"]
+        ram = self.devices["ebr"]
+        self._ram = ram.words
+        self._ram_base = mem_config.mem_addr
+        self._ram_size = 4 * len(ram.words)
+
+        self._decode_cache: Dict[int, Callable[[int], int]] = {}
+        self._rd_cache: Dict[int, int] = {}
+        self._translating = False
+        self._irq_deadline = 0
+
+    def create_device(self, addr_space: MMIOAddressSpace, mem_config: EBRMemConfig, clk_freq: int) -> IssDevice:
+        name = addr_space.basename
+        if name == "ebr":
+            return IssRam(num_words=mem_config.mem_size_words, init=mem_config.mem_content_words)
+        if name == "debug_ebr":
+            return IssRam(num_words=addr_space.num_words)
+        if name == "uart":
+            return IssUart(divisor=baud_divisor(clk_freq=clk_freq, baud_rate=UART_BAUD_RATE), tx_callback=self.uart_tx)
+        if name == "gpio":
+            return IssGpio()
+        if name == "clint":
+            return IssClint(get_time=lambda: self.steps)
+        if name == "plic":
+            return IssPlic(get_sources=self.plic_sources, num_sources=PLIC_NUM_SOURCES)
+        if name == "htif":
+            return IssHtif(
+                get_instret=lambda: self.steps,
+                putchar=self.uart_tx,
+                read_word=lambda addr: self.phys_read(addr, TrapCause.LOAD_ACCESS_FAULT),
+                write_word=lambda addr, value: self.phys_write(addr, value, 0b1111),
+            )
+        raise NotImplementedError(f"No functional model for MMIO device '{name}'!")
+
+    def uart_tx(self, byte: int) -> None:
+        self.uart_output.append(byte)
+        if self.uart_tx_callback is not None:
+            self.uart_tx_callback(byte)
+
+    def plic_sources(self) -> int:
+        return (self.devices["uart"].interrupt << PLIC_SOURCE_UART) | (self.devices["gpio"].interrupt << PLIC_SOURCE_GPIO)
+
+    # -- Memory access.
+
+    def translate(self, vaddr: int, is_write: bool) -> int:
+        """
+        Sv32 page-walk, the same as MemoryArbiter's one.
+        """
+        root_ppn = self.csr[CSRIndex.SATP] & 0x3F_FFFF
+        for level in [1, 0]:
+            vpn = (vaddr >> (22 if level else 12)) & 0x3FF
+            pte = self.phys_read((((root_ppn << 10) | vpn) << 2) & MASK32, TrapCause.LOAD_ACCESS_FAULT)
+            v, r, w, x, u, a, d = [(pte >> i) & 1 for i in [0, 1, 2, 3, 4, 6, 7]]
+            issue = AddrTranslationIssue.OK
+            if not v:
+                issue = AddrTranslationIssue.PAGE_INVALID
+            if w and not r:
+                issue = AddrTranslationIssue.WRITABLE_NOT_READABLE
+            if r or x:
+                # NOTE: translation is only enabled in User mode.
+                if not u:
+                    issue = AddrTranslationIssue.LACK_PERMISSIONS
+                elif not a or (is_write and not d):
+                    issue = AddrTranslationIssue.FIRST_ACCESS
+                elif level == 1 and (pte >> 10) & 0x3FF:
+                    issue = AddrTranslationIssue.MISALIGNED_SUPERPAGE
+                if issue != AddrTranslationIssue.OK:
+                    raise AddrTranslationError(issue, vaddr)
+                return (((pte >> 10) << 12) | (vaddr & 0xFFF)) & MASK32
+            if level == 0:
+                issue = AddrTranslationIssue.LEAF_IS_NO_LEAF
+            if issue != AddrTranslationIssue.OK:
+                raise AddrTranslationError(issue, vaddr)
+            root_ppn = pte >> 10
+        assert False
+
+    def find_region(self, addr: int, fault: TrapCause) -> Tuple[int, IssDevice]:
+        for first, last, device in self.regions:
+            if first <= addr < last:
+                return first, device
+        # MtkCpu reports word address of the bus transaction.
+        raise _Trap(fault, tval=addr)
+
+    def phys_read(self, addr: int, fault: TrapCause) -> int:
+        off = addr - self._ram_base
+        if 0 <= off < self._ram_size:
+            return self._ram[off >> 2]
+        first, device = self.find_region(addr, fault)
+        res = device.read(addr - first)
+        self.last_mmio_read = addr
+        # reading PLIC's 'claim_complete' has side effects.
+        self.update_irq_deadline()
+        return res
+
+    def phys_write(self, addr: int, value: int, mask: int) -> None:
+        off = addr - self._ram_base
+        if 0 <= off < self._ram_size and mask == 0b1111:
+            self._ram[off >> 2] = value
+        else:
+            first, device = self.find_region(addr, TrapCause.STORE_ACCESS_FAULT)
+            device.write(addr - first, value, mask)
+            if not isinstance(device, IssRam):
+                self.update_irq_deadline()
+            if isinstance(device, IssHtif) and device.exit_code is not None:
+                self.exit_code = device.exit_code
+                self.last_store = (addr, value, mask)
+                raise _Exit()
+        self.last_store = (addr, value, mask)
+
+    def read(self, addr: int, fault: TrapCause) -> int:
+        if self._translating:
+            addr = self.translate(addr, is_write=False)
+        return self.phys_read(addr, fault)
+
+    def write(self, addr: int, value: int, mask: int) -> None:
+        if self._translating:
+            addr = self.translate(addr, is_write=True)
+        self.phys_write(addr, value, mask)
+
+    def fetch(self, pc: int) -> int:
+        if pc & 0b11:
+            raise _Trap(TrapCause.FETCH_MISALIGNED)
+        return self.read(pc, TrapCause.FETCH_ACCESS_FAULT)
+
+    # -- Privileged architecture.
+
+    def csr_read(self, idx: int) -> int:
+        if idx == CSRIndex.MIP:
+            return self.mip()
+        if idx == CSRNonStandardIndex.MTIME:
+            return self.clint.mtime & MASK32
+        return self.csr[idx]
+
+    def csr_write(self, idx: int, value: int) -> None:
+        mask = self.csr_write_masks[idx]
+        self.csr[idx] = (self.csr[idx] & ~mask) | (value & mask)
+        self.update_priv_state()
+
+    def mip(self) -> int:
+        return (
+            (self.clint.msip << IrqCause.M_SOFTWARE_INTERRUPT)
+            | (self.clint.timer_interrupt << IrqCause.M_TIMER_INTERRUPT)
+            | (self.plic.external_interrupt << IrqCause.M_EXTERNAL_INTERRUPT)
+        )
+
+    def irqs_globally_enabled(self) -> bool:
+        return bool(self.csr[CSRIndex.MSTATUS] & MSTATUS_MIE) or self.priv != PrivModeBits.MACHINE
+
+    def pending_irq(self) -> Optional[IrqCause]:
+        if not self.irqs_globally_enabled():
+            return None
+        pending = self.mip() & self.csr[CSRIndex.MIE]
+        # the same priority as ExceptionUnit's one (privileged spec order: MEI, MSI, MTI).
+        for cause in [IrqCause.M_EXTERNAL_INTERRUPT, IrqCause.M_SOFTWARE_INTERRUPT, IrqCause.M_TIMER_INTERRUPT]:
+            if pending & (1 << cause):
+                return cause
+        return None
+
+    def update_irq_deadline(self) -> None:
+        """
+        Finds the step when pending interrupts need to be checked next time, so that
+        the main loop doesn't need to do it after each instruction.
+        Must be called whenever state that interrupts depend on changes.
+        """
+        if self.pending_irq() is not None:
+            self._irq_deadline = self.steps
+        elif self.irqs_globally_enabled() and self.csr[CSRIndex.MIE] & (1 << IrqCause.M_TIMER_INTERRUPT):
+            self._irq_deadline = self.steps + self.clint.mtimecmp - self.clint.mtime
+        else:
+            self._irq_deadline = float("inf")
+
+    def update_priv_state(self) -> None:
+        satp_mode = self.csr.get(CSRIndex.SATP, 0) >> 31
+        self._translating = bool(satp_mode) and self.priv == PrivModeBits.USER
+        self.update_irq_deadline()
+
+    def trap(self, pc: int, cause: int, tval: Optional[int] = None, interrupt: bool = False) -> int:
+        csr = self.csr
+        mstatus = csr[CSRIndex.MSTATUS]
+        mpie = (mstatus & MSTATUS_MIE) << 4
+        mstatus &= ~(MSTATUS_MIE | MSTATUS_MPIE | (0b11 << MSTATUS_MPP_OFFSET))
+        csr[CSRIndex.MSTATUS] = mstatus | mpie | (self.priv << MSTATUS_MPP_OFFSET)
+        csr[CSRIndex.MEPC] = pc
+        csr[CSRIndex.MCAUSE] = cause | (MCAUSE_INTERRUPT if interrupt else 0)
+        if tval is not None:
+            csr[CSRIndex.MTVAL] = tval
+        self.priv = PrivModeBits.MACHINE
+        self.update_priv_state()
+
+        mtvec = csr[CSRIndex.MTVEC]
+        base = mtvec & ~0b11
+        if interrupt and (mtvec & 0b11) == MtvecModeBits.VECTORED:
+            return (base + 4 * cause) & MASK32
+        return base
+
+    def mret(self) -> int:
+        mstatus = self.csr[CSRIndex.MSTATUS]
+        mie = (mstatus & MSTATUS_MPIE) >> 4
+        self.csr[CSRIndex.MSTATUS] = (mstatus & ~MSTATUS_MIE) | mie | MSTATUS_MPIE
+        self.priv = PrivModeBits((mstatus >> MSTATUS_MPP_OFFSET) & 0b11)
+        self.update_priv_state()
+        return self.csr[CSRIndex.MEPC]
+
+    def take_pending_irq(self, pc: int) -> int:
+        cause = self.pending_irq()
+        if cause is None:
+            self.update_irq_deadline()
+            return pc
+        # Interrupts are taken between instructions, 'mepc' points to the next one.
+        return self.trap(pc, cause, interrupt=True)
+
+    def csr_op(self, instr: int, funct3: int, idx: int, src: int, rs1: int) -> int:
+        if self.priv != PrivModeBits.MACHINE or idx not in self.csr:
+            raise _Trap(TrapCause.ILLEGAL_INSTRUCTION, tval=instr)
+        # Debug Specs 1.0, 4.10: 'These registers are only accessible from Debug Mode.'
+        if idx in range(0x7b0, 0x7b4):
+            raise _Trap(TrapCause.ILLEGAL_INSTRUCTION, tval=instr)
+        old = self.csr_read(idx)
+        op = funct3 & 0b11
+        if op == Funct3.CSRRW:
+            self.csr_write(idx, src)
+        elif rs1 != 0:
+            self.csr_write(idx, old | src if op == Funct3.CSRRS else old & ~src)
+        return old
+
+    # -- Decoder.
+
+    def decode(self, instr: int) -> Callable[[int], int]:
+        """
+        Returns function that executes 'instr' located at address 'pc' (passed as an argument)
+        and returns the next 'pc'. Register x0 might get written, it's zeroed after each instruction.
+        """
+        regs = self.regs
+        opcode = instr & 0x7F
+        rd = (instr >> 7) & 0x1F
+        funct3 = (instr >> 12) & 0b111
+        rs1 = (instr >> 15) & 0x1F
+        rs2 = (instr >> 20) & 0x1F
+        funct7 = instr >> 25
+        imm = sext(instr >> 20, 12)
+        is_op_imm = opcode == InstrType.OP_IMM
+        writes_rd = False
+
+        def illegal(pc):
+            raise _Trap(TrapCause.ILLEGAL_INSTRUCTION, tval=instr)
+
+        # Order of checks is the same as in MtkCpu's DECODE state.
+        if match_logic_unit(opcode, funct3, funct7):
+            writes_rd = True
+            op = {Funct3.XOR: int.__xor__, Funct3.OR: int.__or__, Funct3.AND: int.__and__}[funct3]
+            if is_op_imm:
+                imm32 = imm & MASK32
+                def fn(pc):
+                    regs[rd] = op(regs[rs1], imm32)
+                    return pc + 4
+            else:
+                def fn(pc):
+                    regs[rd] = op(regs[rs1], regs[rs2])
+                    return pc + 4
+        elif match_adder_unit(opcode, funct3, funct7):
+            writes_rd = True
+            if is_op_imm:
+                def fn(pc):
+                    regs[rd] = (regs[rs1] + imm) & MASK32
+                    return pc + 4
+            elif funct7 == Funct7.SUB:
+                def fn(pc):
+                    regs[rd] = (regs[rs1] - regs[rs2]) & MASK32
+                    return pc + 4
+            else:
+                def fn(pc):
+                    regs[rd] = (regs[rs1] + regs[rs2]) & MASK32
+                    return pc + 4
+        elif match_shifter_unit(opcode, funct3, funct7):
+            writes_rd = True
+            if funct3 == Funct3.SLL:
+                op = lambda a, sh: (a << sh) & MASK32
+            elif funct7 == Funct7.SRL:
+                op = lambda a, sh: a >> sh
+            else:
+                op = lambda a, sh: (sext(a, 32) >> sh) & MASK32
+            if is_op_imm:
+                shamt = rs2
+                def fn(pc):
+                    regs[rd] = op(regs[rs1], shamt)
+                    return pc + 4
+            else:
+                def fn(pc):
+                    regs[rd] = op(regs[rs1], regs[rs2] & 0x1F)
+                    return pc + 4
+        elif match_loadstore_unit(opcode, funct3, funct7):
+            if opcode == InstrType.LOAD:
+                writes_rd = True
+                fn = self.decode_load(rd, funct3, rs1, imm)
+            else:
+                fn = self.decode_store(funct3, rs1, rs2, sext((funct7 << 5) | rd, 12))
+        elif match_compare_unit(opcode, funct3, funct7):
+            writes_rd = True
+            if funct3 == Funct3.SLT:
+                if is_op_imm:
+                    def fn(pc):
+                        regs[rd] = int(sext(regs[rs1], 32) < imm)
+                        return pc + 4
+                else:
+                    def fn(pc):
+                        regs[rd] = int(sext(regs[rs1], 32) < sext(regs[rs2], 32))
+                        return pc + 4
+            else:
+                if is_op_imm:
+                    imm32 = imm & MASK32
+                    def fn(pc):
+                        regs[rd] = int(regs[rs1] < imm32)
+                        return pc + 4
+                else:
+                    def fn(pc):
+                        regs[rd] = int(regs[rs1] < regs[rs2])
+                        return pc + 4
+        elif match_lui(opcode, funct3, funct7):
+            writes_rd = True
+            upper = instr & 0xFFFF_F000
+            def fn(pc):
+                regs[rd] = upper
+                return pc + 4
+        elif match_auipc(opcode, funct3, funct7):
+            writes_rd = True
+            upper = instr & 0xFFFF_F000
+            def fn(pc):
+                regs[rd] = (pc + upper) & MASK32
+                return pc + 4
+        elif match_jal(opcode, funct3, funct7):
+            writes_rd = True
+            offset = sext(
+                (((instr >> 21) & 0x3FF) << 1)
+                | (((instr >> 20) & 1) << 11)
+                | (((instr >> 12) & 0xFF) << 12)
+                | ((instr >> 31) << 20),
+                21
+            )
+            def fn(pc):
+                regs[rd] = (pc + 4) & MASK32
+                return (pc + offset) & MASK32
+        elif match_jalr(opcode, funct3, funct7):
+            writes_rd = True
+            # NOTE: MtkCpu doesn't clear the lowest bit of the target address.
+            def fn(pc):
+                target = (regs[rs1] + imm) & MASK32
+                regs[rd] = (pc + 4) & MASK32
+                return target
+        elif match_branch(opcode, funct3, funct7):
+            offset = sext(
+                (((instr >> 8) & 0xF) << 1)
+                | (((instr >> 25) & 0x3F) << 5)
+                | (((instr >> 7) & 1) << 11)
+                | ((instr >> 31) << 12),
+                13
+            )
+            cond = {
+                Funct3.BEQ: lambda a, b: a == b,
+                Funct3.BNE: lambda a, b: a != b,
+                Funct3.BLT: lambda a, b: sext(a, 32) < sext(b, 32),
+                Funct3.BGE: lambda a, b: sext(a, 32) >= sext(b, 32),
+                Funct3.BLTU: lambda a, b: a < b,
+                Funct3.BGEU: lambda a, b: a >= b,
+            }[funct3]
+            def fn(pc):
+                if cond(regs[rs1], regs[rs2]):
+                    return (pc + offset) & MASK32
+                return pc + 4
+        elif match_csr(opcode, funct3, funct7):
+            writes_rd = True
+            # CSRRWI, CSRRSI and CSRRCI use zero-extended 'rs1' field as an immediate.
+            is_imm = funct3 & 0b100
+            idx = instr >> 20
+            def fn(pc):
+                regs[rd] = self.csr_op(instr, funct3, idx, rs1 if is_imm else regs[rs1], rs1)
+                return pc + 4
+        elif match_mret(opcode, funct3, funct7):
+            def fn(pc):
+                return self.mret()
+        elif match_sfence_vma(opcode, funct3, funct7) or opcode == 0b0001111:
+            # sfence.vma and fence - nothing to do, as we are a simple implementation.
+            def fn(pc):
+                return pc + 4
+        elif opcode == InstrType.SYSTEM:
+            if imm & 0b1:
+                def fn(pc):
+                    if (self.csr[CSRIndex.DCSR] >> 15) & 1: # dcsr.ebreakm
+                        raise _Halt()
+                    raise _Trap(TrapCause.BREAKPOINT)
+            else:
+                # NOTE: ExceptionUnit's priority encoder reports ECALL_FROM_U regardless
+                # of the current privilege mode, as both causes share the same notifier.
+                def fn(pc):
+                    raise _Trap(TrapCause.ECALL_FROM_U)
+        else:
+            fn = illegal
+
+        self._decode_cache[instr] = fn
+        self._rd_cache[instr] = rd if writes_rd else 0
+        return fn
+
+    def decode_load(self, rd: int, funct3: int, rs1: int, imm: int) -> Callable[[int], int]:
+        regs = self.regs
+        read = self.read
+        fault = TrapCause.LOAD_ACCESS_FAULT
+        if funct3 == Funct3.W:
+            def fn(pc):
+                regs[rd] = read((regs[rs1] + imm) & 0xFFFF_FFFC, fault)
+                return pc + 4
+            return fn
+
+        mask, sign_bits = {
+            Funct3.B: (0xFF, 8),
+            Funct3.BU: (0xFF, None),
+            Funct3.H: (0xFFFF, 16),
+            Funct3.HU: (0xFFFF, None),
+        }[funct3]
+        def fn(pc):
+            addr = (regs[rs1] + imm) & MASK32
+            value = (read(addr & ~0b11, fault) >> (8 * (addr & 0b11))) & mask
+            regs[rd] = value if sign_bits is None else sext(value, sign_bits) & MASK32
+            return pc + 4
+        return fn
+
+    def decode_store(self, funct3: int, rs1: int, rs2: int, imm: int) -> Callable[[int], int]:
+        regs = self.regs
+        write = self.write
+        if funct3 == Funct3.W:
+            def fn(pc):
+                write((regs[rs1] + imm) & 0xFFFF_FFFC, regs[rs2], 0b1111)
+                return pc + 4
+            return fn
+
+        data_mask, byte_mask = (0xFF, 0b1) if funct3 == Funct3.B else (0xFFFF, 0b11)
+        def fn(pc):
+            addr = (regs[rs1] + imm) & MASK32
+            lsb = addr & 0b11
+            # NOTE: misaligned half-word store is truncated, the same way it's done in MtkCpu.
+            write(addr & ~0b11, ((regs[rs2] & data_mask) << (8 * lsb)) & MASK32, (byte_mask << lsb) & 0b1111)
+            return pc + 4
+        return fn
+
+    # -- Execution.
+
+    def step(self, take_irq: bool = True) -> IssRetiredInstr:
+        """
+        Takes pending interrupt (if any) and executes a single instruction.
+        With 'take_irq' unset, interrupts are expected to be injected by the caller (see 'trap' method).
+        """
+        if take_irq and self.steps >= self._irq_deadline:
+            self.pc = self.take_pending_irq(self.pc)
+        pc = self.pc
+        self.last_store = None
+        self.last_mmio_read = None
+        instr, rd, trap = None, 0, None
+        try:
+            instr = self.fetch(pc)
+            fn = self._decode_cache.get(instr) or self.decode(instr)
+            self.pc = fn(pc)
+            rd = self._rd_cache[instr]
+        except _Trap as t:
+            self.pc = self.trap(pc, t.cause, t.tval)
+            trap = self.csr[CSRIndex.MCAUSE]
+        except _Halt:
+            self.halted = True
+        except _Exit:
+            # The store itself has completed.
+            self.pc = (pc + 4) & MASK32
+        self.regs[0] = 0
+        self.steps += 1
+        return IssRetiredInstr(pc=pc, instr=instr, rd=rd, rd_val=self.regs[rd], store=self.last_store, trap=trap)
+
+    def run(self, max_instructions: int) -> StopReason:
+        regs = self.regs
+        ram = self._ram
+        ram_base = self._ram_base
+        ram_size = self._ram_size
+        cache = self._decode_cache
+        decode = self.decode
+        fetch = self.fetch
+
+        pc = self.pc
+        steps = self.steps
+        end = steps + max_instructions
+        self.update_irq_deadline()
+
+        try:
+            while steps < end:
+                # 'mtime' is derived from 'self.steps'.
+                self.steps = steps
+                if steps >= self._irq_deadline:
+                    pc = self.take_pending_irq(pc)
+                try:
+                    off = pc - ram_base
+                    if 0 <= off < ram_size and not (pc & 0b11 or self._translating):
+                        instr = ram[off >> 2]
+                    else:
+                        instr = fetch(pc)
+                    new_pc = (cache.get(instr) or decode(instr))(pc)
+                except _Trap as t:
+                    new_pc = self.trap(pc, t.cause, t.tval)
+                regs[0] = 0
+                steps += 1
+                if new_pc == pc:
+                    # Busy loop, e.g. 'j .' - skip to the next interrupt.
+                    self.steps = steps
+                    self.update_irq_deadline()
+                    if self._irq_deadline == float("inf"):
+                        return StopReason.IDLE_LOOP
+                    steps = max(steps, min(self._irq_deadline, end))
+                pc = new_pc
+            return StopReason.MAX_INSTRUCTIONS
+        except _Halt:
+            self.halted = True
+            return StopReason.EBREAK
+        except _Exit:
+            pc = (pc + 4) & MASK32
+            steps += 1
+            return StopReason.EXIT
+        finally:
+            self.pc = pc
+            self.steps = steps
@@ -0,0 +1,176 @@
+"""
+Lockstep co-simulation - MtkCpu RTL simulation is checked against the instruction-set simulator
+instruction by instruction, so that the first divergence is reported as soon as it happens.
+"""
+
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from amaranth.sim.core import Passive
+
+from mtkcpu.cpu.cpu import MtkCpu
+from mtkcpu.cpu.priv_isa import CSRIndex, CSRNonStandardIndex, IrqCause
+from mtkcpu.iss.devices import bytes_mask
+from mtkcpu.iss.iss import MCAUSE_INTERRUPT, MtkCpuIss, IssRetiredInstr
+from mtkcpu.units.csr.csr import match_csr
+from mtkcpu.utils.common import EBRMemConfig
+
+# CSRs, whose values depend on clock cycles, not on instructions executed.
+CYCLE_DEPENDENT_CSRS = [CSRIndex.MIP, CSRNonStandardIndex.MTIME]
+
+
+class LockstepDivergence(Exception):
+    pass
+
+
+def disassemble(instr: Optional[int]) -> str:
+    if instr is None:
+        return "<fetch failed>"
+    from riscvmodel.code import decode
+    try:
+        return str(decode(instr))
+    except:
+        return "<unknown>"
+
+
+def format_retired(r: IssRetiredInstr) -> str:
+    res = f"pc={hex(r.pc)}"
+    if r.instr is not None:
+        res += f" instr={r.instr:08x} ({disassemble(r.instr)})"
+    if r.rd:
+        res += f" x{r.rd}={hex(r.rd_val)}"
+    if r.store is not None:
+        addr, data, mask = r.store
+        res += f" store [{hex(addr)}]={hex(data)} mask={mask:04b}"
+    if r.trap is not None:
+        res += f" trap mcause={hex(r.trap)}"
+    return res
+
+
+class LockstepChecker:
+    """
+    Passive simulation process (see 'process' method) that follows MtkCpu's main FSM and steps
+    the ISS each time an instruction retires (WRITEBACK state), traps (TRAP state) or
+    'mret' executes. Program counter, destination register and its value, memory store and
+    'mcause' (if trapped) must match, otherwise LockstepDivergence is raised, with
+    the last 'history_len' retired instructions printed.
+
+    Things that depend on timing, not on program itself, are taken from the RTL:
+    * interrupts are injected into the ISS when MtkCpu takes them,
+    * values read from MMIO devices (other than RAM) and from 'mip' and 'mtime' CSRs are copied.
+
+    Checking stops once the CPU enters Debug Mode.
+
+    'mem_config' and 'reg_init' are taken from the 'cpu' if not specified - pass them if the program
+    is loaded at runtime (see CpuSimSession). If the simulation starts from a 'checkpoint' (see 'restore_rtl'),
+    the ISS is restored from the same one.
+    """
+    def __init__(
+            self,
+            cpu: MtkCpu,
+            history_len: int = 32,
+            mem_config: Optional[EBRMemConfig] = None,
+            reg_init: Optional[List[int]] = None,
+            checkpoint: Optional["Checkpoint"] = None,
+        ) -> None:
+        self.cpu = cpu
+        self.iss = MtkCpuIss(
+            mem_config=mem_config or cpu.mem_config,
+            cpu_config=cpu.cpu_config,
+            reg_init=reg_init or cpu.reg_init,
+        )
+        if checkpoint is not None:
+            from mtkcpu.iss.checkpoint import restore_iss
+            restore_iss(self.iss, checkpoint)
+        # (cycle, retired instruction) pairs.
+        self.history: Deque[Tuple[int, IssRetiredInstr]] = deque(maxlen=history_len)
+        self.retired = 0
+
+    def dump_history(self) -> List[str]:
+        return [f"  cycle {cycle:>8}: {format_retired(r)}" for cycle, r in self.history]
+
+    def diverged(self, cycle: int, msg: str, rtl: Optional[IssRetiredInstr] = None, iss: Optional[IssRetiredInstr] = None):
+        lines = [f"Lockstep divergence in cycle {cycle}, after {self.retired} retired instructions: {msg}"]
+        if rtl is not None:
+            lines.append(f"  RTL: {format_retired(rtl)}")
+        if iss is not None:
+            lines.append(f"  ISS: {format_retired(iss)}")
+        lines.append(f"Last {len(self.history)} instructions (RTL view):")
+        lines += self.dump_history()
+        raise LockstepDivergence("\n".join(lines))
+
+    def sync_cycle_dependent_read(self, rtl: IssRetiredInstr, iss: IssRetiredInstr) -> None:
+        instr = iss.instr
+        reads_cycle_dependent_csr = instr is not None \
+            and match_csr(instr & 0x7F, (instr >> 12) & 0b111, instr >> 25) \
+            and (instr >> 20) in CYCLE_DEPENDENT_CSRS
+        if iss.rd and iss.rd == rtl.rd and (reads_cycle_dependent_csr or self.iss.last_mmio_read is not None):
+            self.iss.regs[iss.rd] = iss.rd_val = rtl.rd_val
+
+    def check(self, cycle: int, rtl: IssRetiredInstr) -> None:
+        iss = self.iss.step(take_irq=False)
+        self.sync_cycle_dependent_read(rtl=rtl, iss=iss)
+
+        rtl_store, iss_store = [
+            None if x.store is None else (x.store[0], x.store[1] & bytes_mask(x.store[2]), x.store[2])
+            for x in [rtl, iss]
+        ]
+        mismatches = [
+            name for name, a, b in [
+                ("pc", rtl.pc, iss.pc),
+                ("rd", rtl.rd, iss.rd),
+                ("rd value", rtl.rd_val, iss.rd_val),
+                ("store", rtl_store, iss_store),
+                ("trap", rtl.trap, iss.trap),
+            ] if a != b
+        ]
+        if mismatches:
+            self.diverged(cycle, f"{', '.join(mismatches)} mismatch", rtl=rtl, iss=iss)
+        self.history.append((cycle, rtl))
+        self.retired += 1
+
+    def inject_irq(self, cycle: int, cause: int, mepc: int) -> None:
+        iss = self.iss
+        if mepc != iss.pc:
+            self.diverged(cycle, f"interrupt taken with mepc={hex(mepc)}, while ISS is at pc={hex(iss.pc)}")
+        if not (iss.irqs_globally_enabled() and iss.csr[CSRIndex.MIE] & (1 << cause)):
+            self.diverged(cycle, f"interrupt {IrqCause(cause).name} taken, but it's disabled in ISS")
+        iss.pc = iss.trap(iss.pc, cause, interrupt=True)
+        self.history.append((cycle, IssRetiredInstr(pc=mepc, instr=None, rd=0, rd_val=0, store=None, trap=cause | MCAUSE_INTERRUPT)))
+
+    def process(self):
+        cpu = self.cpu
+        yield Passive()
+
+        states = {v: k for k, v in cpu.main_fsm.encoding.items()}
+        wb = cpu.arbiter.wb_bus
+        mcause = cpu.csr_unit.mcause.as_view()
+        mepc = cpu.csr_unit.mepc.as_view().as_value()
+
+        store = None
+        cycle = 0
+        while True:
+            state = states[(yield cpu.main_fsm.state)]
+            if state == "EXECUTE":
+                # NOTE: 'cyc' is already deasserted when 'ack' is high.
+                if (yield wb.ack) and (yield wb.we):
+                    store = ((yield wb.adr), (yield wb.dat_w), (yield wb.sel))
+                if (yield cpu.exception_unit.m_mret):
+                    self.check(cycle, IssRetiredInstr(pc=(yield cpu.pc), instr=(yield cpu.instr), rd=0, rd_val=0, store=None, trap=None))
+            elif state == "WRITEBACK":
+                rd, rd_val = 0, 0
+                if (yield cpu.reg_write_port.en):
+                    rd, rd_val = (yield cpu.reg_write_port.addr), (yield cpu.reg_write_port.data)
+                self.check(cycle, IssRetiredInstr(pc=(yield cpu.pc), instr=(yield cpu.instr), rd=rd, rd_val=rd_val, store=store, trap=None))
+                store = None
+            elif state == "TRAP":
+                cause = yield mcause.ecode
+                if (yield mcause.interrupt):
+                    self.inject_irq(cycle, cause, mepc=(yield mepc))
+                else:
+                    self.check(cycle, IssRetiredInstr(pc=(yield cpu.pc), instr=(yield cpu.instr), rd=0, rd_val=0, store=None, trap=cause))
+                store = None
+            elif state == "HALTED":
+                return
+            cycle += 1
+            yield
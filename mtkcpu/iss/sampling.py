@@ -0,0 +1,226 @@
+"""
+Sampled simulation - estimates number of cycles a long-running program takes on MtkCpu,
+without simulating all of it on the (slow) RTL model.
+
+The instruction-set simulator runs the whole program. Every 'interval' instructions its architectural state
+is captured (see mtkcpu/iss/checkpoint.py) and restored into MtkCpu RTL simulation, that runs
+'warmup' instructions (not measured) followed by 'window' instructions, for which the cycles are counted.
+RTL's state is then discarded - the ISS, that holds the very same architectural state, continues.
+First sample is taken at random offset within the first interval (after 'skip' instructions, e.g. boot code),
+so that the sampling period doesn't align with program's loops.
+
+Cycles per instruction of the whole region is estimated as the mean of the samples' CPI,
+with Student's t confidence interval, and extrapolated to the number of instructions executed by the ISS.
+
+MtkCpu has no caches, nor TLB, thus there is little micro-architectural state to warm up - the warm-up
+instructions just let the pipeline and peripherals (e.g. pending UART transmission) settle after the restore.
+"""
+
+import io
+import math
+import random
+from dataclasses import dataclass, field
+from statistics import NormalDist, mean, stdev
+from typing import List, Optional, Tuple
+
+from amaranth.sim.core import Passive
+
+from mtkcpu.cpu.cpu import CPU_Config
+from mtkcpu.iss.checkpoint import Checkpoint, capture_iss
+from mtkcpu.iss.iss import MtkCpuIss, StopReason
+from mtkcpu.units.mmio.htif import HtifHost
+from mtkcpu.utils.common import EBRMemConfig
+from mtkcpu.utils.tests.sim_session import CpuSimSession
+
+
+@dataclass
+class SamplingConfig:
+    # Number of instructions between the starts of consecutive samples.
+    interval: int = 100_000
+    # Number of instructions simulated on the RTL before the measurement starts.
+    warmup: int = 100
+    # Number of instructions measured on the RTL.
+    window: int = 1_000
+    # Number of instructions to execute before the region of interest (not sampled).
+    skip: int = 0
+    # Length of the region of interest (the whole program by default).
+    max_instructions: Optional[int] = None
+    # Two-sided confidence level of the reported intervals.
+    confidence: float = 0.95
+    # Seed for the offset of the first sample.
+    seed: int = 0
+    # RTL simulation of a sample fails, if it takes more than that many cycles per instruction.
+    max_cpi: int = 100
+
+    def __post_init__(self):
+        if self.window <= 0 or self.warmup < 0:
+            raise ValueError(f"Sample window must be positive, and warm-up non-negative, got {self.window} and {self.warmup}!")
+        if self.interval < self.warmup + self.window:
+            raise ValueError(f"Sampling interval ({self.interval}) is shorter than a sample ({self.warmup} + {self.window})!")
+        if not 0 < self.confidence < 1:
+            raise ValueError(f"Confidence level must be in (0, 1) range, got {self.confidence}!")
+
+
+@dataclass
+class Sample:
+    # Position in the program (number of instructions executed by the ISS before the sample).
+    instret: int
+    # Measured instructions (fewer than 'SamplingConfig.window' if the program exited) and their cycles.
+    instructions: int
+    cycles: int
+
+    @property
+    def cpi(self) -> float:
+        return self.cycles / self.instructions
+
+
+@dataclass
+class SamplingResult:
+    # Number of instructions in the region of interest.
+    instructions: int
+    stop_reason: StopReason
+    confidence: float
+    samples: List[Sample] = field(default_factory=list)
+
+    @property
+    def cpi(self) -> float:
+        return mean(x.cpi for x in self.samples)
+
+    @property
+    def cpi_interval(self) -> Tuple[float, float]:
+        """
+        Confidence interval of the CPI, infinite if there are less than two samples.
+        """
+        n = len(self.samples)
+        if n < 2:
+            return (0.0, math.inf)
+        half = t_quantile(0.5 + self.confidence / 2, df=n - 1) * stdev(x.cpi for x in self.samples) / math.sqrt(n)
+        return (max(self.cpi - half, 0.0), self.cpi + half)
+
+    @property
+    def cycles(self) -> int:
+        """
+        Estimated number of cycles of the region of interest.
+        """
+        return round(self.cpi * self.instructions)
+
+    @property
+    def cycles_interval(self) -> Tuple[float, float]:
+        lo, hi = self.cpi_interval
+        return (lo * self.instructions, hi * self.instructions)
+
+    @property
+    def detailed_instructions(self) -> int:
+        return sum(x.instructions for x in self.samples)
+
+    def summary(self) -> str:
+        if not self.samples:
+            return f"{self.instructions} instructions ({self.stop_reason.value}), no samples taken - region of interest is too short."
+        lo, hi = self.cycles_interval
+        cpi_lo, cpi_hi = self.cpi_interval
+        return (
+            f"{self.instructions} instructions ({self.stop_reason.value}), "
+            f"{len(self.samples)} samples ({self.detailed_instructions} instructions measured on the RTL): "
+            f"CPI {self.cpi:.3f} [{cpi_lo:.3f}, {cpi_hi:.3f}], "
+            f"cycles {self.cycles} [{lo:.0f}, {hi:.0f}] at {self.confidence:.0%} confidence"
+        )
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Quantile of Student's t-distribution - exact for 'df' of 1 and 2,
+    Cornish-Fisher expansion around the normal quantile otherwise (relative error below 1e-3 for df >= 3).
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def measure_rtl(session: CpuSimSession, ckpt: Checkpoint, config: SamplingConfig, tohost_addr: Optional[int] = None) -> Optional[Sample]:
+    """
+    Restores 'ckpt' into the RTL simulation and counts cycles of the sample window.
+    Returns None if the program exited before the window started.
+    """
+    cpu = session.cpu
+    htif = cpu.arbiter.htif
+    # Console output was already printed by the ISS.
+    host = HtifHost(cpu, tohost_addr=tohost_addr, console=io.StringIO())
+    max_cycles = config.max_cpi * (config.warmup + config.window)
+    res = []
+
+    def host_process():
+        yield Passive()
+        yield from host.process()()
+
+    def window():
+        cycle, start = 0, None
+        while True:
+            # Counted by the design (see HtifWishbone), thus a single read per cycle.
+            retired = yield htif.instret
+            if start is None and retired >= config.warmup:
+                start = (cycle, retired)
+            if retired >= config.warmup + config.window or host.exit_code is not None:
+                break
+            if cycle >= max_cycles:
+                raise RuntimeError(
+                    f"Sample at instruction {ckpt.instret} (pc={hex(ckpt.pc)}) retired only {retired} instructions in {cycle} cycles!"
+                )
+            cycle += 1
+            yield
+        if start is not None and retired > start[1]:
+            res.append(Sample(instret=ckpt.instret, instructions=retired - start[1], cycles=cycle - start[0]))
+
+    session.run_checkpoint(ckpt, processes=[host_process, window])
+    return res[0] if res else None
+
+
+def run_sampled(
+        mem_config: EBRMemConfig,
+        cpu_config: CPU_Config,
+        config: SamplingConfig,
+        reg_init: Optional[List[int]] = None,
+        tohost_addr: Optional[int] = None,
+        uart_tx_callback=None,
+    ) -> SamplingResult:
+    """
+    'cpu_config' must have 'sim_htif' set, as the HTIF cycle and instruction counters are used for measurements.
+    Firmware exiting with a write to 'tohost_addr' RAM variable (riscv-tests way) is supported on the RTL only,
+    thus on the ISS such program runs until 'config.max_instructions'.
+    """
+    if not cpu_config.sim_htif:
+        raise ValueError("Sampled simulation requires CPU_Config.sim_htif to be set!")
+    iss = MtkCpuIss(mem_config=mem_config, cpu_config=cpu_config, reg_init=reg_init, uart_tx_callback=uart_tx_callback)
+    session = CpuSimSession.get(
+        cpu_config=cpu_config,
+        mem_size_words=mem_config.mem_size_words,
+        mem_addr=mem_config.mem_addr,
+        sparse_latency=mem_config.sparse_latency,
+    )
+
+    reason = iss.run(max_instructions=config.skip) if config.skip else StopReason.MAX_INSTRUCTIONS
+    start = iss.steps
+    end = math.inf if config.max_instructions is None else start + config.max_instructions
+    next_sample = start + random.Random(config.seed).randrange(config.interval - config.warmup - config.window + 1)
+    samples = []
+    while reason == StopReason.MAX_INSTRUCTIONS and iss.steps < end:
+        reason = iss.run(max_instructions=min(next_sample, end) - iss.steps)
+        if reason != StopReason.MAX_INSTRUCTIONS or iss.steps >= end:
+            break
+        sample = measure_rtl(session, capture_iss(iss), config, tohost_addr=tohost_addr)
+        if sample is not None:
+            samples.append(sample)
+        next_sample += config.interval
+
+    return SamplingResult(
+        instructions=iss.steps - start,
+        stop_reason=reason,
+        confidence=config.confidence,
+        samples=samples,
+    )
@@ -57,32 +57,70 @@ def compare_trace_csv(csv1, csv2, name1, name2, log):
         gpr_state_2 = {}
 
         for i, (entry1, entry2) in enumerate(zip(instr_trace_1, instr_trace_2)):
-            reg_write_1 = check_update_gpr(entry1.gpr, gpr_state_1)
-            reg_write_2 = check_update_gpr(entry2.gpr, gpr_state_2)
-            debug_msg = f"line {i + 1}: {(entry1, entry2)}"
-            if not reg_write_1:
-                assert not reg_write_2, debug_msg
-                continue
-            assert reg_write_1 and reg_write_2, debug_msg
-
-            def parse_gpr(gpr_str : str):
-                rd, val = gpr_str.split(":")
-                return (f"x{reg_abi_name_to_phys(rd)}", int(val, 16))
-
-            regs1 = sorted([parse_gpr(x) for x in entry1.gpr])
-            regs2 = sorted([parse_gpr(x) for x in entry2.gpr])
-            
-            assert len(regs1) == len(regs2) == 1 # we don't use that fact for now
-
-            for (rd1, val1), (rd2, val2) in zip(regs1, regs2):
-                assert rd1 == rd2, f"{rd1} != {rd2}, {debug_msg}"
-                if val1 != val2:
-                    raise ValueError(f"{i}: Detect value mismatch: {hex(val1)} vs {hex(val2)}. {debug_msg} {gpr_state_1} , {gpr_state_2}")
-                # else:
-                #     print(f"{i}: OK, value {hex(val1)} written to {rd1} in both cases!")
+            compare_trace_entries(i, entry1, entry2, gpr_state_1, gpr_state_2)
             
         print(f"OK, got {min(len(instr_trace_1), len(instr_trace_2))} matches!")
 
+
+def compare_trace_entries(i, entry1, entry2, gpr_state_1, gpr_state_2):
+    reg_write_1 = check_update_gpr(entry1.gpr, gpr_state_1)
+    reg_write_2 = check_update_gpr(entry2.gpr, gpr_state_2)
+    debug_msg = f"line {i + 1}: {(entry1, entry2)}"
+    if not reg_write_1:
+        assert not reg_write_2, debug_msg
+        return
+    assert reg_write_1 and reg_write_2, debug_msg
+
+    def parse_gpr(gpr_str : str):
+        rd, val = gpr_str.split(":")
+        return (f"x{reg_abi_name_to_phys(rd)}", int(val, 16))
+
+    regs1 = sorted([parse_gpr(x) for x in entry1.gpr])
+    regs2 = sorted([parse_gpr(x) for x in entry2.gpr])
+    
+    assert len(regs1) == len(regs2) == 1 # we don't use that fact for now
+
+    for (rd1, val1), (rd2, val2) in zip(regs1, regs2):
+        assert rd1 == rd2, f"{rd1} != {rd2}, {debug_msg}"
+        if val1 != val2:
+            raise ValueError(f"{i}: Detect value mismatch: {hex(val1)} vs {hex(val2)}. {debug_msg} {gpr_state_1} , {gpr_state_2}")
+        # else:
+        #     print(f"{i}: OK, value {hex(val1)} written to {rd1} in both cases!")
+
+
+class StreamingTraceComparator:
+    """
+    Incremental version of 'compare_trace_csv', for comparing a trace while it's still being produced.
+    Entries are passed directly via 'add_entry', and 'compare' checks only ones added since its previous call,
+    against the reference trace (e.g. Spike's one), that is read lazily from CSV file.
+    Same as in 'compare_trace_csv', entries past the end of the reference trace are not compared.
+    """
+    def __init__(self, ref_csv, name, ref_name):
+        self.name = name
+        self.ref_name = ref_name
+        self.ref_fd = open(ref_csv, "r")
+        self.ref_trace = RiscvInstructionTraceCsv(self.ref_fd).iter_trace()
+        self.pending : List[RiscvInstructionTraceEntry] = []
+        self.gpr_state = {}
+        self.ref_gpr_state = {}
+        self.num_compared = 0
+
+    def add_entry(self, entry : RiscvInstructionTraceEntry):
+        self.pending.append(entry)
+
+    def compare(self):
+        for entry in self.pending:
+            ref_entry = next(self.ref_trace, None)
+            if ref_entry is None:
+                break
+            compare_trace_entries(self.num_compared, entry, ref_entry, self.gpr_state, self.ref_gpr_state)
+            self.num_compared += 1
+        self.pending.clear()
+        print(f"OK, got {self.num_compared} {self.name} vs {self.ref_name} matches so far!")
+
+    def close(self):
+        self.ref_fd.close()
+
 def reg_abi_name_to_phys(abi_name: str) -> int:
     matches = re.findall(r'\d+', abi_name)
     if len(matches) > 1:
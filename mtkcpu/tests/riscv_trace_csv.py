@@ -63,8 +63,8 @@ class RiscvInstructionTraceCsv(object):
         self.csv_writer = csv.DictWriter(self.csv_fd, fieldnames=fields)
         self.csv_writer.writeheader()
 
-    def read_trace(self, trace):
-        """Read instruction trace from CSV file"""
+    def iter_trace(self):
+        """Lazily read instruction trace from CSV file, one entry at a time"""
         # csv_reader = csv.DictReader(self.csv_fd)
         csv_reader = csv.DictReader(filter(lambda row: row[0]!='#', self.csv_fd)) # https://stackoverflow.com/a/14158869
         for row in csv_reader:
@@ -77,7 +77,11 @@ class RiscvInstructionTraceCsv(object):
             new_trace.instr_str = row['instr_str']
             new_trace.instr = row['instr']
             new_trace.mode = row['mode']
-            trace.append(new_trace)
+            yield new_trace
+
+    def read_trace(self, trace):
+        """Read instruction trace from CSV file"""
+        trace.extend(self.iter_trace())
 
     # TODO: Convert pseudo instruction to regular instruction
 
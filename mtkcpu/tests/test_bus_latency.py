@@ -0,0 +1,64 @@
+from mtkcpu.utils.common import MEM_START_ADDR
+from mtkcpu.utils.tests.latency import BurstyLatency, FixedLatency, LatencyInjector, RegionLatency, UniformLatency
+from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.tests.registers import RegistryContents
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, mem_test
+
+UART_ADDR = 0x7000_0000
+
+
+def test_latency_injector_reproducible():
+    bursty = BurstyLatency(fast=0, slow=7, burst_prob=0.1, mean_burst_len=4)
+    dist = RegionLatency(regions=[(MEM_START_ADDR, MEM_START_ADDR + 0x1000, bursty)], default=UniformLatency(1, 3))
+
+    # Small blocks, so that refilling is covered as well.
+    a, b = [LatencyInjector(dist, seed=1234, block_size=16) for _ in range(2)]
+    mem_a = [a.next(MEM_START_ADDR) for _ in range(100)]
+    mem_b = []
+    for _ in range(100):
+        # Accesses to other regions must not affect latencies of the main memory.
+        b.next(UART_ADDR)
+        mem_b.append(b.next(MEM_START_ADDR + 4))
+    assert mem_a == mem_b
+    assert set(mem_a) == {0, 7}
+    assert set(b.next(UART_ADDR) for _ in range(100)) == {1, 2, 3}
+
+    c = LatencyInjector(dist, seed=4321, block_size=16)
+    assert mem_a != [c.next(MEM_START_ADDR) for _ in range(100)]
+
+
+LATENCY_DISTRIBUTIONS = [
+    FixedLatency(3),
+    UniformLatency(0, 6),
+    BurstyLatency(fast=0, slow=10, burst_prob=0.2, mean_burst_len=3),
+    # Only data accesses are delayed, as code is at the beginning of the memory.
+    RegionLatency(regions=[(MEM_START_ADDR + 0x80, MEM_START_ADDR + 0x100, UniformLatency(5, 20))]),
+]
+
+BUS_LATENCY_TESTS = [
+    MemTestCase(
+        name=f"{dist}, {'sparse' if sparse_mem_latency is not None else 'EBR'} memory",
+        source_type=MemTestSourceType.TEXT,
+        source="""
+        .section code
+            lw x3, 0x80(x1)
+            addi x3, x3, 1
+            sw x3, 0x84(x1)
+            sb x3, 0x89(x1)
+            lw x4, 0x88(x1)
+        """,
+        out_reg=4,
+        out_val=0xAABB78DD,
+        timeout=500,
+        reg_init=RegistryContents.fill(lambda i: MEM_START_ADDR if i == 1 else 0),
+        mem_init=MemoryContents(memory={0x80: 0x1234_5677, 0x88: 0xAABB_CCDD}),
+        mem_out=MemoryContents(memory={0x84: 0x1234_5678, 0x88: 0xAABB_78DD}),
+        sparse_mem_latency=sparse_mem_latency,
+        bus_latency=dist,
+        bus_latency_seed=2024,
+    ) for dist in LATENCY_DISTRIBUTIONS for sparse_mem_latency in [None, 1]
+]
+
+@mem_test(BUS_LATENCY_TESTS)
+def test_bus_latency(_):
+    pass
@@ -0,0 +1,102 @@
+from amaranth.sim import Simulator
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.iss.checkpoint import DERIVED_CSRS, Checkpoint, capture_iss, capture_rtl, restore_iss, restore_rtl
+from mtkcpu.iss.iss import MtkCpuIss
+from mtkcpu.iss.lockstep import LockstepChecker
+from mtkcpu.utils.common import MEM_START_ADDR
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, get_mem_test_config
+
+# Endless loop of stores, CSR accesses and traps.
+CHECKPOINT_CASE = MemTestCase(
+    name="checkpoint",
+    source_type=MemTestSourceType.RAW,
+    source="""
+        start:
+            la x1, trap_handler
+            csrw mtvec, x1
+            la x2, data
+            li x3, 0
+            li x4, 0
+        loop:
+            addi x3, x3, 7
+            andi x5, x3, 0x3c
+            add x5, x5, x2
+            sw x3, 0(x5)
+            lw x6, 0(x5)
+            csrrw x7, mscratch, x6
+            ecall
+            j loop
+        trap_handler:
+            addi x4, x4, 1
+            csrr x8, mepc
+            addi x8, x8, 4
+            csrw mepc, x8
+            mret
+        .align 4
+        data:
+            .fill 16, 4, 0
+    """,
+    reg_init=None,
+)
+
+CPU_CONFIG = CPU_Config(dev_mode=False, with_debug=False, pc_reset_value=MEM_START_ADDR, with_virtual_memory=False)
+
+
+def architectural_state(ckpt: Checkpoint):
+    """
+    State that doesn't depend on timing ('mtime' is counted in cycles by MtkCpu and in instructions by the ISS).
+    """
+    csr = {k: v for k, v in ckpt.csr.items() if k not in DERIVED_CSRS}
+    devices = {k: v for k, v in ckpt.devices.items() if k != "clint.mtime"}
+    return ckpt.pc, ckpt.priv, ckpt.regs, csr, ckpt.mem, devices
+
+
+def test_checkpoint_iss(tmp_path):
+    mem_config = get_mem_test_config(CHECKPOINT_CASE)
+    iss = MtkCpuIss(mem_config=mem_config, cpu_config=CPU_CONFIG)
+    iss.run(max_instructions=500)
+
+    path = tmp_path / "ckpt.npz"
+    capture_iss(iss).save(path)
+    ckpt = Checkpoint.load(path)
+    assert ckpt == capture_iss(iss)
+    assert ckpt.instret == 500
+
+    # Restored ISS continues exactly the same way.
+    restored = MtkCpuIss(mem_config=ckpt.mem_config(), cpu_config=CPU_CONFIG)
+    restore_iss(restored, ckpt)
+    iss.run(max_instructions=300)
+    restored.run(max_instructions=300)
+    assert capture_iss(restored) == capture_iss(iss)
+
+
+def test_checkpoint_iss_to_rtl():
+    """
+    Fast-forward on the ISS, hand off to the RTL (checked in lockstep), capture its state and compare with the ISS.
+    """
+    mem_config = get_mem_test_config(CHECKPOINT_CASE)
+    iss = MtkCpuIss(mem_config=mem_config, cpu_config=CPU_CONFIG)
+    iss.run(max_instructions=1000)
+    ckpt = capture_iss(iss)
+
+    cpu = MtkCpu(mem_config=mem_config, cpu_config=CPU_CONFIG)
+    sim = Simulator(cpu)
+    sim.add_clock(1e-6)
+    sim.add_process(restore_rtl(cpu, ckpt))
+    checker = LockstepChecker(cpu, checkpoint=ckpt)
+    sim.add_sync_process(checker.process)
+    res = []
+
+    def capture():
+        while checker.retired < 100:
+            yield
+        res.append((yield from capture_rtl(cpu)))
+    sim.add_sync_process(capture)
+    sim.run()
+
+    rtl_ckpt, = res
+    iss_ckpt = capture_iss(checker.iss)
+    assert architectural_state(rtl_ckpt) == architectural_state(iss_ckpt)
+    # Trap handler was executed both before and after the hand-off.
+    assert ckpt.regs[4] > 0 and rtl_ckpt.regs[4] > ckpt.regs[4]
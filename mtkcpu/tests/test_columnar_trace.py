@@ -0,0 +1,37 @@
+import re
+
+from amaranth import Signal
+
+from mtkcpu.utils.columnar_trace import ChangeRecorder, ColumnarTrace
+
+
+def test_columnar_trace(tmp_path):
+    signals = [Signal(1, name="valid"), Signal(4, name="state"), Signal(4, name="state")]
+    # 'valid' is high every 5th cycle, 'state' changes every 10 cycles, the other 'state' is constant.
+    valid = lambda c: int(c % 5 == 0)
+    state = lambda c: (c // 10) % 3
+
+    # Small chunks, so that flushing is covered as well.
+    recorder = ChangeRecorder(signals, chunk_size=4)
+    for cycle in range(3, 103):
+        recorder.add(cycle, valid(cycle) | (state(cycle) << 1) | (0xA << 5))
+    recorder.trace().save(tmp_path / "trace.npz")
+    trace = ColumnarTrace.load(tmp_path / "trace.npz")
+
+    assert trace.names == ["valid", "state", "state$1"]
+    assert (trace.start, trace.end) == (3, 103)
+    for cycle in [3, 4, 5, 19, 20, 102]:
+        assert trace.value_at("valid", cycle) == valid(cycle)
+        assert trace.value_at("state", cycle) == state(cycle)
+        assert trace.value_at("state$1", cycle) == 0xA
+    assert trace.edges("valid", "rising").tolist() == list(range(5, 103, 5))
+    assert trace.edges("valid", "falling").tolist() == list(range(6, 103, 5))
+    assert trace.edges("state").tolist() == list(range(10, 103, 10))
+    assert trace.histogram("valid") == {0: 80, 1: 20}
+    assert trace.histogram("state", start=25, end=45) == {2: 5, 0: 10, 1: 5}
+
+    # Only the window requested.
+    trace.to_vcd(tmp_path / "trace.vcd", tmp_path / "trace.gtkw", start=40, end=60)
+    timestamps = [int(x) for x in re.findall(r"^#(\d+)$", (tmp_path / "trace.vcd").read_text(), re.MULTILINE)]
+    assert timestamps == [40, 41, 45, 46, 50, 51, 55, 56]
+    assert "top.state[3:0]" in (tmp_path / "trace.gtkw").read_text()
@@ -0,0 +1,76 @@
+import io
+import json
+
+from mtkcpu.cli.top import sim
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.units.mmio.htif import HTIF_ADDR, HtifHost
+from mtkcpu.utils.common import MEM_START_ADDR
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, get_mem_test_config
+
+CPI_CASE = MemTestCase(
+    name="cpi report",
+    source_type=MemTestSourceType.RAW,
+    source=f"""
+        start:
+            la x1, trap_handler
+            csrw mtvec, x1
+            la x2, data
+            li x9, 10
+        loop:
+            addi x3, x3, 7
+            sw x3, 0(x2)
+            lw x6, 0(x2)
+            csrrw x7, mscratch, x6
+            ecall
+            addi x9, x9, -1
+            bnez x9, loop
+            li x1, {HTIF_ADDR}
+            li x2, 1
+            sw x2, 0(x1)
+        trap_handler:
+            csrr x8, mepc
+            addi x8, x8, 4
+            csrw mepc, x8
+            mret
+        .align 4
+        data:
+            .word 0
+    """,
+    reg_init=None,
+)
+
+
+def test_cpi_report(tmp_path):
+    cpu = MtkCpu(
+        mem_config=get_mem_test_config(CPI_CASE),
+        cpu_config=CPU_Config(dev_mode=False, with_debug=False, pc_reset_value=MEM_START_ADDR, with_virtual_memory=False, sim_htif=True),
+    )
+    htif = HtifHost(cpu, console=io.StringIO())
+    path = tmp_path / "cpi.json"
+    assert sim(cpu=cpu, verbose=False, with_uart=False, htif=htif, cpi_report=path) == 0
+
+    report = json.loads(path.read_text())
+    classes = report["classes"]
+    counts = {cls: x["instructions"] for cls, x in classes.items()}
+    # The final 'sw' (to HTIF) is not complete when the simulation ends.
+    assert {k: counts[k] for k in ["load", "store", "csr", "exception", "mret", "branch"]} == {
+        "load": 10, "store": 10, "csr": 31, "exception": 10, "mret": 10, "branch": 10,
+    }
+    assert report["instructions"] == sum(counts.values()) == htif.instret + counts["exception"]
+    assert report["total_cycles"] == htif.cycles
+    assert report["halted_cycles"] == 0
+    accounted = sum(x["cycles"] for x in classes.values())
+    assert 0 < report["total_cycles"] - accounted < 20
+
+    for cls, x in classes.items():
+        states = x["states"]
+        assert sum(states.values()) == x["cycles"]
+        assert states["fetch"] >= x["instructions"] and states["decode"] == x["instructions"]
+    # 'ecall' traps from DECODE, 'mret' jumps straight from EXECUTE.
+    assert classes["exception"]["states"]["trap"] == 10 and classes["exception"]["states"]["execute"] == 0
+    assert classes["mret"]["states"]["writeback"] == 0
+    # Memory access takes longer than a single cycle.
+    assert classes["load"]["states"]["execute_wait"] > 0
+    assert report["bus_wait_cycles"]["load_store"] == sum(
+        classes[x]["states"]["execute"] + classes[x]["states"]["execute_wait"] for x in ["load", "store"]
+    )
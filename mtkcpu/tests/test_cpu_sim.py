@@ -0,0 +1,96 @@
+import pytest
+
+from mtkcpu.cpu.cpu import CPU_Config
+from mtkcpu.cpu.priv_isa import CSRIndex
+from mtkcpu.utils.common import CODE_START_ADDR
+from mtkcpu.utils.cpu_sim import MtkCpuSim
+from mtkcpu.utils.tests.registers import RegistryContents
+from mtkcpu.utils.tests.sim_session import CpuSimSession
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, get_mem_test_config
+
+DATA_ADDR = CODE_START_ADDR + 0x100
+LOOP_ADDR = CODE_START_ADDR + 0x10
+
+
+@pytest.mark.parametrize("sparse_mem_latency", [None, 1])
+def test_cpu_sim(sparse_mem_latency):
+    case = MemTestCase(
+        name="cpu sim",
+        source_type=MemTestSourceType.RAW,
+        source="""
+        start:
+            addi x1, x0, 5
+            addi x2, x1, 7
+            csrw mscratch, x2
+            sw x2, 0(x3)
+        loop:
+            lw x5, 4(x3)
+            addi x4, x4, 1
+            j loop
+        """,
+        reg_init=RegistryContents.fill(lambda i: DATA_ADDR if i == 3 else 0),
+        sparse_mem_latency=sparse_mem_latency,
+    )
+    mem_cfg = get_mem_test_config(case)
+    session = CpuSimSession.get(
+        cpu_config=CPU_Config(dev_mode=False, with_debug=False, pc_reset_value=CODE_START_ADDR, with_virtual_memory=True),
+        mem_size_words=mem_cfg.mem_size_words,
+        mem_addr=mem_cfg.mem_addr,
+        sparse_latency=mem_cfg.sparse_latency,
+    )
+    cpu = session.cpu
+
+    def drive(cpu_sim: MtkCpuSim):
+        assert cpu_sim.read_gpr(3) == DATA_ADDR
+        assert cpu_sim.step_instructions(1) > 0
+        assert cpu_sim.read(cpu.pc) == CODE_START_ADDR + 4
+        assert cpu_sim.read_gprs()[:3] == [0, 5, 0]
+
+        cpu_sim.step_instructions(3)
+        assert cpu_sim.read(cpu.pc) == LOOP_ADDR
+        assert cpu_sim.read_csr(CSRIndex.MSCRATCH) == 12
+        assert cpu_sim.read_mem(DATA_ADDR, 2) == [12, 0]
+
+        # Stops at the next visit, not the current one.
+        cycles = cpu_sim.run_until_pc(LOOP_ADDR, max_cycles=100)
+        assert cpu_sim.read_gpr(4) == 1
+        assert cpu_sim.step_instructions(3) == cycles
+
+        cpu_sim.write_gpr(4, 100)
+        cpu_sim.write_gpr(0, 1)
+        cpu_sim.write_mem(DATA_ADDR, [1, 2])
+        cpu_sim.run_until(lambda en, addr: en and addr == 5, [cpu.reg_write_port.en, cpu.reg_write_port.addr], max_cycles=100)
+        assert cpu_sim.read(cpu.reg_write_port.data) == 2
+        cpu_sim.run_until_pc(LOOP_ADDR, max_cycles=100)
+        assert cpu_sim.read_gprs()[:6] == [0, 5, 12, DATA_ADDR, 101, 2]
+        assert cpu_sim.read_mem(DATA_ADDR, 2) == [1, 2]
+
+        with pytest.raises(TimeoutError):
+            cpu_sim.run_until_pc(LOOP_ADDR + 0x100, max_cycles=50)
+        with pytest.raises(ValueError, match="not within the main memory"):
+            cpu_sim.read_mem(DATA_ADDR, mem_cfg.mem_size_words)
+
+        # Exceptions raised by commands don't break the simulation.
+        def command():
+            yield cpu.pc
+            raise KeyError("command failed")
+        with pytest.raises(KeyError, match="command failed"):
+            cpu_sim.execute(command())
+        start = cpu_sim.cycles
+        assert cpu_sim.step_cycles(10) == 10
+        assert cpu_sim.cycles == start + 10
+        return cpu_sim.cycles
+
+    assert session.run(mem_config=mem_cfg, reg_init=case.reg_init.reg, processes=[], drive=drive) > 0
+
+    # Memory and registers get reset between runs.
+    def check_reset(cpu_sim: MtkCpuSim):
+        assert cpu_sim.cycles == 0
+        assert cpu_sim.read_mem(DATA_ADDR, 2) == [0, 0]
+        assert cpu_sim.read_gprs() == [0] * 32
+        return cpu_sim.run()
+
+    def active():
+        for _ in range(7):
+            yield
+    assert session.run(mem_config=mem_cfg, reg_init=[0] * 32, processes=[active], drive=check_reset) == 8
@@ -281,6 +281,24 @@ CSR_TESTS = [
         mem_init=MemoryContents.empty(),
         reg_init=RegistryContents.fill(),
     ),
+
+    MemTestCase(
+        name="csrrwi, csrrsi, csrrci use immediate, not register value",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                csrwi mscratch, 0b10110
+                csrsi mscratch, 0b00001
+                csrci mscratch, 0b00100
+                csrci mscratch, 0 // no write at all
+                csrr x10, mscratch
+        """,
+        out_reg=10,
+        out_val=0b10011,
+        timeout=80,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.fill(lambda i: 0xffff_ffff),
+    ),
 ]
 
 
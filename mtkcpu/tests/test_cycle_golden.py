@@ -0,0 +1,42 @@
+import pytest
+
+from mtkcpu.utils.tests.cycle_golden import (CYCLE_REGRESSION_ENV, CYCLE_TOLERANCE_ENV, CYCLE_UPDATE_ENV, DEFAULT_GOLDEN,
+                                             CycleCountWarning, check_cycle_count, golden_key, load_golden)
+
+
+def test_cycle_golden(tmp_path, monkeypatch):
+    # Also when run by 'make update-cycle-golden'.
+    monkeypatch.delenv(CYCLE_UPDATE_ENV, raising=False)
+    path = tmp_path / "golden.json"
+    key = golden_key("case")
+    assert key == "test_cycle_golden.py::test_cycle_golden::case"
+
+    with pytest.warns(CycleCountWarning, match="no golden cycle count"):
+        check_cycle_count("case", 10, path=path)
+
+    monkeypatch.setenv(CYCLE_UPDATE_ENV, "1")
+    check_cycle_count("case", 10, path=path)
+    check_cycle_count("other case", 20, path=path)
+    assert load_golden(path) == {key: 10, golden_key("other case"): 20}
+    monkeypatch.delenv(CYCLE_UPDATE_ENV)
+
+    # Getting faster is fine.
+    check_cycle_count("case", 9, path=path)
+    check_cycle_count("case", 10, path=path)
+    with pytest.raises(AssertionError, match="took 11 cycles, golden count is 10"):
+        check_cycle_count("case", 11, path=path)
+
+    monkeypatch.setenv(CYCLE_TOLERANCE_ENV, "0.1")
+    check_cycle_count("case", 11, path=path)
+    with pytest.raises(AssertionError):
+        check_cycle_count("case", 12, path=path)
+
+    monkeypatch.setenv(CYCLE_REGRESSION_ENV, "warn")
+    with pytest.warns(CycleCountWarning, match="took 12 cycles"):
+        check_cycle_count("case", 12, path=path)
+
+
+def test_cycle_golden_stored():
+    golden = load_golden(DEFAULT_GOLDEN)
+    assert golden
+    assert all(isinstance(x, int) and x > 0 for x in golden.values())
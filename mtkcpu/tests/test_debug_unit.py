@@ -17,6 +17,8 @@ from mtkcpu.units.debug.dmi_handlers import DMI_HANDLERS_MAP
 from mtkcpu.units.debug.impl_config import PROGBUFSIZE, PROGBUF_MMIO_ADDR
 from mtkcpu.units.debug.impl_config import DATASIZE
 from mtkcpu.units.csr.csr_handlers import DCSR
+from mtkcpu.utils.waveform import WaveformCapture
+from mtkcpu.utils.tests.monitor_hub import merge_monitors
 logging = get_color_logging_object()
 
 
@@ -168,7 +170,7 @@ def test_dmi_abstract_command_read_write_gpr(
         *error_monitors(dmi_monitor),
     ]
 
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
 
     vcd_traces = [
@@ -178,7 +180,9 @@ def test_dmi_abstract_command_read_write_gpr(
         cpu.debug.jtag.BAR,
     ]
     
-    with simulator.write_vcd("temp.vcd", "temp.gtkw", traces=vcd_traces):
+    waveform = WaveformCapture(name="dmi", traces=vcd_traces, pc=cpu.pc)
+    waveform.add_to(simulator)
+    with waveform.capture(simulator):
         simulator.run()
 
 
@@ -231,7 +235,7 @@ def test_dmi_try_read_not_implemented_register(
         print_dmi_transactions(dmi_monitor),
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
 
     simulator.run()
@@ -315,7 +319,7 @@ def test_core_halt_resume(
         monitor_pc_and_main_fsm(cpu=cpu),
     ]
 
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
 
     vcd_traces = [
@@ -330,7 +334,9 @@ def test_core_halt_resume(
         cpu.running_state.halted,
     ]
         
-    with simulator.write_vcd("halt.vcd", "halt.gtkw", traces=vcd_traces):
+    waveform = WaveformCapture(name="halt", traces=vcd_traces, pc=cpu.pc)
+    waveform.add_to(simulator)
+    with waveform.capture(simulator):
         simulator.run()
 
 def clear_cmderr_wait_for_success(dmi_monitor: DMI_Monitor):
@@ -395,7 +401,7 @@ def test_cmderr_clear(
         main_process,
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -431,7 +437,7 @@ def test_progbuf_writes_to_bus(
         bus_capture_write_transactions(cpu=cpu, output_dict=memory),
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -542,7 +548,7 @@ def test_halt_resume_with_new_dpc(
         pc_updater,
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -618,7 +624,7 @@ def test_progbuf_gets_executed(
         monitor_pc_and_main_fsm(cpu=cpu, wait_for_first_haltreq=False),
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -668,7 +674,7 @@ def test_progbuf_cmderr_on_runtime_error(
         mepc,
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -726,7 +732,7 @@ def test_access_debug_csr_regs_in_debug_mode(
         monitor_writes_to_dcsr(dmi_monitor=dmi_monitor),
     ]
     
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -758,7 +764,7 @@ def test_not_supported_command_type_finishes(
         yield from dmi_op_wait_for_cmderr(dmi_monitor=dmi_monitor, expected_cmderr=ABSTRACTCS_Layout.CMDERR.NOT_SUPPORTED)
     
     processes = [main_process]
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -857,7 +863,7 @@ def test_abstracauto_autoexecdata(
         monitor_cpu_and_dm_state(dmi_monitor=dmi_monitor),
         monitor_pc_and_main_fsm(cpu=cpu),
     ]
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
         
     simulator.run()
@@ -923,7 +929,7 @@ def test_ebreakm_halt(
         monitor_cpu_dm_if_error(dmi_monitor),
         bus_capture_write_transactions(cpu=cpu, output_dict=dict()),
     ]
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
     
     simulator.run()
@@ -1004,7 +1010,7 @@ def test_single_step(
         monitor_cpu_dm_if_error(dmi_monitor),
         bus_capture_write_transactions(cpu=cpu, output_dict=dict()),
     ]
-    for p in processes:
+    for p in merge_monitors(processes):
         simulator.add_sync_process(p)
     
     simulator.run()
@@ -0,0 +1,103 @@
+from amaranth import Record, Signal
+from amaranth.hdl.rec import Layout
+from amaranth.sim import Simulator
+
+from mtkcpu.units.loadstore import WishboneBusRecord
+from mtkcpu.units.mmio.gpio import (GPIO_Wishbone, GPIO_STATE_OFFSET, GPIO_SET_OFFSET, GPIO_CLEAR_OFFSET,
+                                    GPIO_TOGGLE_OFFSET, GPIO_RISE_OFFSET, GPIO_FALL_OFFSET, GPIO_RISE_IRQ_EN_OFFSET,
+                                    GPIO_FALL_IRQ_EN_OFFSET)
+from mtkcpu.utils.tests.utils import wb_transaction
+
+INPUT_PIN = 4
+
+
+def gpio_sim(process):
+    leds = [Signal(name=f"LED_{i}") for i in range(2)]
+    button = Record(Layout([("i", 1)]), name="BUTTON")
+    signal_map = [*leds, 0, 0, button]
+    assert signal_map[INPUT_PIN] is button
+
+    bus = WishboneBusRecord()
+    gpio = GPIO_Wishbone(signal_map_gen=lambda platform: signal_map)
+    gpio.init_bus_slave(bus)
+
+    sim = Simulator(gpio)
+    sim.add_clock(1e-6)
+
+    def f():
+        yield from process(bus, gpio, leds, button.i)
+
+    sim.add_sync_process(f)
+    sim.run()
+
+
+def test_gpio_set_clear_toggle():
+    def process(bus, gpio, leds, _):
+        def leds_state():
+            res = 0
+            for i, led in enumerate(leds):
+                res |= (yield led) << i
+            return res
+
+        yield from wb_transaction(bus, GPIO_SET_OFFSET, 0b11)
+        assert (yield from leds_state()) == 0b11
+        yield from wb_transaction(bus, GPIO_CLEAR_OFFSET, 0b01)
+        assert (yield from leds_state()) == 0b10
+        yield from wb_transaction(bus, GPIO_TOGGLE_OFFSET, 0b11)
+        assert (yield from leds_state()) == 0b01
+        assert (yield from wb_transaction(bus, GPIO_STATE_OFFSET)) == 0b01
+        # write-only aliases read as zero.
+        assert (yield from wb_transaction(bus, GPIO_SET_OFFSET)) == 0
+        yield from wb_transaction(bus, GPIO_STATE_OFFSET, 0b10)
+        assert (yield from leds_state()) == 0b10
+
+    gpio_sim(process)
+
+
+def test_gpio_input_edges_and_interrupt():
+    def process(bus, gpio, leds, button):
+        mask = 1 << INPUT_PIN
+
+        yield from wb_transaction(bus, GPIO_RISE_IRQ_EN_OFFSET, mask)
+        assert not (yield gpio.interrupt)
+
+        yield button.eq(1)
+        for _ in range(4):
+            yield
+        assert (yield from wb_transaction(bus, GPIO_STATE_OFFSET)) == mask
+        assert (yield from wb_transaction(bus, GPIO_RISE_OFFSET)) == mask
+        assert (yield from wb_transaction(bus, GPIO_FALL_OFFSET)) == 0
+        assert (yield gpio.interrupt)
+
+        # write 1 to clear.
+        yield from wb_transaction(bus, GPIO_RISE_OFFSET, mask)
+        assert (yield from wb_transaction(bus, GPIO_RISE_OFFSET)) == 0
+        assert not (yield gpio.interrupt)
+
+        yield button.eq(0)
+        for _ in range(4):
+            yield
+        assert (yield from wb_transaction(bus, GPIO_STATE_OFFSET)) == 0
+        assert (yield from wb_transaction(bus, GPIO_FALL_OFFSET)) == mask
+        # falling edge interrupt is not enabled.
+        assert not (yield gpio.interrupt)
+
+    gpio_sim(process)
+
+
+def test_gpio_byte_stores():
+    def process(bus, gpio, *_):
+        registers = {
+            GPIO_STATE_OFFSET: gpio.gpio_output,
+            GPIO_RISE_IRQ_EN_OFFSET: gpio.gpio_rise_irq_en,
+            GPIO_FALL_IRQ_EN_OFFSET: gpio.gpio_fall_irq_en,
+        }
+        for offset, reg in registers.items():
+            yield from wb_transaction(bus, offset, 0xffff_ffff)
+            # 'sb' to the second byte - the CPU zeroes lanes that are not selected.
+            yield from wb_transaction(bus, offset, 0x0000_0000, sel=0b0010)
+            # Data of lanes that are not selected is ignored.
+            yield from wb_transaction(bus, offset, 0x1234_5600, sel=0b0001)
+            assert (yield reg) == 0xffff_0000
+
+    gpio_sim(process)
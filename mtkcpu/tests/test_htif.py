@@ -0,0 +1,110 @@
+import io
+from itertools import count
+
+from mtkcpu.asm.asm_dump import dump_asm
+from mtkcpu.cli.top import sim
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.iss.iss import MtkCpuIss, StopReason
+from mtkcpu.units.mmio.htif import HTIF_ADDR, HtifHost, SYS_WRITE, TIMEOUT_EXIT_CODE
+from mtkcpu.utils.common import CODE_START_ADDR, EBRMemConfig
+from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.tests.utils import TOOLCHAIN
+
+SYSCALL_BLOCK = CODE_START_ADDR + 0x100
+BUFFER = CODE_START_ADDR + 0x140
+TOHOST = CODE_START_ADDR + 0x180
+
+# 'putchar', syscall (SYS_write) and exit with code equal to the number of retired instructions, as seen by the firmware.
+HTIF_PROGRAM = f"""
+.section code
+    li x1, {HTIF_ADDR}
+    addi x2, x0, 0x68
+    sw x2, 0x10(x1)
+    addi x2, x0, 0x69
+    sw x2, 0x10(x1)
+    li x2, {SYSCALL_BLOCK}
+    sw x2, 0(x1)
+    lw x3, 0x8(x1)
+    lw x4, 0x20(x1)
+    slli x4, x4, 1
+    ori x4, x4, 1
+    sw x4, 0(x1)
+"""
+
+SYSCALL_MEM = {
+    SYSCALL_BLOCK: SYS_WRITE,
+    SYSCALL_BLOCK + 8: 1,
+    SYSCALL_BLOCK + 16: BUFFER + 1,
+    SYSCALL_BLOCK + 24: 3,
+    BUFFER: int.from_bytes(b"_!?\n", "little"),
+}
+
+# riscv-tests way - write to 'tohost' variable in RAM.
+TOHOST_PROGRAM = f"""
+.section code
+    li x1, {TOHOST}
+    addi x2, x0, 7
+    sw x2, 0(x1)
+"""
+
+IDLE_LOOP_PROGRAM = f"""
+.section code
+    li x1, {CODE_START_ADDR + 8}
+    jalr x0, x1, 0
+"""
+
+
+def get_mem_config(source: str, mem: dict = {}) -> EBRMemConfig:
+    code = dump_asm(code_input=source, toolchain=TOOLCHAIN, verbose=False)
+    program = MemoryContents(memory=dict(zip(count(CODE_START_ADDR, 4), code)))
+    program.patch(MemoryContents(memory=mem), can_overlap=False)
+    return EBRMemConfig.from_mem_dict(start_addr=CODE_START_ADDR, num_bytes=1024, simulate=True, mem_dict=program)
+
+
+def get_cpu_config() -> CPU_Config:
+    return CPU_Config(with_debug=False, dev_mode=False, pc_reset_value=CODE_START_ADDR, with_virtual_memory=False, sim_htif=True)
+
+
+def run_htif(source: str, mem: dict = {}, **kwargs) -> HtifHost:
+    cpu = MtkCpu(mem_config=get_mem_config(source, mem), cpu_config=get_cpu_config())
+    htif = HtifHost(cpu, console=io.StringIO(), **kwargs)
+    assert sim(cpu=cpu, verbose=False, with_uart=False, htif=htif) == htif.status
+    return htif
+
+
+def test_htif():
+    htif = run_htif(HTIF_PROGRAM, SYSCALL_MEM)
+    assert htif.output == b"hi!?\n"
+    # 'li' is two instructions, 'instret' is read by the 11th one.
+    assert htif.exit_code == 10
+    # The last 'sw' didn't retire.
+    assert htif.instret == 13
+    assert htif.cycles > 13
+
+    htif = run_htif(TOHOST_PROGRAM, tohost_addr=TOHOST)
+    assert htif.status == 3
+
+    htif = run_htif(IDLE_LOOP_PROGRAM, max_cycles=200)
+    assert htif.timed_out and htif.cycles == 200
+    assert htif.status == TIMEOUT_EXIT_CODE
+
+
+def test_htif_wait_for_user_processes():
+    cpu = MtkCpu(mem_config=get_mem_config(IDLE_LOOP_PROGRAM), cpu_config=get_cpu_config())
+    htif = HtifHost(cpu, console=io.StringIO())
+
+    def active():
+        for _ in range(100):
+            yield
+
+    assert sim(cpu=cpu, verbose=False, with_uart=False, htif=htif, user_processes=[active], wait_for_user_processes=True) is None
+    assert not htif.finished and 100 <= htif.cycles <= 101
+
+
+def test_iss_htif():
+    output = bytearray()
+    iss = MtkCpuIss(mem_config=get_mem_config(HTIF_PROGRAM, SYSCALL_MEM), cpu_config=get_cpu_config(), uart_tx_callback=output.append)
+    assert iss.run(max_instructions=100) == StopReason.EXIT
+    assert output == b"hi!?\n"
+    assert iss.exit_code == 10
+    assert iss.pc == CODE_START_ADDR + 4 * 14
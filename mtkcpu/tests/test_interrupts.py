@@ -0,0 +1,437 @@
+from amaranth.sim import Simulator, Passive
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.cpu.priv_isa import IrqCause
+from mtkcpu.units.mmio.clint import CLINT_MSIP_OFFSET, CLINT_MTIMECMP_OFFSET, CLINT_MTIME_OFFSET
+from mtkcpu.units.mmio.gpio import GPIO_RISE_IRQ_EN_OFFSET
+from mtkcpu.units.mmio.plic import (PLIC_PRIORITY_OFFSET, PLIC_PENDING_OFFSET, PLIC_ENABLE_OFFSET,
+                                    PLIC_THRESHOLD_OFFSET, PLIC_CLAIM_COMPLETE_OFFSET, PLIC_SOURCE_UART)
+from mtkcpu.utils.common import MEM_START_ADDR, EBRMemConfig
+from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.tests.registers import RegistryContents
+from mtkcpu.utils.tests.utils import (MemTestCase, MemTestSourceType, mem_test, get_code_mem)
+
+CLINT_BASE = 0x0200_0000
+MSIP_ADDR = CLINT_BASE + CLINT_MSIP_OFFSET
+MTIMECMP_ADDR = CLINT_BASE + CLINT_MTIMECMP_OFFSET
+MTIME_ADDR = CLINT_BASE + CLINT_MTIME_OFFSET
+
+GPIO_RISE_IRQ_EN_ADDR = 0x9000_0000 + GPIO_RISE_IRQ_EN_OFFSET
+
+PLIC_BASE = 0x0C00_0000
+UART_PRIORITY_ADDR = PLIC_BASE + PLIC_PRIORITY_OFFSET + 4 * PLIC_SOURCE_UART
+PLIC_PENDING_ADDR = PLIC_BASE + PLIC_PENDING_OFFSET
+PLIC_ENABLE_ADDR = PLIC_BASE + PLIC_ENABLE_OFFSET
+PLIC_THRESHOLD_ADDR = PLIC_BASE + PLIC_THRESHOLD_OFFSET
+PLIC_CLAIM_ADDR = PLIC_BASE + PLIC_CLAIM_COMPLETE_OFFSET
+
+MSTATUS_MIE = 1 << 3
+MIE_MSIE = 1 << IrqCause.M_SOFTWARE_INTERRUPT
+MIE_MTIE = 1 << IrqCause.M_TIMER_INTERRUPT
+MIE_MEIE = 1 << IrqCause.M_EXTERNAL_INTERRUPT
+
+INTERRUPT_BIT = 1 << 31
+
+INTERRUPT_TESTS = [
+    MemTestCase(
+        name="timer interrupt - direct mode, mcause check",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {MTIMECMP_ADDR}
+                sw x0, 4(x5)
+                sw x0, 0(x5) // mtimecmp = 0, interrupt pending right away
+                li x5, {MIE_MTIE}
+                csrw mie, x5
+                li x6, {MSTATUS_MIE}
+                csrs mstatus, x6
+            loop:
+                j loop
+            trap:
+                csrr x2, mcause
+        """,
+        out_reg=2,
+        out_val=INTERRUPT_BIT | IrqCause.M_TIMER_INTERRUPT,
+        timeout=200,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="software interrupt - vectored mode jumps to base + 4 * cause",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, vector_table
+                ori x5, x5, 1 // vectored mode
+                csrw mtvec, x5
+                li x5, {MIE_MSIE}
+                csrw mie, x5
+                li x6, {MSTATUS_MIE}
+                csrs mstatus, x6
+                li x5, {MSIP_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+            loop:
+                j loop
+            .align 2
+            vector_table:
+                j bad
+                j bad
+                j bad
+                j msi
+                j bad
+                j bad
+                j bad
+                j bad
+            bad:
+                li x2, 0xbad
+            msi:
+                li x2, 0x33
+        """,
+        out_reg=2,
+        out_val=0x33,
+        timeout=200,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="software interrupt - masked by mstatus.mie, visible in mip",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {MIE_MSIE}
+                csrw mie, x5
+                li x5, {MSIP_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+                nop
+                csrr x2, mip
+            loop:
+                j loop
+            trap:
+                li x2, 0xbad
+        """,
+        out_reg=2,
+        out_val=MIE_MSIE,
+        timeout=200,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="software interrupt - mret returns to interrupted code with interrupts re-enabled",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {MIE_MSIE}
+                csrw mie, x5
+                li x6, {MSTATUS_MIE}
+                csrs mstatus, x6
+                li x5, {MSIP_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+                csrr x7, mstatus
+                andi x2, x7, {MSTATUS_MIE}
+            loop:
+                j loop
+            trap:
+                sw x0, 0(x5) // clear pending interrupt
+                mret
+        """,
+        out_reg=2,
+        out_val=MSTATUS_MIE,
+        timeout=300,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="CLINT - byte store writes only the selected byte",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                li x5, {MTIMECMP_ADDR}
+                li x6, -1
+                sw x6, 0(x5)
+                sb x0, 1(x5)
+                lw x2, 0(x5)
+        """,
+        out_reg=2,
+        out_val=0xffff_00ff,
+        timeout=200,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="GPIO - byte store to interrupt enable writes only the selected byte",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                li x5, {GPIO_RISE_IRQ_EN_ADDR}
+                li x6, -1
+                sw x6, 0(x5)
+                sb x0, 2(x5)
+                lw x2, 0(x5)
+        """,
+        out_reg=2,
+        out_val=0xff00_ffff,
+        timeout=200,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    # NOTE: UART raises its (level-triggered) interrupt whenever the transmitter is idle.
+    MemTestCase(
+        name="external interrupt - PLIC claim returns UART source ID",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {UART_PRIORITY_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+                li x5, {PLIC_ENABLE_ADDR}
+                li x6, {1 << PLIC_SOURCE_UART}
+                sw x6, 0(x5)
+                li x5, {MIE_MEIE}
+                csrw mie, x5
+                li x5, {MSTATUS_MIE}
+                csrs mstatus, x5
+            loop:
+                j loop
+            trap:
+                csrr x7, mcause
+                li x5, {INTERRUPT_BIT | IrqCause.M_EXTERNAL_INTERRUPT}
+                bne x5, x7, bad
+                li x5, {PLIC_CLAIM_ADDR}
+                lw x2, 0(x5)
+            bad:
+                li x2, 0xbad
+        """,
+        out_reg=2,
+        out_val=PLIC_SOURCE_UART,
+        timeout=300,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="simultaneous interrupts - external one is taken first",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {MTIMECMP_ADDR}
+                sw x0, 4(x5)
+                sw x0, 0(x5)
+                li x5, {MSIP_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+                li x5, {UART_PRIORITY_ADDR}
+                sw x6, 0(x5)
+                li x5, {PLIC_ENABLE_ADDR}
+                li x6, {1 << PLIC_SOURCE_UART}
+                sw x6, 0(x5)
+                li x5, {MIE_MSIE | MIE_MTIE | MIE_MEIE}
+                csrw mie, x5
+                li x5, {MSTATUS_MIE}
+                csrs mstatus, x5
+            loop:
+                j loop
+            trap:
+                csrr x2, mcause
+        """,
+        out_reg=2,
+        out_val=INTERRUPT_BIT | IrqCause.M_EXTERNAL_INTERRUPT,
+        timeout=300,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="PLIC - byte store writes only the selected byte",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                li x5, {PLIC_ENABLE_ADDR}
+                li x6, {1 << PLIC_SOURCE_UART}
+                sw x6, 0(x5)
+                sb x0, 1(x5)
+                lw x2, 0(x5)
+        """,
+        out_reg=2,
+        out_val=1 << PLIC_SOURCE_UART,
+        timeout=200,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="external interrupt - source masked by PLIC threshold stays pending",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {UART_PRIORITY_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+                li x5, {PLIC_THRESHOLD_ADDR}
+                sw x6, 0(x5)
+                li x5, {PLIC_ENABLE_ADDR}
+                li x6, {1 << PLIC_SOURCE_UART}
+                sw x6, 0(x5)
+                li x5, {MIE_MEIE}
+                csrw mie, x5
+                li x5, {MSTATUS_MIE}
+                csrs mstatus, x5
+                li x5, {PLIC_PENDING_ADDR}
+                lw x2, 0(x5)
+            loop:
+                j loop
+            trap:
+                li x2, 0xbad
+        """,
+        out_reg=2,
+        out_val=1 << PLIC_SOURCE_UART,
+        timeout=300,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+
+    MemTestCase(
+        name="external interrupt - claim/complete, source disabled in handler",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x5, {UART_PRIORITY_ADDR}
+                li x6, 1
+                sw x6, 0(x5)
+                li x5, {PLIC_ENABLE_ADDR}
+                li x6, {1 << PLIC_SOURCE_UART}
+                sw x6, 0(x5)
+                li x5, {MIE_MEIE}
+                csrw mie, x5
+                li x5, {MSTATUS_MIE}
+                csrs mstatus, x5
+                nop
+                li x5, {PLIC_CLAIM_ADDR}
+                lw x2, 0(x5) // nothing left to claim
+            loop:
+                j loop
+            trap:
+                li x5, {PLIC_CLAIM_ADDR}
+                lw x6, 0(x5)
+                li x7, {PLIC_ENABLE_ADDR}
+                sw x0, 0(x7)
+                sw x6, 0(x5)
+                mret
+        """,
+        out_reg=2,
+        out_val=0,
+        timeout=400,
+        mem_init=MemoryContents.empty(),
+        reg_init=RegistryContents.empty(),
+    ),
+]
+
+@mem_test(INTERRUPT_TESTS)
+def test_interrupts(_):
+    pass
+
+
+def test_timer_interrupt_latency():
+    """
+    Measures number of cycles between 'mtime >= mtimecmp' and the CPU
+    setting 'pc' to the first instruction of the trap handler.
+    Handler re-arms the timer with a varying delay, so that the interrupt
+    arrives in different states of the main FSM.
+    """
+    case = MemTestCase(
+        name="timer interrupt latency",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                la x5, trap
+                csrw mtvec, x5
+                li x6, {MIE_MTIE}
+                csrw mie, x6
+                li x6, {MSTATUS_MIE}
+                csrs mstatus, x6
+                li x5, {MTIMECMP_ADDR}
+                li x9, {MTIME_ADDR}
+                sw x0, 4(x5)
+                li x6, 200
+                sw x6, 0(x5)
+            loop:
+                addi x10, x10, 1
+                j loop
+            trap:
+                lw x8, 0(x9)
+                addi x7, x7, 1
+                add x8, x8, x7
+                addi x8, x8, 40
+                sw x8, 0(x5)
+                mret
+        """,
+    )
+    program = get_code_mem(case, mem_size_kb=1)
+
+    cpu = MtkCpu(
+        mem_config=EBRMemConfig.from_mem_dict(
+            start_addr=MEM_START_ADDR,
+            num_bytes=1024,
+            simulate=True,
+            mem_dict=program,
+        ),
+        cpu_config=CPU_Config(
+            dev_mode=False,
+            with_debug=False,
+            pc_reset_value=MEM_START_ADDR,
+            with_virtual_memory=False,
+        )
+    )
+    sim = Simulator(cpu)
+    sim.add_clock(1e-6)
+
+    clint = cpu.arbiter.clint
+    mtvec = cpu.csr_unit.mtvec.as_view()
+
+    latencies = []
+
+    def monitor():
+        yield Passive()
+        while True:
+            while not (yield clint.timer_interrupt):
+                yield
+            cycles = 0
+            while (yield cpu.pc) != (yield mtvec.base) << 2:
+                cycles += 1
+                yield
+            latencies.append(cycles)
+            while (yield clint.timer_interrupt):
+                yield
+
+    def timeout():
+        for _ in range(3000):
+            yield
+
+    sim.add_sync_process(monitor)
+    sim.add_sync_process(timeout)
+    sim.run()
+
+    assert len(latencies) > 10
+    assert max(latencies) < 10, f"interrupt-entry latency (cycles): min {min(latencies)}, max {max(latencies)}"
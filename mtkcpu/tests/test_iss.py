@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+import mtkcpu.tests.test_address_translation as address_translation
+import mtkcpu.tests.test_branch as branch
+import mtkcpu.tests.test_compare as compare
+import mtkcpu.tests.test_csr as csr
+import mtkcpu.tests.test_exception as exception
+import mtkcpu.tests.test_interrupts as interrupts
+import mtkcpu.tests.test_memory as memory
+import mtkcpu.tests.test_priv_modes as priv_modes
+import mtkcpu.tests.test_registers as registers
+import mtkcpu.tests.test_upper as upper
+from amaranth.sim import Simulator
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.iss.iss import MtkCpuIss, StopReason
+from mtkcpu.iss.lockstep import LockstepChecker, LockstepDivergence
+from mtkcpu.utils.tests.utils import (MemTestCase, MemTestSourceType, assert_iss_mem_test,
+                                      get_mem_test_config)
+from mtkcpu.utils.common import MEM_START_ADDR
+
+ALL_MEM_TESTS = [
+    *address_translation.MMU_TESTS,
+    *branch.BRANCH_TESTS,
+    *compare.COMPARE_TESTS,
+    *csr.CSR_TESTS,
+    *exception.EXCEPTION_TESTS,
+    *interrupts.INTERRUPT_TESTS,
+    *memory.MEMORY_TESTS,
+    *priv_modes.PRIV_TESTS,
+    *registers.REGISTERS_TESTS,
+    *upper.UPPER_TESTS,
+]
+
+
+@pytest.mark.parametrize("test_case", ALL_MEM_TESTS, ids=[x.name for x in ALL_MEM_TESTS])
+def test_iss_mem_tests(test_case: MemTestCase):
+    assert_iss_mem_test(test_case)
+
+
+# Well below the ~0.8M instructions/s measured on a development machine, so that slow CI runners pass.
+# CPU time is measured, as wall time depends on other tests running in parallel.
+MIN_ISS_THROUGHPUT_MIPS = 0.25
+
+
+def test_iss_throughput():
+    num_iterations = 100_000
+    case = MemTestCase(
+        name="iss throughput",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                li x1, 0
+                li x2, {num_iterations}
+                li x5, 0x70000008 // UART 'tx_data'
+            loop:
+                addi x1, x1, 1
+                andi x3, x1, 0xff
+                sw x3, 0(x4)
+                lw x3, 0(x4)
+                bne x1, x2, loop
+                li x6, 0x41
+                sw x6, 0(x5)
+            end:
+                j end
+        """,
+        reg_init=None,
+    )
+    iss = MtkCpuIss(
+        mem_config=get_mem_test_config(case),
+        cpu_config=CPU_Config(
+            dev_mode=False,
+            with_debug=False,
+            pc_reset_value=MEM_START_ADDR,
+            with_virtual_memory=False,
+        ),
+        reg_init=[0, 0, 0, 0, MEM_START_ADDR + 0x200],
+    )
+    start = time.process_time()
+    assert iss.run(max_instructions=10 * num_iterations) == StopReason.IDLE_LOOP
+    elapsed = time.process_time() - start
+
+    assert iss.regs[1] == num_iterations
+    assert iss.uart_output == b"A"
+    mips = iss.steps / elapsed / 1e6
+    assert mips >= MIN_ISS_THROUGHPUT_MIPS, f"ISS: {iss.steps} instructions in {elapsed:.2f}s ({mips:.2f} MIPS)"
+
+
+def test_lockstep_detects_divergence():
+    case = MemTestCase(
+        name="lockstep divergence",
+        source_type=MemTestSourceType.RAW,
+        source=f"""
+            start:
+                li x1, 1
+            loop:
+                addi x1, x1, 1
+                j loop
+        """,
+        reg_init=None,
+    )
+    cpu = MtkCpu(
+        mem_config=get_mem_test_config(case),
+        cpu_config=CPU_Config(
+            dev_mode=False,
+            with_debug=False,
+            pc_reset_value=MEM_START_ADDR,
+            with_virtual_memory=False,
+        ),
+    )
+    sim = Simulator(cpu)
+    sim.add_clock(1e-6)
+    checker = LockstepChecker(cpu, history_len=4)
+    sim.add_sync_process(checker.process)
+
+    # ISS executes 'addi x1, x1, 2' instead, starting from the fourth loop iteration.
+    addi_offset = 4
+    ram = checker.iss.devices["ebr"].words
+    def patch_iss_program():
+        while checker.retired < 1 + 3 * 2:
+            yield
+        ram[addi_offset // 4] = (ram[addi_offset // 4] & 0xFFFFF) | (2 << 20)
+    sim.add_sync_process(patch_iss_program)
+
+    with pytest.raises(LockstepDivergence) as e:
+        sim.run_until(1e-3, run_passive=True)
+
+    msg = str(e.value)
+    assert "rd value mismatch" in msg
+    assert f"pc={hex(MEM_START_ADDR + addi_offset)}" in msg
+    assert checker.retired == 1 + 3 * 2
+    assert len(checker.history) == 4
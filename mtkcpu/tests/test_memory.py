@@ -213,3 +213,33 @@ MEMORY_TESTS = [
 @mem_test(MEMORY_TESTS)
 def test_memory(_):
     pass
+
+
+SPARSE_MEMORY_TESTS = [
+    MemTestCase(
+        name=f"sparse 16MB memory, latency {latency}",
+        source_type=MemTestSourceType.TEXT,
+        source=f"""
+        .section code
+            lui x2, 0xF00
+            add x2, x2, x{fill_but_one.addr_reg_idx}
+            lw x3, 0(x2)
+            addi x3, x3, 1
+            sw x3, 4(x2)
+            sb x3, 9(x2)
+            lw x4, 8(x2)
+        """,
+        out_reg=4,
+        out_val=0xAABB78DD,
+        timeout=200,
+        reg_init=fill_but_one(),
+        mem_init=MemoryContents(memory={0xF0_0000: 0x1234_5677, 0xF0_0008: 0xAABB_CCDD}),
+        mem_out=MemoryContents(memory={0xF0_0004: 0x1234_5678, 0xF0_0008: 0xAABB_78DD}),
+        mem_size_kb=16 * 1024,
+        sparse_mem_latency=latency,
+    ) for latency in [0, 1, 5]
+]
+
+@mem_test(SPARSE_MEMORY_TESTS)
+def test_sparse_memory(_):
+    pass
@@ -0,0 +1,96 @@
+import pytest
+from amaranth import Module, Signal
+from amaranth.sim import Simulator
+
+from mtkcpu.utils.tests.monitor_hub import MonitorHub, is_monitor, merge_monitors, monitor
+
+
+def run(m: Module, processes: list, num_cycles: int = 20):
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def timeout():
+        for _ in range(num_cycles):
+            yield
+    for p in [*processes, timeout]:
+        sim.add_sync_process(p)
+    sim.run()
+
+
+def counter_design():
+    m = Module()
+    counter = Signal(8)
+    other = Signal(8)
+    m.d.sync += [counter.eq(counter + 1), other.eq(counter * 2)]
+    return m, counter, other
+
+
+def test_monitor_hub():
+    m, counter, other = counter_design()
+    hub = MonitorHub()
+    changes, matches, lazy = [], [], []
+
+    # Slices of the same signal are sampled once.
+    hub.on_change(counter[2], lambda x, prev: changes.append((x, prev)), initial=0)
+    hub.on([counter[0:2], counter[1]], lambda low, bit: low == 0b11, lambda low, bit: matches.append(bit))
+
+    def on_counter_5(_):
+        lazy.append((yield other))
+        lazy.append((yield counter))
+    hub.on([counter], lambda x: x == 5, on_counter_5)
+    assert len(hub._bases) == 1
+
+    run(m, [hub.process], num_cycles=20)
+    assert hub.cycles > 16
+    assert changes[:4] == [(1, 0), (0, 1), (1, 0), (0, 1)]
+    assert matches[:4] == [1] * 4
+    assert lazy == [8, 5]
+
+
+def test_monitor_hub_callback_errors():
+    m, counter, _ = counter_design()
+    hub = MonitorHub()
+
+    def waits_for_clock(_):
+        yield
+    hub.on([counter], lambda x: x == 3, waits_for_clock)
+    with pytest.raises(TypeError, match="can only read values"):
+        run(m, [hub.process])
+
+    hub = MonitorHub()
+    def raises(_):
+        raise ValueError("counter reached 3")
+    hub.on([counter], lambda x: x == 3, raises)
+    with pytest.raises(ValueError, match="counter reached 3"):
+        run(m, [hub.process])
+
+
+def test_merge_monitors():
+    m, counter, other = counter_design()
+    seen = []
+
+    def counter_monitor(name: str, value: Signal):
+        @monitor
+        def setup(hub: MonitorHub):
+            # Triggers can be registered during simulation too.
+            def start(x):
+                if not seen:
+                    hub.on_change(other, lambda x, _: seen.append(("other", x)))
+                seen.append((name, x))
+            hub.on([value], lambda x: x == 4, start)
+        return setup
+
+    def not_a_monitor():
+        yield
+
+    processes = [not_a_monitor, counter_monitor("a", counter), not_a_monitor, counter_monitor("b", counter)]
+    merged = merge_monitors(processes)
+    assert len(merged) == 3
+    assert merged[0] is not_a_monitor and merged[2] is not_a_monitor
+    assert is_monitor(merged[1])
+    assert merge_monitors(processes[:2]) == processes[:2]
+
+    run(m, merged, num_cycles=8)
+    assert seen[:2] == [("a", 4), ("b", 4)]
+    # 'other' is sampled since the next cycle (counter == 5).
+    assert seen[2:5] == [("other", 8), ("other", 10), ("other", 12)]
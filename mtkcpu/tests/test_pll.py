@@ -0,0 +1,39 @@
+import pytest
+
+from mtkcpu.cli.top import get_board_cpu, get_platform
+from mtkcpu.cpu.cpu import CPU_Config
+from mtkcpu.units.mmio.uart import baud_divisor
+from mtkcpu.units.pll import pll_params, PLL_REF_CLK_FREQ, COMMON_CLK_FREQS
+from mtkcpu.utils.common import CODE_START_ADDR
+
+
+@pytest.mark.parametrize("freq", COMMON_CLK_FREQS)
+def test_pll_params_exact(freq: int):
+    params = pll_params(freq_in=PLL_REF_CLK_FREQ, freq_out=freq)
+    f_vco = PLL_REF_CLK_FREQ / (params.divr + 1) * (params.divf + 1)
+    assert 533e6 <= f_vco <= 1066e6
+    assert params.freq_out == freq == f_vco / (1 << params.divq)
+
+
+def test_pll_params_unreachable():
+    with pytest.raises(ValueError):
+        pll_params(freq_in=PLL_REF_CLK_FREQ, freq_out=5_000_000)
+
+
+def test_pll_clock_propagation():
+    freq = 30_000_000
+    cpu = get_board_cpu(
+        elf_path=None,
+        cpu_config=CPU_Config(
+            with_debug=False,
+            dev_mode=False,
+            pc_reset_value=CODE_START_ADDR,
+            with_virtual_memory=False,
+            clk_freq_hz=freq,
+        )
+    )
+    plan = get_platform().prepare(cpu)
+
+    assert "SB_PLL40_PAD" in plan.files["top.il"]
+    assert f"set_frequency clk {freq / 1e6}" in plan.files["top.pcf"]
+    assert cpu.arbiter.uart.divisor == baud_divisor(clk_freq=freq, baud_rate=115200)
@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+
+from mtkcpu.cli.top import sim
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.units.mmio.htif import HTIF_ADDR, HtifHost
+from mtkcpu.utils.common import MEM_START_ADDR, EBRMemConfig, compile_source, read_elf
+from mtkcpu.utils.profiler import ElfSymbols, PcProfiler
+from mtkcpu.utils.tests.memory import MemoryContents
+
+# 'bar' is called both directly and from 'foo'.
+PROFILED_PROGRAM = f"""
+.global start
+start:
+    la sp, stack_top
+    li s0, 5
+loop:
+    call foo
+    call bar
+    addi s0, s0, -1
+    bnez s0, loop
+    li t1, {HTIF_ADDR}
+    li t2, 1
+    sw t2, 0(t1)
+
+.global foo
+.type foo, @function
+foo:
+    addi sp, sp, -4
+    sw ra, 0(sp)
+    call bar
+    lw ra, 0(sp)
+    addi sp, sp, 4
+    ret
+
+.global bar
+.type bar, @function
+bar:
+    li t0, 10
+bar_loop:
+    addi t0, t0, -1
+    bnez t0, bar_loop
+    ret
+
+.align 4
+.fill 8, 4, 0
+stack_top:
+"""
+
+
+def test_profiler(tmp_path):
+    elf_path = tmp_path / "profiled.elf"
+    compile_source(PROFILED_PROGRAM, str(elf_path), mem_size_kb=1)
+    mem_config = EBRMemConfig.from_mem_dict(start_addr=MEM_START_ADDR, num_bytes=1024, simulate=True, mem_dict=MemoryContents(read_elf(elf_path)))
+    cpu = MtkCpu(
+        mem_config=mem_config,
+        cpu_config=CPU_Config(dev_mode=False, with_debug=False, pc_reset_value=MEM_START_ADDR, with_virtual_memory=False, sim_htif=True),
+    )
+    profiler = PcProfiler(cpu, symbols=ElfSymbols(elf_path))
+    htif = HtifHost(cpu, console=io.StringIO())
+    assert sim(cpu=cpu, verbose=False, with_uart=False, htif=htif, user_processes=[profiler.process()]) == 0
+
+    flat = {name: (cycles, instret) for name, cycles, instret in profiler.flat_profile()}
+    assert list(flat) == ["bar", "foo", "start"]
+    # 10 calls of 'li', 10 x ('addi', 'bnez'), 'ret'.
+    assert flat["bar"][1] == 10 * 22
+    # 'call' is 'auipc' and 'jalr'.
+    assert flat["foo"][1] == 5 * 7
+    # The last 'sw' is not complete when the simulation ends.
+    assert sum(x[1] for x in flat.values()) == htif.instret
+    total = sum(profiler.cycles.values())
+    assert 0 < htif.cycles - total < 20
+    assert flat["bar"][0] > total / 2
+
+    folded = dict(line.rsplit(" ", 1) for line in profiler.folded_stacks())
+    assert set(folded) == {"start", "start;foo", "start;foo;bar", "start;bar"}
+    assert sum(int(x) for x in folded.values()) == total
+    # The same work in both call sites.
+    assert folded["start;foo;bar"] == folded["start;bar"]
+
+    npz, txt, folded_path = profiler.save(tmp_path / "profile")
+    with np.load(npz) as f:
+        assert dict(zip(f["pc"].tolist(), f["cycles"].tolist())) == profiler.cycles
+    assert "bar" in txt.read_text().splitlines()[2]
+    assert folded_path.read_text().splitlines() == profiler.folded_stacks()
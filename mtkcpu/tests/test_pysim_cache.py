@@ -0,0 +1,94 @@
+import base64
+import marshal
+
+import amaranth
+import pytest
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.utils.common import CODE_START_ADDR, EBRMemConfig
+from mtkcpu.utils.pysim_cache import PYSIM_CACHE_ENV, CachedPySimEngine, _check_entry_file, _load_code, get_simulator
+from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.tests.registers import RegistryContents
+from mtkcpu.utils.tests.sim_session import CpuSimSession
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, capture_write_transactions, get_mem_test_config
+from mtkcpu.utils.tests.sim_tests import get_sim_register_test
+
+
+def test_pysim_cache(tmp_path, monkeypatch):
+    """
+    Simulation with generated code loaded from the cache must behave the same as freshly generated one.
+    """
+    monkeypatch.setenv(PYSIM_CACHE_ENV, str(tmp_path))
+    test_case = MemTestCase(
+        name="pysim cache",
+        source_type=MemTestSourceType.TEXT,
+        source="""
+        .section code
+        start:
+            lw x2, 0(x1)
+            addi x2, x2, 3
+            slli x2, x2, 4
+            add x3, x2, x0
+            sw x3, 4(x1)
+            beq x3, x0, start
+            xori x4, x3, 0x55
+        """,
+        out_reg=4,
+        out_val=((0x11 + 3) << 4) ^ 0x55,
+        timeout=100,
+        mem_init=MemoryContents(memory={0x200: 0x11}),
+        reg_init=RegistryContents.fill(lambda i: CODE_START_ADDR + 0x200 if i == 1 else 0),
+    )
+    mem_cfg = get_mem_test_config(test_case)
+    cpu_config = CPU_Config(
+        dev_mode=False,
+        with_debug=False,
+        pc_reset_value=CODE_START_ADDR,
+        with_virtual_memory=True,
+    )
+
+    for expect_cache_hit in [False, True]:
+        # Not CpuSimSession.get, as each session needs freshly elaborated design.
+        session = CpuSimSession(cpu_config=cpu_config, mem_size_words=mem_cfg.mem_size_words, mem_addr=mem_cfg.mem_addr)
+        assert session.sim._engine.cache_hit == expect_cache_hit
+
+        result_mem = {}
+        session.run(
+            mem_config=mem_cfg,
+            reg_init=test_case.reg_init.reg,
+            processes=[
+                capture_write_transactions(cpu=session.cpu, dict_reference=result_mem),
+                get_sim_register_test(name=test_case.name, cpu=session.cpu, timeout_cycles=test_case.timeout, reg_num=test_case.out_reg, expected_val=test_case.out_val),
+            ],
+        )
+        assert result_mem == {0x204: (0x11 + 3) << 4}
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_pysim_cache_entry_checks(tmp_path):
+    def entry_code(source: str) -> str:
+        code = compile(source, "<string>", "exec").co_consts[0]
+        return base64.b64encode(marshal.dumps(code)).decode()
+
+    _load_code(entry_code("def run():\n    next_0 = slots[0].next\n    slots[0].set(bool(slots[1].curr) + sign(next_0, -2))"))
+    with pytest.raises(ValueError, match="__import__"):
+        _load_code(entry_code("def run():\n    __import__('os').system('true')"))
+    with pytest.raises(ValueError, match="__class__"):
+        _load_code(entry_code("def run():\n    return slots.__class__"))
+
+    path = tmp_path / "entry.json"
+    path.write_text("{}")
+    path.chmod(0o644)
+    _check_entry_file(path)
+    path.chmod(0o666)
+    with pytest.raises(ValueError, match="writable by other users"):
+        _check_entry_file(path)
+
+
+def test_pysim_cache_unsupported_amaranth(tmp_path, monkeypatch):
+    monkeypatch.setattr(amaranth, "__version__", "0.0.1")
+    mem_config = EBRMemConfig(mem_size_words=16, mem_content_words=None, mem_addr=CODE_START_ADDR, simulate=True)
+    cpu = MtkCpu(mem_config=mem_config, cpu_config=CPU_Config(dev_mode=False, with_debug=False, pc_reset_value=CODE_START_ADDR, with_virtual_memory=False))
+    sim = get_simulator(cpu, cache_dir=tmp_path)
+    assert not isinstance(sim._engine, CachedPySimEngine)
+    assert not list(tmp_path.iterdir())
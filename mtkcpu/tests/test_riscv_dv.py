@@ -4,6 +4,7 @@ from pathlib import Path
 from mtkcpu.cpu.cpu import MtkCpu
 from mtkcpu.utils.common import EBRMemConfig, read_elf
 from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.waveform import WaveformCapture
 
 from amaranth.sim import Simulator
 
@@ -12,8 +13,7 @@ from typing import Optional
 import pytest
 
 import sys
-from instr_trace_compare import compare_trace_csv
-import tempfile
+from instr_trace_compare import StreamingTraceComparator
 
 def disassemble(instr : int) -> Optional[Instruction]:
     try:
@@ -28,13 +28,17 @@ from riscv_trace_csv import RiscvInstructionTraceEntry, RiscvInstructionTraceCsv
 """
     google/riscv-dv code-generator for comparison uses specific csv format,
     to compare against e.g. Spike ground truth.
-    It will be written by simulator function to 'csv_output' file. 
+    Trace entries are passed directly to the StreamingTraceComparator, and (optionally) written to 'csv_output' file.
 """
-def riscv_dv_sim_process(cpu : MtkCpu, iss_csv : Path, compare_every: int, csv_output: Path):
+def riscv_dv_sim_process(cpu : MtkCpu, iss_csv : Path, compare_every: int, csv_output: Optional[Path] = None):
     def aux():
-        csv_output_fd = csv_output.open("w")
-        csv_writer = RiscvInstructionTraceCsv(csv_fd=csv_output_fd)
-        csv_writer.start_new_trace()
+        # order of passing mtkcpu and spike matters - we allow only first passed log to be shorter
+        comparator = StreamingTraceComparator(iss_csv.absolute(), "mtkcpu", "spike")
+        csv_writer = None
+        if csv_output is not None:
+            csv_output_fd = csv_output.open("w")
+            csv_writer = RiscvInstructionTraceCsv(csv_fd=csv_output_fd)
+            csv_writer.start_new_trace()
 
         total_num_processed = -1
         prev_checkpoint = 0
@@ -46,11 +50,9 @@ def riscv_dv_sim_process(cpu : MtkCpu, iss_csv : Path, compare_every: int, csv_o
             if (yield cpu.main_fsm.ongoing("DECODE")):
                 total_num_processed += 1
                 if do_compare():
-                    csv_output_fd.flush()
-                    logging.info(f"total: {total_num_processed}, previous checkpoint: {prev_checkpoint}. calling 'compare_trace_csv'...")
+                    logging.info(f"total: {total_num_processed}, previous checkpoint: {prev_checkpoint}. comparing new trace entries...")
                     prev_checkpoint = total_num_processed
-                    # order of passing mtkcpu and spike matters - we allow only first passed log to be shorter
-                    compare_trace_csv(csv_output.absolute(), iss_csv.absolute(), "mtkcpu", "spike", log=0)
+                    comparator.compare()
                 
                 instr_disas = disassemble(instr)
                 logging.info(f"{hex(pc)}: {hex(instr)} : {instr_disas}")
@@ -67,6 +69,10 @@ def riscv_dv_sim_process(cpu : MtkCpu, iss_csv : Path, compare_every: int, csv_o
 
                 if instr == 0x73: # 'ecall' - Spike simulation finishes with ecall. By default we compare with Spike.
                     logging.critical(f"found {hex(instr)} : {instr_str} intruction: finishing simulation")
+                    comparator.compare()
+                    comparator.close()
+                    if csv_writer is not None:
+                        csv_output_fd.close()
                     return
                 
                 timeout_cyc = 50
@@ -77,7 +83,8 @@ def riscv_dv_sim_process(cpu : MtkCpu, iss_csv : Path, compare_every: int, csv_o
                         if not (yield cpu.should_write_rd):
                             logging.info(f"detected instruction that doesn't write to rd. - {instr_str}")
                             found = True
-                            csv_output_fd.write(f"# {hex(instr)}: {instr_str}\n")
+                            if csv_writer is not None:
+                                csv_output_fd.write(f"# {hex(instr)}: {instr_str}\n")
                             break
                         en = yield cpu.reg_write_port.en
                         assert en
@@ -93,7 +100,9 @@ def riscv_dv_sim_process(cpu : MtkCpu, iss_csv : Path, compare_every: int, csv_o
                                 # depending on '-f' param passed to 'scripts/spike_log_to_trace_csv.py' inside riscv-dv repo,
                                 # we need either to print register-state-changing instructions only (like here),
                                 # or all instructions, then we would put the line below after the loop. 
-                                csv_writer.write_trace_entry(entry)
+                                comparator.add_entry(entry)
+                                if csv_writer is not None:
+                                    csv_writer.write_trace_entry(entry)
                                 break
                     yield
                 if not found:
@@ -171,19 +180,14 @@ def test_riscv_dv(cfg: RiscvDvTestConfig):
         cpu.arbiter.error_code,
     ]
 
-    csv_output = tempfile.NamedTemporaryFile(
-        suffix=f".mtkcpu.{cfg.test_name}.csv", 
-        dir=Path(__file__).parent.name, 
-        delete=False
-    )
     fn = riscv_dv_sim_process(
         cpu=cpu,
         iss_csv=cfg.iss_csv,
         compare_every=cfg.compare_every,
-        csv_output=Path(csv_output.name),
     )
     sim.add_sync_process(fn)
-    
-    with sim.write_vcd("cpu.vcd", "cpu.gtkw", traces=traces):
+
+    waveform = WaveformCapture(name=cfg.test_name, traces=traces, pc=cpu.pc)
+    waveform.add_to(sim)
+    with waveform.capture(sim):
         sim.run()
-    print("== Waveform dumped to cpu.vcd file")
@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+from mtkcpu.cli.top import sim
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.iss.iss import StopReason
+from mtkcpu.iss.sampling import SamplingConfig, run_sampled, t_quantile
+from mtkcpu.units.mmio.htif import HTIF_ADDR, HtifHost
+from mtkcpu.utils.common import MEM_START_ADDR
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, get_mem_test_config
+
+# ALU-only phase, followed by (slower) load/store one, then exit via HTIF.
+SAMPLING_CASE = MemTestCase(
+    name="sampling",
+    source_type=MemTestSourceType.RAW,
+    source=f"""
+        start:
+            li x1, 800
+        alu_loop:
+            addi x2, x2, 3
+            xor x3, x3, x2
+            addi x1, x1, -1
+            bnez x1, alu_loop
+            li x1, 800
+            la x4, data
+        mem_loop:
+            lw x5, 0(x4)
+            addi x5, x5, 1
+            sw x5, 4(x4)
+            addi x1, x1, -1
+            bnez x1, mem_loop
+            li x1, {HTIF_ADDR}
+            li x2, 1
+            sw x2, 0(x1)
+        .align 4
+        data:
+            .fill 4, 4, 0
+    """,
+    reg_init=None,
+)
+
+CPU_CONFIG = CPU_Config(dev_mode=False, with_debug=False, pc_reset_value=MEM_START_ADDR, with_virtual_memory=False, sim_htif=True)
+
+
+def test_t_quantile():
+    assert t_quantile(0.975, df=1) == pytest.approx(12.706, abs=1e-3)
+    assert t_quantile(0.975, df=2) == pytest.approx(4.303, abs=1e-3)
+    assert t_quantile(0.975, df=5) == pytest.approx(2.571, abs=1e-3)
+    assert t_quantile(0.95, df=30) == pytest.approx(1.697, abs=1e-3)
+
+
+def test_sampling():
+    mem_config = get_mem_test_config(SAMPLING_CASE)
+    config = SamplingConfig(interval=700, warmup=20, window=100)
+    res = run_sampled(mem_config=mem_config, cpu_config=CPU_CONFIG, config=config)
+    assert res.stop_reason == StopReason.EXIT
+    assert len(res.samples) >= 8
+    assert all(x.instructions == 100 for x in res.samples[:-1])
+    # Two phases of different CPI.
+    assert min(x.cpi for x in res.samples) < max(x.cpi for x in res.samples)
+
+    # Reference - whole program simulated on the RTL.
+    cpu = MtkCpu(mem_config=mem_config, cpu_config=CPU_CONFIG)
+    htif = HtifHost(cpu, console=io.StringIO())
+    assert sim(cpu=cpu, verbose=False, with_uart=False, htif=htif) == 0
+    # The final 'sw' doesn't retire on the RTL.
+    assert res.instructions == htif.instret + 1
+
+    lo, hi = res.cycles_interval
+    assert lo <= htif.cycles <= hi
+    assert abs(res.cycles - htif.cycles) / htif.cycles < 0.05
+
+    # Region of interest ending before the load/store loop - the same CPI in each sample.
+    res = run_sampled(mem_config=mem_config, cpu_config=CPU_CONFIG, config=SamplingConfig(interval=500, warmup=20, window=100, max_instructions=2500))
+    assert res.stop_reason == StopReason.MAX_INSTRUCTIONS
+    assert res.instructions == 2500
+    assert len({x.cpi for x in res.samples}) == 1
+    assert res.cpi_interval == (res.cpi, res.cpi)
+
+    with pytest.raises(ValueError):
+        SamplingConfig(interval=100, warmup=20, window=100)
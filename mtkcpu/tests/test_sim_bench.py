@@ -0,0 +1,34 @@
+import copy
+
+from mtkcpu.utils.tests.sim_bench import DEFAULT_BASELINE, MIN_TIME_DELTA_S, WORKLOADS, compare, load_report, run_sim_bench, save_report
+
+
+def test_sim_bench(tmp_path):
+    report = run_sim_bench(num_cycles=1000)
+    workloads = report["workloads"]
+    assert list(workloads) == [x.name for x in WORKLOADS]
+    for name, metrics in workloads.items():
+        assert metrics["cycles"] == 1000
+        assert metrics["cycles_per_s"] > 0
+        if name.startswith("jtag_dm"):
+            # CPU gets halted by the debugger.
+            assert metrics["instructions"] < 10
+        else:
+            assert metrics["instructions"] > 10
+
+    path = tmp_path / "report.json"
+    save_report(report, path)
+    assert load_report(path) == report
+    assert not compare(report, report, tolerance=0.0)
+
+    slower = copy.deepcopy(report)
+    slower["workloads"]["alu_loop"]["cycles_per_s"] /= 2
+    slower["workloads"]["uart_print"]["startup_s"] += 2 * MIN_TIME_DELTA_S
+    # Not a regression - below MIN_TIME_DELTA_S.
+    slower["workloads"]["vm_user_loop"]["elaboration_s"] *= 1.001
+    regressions = compare(slower, report, tolerance=0.1)
+    assert [x.split(":")[0] for x in regressions] == ["alu_loop.cycles_per_s", "uart_print.startup_s"]
+    assert not compare(slower, report, tolerance=1000.0)
+
+    # Stored baseline covers all the workloads.
+    assert set(load_report(DEFAULT_BASELINE)["workloads"]) == set(workloads)
@@ -0,0 +1,58 @@
+from mtkcpu.cpu.cpu import CPU_Config
+from mtkcpu.utils.common import CODE_START_ADDR
+from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.tests.registers import RegistryContents
+from mtkcpu.utils.tests.sim_session import CpuSimSession
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, capture_write_transactions, get_mem_test_config
+from mtkcpu.utils.tests.sim_tests import get_sim_register_test
+
+
+def test_sim_session_reuse():
+    """
+    Consecutive runs within one session must not see any state (memory, registers, CSRs) left by the previous ones.
+    """
+    def case(out_val: int) -> MemTestCase:
+        return MemTestCase(
+            name=f"session run {out_val}",
+            source_type=MemTestSourceType.RAW,
+            source=f"""
+            start:
+                lw x2, 0(x1)
+                csrr x3, mscratch
+                add x2, x2, x3
+                addi x2, x2, {out_val}
+                csrw mscratch, x2
+                sw x2, 0(x1)
+                add x4, x2, x0
+            """,
+            out_reg=4,
+            out_val=out_val,
+            timeout=100,
+            mem_init=MemoryContents.empty(),
+            reg_init=RegistryContents.fill(lambda i: CODE_START_ADDR + 0x100 if i == 1 else 0),
+        )
+
+    cpu_config = CPU_Config(
+        dev_mode=False,
+        with_debug=False,
+        pc_reset_value=CODE_START_ADDR,
+        with_virtual_memory=True,
+    )
+    session = None
+    for out_val in [5, 7, 5]:
+        test_case = case(out_val)
+        mem_cfg = get_mem_test_config(test_case)
+        s = CpuSimSession.get(cpu_config=cpu_config, mem_size_words=mem_cfg.mem_size_words, mem_addr=mem_cfg.mem_addr)
+        assert session in [None, s]
+        session = s
+
+        result_mem = {}
+        session.run(
+            mem_config=mem_cfg,
+            reg_init=test_case.reg_init.reg,
+            processes=[
+                capture_write_transactions(cpu=session.cpu, dict_reference=result_mem),
+                get_sim_register_test(name=test_case.name, cpu=session.cpu, timeout_cycles=test_case.timeout, reg_num=4, expected_val=out_val),
+            ],
+        )
+        assert result_mem == {0x100: out_val}
@@ -0,0 +1,58 @@
+import shutil
+
+import pytest
+
+from mtkcpu.utils.tests.sw_benchmarks import BENCHMARKS, DEFAULT_REFERENCE, compare, get_benchmark, load_report, run_benchmark_iss, run_sw_benchmarks
+from mtkcpu.utils.tests.utils import TOOLCHAIN
+
+requires_toolchain = pytest.mark.skipif(shutil.which(f"{TOOLCHAIN}-g++") is None, reason=f"{TOOLCHAIN}-g++ not found")
+
+
+@requires_toolchain
+@pytest.mark.parametrize("name", [x.name for x in BENCHMARKS])
+def test_sw_benchmark(name):
+    report = run_sw_benchmarks(names=[name], quick=True)
+    result = report["benchmarks"][name]
+    # Benchmark's self-check.
+    assert result["exit_code"] == 0, result["output"]
+    assert result["score"] > 0
+    assert 0 < result["cycles"] < result["sim_cycles"]
+
+    # Scores are exact (cycle-accurate simulation), as long as the compiler is the same as the reference one.
+    if not DEFAULT_REFERENCE.exists():
+        pytest.skip("No reference scores recorded (see 'mtkcpu bench-sw --quick --update_reference').")
+    reference = load_report(DEFAULT_REFERENCE)
+    if reference["toolchain"] != report["toolchain"]:
+        pytest.skip(f"Reference scores come from {reference['toolchain']}, not {report['toolchain']}.")
+    assert reference["benchmarks"][name]["make_vars"] == result["make_vars"]
+    assert not compare(report, reference, tolerance=0.0)
+
+
+@requires_toolchain
+def test_coremark_standard_size_iss():
+    # Reduced-size CoreMark runs can't validate their results (there are no known CRCs for them),
+    # so the port itself is validated on the standard size.
+    benchmark = get_benchmark("coremark")
+    result = run_benchmark_iss(benchmark, make_vars={**benchmark.make_vars, "ITERATIONS": 1})
+    assert result["exit_code"] == 0, result["output"]
+    assert "Correct operation validated" in result["output"]
+
+
+def test_compare():
+    report = {
+        "version": 1,
+        "toolchain": "gcc",
+        "benchmarks": {"dhrystone": {"make_vars": {"NUMBER_OF_RUNS": 2}, "score": 0.5, "cycles": 1000}},
+    }
+    worse = {**report, "benchmarks": {"dhrystone": {"make_vars": {"NUMBER_OF_RUNS": 2}, "score": 0.4, "cycles": 1250}}}
+    assert not compare(report, report, tolerance=0.0)
+    assert [x.split(":")[0] for x in compare(worse, report, tolerance=0.1)] == ["dhrystone.score", "dhrystone.cycles"]
+    # Same rounded score, but more cycles.
+    slightly_worse = {**report, "benchmarks": {"dhrystone": {"make_vars": {"NUMBER_OF_RUNS": 2}, "score": 0.5, "cycles": 1001}}}
+    assert [x.split(":")[0] for x in compare(slightly_worse, report, tolerance=0.0)] == ["dhrystone.cycles"]
+    assert not compare(worse, report, tolerance=0.5)
+    # Different compiler or different benchmark size - scores are not comparable.
+    with pytest.raises(ValueError, match="different toolchains"):
+        compare({**worse, "toolchain": "clang"}, report, tolerance=0.0)
+    other_size = {**report, "benchmarks": {"dhrystone": {"make_vars": {"NUMBER_OF_RUNS": 3}, "score": 0.4, "cycles": 1250}}}
+    assert not compare(other_size, report, tolerance=0.0)
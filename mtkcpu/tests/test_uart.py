@@ -0,0 +1,115 @@
+import pytest
+from itertools import count
+
+from amaranth import Record
+from amaranth.hdl.rec import Layout
+from amaranth.sim import Simulator, Passive
+
+from mtkcpu.units.loadstore import WishboneBusRecord
+from mtkcpu.units.mmio.uart import SimConsoleTX, UartTX, baud_divisor, BAUD_DIVISOR_FRAC_BITS
+from mtkcpu.utils.tests.utils import wb_transaction
+
+CLK_FREQ = 12_000_000
+
+
+@pytest.mark.parametrize("baud_rate", [115200, 460800, 921600, 1_000_000, 2_000_000, 3_000_000])
+def test_uart_bit_timing(baud_rate: int):
+    """
+    Reprogram the divisor at runtime, send a byte and check that each bit edge
+    lands within a single cycle from it's ideal position.
+    """
+    bus = WishboneBusRecord()
+    uart = UartTX(
+        serial_record_gen=lambda platform, m: Record(Layout([("tx", 1)]), name="UART_SERIAL"),
+        clk_freq=CLK_FREQ,
+        baud_rate=115200,
+    )
+    uart.init_bus_slave(bus)
+
+    divisor = baud_divisor(clk_freq=CLK_FREQ, baud_rate=baud_rate)
+    bit_period = divisor / (1 << BAUD_DIVISOR_FRAC_BITS)
+    tx_byte = 0x55 # each bit differs from the previous one, so every bit boundary is an edge.
+
+    edges = []
+
+    def tx_edges_monitor():
+        yield Passive()
+        # wait for the line to become idle (high) after reset.
+        while not (yield uart.serial.tx):
+            yield
+        prev_tx = 1
+        for cycle in count():
+            tx = yield uart.serial.tx
+            if tx != prev_tx:
+                edges.append(cycle)
+            prev_tx = tx
+            yield
+
+    def process():
+        yield from wb_transaction(bus, addr=0x10, write_data=divisor)
+        assert (yield from wb_transaction(bus, addr=0x10)) == divisor
+        # NOTE: write to 'tx_data' gets acked only after the whole byte is sent.
+        yield from wb_transaction(bus, addr=0x8, write_data=tx_byte, timeout=int(12 * bit_period) + 10)
+        assert (yield from wb_transaction(bus, addr=0x0)) == 0
+
+        # start bit, 8 data bits and a stop bit.
+        assert len(edges) == 10, edges
+        start = edges[0]
+        for i, edge in enumerate(edges):
+            assert abs((edge - start) - i * bit_period) <= 1, (i, edges, bit_period)
+
+    sim = Simulator(uart)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(tx_edges_monitor)
+    sim.add_sync_process(process)
+    sim.run()
+
+
+@pytest.mark.parametrize("uart_cls", [UartTX, SimConsoleTX])
+def test_uart_divisor_byte_stores(uart_cls):
+    bus = WishboneBusRecord()
+    uart = uart_cls(
+        serial_record_gen=lambda platform, m: Record(Layout([("tx", 1)]), name="UART_SERIAL"),
+        clk_freq=CLK_FREQ,
+        baud_rate=115200,
+    )
+    uart.init_bus_slave(bus)
+
+    def process():
+        yield from wb_transaction(bus, addr=0x10, write_data=0x1234)
+        # 'sb' to the second byte - data of lanes that are not selected is ignored.
+        yield from wb_transaction(bus, addr=0x10, write_data=0xff56_78ff, sel=0b0010)
+        assert (yield from wb_transaction(bus, addr=0x10)) == 0x7834
+
+    sim = Simulator(uart)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    sim.run()
+
+
+def test_sim_console():
+    """
+    Writes to 'tx_data' complete immediately, the transmitter is never busy.
+    """
+    bus = WishboneBusRecord()
+    uart = SimConsoleTX(
+        serial_record_gen=lambda platform, m: Record(Layout([("tx", 1)]), name="UART_SERIAL"),
+        clk_freq=CLK_FREQ,
+        baud_rate=115200,
+    )
+    uart.init_bus_slave(bus)
+
+    def process():
+        for tx_byte in b"hello":
+            assert (yield from wb_transaction(bus, addr=0x0)) == 0
+            yield from wb_transaction(bus, addr=0x8, write_data=tx_byte, timeout=2)
+        assert (yield from wb_transaction(bus, addr=0x10)) == uart.divisor
+        yield from wb_transaction(bus, addr=0x10, write_data=0x123)
+        assert (yield from wb_transaction(bus, addr=0x10)) == 0x123
+        assert (yield uart.serial.tx) == 1
+        assert (yield uart.interrupt) == 1
+
+    sim = Simulator(uart)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    sim.run()
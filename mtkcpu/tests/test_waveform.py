@@ -0,0 +1,83 @@
+import re
+
+import pytest
+from amaranth import Module, Signal
+from amaranth.sim import Simulator
+
+from mtkcpu.utils.columnar_trace import ColumnarTrace
+from mtkcpu.utils.waveform import TraceConfig, TraceMode, WaveformCapture
+
+
+def run_counter(spec: str, directory, fail_at: int = None, num_cycles: int = 50) -> WaveformCapture:
+    """
+    Simulates a counter, incremented by 4 each cycle (so that it resembles program counter).
+    """
+    m = Module()
+    pc = Signal(32)
+    m.d.sync += pc.eq(pc + 4)
+
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+
+    def process():
+        for cycle in range(num_cycles):
+            if cycle == fail_at:
+                raise ValueError("simulation failed")
+            yield
+
+    sim.add_sync_process(process)
+    waveform = WaveformCapture(name="counter", traces=[pc], pc=pc, config=TraceConfig.parse(spec), directory=directory)
+    waveform.add_to(sim)
+    with waveform.capture(sim):
+        sim.run()
+    return waveform
+
+
+def sampled_pcs(waveform: WaveformCapture):
+    return [waveform.values(sample)[0] for _, sample in waveform.samples]
+
+
+def test_trace_spec():
+    assert TraceConfig.parse("none") == TraceConfig()
+    assert TraceConfig.parse("window:10:20") == TraceConfig(mode=TraceMode.WINDOW, first_cycle=10, num_cycles=20)
+    assert TraceConfig.parse("trigger:0x80000010:5") == TraceConfig(mode=TraceMode.TRIGGER, trigger_pc=0x8000_0010, pre_trigger_cycles=5, num_cycles=1000)
+    for spec in ["ring", "window:10", "bogus", "ring:x"]:
+        with pytest.raises(ValueError):
+            TraceConfig.parse(spec)
+
+
+def test_waveform_capture(tmp_path):
+    vcd = tmp_path / "counter.vcd"
+
+    run_counter("none", tmp_path)
+    assert not vcd.exists()
+
+    waveform = run_counter("window:10:5", tmp_path)
+    assert sampled_pcs(waveform) == [4 * i for i in range(10, 15)]
+    assert vcd.exists()
+    vcd.unlink()
+
+    waveform = run_counter("trigger:40:3:4", tmp_path)
+    assert sampled_pcs(waveform) == [4 * i for i in range(7, 14)]
+    assert vcd.exists()
+    vcd.unlink()
+
+    # Ring buffer is dumped on failure only.
+    run_counter("ring:8", tmp_path)
+    assert not vcd.exists()
+    with pytest.raises(ValueError):
+        run_counter("ring:8", tmp_path, fail_at=30)
+    assert vcd.exists()
+    # Last 8 cycles.
+    timestamps = re.findall(r"^#(\d+)$", vcd.read_text(), re.MULTILINE)
+    assert timestamps == [str(x) for x in range(23, 31)]
+
+    run_counter("full", tmp_path)
+    assert (tmp_path / "counter.gtkw").exists()
+
+
+def test_waveform_capture_npz(tmp_path):
+    run_counter("npz", tmp_path, num_cycles=100)
+    trace = ColumnarTrace.load(tmp_path / "counter.npz")
+    assert (trace.start, trace.end) == (1, 101)
+    assert trace.value_at("pc", 50) == 4 * 50
@@ -17,7 +17,8 @@ def _is(x, ys):
 class CsrUnit(Elaboratable):
     @staticmethod
     def enabled_csr_regs(with_virtual_memory: bool) -> Sequence[type]:
-        regs = {
+        # NOTE: list, not set, so that the design (e.g. signals creation order) is the same in each run.
+        regs = [
             MISA,
             MTVEC,
             MTVAL,
@@ -32,9 +33,9 @@ class CsrUnit(Elaboratable):
             MIE,
             MIP,
             DCSR,
-        }
+        ]
         if with_virtual_memory:
-            regs.add(SATP)
+            regs.append(SATP)
         return regs
 
     def reg_by_addr(self, addr : CSRNonStandardIndex | CSRIndex) -> CSR_Write_Handler:
@@ -149,7 +150,8 @@ class CsrUnit(Elaboratable):
                             # For both CSRRS and CSRRC, if rs1=x0, then the instruction will not write 
                             # to the CSR at all, and so shall not cause any of the side effects 
                             # that might otherwise occur on a CSR write,
-                            with m.If(_is(func3_latch, [Funct3.CSRRS, Funct3.CSRRC]) & (rs1_latch == 0)):
+                            # Same holds for CSRRSI and CSRRCI with zero immediate.
+                            with m.If(_is(func3_latch, [Funct3.CSRRS, Funct3.CSRRC, Funct3.CSRRSI, Funct3.CSRRCI]) & (rs1_latch == 0)):
                                 m.next = "FINISH"
                             with m.Else():
                                 comb += [
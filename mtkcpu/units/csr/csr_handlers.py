@@ -171,14 +171,13 @@ class MIE(CSR_Write_Handler):
         return self.latch_whole_value_with_no_side_effect()
 
 class MIP(CSR_Write_Handler):
-    addr = CSRIndex.MIE
+    addr = CSRIndex.MIP
     layout = MIP_Layout
 
-    # TODO
-    # For now it's fully readonly - doesn't support software interrupts,
-    # normally triggered via write to {m|s|u}sip field.
+    # Fully readonly - pending bits reflect interrupt sources (see ExceptionUnit),
+    # software interrupts are triggered via CLINT's 'msip' register instead.
     def elaborate(self, _):
-        return Module()
+        return self.no_action_at_all()
 
 class SATP(CSR_Write_Handler):
     addr = CSRIndex.SATP
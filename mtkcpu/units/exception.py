@@ -17,9 +17,10 @@ class ExceptionUnit(Elaboratable):
         self.mstatus = csr_unit.mstatus
         self.mip = csr_unit.mip
 
-        self.external_interrupt = Signal() # not supported for now
+        # Driven by CLINT (timer, software) and PLIC (external).
+        self.external_interrupt = Signal()
         self.timer_interrupt = Signal()
-        self.software_interrupt = Signal() # not supported for now
+        self.software_interrupt = Signal()
 
         # TODO move those to 'elaborate' function
         self.m_illegal = Signal()
@@ -43,6 +44,11 @@ class ExceptionUnit(Elaboratable):
         self.m_mret = Signal()
         self.m_raise = Signal()
 
+        # Set when there is an enabled interrupt pending, that would be taken in current privilege mode.
+        self.m_irq_pending = Signal()
+        # Set by CPU when it decides to take pending interrupt (between two instructions).
+        self.m_take_irq = Signal()
+
         self.current_priv_mode = current_priv_mode
 
         self.trap_cause_map = {
@@ -86,27 +92,39 @@ class ExceptionUnit(Elaboratable):
         for k, v in self.trap_cause_map.items():
             m.d.comb += trap_pe.i[k].eq(v)
         
-        interrupt_pe = m.submodules.interrupt_pe = PriorityEncoder(16)
-        m.d.comb += [
-            interrupt_pe.i[IrqCause.M_SOFTWARE_INTERRUPT].eq(mie.msie), # self.mip.r.msip & self.mie.r.msie),
-            interrupt_pe.i[IrqCause.M_TIMER_INTERRUPT   ].eq(mie.mtie & self.timer_interrupt), # self.mip.r.mtip & self.mie.r.mtie),
-            interrupt_pe.i[IrqCause.M_EXTERNAL_INTERRUPT].eq(mie.meie), # self.mip.r.meip & self.mie.r.meie)
+        # Privilege Specs: 'Multiple simultaneous interrupts destined for M-mode are handled
+        # in the following decreasing priority order: MEI, MSI, MTI (...)'.
+        irq_valid = Signal()
+        irq_cause = Signal.like(trap_pe.o)
+        with m.If(mie.meie & self.external_interrupt):
+            m.d.comb += [irq_valid.eq(1), irq_cause.eq(IrqCause.M_EXTERNAL_INTERRUPT)]
+        with m.Elif(mie.msie & self.software_interrupt):
+            m.d.comb += [irq_valid.eq(1), irq_cause.eq(IrqCause.M_SOFTWARE_INTERRUPT)]
+        with m.Elif(mie.mtie & self.timer_interrupt):
+            m.d.comb += [irq_valid.eq(1), irq_cause.eq(IrqCause.M_TIMER_INTERRUPT)]
+
+        # Privilege Specs: 'Interrupts for higher-privilege modes are always globally enabled
+        # regardless of the setting of the global yIE bit for the higher-privilege mode.'
+        m.d.comb += self.m_irq_pending.eq(
+            irq_valid & (mstatus.mie | (self.current_priv_mode != PrivModeBits.MACHINE))
+        )
+
+        # 'mip' mirrors interrupt sources all the time, not only when the trap is taken.
+        m.d.sync += [
+            mip.msip.eq(self.software_interrupt),
+            mip.mtip.eq(self.timer_interrupt),
+            mip.meip.eq(self.external_interrupt)
         ]
 
-        m.d.comb += self.m_raise.eq(~trap_pe.n | (~interrupt_pe.n & mstatus.mie))
+        m.d.comb += self.m_raise.eq(~trap_pe.n | self.m_take_irq)
         with m.If(self.m_raise):
             m.d.sync += [
                 mstatus.mpp.eq(self.current_priv_mode),
                 self.current_priv_mode.eq(PrivModeBits.MACHINE), # will be changed when impl. either supervisor or mdeleg register.
             ]
             m.d.sync += [
-                mip.msip.eq(self.software_interrupt),
-                mip.mtip.eq(self.timer_interrupt),
-                mip.meip.eq(self.external_interrupt)
-            ]
-            m.d.sync += [
-                # self.mstatus.r.mpie.eq(self.mstatus.r.mie),
-                # self.mstatus.r.mie.eq(0),
+                mstatus.mpie.eq(mstatus.mie),
+                mstatus.mie.eq(0),
                 mepc.eq(self.m_pc)
             ]
             with m.If(~trap_pe.n):
@@ -131,12 +149,13 @@ class ExceptionUnit(Elaboratable):
                     #     m.d.sync += self.mtval.r.eq(0) # XXX
             with m.Else():
                 m.d.sync += [
-                    mcause.ecode.eq(interrupt_pe.o),
+                    mcause.ecode.eq(irq_cause),
                     mcause.interrupt.eq(1)
                 ]
         with m.Elif(self.m_mret):
             m.d.sync += [
                 self.mstatus.as_view().mie.eq(self.mstatus.as_view().mpie),
+                self.mstatus.as_view().mpie.eq(1),
                 self.current_priv_mode.eq(self.mstatus.as_view().mpp) # pop privilege mode
             ]
 
@@ -12,6 +12,18 @@ from mtkcpu.cpu.isa import Funct3, InstrType
 MEM_WORDS = 10
 
 
+# Problems detected by Sv32 page-walk (see MemoryArbiter).
+@unique
+class AddrTranslationIssue(IntEnum):
+    OK = 0
+    PAGE_INVALID = 1
+    WRITABLE_NOT_READABLE = 2
+    LACK_PERMISSIONS = 3
+    FIRST_ACCESS = 4
+    MISALIGNED_SUPERPAGE = 5
+    LEAF_IS_NO_LEAF = 6
+
+
 wb_bus_layout = [
     ("cyc", 1, DIR_FANIN),
     ("we", 1, DIR_FANIN),
@@ -45,6 +57,11 @@ class WishboneBusRecord(Record):
     def __layout(self):
         return wb_bus_layout
 
+    def sel_mask(self):
+        """ 'sel' expanded to a bit mask of the selected byte lanes. """
+        granularity = self.bus_width // len(self.sel)
+        return Cat(self.sel[i].replicate(granularity) for i in range(len(self.sel)))
+
 
 class LoadStoreInterface(Record):
     def __init__(self, *args, **kwargs):
@@ -75,9 +92,12 @@ class PriorityEncoder(Elaboratable):
 
 
 class WishboneSlave(Elaboratable):
-    def __init__(self, wb_bus : WishboneBusRecord, owner: "BusSlaveOwnerInterface") -> None:
+    def __init__(self, wb_bus : WishboneBusRecord, owner: "BusSlaveOwnerInterface", with_stall: bool = False) -> None:
         self.wb_bus = wb_bus
         self.owner = owner
+        # Simulation only (see CPU_Config.sim_bus_stall), never driven by the design - delays handling
+        # of a transaction for as long as it's asserted (see LatencyInjector).
+        self.stall = Signal() if with_stall else None
     
     def elaborate(self, platform):
         m = Module()
@@ -86,7 +106,7 @@ class WishboneSlave(Elaboratable):
         with m.FSM():
             with m.State("WB_SLV_TRY_HANDLE"):
                 comb += self.wb_bus.ack.eq(0)
-                with m.If(self.wb_bus.cyc):
+                with m.If(self.wb_bus.cyc if self.stall is None else self.wb_bus.cyc & ~self.stall):
                     self.owner.handle_transaction(m)
                     with m.If(self.owner.get_handled_signal()):
                         m.next = "WB_SLV_DONE"
@@ -108,8 +128,8 @@ class BusSlaveOwnerInterface:
         self.dat_r = Signal(32)
         self._wb_slave_bus = None
 
-    def init_bus_slave(self, bus):
-        self._wb_slave_bus = WishboneSlave(bus, self)
+    def init_bus_slave(self, bus, with_stall: bool = False):
+        self._wb_slave_bus = WishboneSlave(bus, self, with_stall=with_stall)
 
     def get_handled_signal(self):
         return self.ack
@@ -194,14 +214,77 @@ from typing import List, Tuple
 from amaranth.build import Platform
 
 from mtkcpu.units.mmio.ebr import EBR_Wishbone
+from mtkcpu.units.mmio.sparse_memory import SparseMemory_Wishbone
 from mtkcpu.units.mmio.gpio import GPIO_Wishbone
+from mtkcpu.units.pll import PLL_REF_CLK_FREQ
 from mtkcpu.units.memory_interface import MMIOAddressSpace, AddressManager
 
+UART_BAUD_RATE = 115200
+
+
+def mmio_address_spaces(mem_config: EBRMemConfig, sim_htif: bool = False, word_size: int = 4) -> List[MMIOAddressSpace]:
+    """
+    Memory map - address spaces of MemoryArbiter's MMIO devices, in 'get_mmio_devices_config' order.
+    It's plain data, so that other models (e.g. the ISS) don't need to instantiate any elaboratables.
+    """
+    from mtkcpu.units.debug.impl_config import PROGBUF_MMIO_ADDR, PROGBUFSIZE
+    from mtkcpu.units.mmio.clint import CLINT_ADDR_SPACE_SIZE
+    from mtkcpu.units.mmio.plic import PLIC_ADDR_SPACE_SIZE
+
+    spaces = [
+        MMIOAddressSpace(
+            ws=word_size,
+            basename="uart",
+            first_valid_addr_incl=0x7000_0000,
+            last_valid_addr_excl=0x7000_1000,
+        ),
+        MMIOAddressSpace(
+            ws=word_size,
+            basename="ebr",
+            first_valid_addr_incl=mem_config.mem_addr,
+            last_valid_addr_excl=mem_config.last_valid_addr_excl,
+        ),
+        MMIOAddressSpace(
+            ws=word_size,
+            basename="gpio",
+            first_valid_addr_incl=0x9000_0000,
+            last_valid_addr_excl=0x9000_1000,
+        ),
+        MMIOAddressSpace(
+            ws=word_size,
+            basename="debug_ebr",
+            first_valid_addr_incl=PROGBUF_MMIO_ADDR,
+            last_valid_addr_excl=PROGBUF_MMIO_ADDR + PROGBUFSIZE * 4, # NOTE: no support for impebreak yet.
+        ),
+        MMIOAddressSpace(
+            ws=word_size,
+            basename="clint",
+            first_valid_addr_incl=0x0200_0000,
+            last_valid_addr_excl=0x0200_0000 + CLINT_ADDR_SPACE_SIZE,
+        ),
+        MMIOAddressSpace(
+            ws=word_size,
+            basename="plic",
+            first_valid_addr_incl=0x0C00_0000,
+            last_valid_addr_excl=0x0C00_0000 + PLIC_ADDR_SPACE_SIZE,
+        ),
+    ]
+    if sim_htif:
+        from mtkcpu.units.mmio.htif import HTIF_ADDR, HTIF_ADDR_SPACE_SIZE
+        spaces.append(MMIOAddressSpace(
+            ws=word_size,
+            basename="htif",
+            first_valid_addr_incl=HTIF_ADDR,
+            last_valid_addr_excl=HTIF_ADDR + HTIF_ADDR_SPACE_SIZE,
+        ))
+    return spaces
+
+
 class MemoryArbiter(Elaboratable, AddressManager):
     def __init__(self):
         raise ArgumentError("lack of 'mem_config' param!")
 
-    def __init__(self, mem_config: EBRMemConfig, with_addr_translation: bool, csr_unit: CsrUnit, exception_unit : ExceptionUnit):
+    def __init__(self, mem_config: EBRMemConfig, with_addr_translation: bool, csr_unit: CsrUnit, exception_unit : ExceptionUnit, clk_freq: int = PLL_REF_CLK_FREQ, sim_fast_console: bool = False, sim_htif: bool = False, sim_bus_stall: bool = False):
         self.ports = {}
         self.word_size = 4
         self.generic_bus = LoadStoreInterface(name="generic_bus")
@@ -210,6 +293,10 @@ class MemoryArbiter(Elaboratable, AddressManager):
         self.with_addr_translation = with_addr_translation
         self.csr_unit = csr_unit
         self.exception_unit = exception_unit
+        self.clk_freq = clk_freq
+        self.sim_fast_console = sim_fast_console
+        self.sim_htif = sim_htif
+        self.sim_bus_stall = sim_bus_stall
         self.__gen_mmio_devices_config_once()
 
     def __gen_mmio_devices_config_once(self) -> None:
@@ -223,7 +310,7 @@ class MemoryArbiter(Elaboratable, AddressManager):
             self.led_r, self.led_g = led_r, led_g # XXX: for simulation testbench.
             return [led_r, led_g]
 
-        from mtkcpu.units.mmio.uart import UartTX
+        from mtkcpu.units.mmio.uart import SimConsoleTX, UartTX
         from amaranth.hdl.rec import Layout
 
         def uart_gen_serial_record(platform : Platform, m : Module):
@@ -235,7 +322,7 @@ class MemoryArbiter(Elaboratable, AddressManager):
             
             return serial
         
-        from mtkcpu.units.debug.impl_config import PROGBUF_MMIO_ADDR, PROGBUFSIZE
+        from mtkcpu.units.debug.impl_config import PROGBUFSIZE
 
         debug_mem_config = EBRMemConfig(
             mem_size_words=PROGBUFSIZE,
@@ -244,43 +331,30 @@ class MemoryArbiter(Elaboratable, AddressManager):
             simulate=True,
         )
 
+        from mtkcpu.units.mmio.clint import CLINT_Wishbone
+        from mtkcpu.units.mmio.plic import PLIC_Wishbone
+
+        # CPU needs direct access to 'mtime', thus keep the reference.
+        self.clint = CLINT_Wishbone()
+        self.plic = PLIC_Wishbone()
+        uart_type = SimConsoleTX if self.sim_fast_console else UartTX
+        self.uart = uart_type(serial_record_gen=uart_gen_serial_record, clk_freq=self.clk_freq, baud_rate=UART_BAUD_RATE)
+
+        owners = {
+            "uart": self.uart,
+            "ebr": EBR_Wishbone(self.mem_config) if self.mem_config.sparse_latency is None else SparseMemory_Wishbone(self.mem_config),
+            "gpio": GPIO_Wishbone(signal_map_gen=gpio_gen),
+            "debug_ebr": EBR_Wishbone(debug_mem_config),
+            "clint": self.clint,
+            "plic": self.plic,
+        }
+        if self.sim_htif:
+            from mtkcpu.units.mmio.htif import HtifWishbone
+            self.htif = owners["htif"] = HtifWishbone()
+
         self.mmio_cfg = [
-            (
-                UartTX(serial_record_gen=uart_gen_serial_record, clk_freq=12_000_000, baud_rate=115200),
-                MMIOAddressSpace(
-                    ws=self.word_size,
-                    basename="uart",
-                    first_valid_addr_incl=0x7000_0000,
-                    last_valid_addr_excl=0x7000_1000,
-                )
-            ),
-            (
-                EBR_Wishbone(self.mem_config),
-                MMIOAddressSpace(
-                    ws=self.word_size,
-                    basename="ebr",
-                    first_valid_addr_incl=self.mem_config.mem_addr,
-                    last_valid_addr_excl=self.mem_config.last_valid_addr_excl,
-                )
-            ),
-            (
-                GPIO_Wishbone(signal_map_gen=gpio_gen),
-                MMIOAddressSpace(
-                    ws=self.word_size,
-                    basename="gpio",
-                    first_valid_addr_incl=0x9000_0000,
-                    last_valid_addr_excl=0x9000_1000,
-                )
-            ),
-            (
-                EBR_Wishbone(debug_mem_config),
-                MMIOAddressSpace(
-                    ws=self.word_size,
-                    basename="debug_ebr",
-                    first_valid_addr_incl=PROGBUF_MMIO_ADDR,
-                    last_valid_addr_excl=PROGBUF_MMIO_ADDR + PROGBUFSIZE * 4, # NOTE: no support for impebreak yet.
-                )
-            ),
+            (owners[space.basename], space)
+            for space in mmio_address_spaces(mem_config=self.mem_config, sim_htif=self.sim_htif, word_size=self.word_size)
         ]
 
     def get_mmio_devices_config(self) -> List[Tuple[BusSlaveOwnerInterface, MMIOAddressSpace]]:
@@ -295,13 +369,27 @@ class MemoryArbiter(Elaboratable, AddressManager):
         # TODO XXX self.no_match on decoder
         m.submodules.bridge = GenericInterfaceToWishboneMasterBridge(generic_bus=self.generic_bus, wb_bus=self.wb_bus)
         self.decoder = m.submodules.decoder = WishboneBusAddressDecoder(wb_bus=self.wb_bus, word_size=cfg.word_size)
-        self.initialize_mmio_devices(self.decoder, m)
+        self.initialize_mmio_devices(self.decoder, m, with_stall=self.sim_bus_stall)
         pe = m.submodules.pe = self.pe = PriorityEncoder(width=len(self.ports))
         sorted_ports = [port for priority, port in sorted(self.ports.items())]
         
         # force 'elaborate' invocation for all mmio modules.
         for mmio_module, addr_space in self.mmio_cfg:
             setattr(m.submodules, addr_space.basename, mmio_module)
+
+        from mtkcpu.units.mmio.plic import PLIC_SOURCE_UART, PLIC_SOURCE_GPIO
+
+        m.d.comb += [
+            self.exception_unit.timer_interrupt.eq(self.clint.timer_interrupt),
+            self.exception_unit.software_interrupt.eq(self.clint.software_interrupt),
+            self.exception_unit.external_interrupt.eq(self.plic.external_interrupt),
+            self.plic.sources[PLIC_SOURCE_UART].eq(self.uart.interrupt),
+            self.plic.sources[PLIC_SOURCE_GPIO].eq(self.gpio.interrupt),
+        ]
+
+        if self.sim_htif:
+            m.d.comb += self.htif.store.eq(self.wb_bus.ack & self.wb_bus.we)
+            m.d.comb += self.htif.store_addr.eq(self.wb_bus.adr)
         
         addr_translation_en = self.addr_translation_en = Signal()
         bus_free_to_latch = self.bus_free_to_latch = Signal(reset=1)
@@ -380,18 +468,8 @@ class MemoryArbiter(Elaboratable, AddressManager):
             vaddr.eq(virtual_req_bus_latch.addr << 2),
         ]
 
-        @unique
-        class Issue(IntEnum):
-            OK = 0
-            PAGE_INVALID = 1
-            WRITABLE_NOT_READABLE = 2
-            LACK_PERMISSIONS = 3
-            FIRST_ACCESS = 4
-            MISALIGNED_SUPERPAGE = 5
-            LEAF_IS_NO_LEAF = 6
-
-        self.error_code = Signal(Issue)
-        def error(code: Issue):
+        self.error_code = Signal(AddrTranslationIssue)
+        def error(code: AddrTranslationIssue):
             m.d.sync += self.error_code.eq(code)
 
         # Code below implements algorithm 4.3.2 in Risc-V Privileged specification, v1.10
@@ -423,24 +501,24 @@ class MemoryArbiter(Elaboratable, AddressManager):
                         m.next = "PROCESS_PTE"
                 with m.State("PROCESS_PTE"):
                     with m.If(~pte.v):
-                        error(Issue.PAGE_INVALID)
+                        error(AddrTranslationIssue.PAGE_INVALID)
                     with m.If(pte.w & ~pte.r):
-                        error(Issue.WRITABLE_NOT_READABLE)
+                        error(AddrTranslationIssue.WRITABLE_NOT_READABLE)
 
                     is_leaf = lambda pte: pte.r | pte.x
                     with m.If(is_leaf(pte)):
                         with m.If(~pte.u & (self.exception_unit.current_priv_mode == PrivModeBits.USER)):
-                            error(Issue.LACK_PERMISSIONS)
+                            error(AddrTranslationIssue.LACK_PERMISSIONS)
                         with m.Elif(~pte.a | (req_is_write & ~pte.d)):
-                            error(Issue.FIRST_ACCESS)
+                            error(AddrTranslationIssue.FIRST_ACCESS)
                         with m.Elif(sv32_i.bool() & pte.ppn0.bool()):
-                            error(Issue.MISALIGNED_SUPERPAGE)
+                            error(AddrTranslationIssue.MISALIGNED_SUPERPAGE)
                         # phys_addr could be 34 bits long, but our interconnect is 32-bit long.
                         # below statement cuts lowest two bits of r-value.
                         sync += phys_addr.eq(Cat(vaddr.page_offset, pte.ppn0, pte.ppn1))
                     with m.Else(): # not a leaf
                         with m.If(sv32_i == 0):
-                            error(Issue.LEAF_IS_NO_LEAF)
+                            error(AddrTranslationIssue.LEAF_IS_NO_LEAF)
                         sync += root_ppn.eq(Cat(pte.ppn0, pte.ppn1)) # pte a is pointer to the next level
                     m.next = "NEXT"
                 with m.State("NEXT"):
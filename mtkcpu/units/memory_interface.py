@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Tuple
 from amaranth import Module, Signal
 
@@ -35,7 +35,15 @@ class MMIORegister:
     description : str
     bitfield_t = Tuple[str, int] # name, offset, e.g. ('led_g', 10) if green led is mapped at 10-th bit of register 
     bits : List[bitfield_t]
-    
+    value_t = Tuple[str, int] # name, value, e.g. ('115200', 0x683) for a baud rate divisor
+    values : List[value_t] = field(default_factory=list)
+
+    def bsp_define_get_value_name(self, value_name : str):
+        return f"__{self.name}_{value_name}"
+
+    def bsp_constexpr_get_value_name(self, value_name : str):
+        return f"{self.name}_{value_name}"
+
     def bsp_define_get_name(self):
         return f"__{self.bsp_constexpr_get_name()}"
 
@@ -103,7 +111,7 @@ class AddressManager:
             cfg = dev.get_periph_config()
 
     # must be called before 'elaborate' of each MMIO periph.
-    def initialize_mmio_devices(self, decoder : DecoderInterface, top_module : Module):
+    def initialize_mmio_devices(self, decoder : DecoderInterface, top_module : Module, with_stall: bool = False):
         # self.sanity_check()
         lst = self.get_mmio_devices_config()
         for owner, addr_cfg in lst:
@@ -111,7 +119,7 @@ class AddressManager:
             setattr(self, name, owner)
             setattr(top_module, name, owner)
             bus = decoder.port(addr_cfg)
-            owner.init_bus_slave(bus)
+            owner.init_bus_slave(bus, with_stall=with_stall)
 
     @staticmethod
     def __check_in_range(owner : BusSlaveOwnerInterface, addr_space : MMIOAddressSpace):
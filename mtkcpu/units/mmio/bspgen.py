@@ -40,6 +40,9 @@ class MemMapCodeGen:
             for name, offset in reg.bits:
                 line = f"#define __{name}_{reg.bsp_define_get_name()}_offset {offset}"
                 codelines.extend([line, ""])
+            for name, value in reg.values:
+                line = f"#define {reg.bsp_define_get_value_name(name)} {hex(value)}"
+                codelines.extend([line, ""])
         for area in cfg.regions:
             comment = f"/* {area.description} */"
             ptr = f"#define {area.bsp_define_get_name()} {hex(area.start_addr)}"
@@ -62,6 +65,10 @@ class MemMapCodeGen:
                 name = f"{name}___{reg.bsp_constexpr_get_name()}_offset"
                 line = f"constexpr unsigned {name} = (unsigned) __{name};"
                 codelines.extend([line, ""])
+            for name, _ in reg.values:
+                constname, defname = reg.bsp_constexpr_get_value_name(name), reg.bsp_define_get_value_name(name)
+                line = f"constexpr unsigned {constname} = (unsigned) {defname};"
+                codelines.extend([line, ""])
 
         for area in cfg.regions:
             defptrname, defsizename = area.bsp_define_get_name(), area.bsp_define_get_size_bytes_name()
@@ -73,21 +80,24 @@ class MemMapCodeGen:
         __class__.get_cc_path(addr_scheme).open("w").writelines([x + '\n' for x in codelines])
 
     @staticmethod
-    def gen_periph_baseaddr(addr_schemes : List['MMIOAddressSpace']):
+    def gen_periph_baseaddr(addr_schemes : List['MMIOAddressSpace'], clk_freq_hz : int):
         path = __class__.base_h_fpath
         lines = []
         lines.append(__class__.autogenerated_str)
         for scheme in addr_schemes:
             lines.append(scheme.bsp_define_base())
+        lines.append("")
+        lines.append("/* Frequency of the CPU clock, 'mtime' is incremented once per cycle. */")
+        lines.append(f"#define clk_freq_hz {clk_freq_hz}")
         path.open("w").writelines([l + "\n" for l in lines])
         __class__.log(f"ok, {path} file generated!")
 
     @staticmethod
-    def gen_bsp_sources(owners : List['BusSlaveOwnerInterface'], addr_schemes : List['MMIOAddressSpace']):
+    def gen_bsp_sources(owners : List['BusSlaveOwnerInterface'], addr_schemes : List['MMIOAddressSpace'], clk_freq_hz : int):
         log = __class__.log
         log(f"starting bsp code generation inside {__class__.gen_dir} directory..")
         __class__.gen_dir.mkdir(exist_ok=True)
-        __class__.gen_periph_baseaddr(addr_schemes)
+        __class__.gen_periph_baseaddr(addr_schemes, clk_freq_hz=clk_freq_hz)
         bsp_generatables = [(o.get_periph_config(), s) for o, s in zip(owners, addr_schemes) if isinstance(o, BspGeneratable)]
         log(f"found {len(owners)} peripherials, of whom {len(bsp_generatables)} is bsp-generatable..")
         for c, s in bsp_generatables:
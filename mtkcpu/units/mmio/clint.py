@@ -0,0 +1,134 @@
+from amaranth import *
+from amaranth.build import Platform
+
+from mtkcpu.units.loadstore import BusSlaveOwnerInterface
+from mtkcpu.units.mmio.bspgen import BspGeneratable
+from mtkcpu.units.memory_interface import MMIOPeriphConfig, MMIORegister
+
+# Register offsets, compatible with SiFive's CLINT (single hart).
+CLINT_MSIP_OFFSET = 0x0
+CLINT_MTIMECMP_OFFSET = 0x4000
+CLINT_MTIME_OFFSET = 0xBFF8
+CLINT_ADDR_SPACE_SIZE = 0x10000
+
+
+class CLINT_Wishbone(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
+    """
+    Core-Local Interruptor - 64-bit 'mtime' timer with 'mtimecmp' comparator
+    and 'msip' software interrupt register.
+    """
+    def __init__(self) -> None:
+        BusSlaveOwnerInterface.__init__(self)
+
+        # Free running counter, incremented on each 'mtime_tick'.
+        self.mtime = Signal(64)
+        self.mtime_tick = Signal(reset=1)
+        self.mtimecmp = Signal(64, reset=2**64 - 1)
+        self.msip = Signal()
+
+        # Output signals, to be connected to the Exception Unit.
+        self.timer_interrupt = Signal()
+        self.software_interrupt = Signal()
+
+        # 32-bit halves of all registers, with their bus offsets.
+        self.registers = {
+            CLINT_MSIP_OFFSET: self.msip,
+            CLINT_MTIMECMP_OFFSET: self.mtimecmp[:32],
+            CLINT_MTIMECMP_OFFSET + 4: self.mtimecmp[32:],
+            CLINT_MTIME_OFFSET: self.mtime[:32],
+            CLINT_MTIME_OFFSET + 4: self.mtime[32:],
+        }
+        # Driven by bus transaction logic - registers are only assigned inside 'elaborate',
+        # as 'mtime' has to be incremented regardless of bus activity.
+        self.reg_write_en = Signal(len(self.registers))
+        self.reg_write_data = Signal(32)
+        self.reg_write_mask = Signal(32)
+
+    def get_periph_config(self) -> MMIOPeriphConfig:
+        return MMIOPeriphConfig(
+            regions=[],
+            registers=[
+                MMIORegister(
+                    name="msip",
+                    addr=CLINT_MSIP_OFFSET,
+                    description="Machine Software Interrupt Pending - write 1 to the lowest bit to raise the interrupt, 0 to clear it.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="mtimecmp_lo",
+                    addr=CLINT_MTIMECMP_OFFSET,
+                    description="Lower 32 bits of 'mtimecmp'. Timer interrupt is pending as long as mtime >= mtimecmp.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="mtimecmp_hi",
+                    addr=CLINT_MTIMECMP_OFFSET + 4,
+                    description="Upper 32 bits of 'mtimecmp'.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="mtime_lo",
+                    addr=CLINT_MTIME_OFFSET,
+                    description="Lower 32 bits of free running 'mtime' counter.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="mtime_hi",
+                    addr=CLINT_MTIME_OFFSET + 4,
+                    description="Upper 32 bits of free running 'mtime' counter.",
+                    bits=[],
+                ),
+            ]
+        )
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = self.init_owner_module()
+
+        with m.If(self.mtime_tick):
+            m.d.sync += self.mtime.eq(self.mtime + 1)
+
+        # NOTE: bus write has higher priority than 'mtime' increment, as it comes later.
+        for i, reg in enumerate(self.registers.values()):
+            with m.If(self.reg_write_en[i]):
+                # Byte lanes not selected by the bus are ignored.
+                m.d.sync += reg.eq((reg & ~self.reg_write_mask) | (self.reg_write_data & self.reg_write_mask))
+
+        m.d.comb += [
+            self.timer_interrupt.eq(self.mtime >= self.mtimecmp),
+            self.software_interrupt.eq(self.msip),
+        ]
+
+        return m
+
+    def handle_transaction(self, wb_slv_module):
+        m = wb_slv_module
+        sync = m.d.sync
+        comb = m.d.comb
+
+        wb_slave = self.get_wb_slave_bus()
+        cyc   = wb_slave.wb_bus.cyc
+        write = wb_slave.wb_bus.we
+        addr  = wb_slave.wb_bus.adr
+        data  = wb_slave.wb_bus.dat_w
+
+        comb += [
+            self.reg_write_data.eq(data),
+            self.reg_write_mask.eq(wb_slave.wb_bus.sel_mask()),
+        ]
+
+        with m.FSM():
+            with m.State("CLINT_REQ"):
+                with m.If(cyc):
+                    with m.Switch(addr):
+                        for i, (offset, reg) in enumerate(self.registers.items()):
+                            with m.Case(offset):
+                                with m.If(write):
+                                    comb += self.reg_write_en[i].eq(1)
+                                with m.Else():
+                                    sync += self.get_dat_r().eq(reg)
+                        with m.Default():
+                            sync += self.get_dat_r().eq(0)
+                    m.next = "CLINT_RET"
+            with m.State("CLINT_RET"):
+                comb += self.mark_handled_stmt()
+                m.next = "CLINT_REQ"
@@ -8,11 +8,47 @@ from mtkcpu.units.loadstore import BusSlaveOwnerInterface
 from mtkcpu.units.mmio.bspgen import BspGeneratable
 from mtkcpu.units.memory_interface import MMIOPeriphConfig, MMIORegister
 
+# Register offsets.
+GPIO_STATE_OFFSET = 0x0
+GPIO_SET_OFFSET = 0x4
+GPIO_CLEAR_OFFSET = 0x8
+GPIO_TOGGLE_OFFSET = 0xC
+GPIO_RISE_OFFSET = 0x10
+GPIO_FALL_OFFSET = 0x14
+GPIO_RISE_IRQ_EN_OFFSET = 0x18
+GPIO_FALL_IRQ_EN_OFFSET = 0x1C
+
+
 class GPIO_Wishbone(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
     def __init__(self, signal_map_gen : Callable[[Platform], List[Signal]]) -> None:
         BusSlaveOwnerInterface.__init__(self)
         self.signal_map_gen = signal_map_gen
 
+        self.gpio_output = Signal(32)
+        # Current level of all GPIO signals - either output value, or synchronized input sample.
+        self.gpio_pins = Signal(32)
+        # Edge latches, set on rising/falling edge of the corresponding pin, cleared by writing 1.
+        self.gpio_rise = Signal(32)
+        self.gpio_fall = Signal(32)
+        self.gpio_rise_irq_en = Signal(32)
+        self.gpio_fall_irq_en = Signal(32)
+
+        # Output signal, to be connected to the PLIC.
+        self.interrupt = Signal()
+
+        # Driven by bus transaction logic - registers are only assigned inside 'elaborate',
+        # as edge latches are updated regardless of bus activity.
+        self.state_write_en = Signal()
+        self.set_write_en = Signal()
+        self.clear_write_en = Signal()
+        self.toggle_write_en = Signal()
+        self.rise_write_en = Signal()
+        self.fall_write_en = Signal()
+        self.rise_irq_en_write_en = Signal()
+        self.fall_irq_en_write_en = Signal()
+        self.reg_write_data = Signal(32)
+        self.reg_write_mask = Signal(32)
+
     def sanity_check(self):
         m = self.signal_map
         if len(m) > 32:
@@ -34,10 +70,52 @@ class GPIO_Wishbone(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
             registers=[
                 MMIORegister(
                     name="gpio_state",
-                    addr=0x0,
-                    description="State of all GPIO signals (either high or low).",
+                    addr=GPIO_STATE_OFFSET,
+                    description="State of all GPIO signals (either high or low). Write sets all outputs at once.",
                     bits=bits
                 ),
+                MMIORegister(
+                    name="gpio_set",
+                    addr=GPIO_SET_OFFSET,
+                    description="Write only - outputs with corresponding bits set are driven high, the rest stay untouched.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="gpio_clear",
+                    addr=GPIO_CLEAR_OFFSET,
+                    description="Write only - outputs with corresponding bits set are driven low, the rest stay untouched.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="gpio_toggle",
+                    addr=GPIO_TOGGLE_OFFSET,
+                    description="Write only - outputs with corresponding bits set are inverted, the rest stay untouched.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="gpio_rise",
+                    addr=GPIO_RISE_OFFSET,
+                    description="Rising edge latches - bit is set on rising edge of the corresponding signal. Write 1 to clear.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="gpio_fall",
+                    addr=GPIO_FALL_OFFSET,
+                    description="Falling edge latches - bit is set on falling edge of the corresponding signal. Write 1 to clear.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="gpio_rise_irq_en",
+                    addr=GPIO_RISE_IRQ_EN_OFFSET,
+                    description="Interrupt is raised as long as any enabled rising edge latch is set.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="gpio_fall_irq_en",
+                    addr=GPIO_FALL_IRQ_EN_OFFSET,
+                    description="Interrupt is raised as long as any enabled falling edge latch is set.",
+                    bits=[],
+                ),
             ],
         )
         return cfg
@@ -46,31 +124,18 @@ class GPIO_Wishbone(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
         self.signal_map = self.signal_map_gen(platform)
         self.sanity_check()
         m = self.init_owner_module()
-        return m
-
-    # for now support single 32-bit word.
-    def handle_transaction(self, wb_slv_module):
-        m = wb_slv_module
-        comb = m.d.comb
         sync = m.d.sync
+        comb = m.d.comb
 
-        wb_slave = self.get_wb_slave_bus()
-        cyc   = wb_slave.wb_bus.cyc
-        write = wb_slave.wb_bus.we
-        addr  = wb_slave.wb_bus.adr
-        data  = wb_slave.wb_bus.dat_w
-        mask  = wb_slave.wb_bus.sel
-
-        gpio_output = Signal(32)
-
-        # NOTE
-        # we cannot use 'comb' domain here, as we are in 'transaction' context, 
-        # so the assignments won't be persistent.
+        pins = self.gpio_pins
         for i, s in enumerate(self.signal_map):
             if isinstance(s, Signal):
                 if s.width != 1:
                     raise ValueError("GPIO: only single bits signals supported!")
-                sync += s.eq(gpio_output[i])
+                comb += [
+                    s.eq(self.gpio_output[i]),
+                    pins[i].eq(self.gpio_output[i]),
+                ]
             elif isinstance(s, Record):
                 if len(s.fields) > 1:
                     print(f"ERROR: as part of sigal_map param GPIO received Record instance with more than 1 field! ({len(s.fields)})")
@@ -80,34 +145,97 @@ class GPIO_Wishbone(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
                 sig_i = fs.get('i', None)
                 if isinstance(sig_o, Signal):
                     print(f"GPIO: adding output {sig_o} to GPIO pin {i}..")
-                    sync += sig_o.eq(gpio_output[i])
+                    comb += [
+                        sig_o.eq(self.gpio_output[i]),
+                        pins[i].eq(self.gpio_output[i]),
+                    ]
                 elif isinstance(sig_i, Signal):
                     print(f"GPIO: adding input {sig_i} to GPIO pin {i}..")
-                    sync += gpio_output[i].eq(sig_i)
+                    # two flip-flops synchronizer, as input may change asynchronously.
+                    sync_ff = Signal(2, name=f"gpio_sync_{i}")
+                    sync += sync_ff.eq(Cat(sig_i, sync_ff[0]))
+                    comb += pins[i].eq(sync_ff[1])
                 else:
                     print(f"ERROR: as part of sigal_map param GPIO received Record instance without 'o' or 'i' field! {fs}")
             else:
                 print(f"GPIO: skipping non-signal value at index {i}..")
 
+        pins_prev = Signal(32)
+        sync += pins_prev.eq(pins)
+
+        # Byte lanes not selected by the bus are ignored.
+        mask = self.reg_write_mask
+        data = self.reg_write_data & mask
+        out = self.gpio_output
+        with m.If(self.state_write_en):
+            sync += out.eq((out & ~mask) | data)
+        with m.Elif(self.set_write_en):
+            sync += out.eq(out | data)
+        with m.Elif(self.clear_write_en):
+            sync += out.eq(out & ~data)
+        with m.Elif(self.toggle_write_en):
+            sync += out.eq(out ^ data)
+
+        # NOTE: edge that happens in the same cycle as write-1-to-clear is not lost.
+        rise_clear = Mux(self.rise_write_en, data, 0)
+        fall_clear = Mux(self.fall_write_en, data, 0)
+        sync += [
+            self.gpio_rise.eq((self.gpio_rise & ~rise_clear) | (pins & ~pins_prev)),
+            self.gpio_fall.eq((self.gpio_fall & ~fall_clear) | (~pins & pins_prev)),
+        ]
+
+        with m.If(self.rise_irq_en_write_en):
+            sync += self.gpio_rise_irq_en.eq((self.gpio_rise_irq_en & ~mask) | data)
+        with m.If(self.fall_irq_en_write_en):
+            sync += self.gpio_fall_irq_en.eq((self.gpio_fall_irq_en & ~mask) | data)
+
+        comb += self.interrupt.eq(
+            (self.gpio_rise & self.gpio_rise_irq_en).any() | (self.gpio_fall & self.gpio_fall_irq_en).any()
+        )
+
+        return m
+
+    def handle_transaction(self, wb_slv_module):
+        m = wb_slv_module
+        comb = m.d.comb
+        sync = m.d.sync
+
+        wb_slave = self.get_wb_slave_bus()
+        cyc   = wb_slave.wb_bus.cyc
+        write = wb_slave.wb_bus.we
+        addr  = wb_slave.wb_bus.adr
+        data  = wb_slave.wb_bus.dat_w
+
+        comb += [
+            self.reg_write_data.eq(data),
+            self.reg_write_mask.eq(wb_slave.wb_bus.sel_mask()),
+        ]
+
+        registers = {
+            GPIO_STATE_OFFSET: (self.gpio_pins, self.state_write_en),
+            GPIO_SET_OFFSET: (None, self.set_write_en),
+            GPIO_CLEAR_OFFSET: (None, self.clear_write_en),
+            GPIO_TOGGLE_OFFSET: (None, self.toggle_write_en),
+            GPIO_RISE_OFFSET: (self.gpio_rise, self.rise_write_en),
+            GPIO_FALL_OFFSET: (self.gpio_fall, self.fall_write_en),
+            GPIO_RISE_IRQ_EN_OFFSET: (self.gpio_rise_irq_en, self.rise_irq_en_write_en),
+            GPIO_FALL_IRQ_EN_OFFSET: (self.gpio_fall_irq_en, self.fall_irq_en_write_en),
+        }
+
         with m.FSM():
             with m.State("GPIO_REQ"):
-                with m.If(cyc & (addr == 0x0)):
-                    with m.If(write):
-                        # sync += gpio_output[0:2].eq(Const(0b11, 2)) # XXX REMOVE ME
-                        granularity = 8
-                        bus_width = wb_slave.wb_bus.bus_width
-                        mask_width = bus_width // granularity
-                        assert mask_width == mask.width
-                        for i in range(mask_width):
-                            # try to emulate 'select'
-                            start_incl = i * granularity
-                            end_excl = start_incl + granularity
-                            with m.If(mask[i]):
-                                sync += gpio_output[start_incl:end_excl].eq(data[start_incl:end_excl])
-                    with m.Else():
-                        sync += self.get_dat_r().eq(gpio_output)
+                with m.If(cyc):
+                    with m.Switch(addr):
+                        for offset, (reg, write_en) in registers.items():
+                            with m.Case(offset):
+                                with m.If(write):
+                                    comb += write_en.eq(1)
+                                with m.Else():
+                                    # write-only registers read as zero.
+                                    sync += self.get_dat_r().eq(0 if reg is None else reg)
+                        with m.Default():
+                            sync += self.get_dat_r().eq(0)
                 m.next = "GPIO_RET"
             with m.State("GPIO_RET"):
                 comb += self.mark_handled_stmt()
                 m.next = "GPIO_REQ"
-
@@ -0,0 +1,302 @@
+"""
+Host-target interface (HTIF) - lets firmware running in simulation talk to the simulator,
+in the spirit of Spike/fesvr 'tohost'/'fromhost' protocol.
+
+Registers (offsets from HTIF_ADDR):
+
+* 0x00 'tohost' - write of odd value 'v' ends the simulation with exit code 'v >> 1',
+  write of even, non-zero value is a physical address of a syscall block (see below),
+* 0x08 'fromhost' - set to 1 by the host, once the syscall is done (to be cleared by the firmware),
+* 0x10 'putchar' - lowest byte is printed to the console,
+* 0x18/0x1C 'cycle' - number of clock cycles since the simulation start (low/high word),
+* 0x20/0x24 'instret' - number of retired instructions (low/high word).
+
+Syscall block is an array of 64-bit words: [syscall number, arg0, arg1, arg2], the result is written
+back into its first word. Supported are SYS_write (only to stdout/stderr) and SYS_exit.
+
+riscv-tests (and other firmware built against fesvr environment) write 'tohost' variable in RAM
+instead - HtifHost handles that as well, if given the 'tohost' symbol address (see 'elf_symbol').
+"""
+
+import sys
+from pathlib import Path
+from typing import Optional, TextIO
+
+from amaranth import Elaboratable, Signal
+from amaranth.sim import Passive, Settle
+from elftools.elf.elffile import ELFFile
+from elftools.elf.sections import SymbolTableSection
+
+from mtkcpu.units.loadstore import BusSlaveOwnerInterface
+from mtkcpu.units.mmio.sparse_memory import SparseMemory_Wishbone
+
+HTIF_ADDR = 0x4000_0000
+HTIF_ADDR_SPACE_SIZE = 0x1000
+
+HTIF_TOHOST = 0x00
+HTIF_FROMHOST = 0x08
+HTIF_PUTCHAR = 0x10
+HTIF_CYCLE = 0x18
+HTIF_INSTRET = 0x20
+
+SYS_WRITE = 64
+SYS_EXIT = 93
+
+# The same as of coreutils' 'timeout'.
+TIMEOUT_EXIT_CODE = 124
+
+MASK32 = 0xFFFF_FFFF
+
+
+def elf_symbol(elf_path: Path, name: str) -> Optional[int]:
+    """
+    Address of the 'name' symbol, None if the ELF doesn't define it.
+    """
+    with open(elf_path, "rb") as f:
+        for section in ELFFile(f).iter_sections():
+            if not isinstance(section, SymbolTableSection):
+                continue
+            symbols = section.get_symbol_by_name(name)
+            if symbols:
+                return symbols[0]["st_value"]
+    return None
+
+
+class HtifWishbone(Elaboratable, BusSlaveOwnerInterface):
+    """
+    Simulation-only MMIO region, selected by CPU_Config.sim_htif.
+    Transactions are serviced by HtifHost, that must be added to the simulator.
+
+    Counters and detection of writes to 'tohost' RAM variable are implemented in the design,
+    so that the host needs to read just a single signal ('request') per cycle.
+    """
+    def __init__(self) -> None:
+        BusSlaveOwnerInterface.__init__(self)
+        # Inputs - instruction retired, store on the main bus (and its address).
+        self.retire = Signal()
+        self.store = Signal()
+        self.store_addr = Signal(32)
+        # Set by the host, zero if there is no 'tohost' variable.
+        self.tohost_addr = Signal(32)
+
+        self.cycle = Signal(64)
+        self.instret = Signal(64)
+        # Transaction to the HTIF region, or store to 'tohost' variable.
+        self.request = Signal()
+
+    def elaborate(self, platform):
+        m = self.init_owner_module()
+        tohost_store = self.store & (self.tohost_addr != 0) & (self.store_addr == self.tohost_addr)
+        m.d.comb += self.request.eq(self.get_wb_slave_bus().wb_bus.cyc | tohost_store)
+        m.d.sync += [
+            self.cycle.eq(self.cycle + 1),
+            self.instret.eq(self.instret + self.retire),
+        ]
+        return m
+
+    def handle_transaction(self, wb_slv_module):
+        # Both 'ack' and 'dat_r' are driven by HtifHost.
+        pass
+
+
+class HtifHost:
+    """
+    Simulator side of the HTIF. Its process (see 'process') is an active one - it returns once
+    the firmware exits ('exit_code' is set) or after 'max_cycles' cycles ('timed_out' is set),
+    thus with all other processes passive, it decides when 'sim.run()' returns.
+    With 'passive' set, it doesn't keep the simulation running (some other process has to).
+
+    Writes to 'tohost_addr' (RAM variable, e.g. ELF's 'tohost' symbol) are interpreted
+    the same as writes to the 'tohost' register, in which case the syscall completion is signalled
+    by writing 1 to 'fromhost_addr' (if given).
+    """
+    def __init__(
+            self,
+            cpu,
+            max_cycles: Optional[int] = None,
+            tohost_addr: Optional[int] = None,
+            fromhost_addr: Optional[int] = None,
+            console: TextIO = sys.stdout,
+        ) -> None:
+        self.cpu = cpu
+        self.max_cycles = max_cycles
+        self.tohost_addr = tohost_addr
+        self.fromhost_addr = fromhost_addr
+        self.console = console
+        # Number of cycles simulated so far.
+        self.cycles = 0
+        # Number of retired instructions, known once the simulation is finished.
+        self.instret = 0
+        self.fromhost = 0
+        self.exit_code: Optional[int] = None
+        self.timed_out = False
+        self.output = bytearray()
+
+    @staticmethod
+    def for_elf(cpu, elf_path: Path, **kwargs) -> "HtifHost":
+        return HtifHost(
+            cpu,
+            tohost_addr=elf_symbol(elf_path, "tohost"),
+            fromhost_addr=elf_symbol(elf_path, "fromhost"),
+            **kwargs,
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.exit_code is not None or self.timed_out
+
+    @property
+    def status(self) -> int:
+        """
+        Exit code of the simulation - firmware's one, or TIMEOUT_EXIT_CODE.
+        """
+        if self.exit_code is not None:
+            return self.exit_code
+        if self.timed_out:
+            return TIMEOUT_EXIT_CODE
+        raise ValueError("Simulation didn't finish yet!")
+
+    # -- Access to the main memory (syscall blocks and buffers).
+
+    def _ram(self, addr: int):
+        for owner, space in self.cpu.arbiter.get_mmio_devices_config():
+            if space.basename == "ebr" and space.first_valid_addr_incl <= addr < space.last_valid_addr_excl:
+                return owner, (addr - space.first_valid_addr_incl) >> 2
+        raise ValueError(f"HTIF: address {hex(addr)} is not within the main memory!")
+
+    def read_word(self, addr: int):
+        owner, idx = self._ram(addr)
+        if isinstance(owner, SparseMemory_Wishbone):
+            return owner.storage.read(idx)
+        return (yield owner.mem[idx])
+
+    def write_word(self, addr: int, value: int):
+        owner, idx = self._ram(addr)
+        if isinstance(owner, SparseMemory_Wishbone):
+            owner.storage.write(idx, value, 0b1111)
+        else:
+            yield owner.mem[idx].eq(value)
+
+    def read_bytes(self, addr: int, num: int):
+        res = bytearray()
+        for word_addr in range(addr & ~0b11, addr + num, 4):
+            res += (yield from self.read_word(word_addr)).to_bytes(4, "little")
+        start = addr & 0b11
+        return bytes(res[start:start + num])
+
+    # -- Requests.
+
+    def putchar(self, byte: int) -> None:
+        self.output.append(byte)
+        self.console.write(chr(byte))
+        self.console.flush()
+
+    def syscall(self, block_addr: int):
+        """
+        Returns syscall's result.
+        """
+        args = []
+        for i in range(4):
+            args.append((yield from self.read_word(block_addr + 8 * i)))
+        which, arg0, arg1, arg2 = args
+        if which == SYS_EXIT:
+            self.exit_code = arg0
+            return 0
+        if which == SYS_WRITE and arg0 in [1, 2]:
+            for byte in (yield from self.read_bytes(arg1, arg2)):
+                self.putchar(byte)
+            return arg2
+        # -ENOSYS
+        return -38 & MASK32
+
+    def tohost(self, value: int, fromhost_addr: Optional[int]):
+        if value & 1:
+            self.exit_code = value >> 1
+            return
+        if not value:
+            return
+        result = yield from self.syscall(value)
+        yield from self.write_word(value, result)
+        yield from self.write_word(value + 4, 0xFFFF_FFFF if result >> 31 else 0)
+        self.fromhost = 1
+        if fromhost_addr is not None:
+            yield from self.write_word(fromhost_addr, 1)
+
+    def read(self, htif: HtifWishbone, offset: int):
+        counters = {
+            HTIF_CYCLE: htif.cycle,
+            HTIF_INSTRET: htif.instret,
+        }
+        if offset & ~0b100 in counters:
+            value = yield counters[offset & ~0b100]
+            return (value >> (8 * (offset & 0b100))) & MASK32
+        if offset == HTIF_FROMHOST:
+            return self.fromhost
+        return 0
+
+    def write(self, offset: int, data: int):
+        if offset == HTIF_TOHOST:
+            yield from self.tohost(data, fromhost_addr=None)
+        elif offset == HTIF_FROMHOST:
+            self.fromhost = data
+        elif offset == HTIF_PUTCHAR:
+            self.putchar(data & 0xFF)
+
+    def process(self, passive: bool = False):
+        cpu = self.cpu
+        htif: Optional[HtifWishbone] = getattr(cpu.arbiter, "htif", None)
+        if htif is None and self.tohost_addr is not None:
+            raise ValueError("HTIF 'tohost' variable requires CPU_Config.sim_htif to be set!")
+
+        def aux():
+            if passive:
+                yield Passive()
+            if htif is not None and self.tohost_addr is not None:
+                yield htif.tohost_addr.eq(self.tohost_addr)
+            acked = False
+            while True:
+                if acked:
+                    yield htif.ack.eq(0)
+                    acked = False
+                self.cycles += 1
+                # NOTE: each signal read is costly, thus there is only one per cycle, unless HTIF is used.
+                if htif is not None:
+                    # Address decoding is combinational.
+                    yield Settle()
+                    if (yield htif.request):
+                        acked = yield from self.handle_request(htif)
+                if self.exit_code is None and self.max_cycles is not None and self.cycles >= self.max_cycles:
+                    self.timed_out = True
+                if self.finished:
+                    if htif is not None:
+                        self.instret = yield htif.instret
+                    return
+                yield
+        return aux
+
+    def handle_request(self, htif: HtifWishbone):
+        """
+        Returns True if HTIF region transaction was acknowledged.
+        """
+        wb_slave = htif.get_wb_slave_bus()
+        bus = wb_slave.wb_bus
+        if not (yield bus.cyc):
+            # Store to 'tohost' variable.
+            value = yield self.cpu.arbiter.wb_bus.dat_w
+            if value:
+                yield from self.tohost(value, fromhost_addr=self.fromhost_addr)
+                # The host consumes the request.
+                yield from self.write_word(self.tohost_addr, 0)
+            return False
+        if wb_slave.stall is not None:
+            # 'stall' might have been driven by another process in this very cycle (see LatencyInjector).
+            yield Settle()
+            if (yield wb_slave.stall):
+                return False
+        offset = yield bus.adr
+        if (yield bus.we):
+            yield from self.write(offset, (yield bus.dat_w))
+        else:
+            yield htif.dat_r.eq((yield from self.read(htif, offset)))
+        yield htif.ack.eq(1)
+        return True
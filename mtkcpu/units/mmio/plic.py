@@ -0,0 +1,200 @@
+from amaranth import *
+from amaranth.build import Platform
+
+from mtkcpu.units.loadstore import BusSlaveOwnerInterface
+from mtkcpu.units.mmio.bspgen import BspGeneratable
+from mtkcpu.units.memory_interface import MMIOPeriphConfig, MMIORegister
+
+# Register offsets, compatible with SiFive's PLIC (single hart, M-mode context only).
+PLIC_PRIORITY_OFFSET = 0x0
+PLIC_PENDING_OFFSET = 0x1000
+PLIC_ENABLE_OFFSET = 0x2000
+PLIC_THRESHOLD_OFFSET = 0x20_0000
+PLIC_CLAIM_COMPLETE_OFFSET = 0x20_0004
+PLIC_ADDR_SPACE_SIZE = 0x40_0000
+
+PLIC_PRIORITY_BITS = 3
+
+# Interrupt source IDs. Source 0 is reserved and means 'no interrupt'.
+PLIC_NUM_SOURCES = 8
+PLIC_SOURCE_UART = 1
+PLIC_SOURCE_GPIO = 2
+
+
+class PLIC_Wishbone(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
+    """
+    Platform-Level Interrupt Controller - level-triggered sources, each with
+    an enable bit and a priority. Source is claimed by reading 'claim_complete' register
+    (returns the ID of the highest priority pending source, or 0), and completed
+    by writing the same ID back. Sources with priority not greater than 'threshold' are masked.
+    """
+    def __init__(self, num_sources: int = PLIC_NUM_SOURCES) -> None:
+        BusSlaveOwnerInterface.__init__(self)
+
+        if num_sources > 32:
+            raise ValueError(f"Error: PLIC supports at most 32 sources (including reserved 0), got {num_sources}")
+        self.num_sources = num_sources
+
+        # Input signals - to be driven by peripherals. Bit 0 is ignored.
+        self.sources = Signal(num_sources)
+
+        self.priority = Array(Signal(PLIC_PRIORITY_BITS, name=f"priority_{i}") for i in range(num_sources))
+        self.pending = Signal(num_sources)
+        self.enable = Signal(num_sources)
+        self.threshold = Signal(PLIC_PRIORITY_BITS)
+        # Claimed but not yet completed. Gateway doesn't forward new requests of such sources.
+        self.in_service = Signal(num_sources)
+
+        # ID of highest priority pending and enabled source, 0 if none.
+        self.claim_id = Signal(range(num_sources))
+
+        # Output signal, to be connected to the Exception Unit.
+        self.external_interrupt = Signal()
+
+        # Driven by bus transaction logic - registers are only assigned inside 'elaborate'.
+        self.priority_write_en = Signal(num_sources)
+        self.enable_write_en = Signal()
+        self.threshold_write_en = Signal()
+        self.claim_en = Signal()
+        self.complete_en = Signal()
+        # Byte lanes not selected by the bus are zeroed in 'reg_write_data', and ignored by register writes.
+        self.reg_write_data = Signal(32)
+        self.reg_write_mask = Signal(32)
+
+    def get_periph_config(self) -> MMIOPeriphConfig:
+        return MMIOPeriphConfig(
+            regions=[],
+            registers=[
+                MMIORegister(
+                    name=f"priority_{i}",
+                    addr=PLIC_PRIORITY_OFFSET + 4 * i,
+                    description=f"Priority of interrupt source {i}, {PLIC_PRIORITY_BITS} bits wide. Zero means 'never interrupt'.",
+                    bits=[],
+                ) for i in range(1, self.num_sources)
+            ] + [
+                MMIORegister(
+                    name="pending",
+                    addr=PLIC_PENDING_OFFSET,
+                    description="Read only - bit 'i' set means that interrupt source 'i' is pending.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="enable",
+                    addr=PLIC_ENABLE_OFFSET,
+                    description="Bit 'i' set means that interrupt source 'i' is enabled.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="threshold",
+                    addr=PLIC_THRESHOLD_OFFSET,
+                    description="Only sources with priority strictly greater than threshold can interrupt.",
+                    bits=[],
+                ),
+                MMIORegister(
+                    name="claim_complete",
+                    addr=PLIC_CLAIM_COMPLETE_OFFSET,
+                    description="Read claims the highest priority pending source and returns its ID (0 if none). "
+                    "Write of claimed ID signals that the interrupt handling is completed.",
+                    bits=[],
+                    values=[
+                        ("uart", PLIC_SOURCE_UART),
+                        ("gpio", PLIC_SOURCE_GPIO),
+                    ],
+                ),
+            ]
+        )
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = self.init_owner_module()
+        sync = m.d.sync
+        comb = m.d.comb
+
+        # NOTE: strict comparison and ascending order - on equal priorities, lower ID wins.
+        max_priority = self.threshold
+        for i in range(1, self.num_sources):
+            next_max_priority = Signal(PLIC_PRIORITY_BITS, name=f"max_priority_{i}")
+            active = self.pending[i] & self.enable[i] & (self.priority[i] > max_priority)
+            comb += next_max_priority.eq(Mux(active, self.priority[i], max_priority))
+            with m.If(active):
+                comb += self.claim_id.eq(i)
+            max_priority = next_max_priority
+
+        comb += self.external_interrupt.eq(self.claim_id != 0)
+
+        for i in range(1, self.num_sources):
+            with m.If(self.claim_en & (self.claim_id == i)):
+                sync += [
+                    self.pending[i].eq(0),
+                    self.in_service[i].eq(1),
+                ]
+            with m.Else():
+                with m.If(self.sources[i] & ~self.in_service[i]):
+                    sync += self.pending[i].eq(1)
+                with m.If(self.complete_en & (self.reg_write_data == i)):
+                    sync += self.in_service[i].eq(0)
+
+            with m.If(self.priority_write_en[i]):
+                sync += self.priority[i].eq(self.masked_write(self.priority[i]))
+
+        with m.If(self.enable_write_en):
+            # source 0 is reserved.
+            sync += self.enable.eq(self.masked_write(self.enable) & ~1)
+        with m.If(self.threshold_write_en):
+            sync += self.threshold.eq(self.masked_write(self.threshold))
+
+        return m
+
+    def masked_write(self, reg: Value) -> Value:
+        return (reg & ~self.reg_write_mask) | self.reg_write_data
+
+    def handle_transaction(self, wb_slv_module):
+        m = wb_slv_module
+        sync = m.d.sync
+        comb = m.d.comb
+
+        wb_slave = self.get_wb_slave_bus()
+        cyc   = wb_slave.wb_bus.cyc
+        write = wb_slave.wb_bus.we
+        addr  = wb_slave.wb_bus.adr
+        data  = wb_slave.wb_bus.dat_w
+
+        sel_mask = wb_slave.wb_bus.sel_mask()
+        comb += [
+            self.reg_write_data.eq(data & sel_mask),
+            self.reg_write_mask.eq(sel_mask),
+        ]
+
+        with m.FSM():
+            with m.State("PLIC_REQ"):
+                with m.If(cyc):
+                    with m.Switch(addr):
+                        for i in range(1, self.num_sources):
+                            with m.Case(PLIC_PRIORITY_OFFSET + 4 * i):
+                                with m.If(write):
+                                    comb += self.priority_write_en[i].eq(1)
+                                with m.Else():
+                                    sync += self.get_dat_r().eq(self.priority[i])
+                        with m.Case(PLIC_PENDING_OFFSET):
+                            sync += self.get_dat_r().eq(self.pending)
+                        with m.Case(PLIC_ENABLE_OFFSET):
+                            with m.If(write):
+                                comb += self.enable_write_en.eq(1)
+                            with m.Else():
+                                sync += self.get_dat_r().eq(self.enable)
+                        with m.Case(PLIC_THRESHOLD_OFFSET):
+                            with m.If(write):
+                                comb += self.threshold_write_en.eq(1)
+                            with m.Else():
+                                sync += self.get_dat_r().eq(self.threshold)
+                        with m.Case(PLIC_CLAIM_COMPLETE_OFFSET):
+                            with m.If(write):
+                                comb += self.complete_en.eq(1)
+                            with m.Else():
+                                comb += self.claim_en.eq(1)
+                                sync += self.get_dat_r().eq(self.claim_id)
+                        with m.Default():
+                            sync += self.get_dat_r().eq(0)
+                    m.next = "PLIC_RET"
+            with m.State("PLIC_RET"):
+                comb += self.mark_handled_stmt()
+                m.next = "PLIC_REQ"
@@ -0,0 +1,128 @@
+from typing import Dict, List
+
+import numpy as np
+from amaranth import Elaboratable
+from amaranth.sim import Settle
+from amaranth.sim.core import Passive
+
+from mtkcpu.utils.common import EBRMemConfig
+from mtkcpu.units.loadstore import BusSlaveOwnerInterface
+
+PAGE_BITS = 10
+PAGE_WORDS = 1 << PAGE_BITS
+
+
+class PagedMemory:
+    """
+    Word-addressed memory, allocated in pages of PAGE_WORDS words on first write.
+    Words never written read as zero.
+    """
+    def __init__(self, num_words: int) -> None:
+        self.num_words = num_words
+        self.pages: Dict[int, np.ndarray] = {}
+
+    def clear(self) -> None:
+        self.pages.clear()
+
+    def page(self, page_idx: int) -> np.ndarray:
+        if page_idx not in self.pages:
+            self.pages[page_idx] = np.zeros(PAGE_WORDS, dtype=np.uint32)
+        return self.pages[page_idx]
+
+    def load(self, words: Dict[int, int]) -> None:
+        """
+        'words' is {word index: value} dict, e.g. EBRMemConfig.mem_content_dict().
+        """
+        if not words:
+            return
+        idx = np.fromiter(words.keys(), dtype=np.int64, count=len(words))
+        val = np.fromiter(words.values(), dtype=np.uint32, count=len(words))
+        if idx.min() < 0 or idx.max() >= self.num_words:
+            raise ValueError(f"Word index out of range [0, {self.num_words})!")
+        page_idx = idx >> PAGE_BITS
+        for p in np.unique(page_idx):
+            sel = page_idx == p
+            self.page(int(p))[idx[sel] & (PAGE_WORDS - 1)] = val[sel]
+
+    def read(self, idx: int) -> int:
+        page = self.pages.get(idx >> PAGE_BITS)
+        if page is None:
+            return 0
+        return int(page[idx & (PAGE_WORDS - 1)])
+
+    def write(self, idx: int, data: int, mask: int) -> None:
+        """
+        'mask' is 4-bit byte-select mask.
+        """
+        page = self.page(idx >> PAGE_BITS)
+        m = sum(0xFF << (8 * i) for i in range(4) if mask & (1 << i))
+        offset = idx & (PAGE_WORDS - 1)
+        page[offset] = (int(page[offset]) & ~m) | (data & m)
+
+
+class SparseMemory_Wishbone(Elaboratable, BusSlaveOwnerInterface):
+    """
+    Simulation-only replacement of EBR_Wishbone, selected by EBRMemConfig.sparse_latency.
+
+    Content lives in PagedMemory, not in the design, so that elaboration cost doesn't
+    depend on memory size. Transactions are serviced by 'sparse_memories_process'
+    (see 'get_simulator', that adds it automatically) - each one is acknowledged after 'sparse_latency' cycles
+    (1 gives the same timing as EBR_Wishbone).
+
+    NOTE: content is not restored by Simulator.reset.
+    """
+    def __init__(self, mem_config: EBRMemConfig) -> None:
+        BusSlaveOwnerInterface.__init__(self)
+        if mem_config.sparse_latency is None or mem_config.sparse_latency < 0:
+            raise ValueError(f"Sparse memory requires non-negative latency, got {mem_config.sparse_latency}!")
+        self.mem_config = mem_config
+        self.storage = PagedMemory(num_words=mem_config.mem_size_words)
+        self.storage.load(mem_config.mem_content_dict())
+
+    def elaborate(self, platform):
+        return self.init_owner_module()
+
+    def handle_transaction(self, wb_slv_module):
+        # Both 'ack' and 'dat_r' are driven by 'sparse_memories_process'.
+        pass
+
+
+def sparse_memories_process(memories: List[SparseMemory_Wishbone]):
+    """
+    Single passive process, that services all of 'memories'.
+    """
+    def aux():
+        yield Passive()
+        waited = [0] * len(memories)
+        acked = [False] * len(memories)
+        while True:
+            for i, mem in enumerate(memories):
+                if acked[i]:
+                    yield mem.ack.eq(0)
+                    acked[i] = False
+            # Address decoding is combinational.
+            yield Settle()
+            for i, mem in enumerate(memories):
+                wb_slave = mem.get_wb_slave_bus()
+                bus = wb_slave.wb_bus
+                if not (yield bus.cyc):
+                    waited[i] = 0
+                    continue
+                if wb_slave.stall is not None:
+                    # 'stall' might have been driven by another process in this very cycle (see LatencyInjector).
+                    yield Settle()
+                    if (yield wb_slave.stall):
+                        continue
+                if waited[i] < mem.mem_config.sparse_latency:
+                    waited[i] += 1
+                    continue
+                waited[i] = 0
+                idx = (yield bus.adr) >> 2
+                if (yield bus.we):
+                    mem.storage.write(idx, (yield bus.dat_w), (yield bus.sel))
+                else:
+                    yield mem.dat_r.eq(mem.storage.read(idx))
+                yield mem.ack.eq(1)
+                acked[i] = True
+            yield
+    return aux
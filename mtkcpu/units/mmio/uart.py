@@ -7,17 +7,35 @@ from amaranth.build import *
 from amaranth_boards.icebreaker import *
 
 
-def _divisor(freq_in, freq_out, max_ppm=None):
-    divisor = freq_in // freq_out
-    if divisor <= 0:
+# Layout of the 'baud_divisor' register - unsigned fixed-point number,
+# with integer part in upper bits and fractional part (in 1/16 cycle units) in lower bits.
+BAUD_DIVISOR_INT_BITS = 16
+BAUD_DIVISOR_FRAC_BITS = 4
+
+# Baud rates, for which BSP constants get generated (if reachable with given clock).
+COMMON_BAUD_RATES = [9600, 19200, 57600, 115200, 230400, 460800, 921600, 1_000_000, 2_000_000, 3_000_000]
+
+
+def _divisor(freq_in, freq_out, max_ppm=None, frac_bits=0):
+    divisor = round(freq_in * (1 << frac_bits) / freq_out)
+    if (divisor >> frac_bits) <= 0:
         raise ArgumentError("Output frequency is too high.")
+    if divisor >= 1 << (BAUD_DIVISOR_INT_BITS + frac_bits):
+        raise ArgumentError("Output frequency is too low.")
 
-    ppm = 100000 * ((freq_in / divisor) - freq_out) / freq_out
+    ppm = 100000 * abs((freq_in * (1 << frac_bits) / divisor) - freq_out) / freq_out
     if max_ppm is not None and ppm > max_ppm:
         raise ArgumentError("Output frequency deviation is too high.")
 
     return divisor
 
+
+def baud_divisor(clk_freq, baud_rate, max_ppm=50000):
+    """
+    Returns value to be written to UART's 'baud_divisor' register, for given core clock frequency.
+    """
+    return _divisor(freq_in=clk_freq, freq_out=baud_rate, max_ppm=max_ppm, frac_bits=BAUD_DIVISOR_FRAC_BITS)
+
 from mtkcpu.units.loadstore import BusSlaveOwnerInterface
 from mtkcpu.units.mmio.bspgen import BspGeneratable
 from mtkcpu.units.memory_interface import MMIOPeriphConfig, MMIORegister
@@ -41,10 +59,24 @@ class UartTX(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
         self.tx_latch = None
         self.tx_fsm = None
 
+        # Level-triggered 'transmitter idle' interrupt, to be connected to the PLIC.
+        self.interrupt = Signal()
+
         self.serial_record_gen = serial_record_gen
 
-        self.divisor = _divisor(
-            freq_in=clk_freq, freq_out=baud_rate, max_ppm=50000)
+        self.clk_freq = clk_freq
+        # Reset value of 'baud_divisor' register, firmware is free to change it at runtime.
+        self.divisor = baud_divisor(clk_freq=clk_freq, baud_rate=baud_rate)
+        self.baud_divisor = Signal(BAUD_DIVISOR_INT_BITS + BAUD_DIVISOR_FRAC_BITS, reset=self.divisor)
+
+    def get_common_baud_divisors(self):
+        res = []
+        for baud_rate in COMMON_BAUD_RATES:
+            try:
+                res.append((str(baud_rate), baud_divisor(clk_freq=self.clk_freq, baud_rate=baud_rate)))
+            except ArgumentError:
+                pass
+        return res
 
     def get_periph_config(self) -> MMIOPeriphConfig:
         return MMIOPeriphConfig(
@@ -63,6 +95,14 @@ class UartTX(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
                     description="Data byte to be sent. Width of this register is 8 bits.",
                     bits=[],
                 ),
+                MMIORegister(
+                    "baud_divisor",
+                    addr=0x10,
+                    description=f"Read/write - number of clock cycles per bit, as a fixed-point number with {BAUD_DIVISOR_FRAC_BITS} fractional bits. "
+                    f"Integer part must be non-zero. Reset value is {hex(self.divisor)}. Write it only when tx_busy is zero.",
+                    bits=[],
+                    values=self.get_common_baud_divisors(),
+                ),
             ]
         )
     
@@ -97,6 +137,14 @@ class UartTX(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
                                         self.tx_ready.eq(1),
                                     ]
                                     m.next = "WAIT"
+                        with m.Case(0x10):
+                            with m.If(write_mask == 0):
+                                sync += self.get_dat_r().eq(self.baud_divisor)
+                            with m.Else():
+                                # Byte lanes not selected by the bus are ignored.
+                                sel_mask = wb_slave.wb_bus.sel_mask()
+                                sync += self.baud_divisor.eq((self.baud_divisor & ~sel_mask) | (write_data & sel_mask))
+                            m.next = "PARK"
             with m.State("WAIT"):
                 with m.If(self.tx_ack):
                     m.next = "PARK"
@@ -108,10 +156,22 @@ class UartTX(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
         m = self.init_owner_module()
         self.serial = self.serial_record_gen(platform, m)
 
-        tx_counter = Signal(range(self.divisor))
+        div_int = self.baud_divisor[BAUD_DIVISOR_FRAC_BITS:]
+        div_frac = self.baud_divisor[:BAUD_DIVISOR_FRAC_BITS]
+
+        # Fractional part of the divisor gets accumulated bit after bit - on each overflow
+        # the bit period is one cycle longer, so that on average it's equal to 'div_int + div_frac / 16'.
+        frac_acc = Signal(BAUD_DIVISOR_FRAC_BITS)
+        frac_sum = Signal(BAUD_DIVISOR_FRAC_BITS + 1)
+        m.d.comb += frac_sum.eq(frac_acc + div_frac)
+
+        tx_counter = Signal(BAUD_DIVISOR_INT_BITS)
         m.d.comb += self.tx_strobe.eq(tx_counter == 0)
         with m.If(tx_counter == 0):
-            m.d.sync += tx_counter.eq(self.divisor - 1)
+            m.d.sync += [
+                tx_counter.eq(div_int - 1 + frac_sum[-1]),
+                frac_acc.eq(frac_sum),
+            ]
         with m.Else():
             m.d.sync += tx_counter.eq(tx_counter - 1)
 
@@ -119,13 +179,15 @@ class UartTX(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
         self.tx_latch = tx_latch = Signal(8)
         
         self.busy_mmio = busy_mmio = Signal(reset=1)
+        m.d.comb += self.interrupt.eq(~busy_mmio)
         
         with m.FSM(reset="IDLE") as self.tx_fsm:
             with m.State("IDLE"):
                 m.d.comb += self.tx_ack.eq(1)
                 with m.If(self.tx_ready):
                     m.d.sync += [
-                        tx_counter.eq(self.divisor - 1),
+                        tx_counter.eq(div_int - 1),
+                        frac_acc.eq(0),
                         tx_latch.eq(self.tx_data)
                     ]
                     m.next = "START"
@@ -154,3 +216,45 @@ class UartTX(Elaboratable, BusSlaveOwnerInterface, BspGeneratable):
                     m.next = "IDLE"
 
         return m
+
+
+class SimConsoleTX(UartTX):
+    """
+    Simulation-only replacement of UartTX, selected by CPU_Config.sim_fast_console.
+
+    Registers are the same, but write to 'tx_data' completes immediately and 'tx_busy' always reads zero,
+    so that no cycles are spent on bit timing, nor on firmware polling. The 'serial.tx' line stays idle -
+    sent bytes are to be taken directly from the bus transactions (see 'uart_process' in mtkcpu/cli/top.py).
+    Timing matches the instruction-set simulator's UART model.
+    """
+    def handle_transaction(self, wb_slv_module):
+        m = wb_slv_module
+        sync = m.d.sync
+        comb = m.d.comb
+
+        wb_slave = self.get_wb_slave_bus()
+        write_mask = wb_slave.wb_bus.we
+        addr  = wb_slave.wb_bus.adr
+        write_data  = wb_slave.wb_bus.dat_w
+
+        with m.Switch(addr):
+            with m.Case(0x10):
+                with m.If(write_mask == 0):
+                    sync += self.get_dat_r().eq(self.baud_divisor)
+                with m.Else():
+                    sel_mask = wb_slave.wb_bus.sel_mask()
+                    sync += self.baud_divisor.eq((self.baud_divisor & ~sel_mask) | (write_data & sel_mask))
+            with m.Default():
+                # 'tx_busy' is never set.
+                sync += self.get_dat_r().eq(0)
+        comb += self.mark_handled_stmt()
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = self.init_owner_module()
+        self.serial = self.serial_record_gen(platform, m)
+        m.d.comb += [
+            self.serial.tx.eq(1),
+            # Transmitter idle.
+            self.interrupt.eq(1),
+        ]
+        return m
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from amaranth import *
+from amaranth.build import Platform
+from amaranth.lib.cdc import ResetSynchronizer
+
+# iCEBreaker's oscillator.
+PLL_REF_CLK_FREQ = 12_000_000
+
+# Frequencies known to be achievable exactly from 12 MHz reference.
+COMMON_CLK_FREQS = [12_000_000, 24_000_000, 30_000_000, 36_000_000, 48_000_000]
+
+
+@dataclass(frozen=True)
+class PLLParams:
+    divr: int
+    divf: int
+    divq: int
+    filter_range: int
+    freq_out: float
+
+
+def pll_params(freq_in: int, freq_out: int, max_ppm: int = 1000) -> PLLParams:
+    """
+    Finds iCE40 SB_PLL40 dividers (SIMPLE feedback mode) for requested output frequency,
+    the same way 'icepll' tool does. Raises ValueError if it cannot be reached
+    with accuracy better than 'max_ppm'.
+    """
+    # Limits come from iCE40 sysCLOCK PLL Design and Usage Guide.
+    best : Optional[PLLParams] = None
+    for divr in range(16):
+        f_pfd = freq_in / (divr + 1)
+        if not 10e6 <= f_pfd <= 133e6:
+            continue
+        for divf in range(128):
+            f_vco = f_pfd * (divf + 1)
+            if not 533e6 <= f_vco <= 1066e6:
+                continue
+            for divq in range(1, 7):
+                f_out = f_vco / (1 << divq)
+                if best is None or abs(f_out - freq_out) < abs(best.freq_out - freq_out):
+                    filter_range = next(i + 1 for i, limit in enumerate([17e6, 26e6, 44e6, 66e6, 101e6, float("inf")]) if f_pfd < limit)
+                    best = PLLParams(divr=divr, divf=divf, divq=divq, filter_range=filter_range, freq_out=f_out)
+
+    if best is None or abs(best.freq_out - freq_out) > freq_out * max_ppm / 1e6:
+        achieved = f" (closest achievable: {best.freq_out / 1e6} MHz)" if best else ""
+        raise ValueError(f"Could not generate {freq_out / 1e6} MHz clock from {freq_in / 1e6} MHz reference{achieved}!")
+    return best
+
+
+class PLL40(Elaboratable):
+    """
+    Drives 'sync' clock domain from SB_PLL40_PAD, fed by the platform's default clock pin.
+    Domain is held in reset until PLL locks.
+    """
+    def __init__(self, freq_out: int) -> None:
+        self.freq_out = freq_out
+        self.locked = Signal()
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        params = pll_params(freq_in=int(platform.default_clk_frequency), freq_out=self.freq_out)
+
+        clk_pin = platform.request(platform.default_clk, dir="-")
+        cd_sync = m.domains.sync = ClockDomain("sync")
+
+        m.submodules.pll = Instance(
+            "SB_PLL40_PAD",
+            p_FEEDBACK_PATH="SIMPLE",
+            p_DIVR=params.divr,
+            p_DIVF=params.divf,
+            p_DIVQ=params.divq,
+            p_FILTER_RANGE=params.filter_range,
+            i_PACKAGEPIN=clk_pin.io,
+            i_RESETB=Const(1),
+            i_BYPASS=Const(0),
+            o_PLLOUTGLOBAL=cd_sync.clk,
+            o_LOCK=self.locked,
+        )
+        m.submodules.reset_sync = ResetSynchronizer(~self.locked, domain="sync")
+        platform.add_clock_constraint(cd_sync.clk, params.freq_out)
+
+        return m
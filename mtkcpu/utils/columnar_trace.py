@@ -0,0 +1,204 @@
+"""
+Compact trace format - for each signal only cycles in which its value changed are stored,
+as a pair of NumPy arrays (cycles, values), in a compressed .npz file.
+
+Unlike VCD, size of such trace depends on signals' activity, not on the design size,
+it's cheap to write and allows for queries (see ColumnarTrace) without reading any text.
+VCD (with GTKWave save file) for a window of interest is generated on demand ('ColumnarTrace.to_vcd',
+'mtkcpu trace2vcd').
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from amaranth.hdl.ast import Signal
+from vcd import VCDWriter
+from vcd.gtkw import GTKWSave
+
+MAX_SIGNAL_WIDTH = 64
+
+
+def unique_names(signals: Sequence[Signal]) -> List[str]:
+    """
+    Signal names are not unique within the design - duplicates get '$<n>' suffix.
+    """
+    seen = {}
+    res = []
+    for signal in signals:
+        n = seen[signal.name] = seen.get(signal.name, -1) + 1
+        res.append(signal.name if n == 0 else f"{signal.name}${n}")
+    return res
+
+
+class ColumnarTrace:
+    """
+    'changes[i]' is (cycles, values) pair for i-th signal - its value is 'values[k]' from 'cycles[k]' cycle,
+    until the next change. The trace covers [start, end) cycles.
+    """
+    def __init__(self, names: List[str], widths: List[int], changes: List[Tuple[np.ndarray, np.ndarray]], start: int, end: int) -> None:
+        self.names = names
+        self.widths = widths
+        self.changes = changes
+        self.start = start
+        self.end = end
+
+    def save(self, path: Path) -> None:
+        arrays = {}
+        for i, (cycles, values) in enumerate(self.changes):
+            arrays[f"cycles_{i}"] = cycles
+            arrays[f"values_{i}"] = values
+        np.savez_compressed(
+            path,
+            names=np.array(self.names),
+            widths=np.array(self.widths, dtype=np.int64),
+            bounds=np.array([self.start, self.end], dtype=np.int64),
+            **arrays,
+        )
+
+    @staticmethod
+    def load(path: Path) -> "ColumnarTrace":
+        with np.load(path, allow_pickle=False) as f:
+            names = [str(x) for x in f["names"]]
+            start, end = (int(x) for x in f["bounds"])
+            return ColumnarTrace(
+                names=names,
+                widths=[int(x) for x in f["widths"]],
+                changes=[(f[f"cycles_{i}"], f[f"values_{i}"]) for i in range(len(names))],
+                start=start,
+                end=end,
+            )
+
+    def _changes(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        if name not in self.names:
+            raise KeyError(f"No '{name}' signal in the trace, available: {self.names}")
+        return self.changes[self.names.index(name)]
+
+    def _check_cycle(self, cycle: int) -> None:
+        if not self.start <= cycle < self.end:
+            raise ValueError(f"Cycle {cycle} is not covered by the trace ([{self.start}, {self.end})).")
+
+    def value_at(self, name: str, cycle: int) -> int:
+        self._check_cycle(cycle)
+        cycles, values = self._changes(name)
+        return int(values[np.searchsorted(cycles, cycle, side="right") - 1])
+
+    def edges(self, name: str, kind: str = "any") -> np.ndarray:
+        """
+        Cycles, in which value changed ('any'), changed from zero ('rising') or to zero ('falling').
+        """
+        cycles, values = self._changes(name)
+        prev, cur = values[:-1], values[1:]
+        if kind == "any":
+            sel = np.ones(len(cur), dtype=bool)
+        elif kind == "rising":
+            sel = (prev == 0) & (cur != 0)
+        elif kind == "falling":
+            sel = (prev != 0) & (cur == 0)
+        else:
+            raise ValueError(f"Unknown edge kind '{kind}', expected one of 'any', 'rising', 'falling'.")
+        return cycles[1:][sel]
+
+    def histogram(self, name: str, start: Optional[int] = None, end: Optional[int] = None) -> Dict[int, int]:
+        """
+        Returns {value: number of cycles} for [start, end) window (the whole trace by default).
+        """
+        start = self.start if start is None else max(start, self.start)
+        end = self.end if end is None else min(end, self.end)
+        cycles, values = self._changes(name)
+        # Each value lasts until the next change, clipped to the window.
+        begins = np.clip(cycles, start, end)
+        ends = np.clip(np.append(cycles[1:], self.end), start, end)
+        durations = ends - begins
+        unique, inverse = np.unique(values, return_inverse=True)
+        counts = np.bincount(inverse, weights=durations, minlength=len(unique))
+        return {int(v): int(c) for v, c in zip(unique, counts) if c}
+
+    def to_vcd(self, vcd_path: Path, gtkw_path: Optional[Path] = None, start: Optional[int] = None, end: Optional[int] = None) -> None:
+        """
+        Writes [start, end) window (the whole trace by default) to VCD file, one time unit per cycle.
+        """
+        start = self.start if start is None else max(start, self.start)
+        end = self.end if end is None else min(end, self.end)
+        if start >= end:
+            raise ValueError(f"Empty window [{start}, {end}), trace covers [{self.start}, {self.end}).")
+
+        # (cycle, signal index, value) of all changes within the window, initial values first.
+        events = []
+        for i, (cycles, values) in enumerate(self.changes):
+            lo = np.searchsorted(cycles, start, side="right")
+            hi = np.searchsorted(cycles, end, side="left")
+            events.append((start, i, int(values[lo - 1])))
+            events += zip(cycles[lo:hi].tolist(), [i] * (hi - lo), values[lo:hi].tolist())
+        events.sort()
+
+        with Path(vcd_path).open("w") as f, VCDWriter(f, timescale="1 ns", init_timestamp=start) as writer:
+            variables = [writer.register_var("top", name, "wire", size=width) for name, width in zip(self.names, self.widths)]
+            for cycle, i, value in events:
+                writer.change(variables[i], cycle, value)
+
+        if gtkw_path is not None:
+            with Path(gtkw_path).open("w") as f:
+                save = GTKWSave(f)
+                save.dumpfile(str(vcd_path))
+                for name, width in zip(self.names, self.widths):
+                    save.trace(f"top.{name}" if width == 1 else f"top.{name}[{width - 1}:0]")
+
+
+class ChangeRecorder:
+    """
+    Builds ColumnarTrace from per-cycle samples of 'Cat(*signals)' (single simulator read per cycle).
+    Changes are kept in NumPy chunks of 'chunk_size', so that memory usage of long runs stays low.
+    """
+    def __init__(self, signals: Sequence[Signal], chunk_size: int = 1 << 16) -> None:
+        too_wide = [s.name for s in signals if len(s) > MAX_SIGNAL_WIDTH]
+        if too_wide:
+            raise ValueError(f"Signals wider than {MAX_SIGNAL_WIDTH} bits are not supported: {too_wide}")
+        self.names = unique_names(signals)
+        self.widths = [len(s) for s in signals]
+        self.offsets = np.cumsum([0, *self.widths[:-1]]).tolist()
+        self.chunk_size = chunk_size
+        self.pending: List[Tuple[List[int], List[int]]] = [([], []) for _ in signals]
+        self.chunks: List[List[Tuple[np.ndarray, np.ndarray]]] = [[] for _ in signals]
+        self.prev: Optional[int] = None
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+
+    def add(self, cycle: int, sample: int) -> None:
+        if sample == self.prev:
+            self.end = cycle + 1
+            return
+        if self.start is None:
+            self.start = cycle
+            # All bits set - initial values of all signals get recorded.
+            diff = -1
+        else:
+            diff = sample ^ self.prev
+        self.prev = sample
+        self.end = cycle + 1
+        for i, (offset, width) in enumerate(zip(self.offsets, self.widths)):
+            mask = (1 << width) - 1
+            if (diff >> offset) & mask:
+                cycles, values = self.pending[i]
+                cycles.append(cycle)
+                values.append((sample >> offset) & mask)
+                if len(cycles) == self.chunk_size:
+                    self._flush(i)
+
+    def _flush(self, i: int) -> None:
+        cycles, values = self.pending[i]
+        self.chunks[i].append((np.array(cycles, dtype=np.int64), np.array(values, dtype=np.uint64)))
+        self.pending[i] = ([], [])
+
+    def trace(self) -> ColumnarTrace:
+        if self.start is None:
+            raise ValueError("No cycles were recorded.")
+        for i in range(len(self.names)):
+            self._flush(i)
+        changes = [
+            (np.concatenate([c for c, _ in chunks]), np.concatenate([v for _, v in chunks]))
+            for chunks in self.chunks
+        ]
+        # Keep recording possible - single chunk per signal from now on.
+        self.chunks = [[x] for x in changes]
+        return ColumnarTrace(names=self.names, widths=self.widths, changes=changes, start=self.start, end=self.end)
@@ -3,7 +3,7 @@ from itertools import starmap, count
 import logging
 from operator import or_
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from subprocess import Popen, PIPE
 from pathlib import Path
 from shutil import which
@@ -37,9 +37,28 @@ from mtkcpu.utils.tests.memory import MemoryContents
 class EBRMemConfig():
     word_size = 4
     mem_size_words : int
-    mem_content_words : Optional[List[int]] # e.g you may want to have an ELF content as an init state
+    # e.g you may want to have an ELF content as an init state.
+    # Sparse memories accept also {word index: value} dict.
+    mem_content_words : Optional[Union[List[int], Dict[int, int]]]
     mem_addr : int
     simulate: bool
+    # Simulation only - if set, instead of 'Memory' the content lives in a paged Python structure,
+    # and each access takes 'sparse_latency' cycles (see SparseMemory_Wishbone).
+    sparse_latency: Optional[int] = None
+
+    def __post_init__(self):
+        if self.sparse_latency is not None and not self.simulate:
+            raise ValueError("Sparse memory is supported only in simulation!")
+        if isinstance(self.mem_content_words, dict) and self.sparse_latency is None:
+            raise ValueError("Memory content passed as dict is supported only by sparse memory!")
+
+    def mem_content_dict(self) -> Dict[int, int]:
+        """
+        Returns non-zero words of 'mem_content_words', as {word index: value} dict.
+        """
+        content = self.mem_content_words or []
+        items = content.items() if isinstance(content, dict) else enumerate(content)
+        return {i: x for i, x in items if x}
 
     @property
     def last_valid_addr_excl(self):
@@ -51,7 +70,7 @@ class EBRMemConfig():
         return self.mem_addr + self.mem_size_words * self.word_size
 
     @staticmethod
-    def from_mem_dict(start_addr: int , num_bytes: int, mem_dict: MemoryContents, simulate: bool) -> "EBRMemConfig":
+    def from_mem_dict(start_addr: int , num_bytes: int, mem_dict: MemoryContents, simulate: bool, sparse_latency: Optional[int] = None) -> "EBRMemConfig":
         ws = __class__.word_size
         num_words = num_bytes // ws
         
@@ -66,7 +85,11 @@ class EBRMemConfig():
             )
         
         d = dict([(k - start_addr, v) for k, v in mem_dict.memory.items()])
-        mem_map = [0] * num_words
+        if sparse_latency is not None:
+            # don't allocate 'num_words' list, as sparse memories are usually huge.
+            mem_map = {}
+        else:
+            mem_map = [0] * num_words
         
         for k, v in d.items():
             mem_map[(k >> int(log2(ws)))] = v
@@ -76,6 +99,7 @@ class EBRMemConfig():
             mem_addr=start_addr,
             mem_content_words=mem_map,
             simulate=simulate,
+            sparse_latency=sparse_latency,
         )
 
 # returns memory (all PT_LOAD type segments) as dictionary.
@@ -0,0 +1,154 @@
+"""
+Cycle accounting - each simulated cycle is attributed to the state of MtkCpu's main FSM,
+and to the class of the instruction being executed, i.e. to the unit that executes it (see ActiveUnit),
+with loads and stores distinguished. Instructions that trap before reaching a unit (e.g. 'ecall') are
+classified as 'exception', interrupts taken between instructions as 'interrupt', and the ones
+that need no unit at all (e.g. 'fence') as 'other'.
+
+Cycles of an instruction start at CHECK_SHOULD_HALT state and end at the next one.
+EXECUTE cycles after the first one are waiting for the unit, e.g. for the memory bus or CSR unit.
+Cycles spent in Debug Mode (HALTED state) are not attributed to any instruction.
+"""
+
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Optional
+
+from amaranth.sim.core import Passive
+
+from mtkcpu.cpu.cpu import ActiveUnitLayout, MtkCpu
+from mtkcpu.cpu.isa import InstrType
+
+CPI_REPORT_VERSION = 1
+
+CYCLE_STATES = ["check", "fetch", "decode", "execute", "execute_wait", "writeback", "trap"]
+
+STATE_BUCKETS = {
+    "CHECK_SHOULD_HALT": "check",
+    "FETCH": "fetch",
+    "DECODE": "decode",
+    "WRITEBACK": "writeback",
+    "TRAP": "trap",
+}
+
+
+class CpiMonitor:
+    """
+    Passive simulation process (see 'process' method). Reads just the main FSM state each cycle,
+    and the active unit (and opcode, for memory instructions) once per instruction.
+    """
+    def __init__(self, cpu: MtkCpu) -> None:
+        self.cpu = cpu
+        # {instruction class: {cycle state: number of cycles}}
+        self.cycles: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.instructions: Dict[str, int] = defaultdict(int)
+        self.halted_cycles = 0
+        self.total_cycles = 0
+        # Single-bit fields, starting from the LSB.
+        self.units = [name for name, _, _ in ActiveUnitLayout()]
+
+    def _unit_name(self, active_unit: int) -> str:
+        for i, name in enumerate(self.units):
+            if active_unit & (1 << i):
+                return name
+        return "other"
+
+    def _commit(self, cls: Optional[str], cycles: Dict[str, int]) -> None:
+        cls = cls or "exception"
+        self.instructions[cls] += 1
+        for state, n in cycles.items():
+            self.cycles[cls][state] += n
+
+    def process(self):
+        cpu = self.cpu
+        states = {v: k for k, v in cpu.main_fsm.encoding.items()}
+
+        def aux():
+            yield Passive()
+            # Cycles of the instruction being executed (None if there is none), and its class.
+            cur, cls = None, None
+            while True:
+                self.total_cycles += 1
+                state = states[(yield cpu.main_fsm.state)]
+                if state == "CHECK_SHOULD_HALT":
+                    if cur is not None:
+                        self._commit(cls, cur)
+                    cur, cls = defaultdict(int), None
+                elif state == "HALTED":
+                    if cur is not None and not cur["fetch"]:
+                        # Entered Debug Mode instead of fetching the next instruction.
+                        self.halted_cycles += sum(cur.values())
+                        cur = None
+                    self.halted_cycles += 1
+                    yield
+                    continue
+                elif cur is None:
+                    # Resumed from Debug Mode.
+                    cur = defaultdict(int)
+
+                if state == "EXECUTE":
+                    if cls is None:
+                        cls = self._unit_name((yield cpu.active_unit.as_value()))
+                        if cls == "mem_unit":
+                            cls = "store" if (yield cpu.opcode) == InstrType.STORE else "load"
+                        cur["execute"] += 1
+                    else:
+                        cur["execute_wait"] += 1
+                else:
+                    if state == "TRAP" and not cur["fetch"]:
+                        cls = "interrupt"
+                    cur[STATE_BUCKETS[state]] += 1
+                yield
+        return aux
+
+    def report(self) -> dict:
+        classes = {}
+        for cls in sorted(self.instructions):
+            cycles = self.cycles[cls]
+            total = sum(cycles.values())
+            classes[cls] = {
+                "instructions": self.instructions[cls],
+                "cycles": total,
+                "cpi": total / self.instructions[cls],
+                "states": {x: cycles.get(x, 0) for x in CYCLE_STATES},
+            }
+        instructions = sum(self.instructions.values())
+        cycles = sum(x["cycles"] for x in classes.values())
+        return {
+            "version": CPI_REPORT_VERSION,
+            "total_cycles": self.total_cycles,
+            "halted_cycles": self.halted_cycles,
+            "instructions": instructions,
+            "cpi": cycles / instructions if instructions else None,
+            # All FETCH cycles, and all EXECUTE cycles of loads and stores are spent on the memory bus.
+            "bus_wait_cycles": {
+                "fetch": sum(x["states"]["fetch"] for x in classes.values()),
+                "load_store": sum(
+                    classes[x]["states"]["execute"] + classes[x]["states"]["execute_wait"]
+                    for x in ["load", "store"] if x in classes
+                ),
+            },
+            "classes": classes,
+        }
+
+    def format_table(self) -> str:
+        report = self.report()
+        header = f"{'class':<10} {'instr':>8} {'cycles':>9} {'CPI':>6} " + " ".join(f"{x:>12}" for x in CYCLE_STATES)
+        lines = [header, "-" * len(header)]
+        for cls, x in report["classes"].items():
+            lines.append(
+                f"{cls:<10} {x['instructions']:>8} {x['cycles']:>9} {x['cpi']:>6.2f} "
+                + " ".join(f"{x['states'][s]:>12}" for s in CYCLE_STATES)
+            )
+        lines.append("-" * len(header))
+        cpi = f"{report['cpi']:.2f}" if report["cpi"] is not None else "-"
+        bus = report["bus_wait_cycles"]
+        lines.append(
+            f"{report['instructions']} instructions, {report['total_cycles']} cycles ({report['halted_cycles']} halted), CPI {cpi}, "
+            f"bus wait cycles: {bus['fetch']} fetch, {bus['load_store']} load/store"
+        )
+        return "\n".join(lines)
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(self.report(), indent=2) + "\n")
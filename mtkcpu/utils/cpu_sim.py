@@ -0,0 +1,259 @@
+"""
+MtkCpuSim - MtkCpu simulation driven by plain function calls, instead of hand-written generator processes:
+
+    cpu_sim = MtkCpuSim(cpu)
+    cpu_sim.write_mem(CODE_START_ADDR, program)
+    cpu_sim.run_until_pc(CODE_START_ADDR + 0x40, max_cycles=1000)
+    assert cpu_sim.read_gpr(10) == 0
+
+Between calls simulation is paused (no time passes), so that the design can be inspected and modified.
+Calls are executed by a single 'driver' process. Run-type calls check their stop condition after every clock edge,
+without getting back to the caller - values it depends on are sampled by a MonitorHub (one read per signal,
+no matter how many slices of it are used).
+
+Processes (monitors, testbenches, HTIF etc.) can still be added with 'add_processes'.
+"""
+
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Generator, List, Optional, Sequence, Tuple, Union
+
+from amaranth.hdl.ast import Signal, Value
+from amaranth.sim import Passive, Settle, Tick
+
+from mtkcpu.cpu.cpu import MtkCpu
+from mtkcpu.units.mmio.sparse_memory import SparseMemory_Wishbone
+from mtkcpu.utils.pysim_cache import get_simulator
+from mtkcpu.utils.tests.monitor_hub import MonitorHub, merge_monitors
+
+
+class _Failed:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+class MtkCpuSim:
+    """
+    Run-type methods ('step_*', 'run_until*') stop with all signals settled after a clock edge,
+    and return number of cycles run. Those with 'max_cycles' raise TimeoutError if it elapses.
+
+    NOTE: Use 'run' instead of 'sim.run()' - the driver process keeps simulation time frozen while waiting
+    for the next call, so 'sim.run()' would never return.
+    """
+
+    def __init__(self, cpu: MtkCpu, cache_dir: Optional[Path] = None) -> None:
+        self.cpu = cpu
+        self.sim = get_simulator(cpu, cache_dir=cache_dir)
+        self.sim.add_clock(1 / cpu.cpu_config.clk_freq_hz)
+        # NOTE: those are available only after elaboration, done by 'get_simulator'.
+        self._retired = cpu.writeback | cpu.exception_unit.m_mret
+        self._boundary = cpu.main_fsm.encoding["CHECK_SHOULD_HALT"]
+
+        # (command, list for its result) pairs.
+        self._commands: Deque[Tuple[Generator, list]] = deque()
+        self._free_running = False
+        self._hub = MonitorHub()
+        # Number of clock edges since the (last) reset.
+        self.cycles = 0
+        self.sim.add_process(self._driver)
+
+    def _driver(self):
+        yield Passive()
+        while True:
+            if self._free_running:
+                yield Tick()
+                self.cycles += 1
+            elif self._commands:
+                command, result = self._commands.popleft()
+                try:
+                    result.append((yield from command))
+                except Exception as e:
+                    # Keeps the driver alive, exception is re-raised by 'execute'.
+                    result.append(_Failed(e))
+            else:
+                # Doesn't let the time pass until the next command.
+                yield Settle()
+
+    def reset(self) -> None:
+        """
+        Resets the whole design, including memory, to its initial state.
+        """
+        self.sim.reset()
+        for owner, _ in self.cpu.arbiter.get_mmio_devices_config():
+            if isinstance(owner, SparseMemory_Wishbone):
+                owner.storage.clear()
+                owner.storage.load(owner.mem_config.mem_content_dict())
+        self._commands.clear()
+        self._hub = MonitorHub()
+        self.cycles = 0
+
+    def add_processes(self, processes: List[Callable]) -> None:
+        """
+        Adds 'processes' the same way as 'Simulator.add_sync_process' (monitors get merged, see 'merge_monitors').
+        """
+        for p in merge_monitors(processes):
+            self.sim.add_sync_process(p)
+
+    def execute(self, command: Generator) -> Any:
+        """
+        Runs 'command' - a generator, as of 'Simulator.add_process' processes - and returns its result.
+        For custom stimulus, common cases are covered by the methods below.
+        NOTE: written values are visible to reads of the same command only after 'yield Settle()'.
+        """
+        result = []
+        self._commands.append((command, result))
+        while not result:
+            self.sim.advance()
+        if isinstance(result[0], _Failed):
+            raise result[0].exc
+        return result[0]
+
+    def run(self) -> int:
+        """
+        Runs until all active processes return, the same as 'Simulator.run'.
+        """
+        start = self.cycles
+        self._free_running = True
+        try:
+            while self.sim.advance():
+                pass
+        finally:
+            self._free_running = False
+        return self.cycles - start
+
+    def run_until(self, predicate: Callable[..., bool], values: Sequence[Value] = (), max_cycles: Optional[int] = None) -> int:
+        """
+        Runs until 'predicate(*values)' is true. 'values' are sampled after every clock edge, with all signals settled.
+        """
+        hit = []
+        trigger = self._hub.on(values, predicate, lambda *_: hit.append(True))
+
+        def command():
+            cycles = 0
+            while max_cycles is None or cycles < max_cycles:
+                yield Tick()
+                self.cycles += 1
+                cycles += 1
+                yield Settle()
+                yield from self._hub.step()
+                if hit:
+                    return cycles
+            return None
+
+        try:
+            cycles = self.execute(command())
+        finally:
+            self._hub.remove(trigger)
+        if cycles is None:
+            raise TimeoutError(f"Stop condition not met within {max_cycles} cycles!")
+        return cycles
+
+    def step_cycles(self, n: int) -> int:
+        def command():
+            for _ in range(n):
+                yield Tick()
+                self.cycles += 1
+            return n
+        return self.execute(command())
+
+    def step_instructions(self, n: int = 1, max_cycles: Optional[int] = None) -> int:
+        """
+        Runs until 'n' instructions retire and MtkCpu gets to the next instruction boundary
+        (about to fetch the next instruction, see 'wait_instruction_boundary').
+        Instructions that trap don't retire.
+        """
+        left = [n]
+
+        def done(retired: int, state: int) -> bool:
+            left[0] -= retired
+            return left[0] <= 0 and state == self._boundary
+        return self.run_until(done, [self._retired, self.cpu.main_fsm.state], max_cycles=max_cycles)
+
+    def run_until_pc(self, addr: int, max_cycles: Optional[int] = None) -> int:
+        """
+        Runs until MtkCpu is about to execute instruction at 'addr' (at least one cycle is run,
+        i.e. when already there, it stops there next time).
+        """
+        return self.run_until(
+            lambda state, pc: state == self._boundary and pc == addr,
+            [self.cpu.main_fsm.state, self.cpu.pc],
+            max_cycles=max_cycles,
+        )
+
+    def read(self, value: Value) -> int:
+        def command():
+            return (yield value)
+        return self.execute(command())
+
+    def write(self, signal: Signal, value: int) -> None:
+        def command():
+            yield signal.eq(value)
+        self.execute(command())
+
+    def read_gpr(self, idx: int) -> int:
+        return self.read(self.cpu.regs._array[idx])
+
+    def write_gpr(self, idx: int, value: int) -> None:
+        self.write_gprs({idx: value})
+
+    def read_gprs(self) -> List[int]:
+        def command():
+            res = []
+            for signal in self.cpu.regs._array:
+                res.append((yield signal))
+            return res
+        return self.execute(command())
+
+    def write_gprs(self, values: Union[Sequence[int], Dict[int, int]]) -> None:
+        """
+        Writes registers from 'values' (list of all of them, or a dict indexed by register number).
+        x0 is hardwired to zero, thus writes to it are ignored.
+        """
+        items = values.items() if isinstance(values, dict) else enumerate(values)
+
+        def command():
+            for idx, value in items:
+                if idx != 0:
+                    yield self.cpu.regs._array[idx].eq(value)
+        self.execute(command())
+
+    def read_csr(self, addr: int) -> int:
+        return self.read(self.cpu.csr_unit.reg_by_addr(addr).my_reg_latch)
+
+    def _ram(self, addr: int, num_words: int) -> Tuple[Any, int]:
+        if addr % 4:
+            raise ValueError(f"Memory access address must be word-aligned, got {hex(addr)}!")
+        for owner, space in self.cpu.arbiter.get_mmio_devices_config():
+            if space.basename == "ebr" and space.first_valid_addr_incl <= addr and addr + 4 * num_words <= space.last_valid_addr_excl:
+                return owner, (addr - space.first_valid_addr_incl) >> 2
+        raise ValueError(f"Range {hex(addr)} + {num_words} words is not within the main memory!")
+
+    def read_mem(self, addr: int, num_words: int = 1) -> List[int]:
+        """
+        Reads 'num_words' words of the main memory, starting from 'addr' - all with a single command.
+        """
+        owner, idx = self._ram(addr, num_words)
+        if isinstance(owner, SparseMemory_Wishbone):
+            return [owner.storage.read(i) for i in range(idx, idx + num_words)]
+
+        def command():
+            res = []
+            for i in range(idx, idx + num_words):
+                res.append((yield owner.mem[i]))
+            return res
+        return self.execute(command())
+
+    def write_mem(self, addr: int, words: Sequence[int]) -> None:
+        """
+        Writes 'words' to the main memory, starting from 'addr' - all with a single command.
+        """
+        owner, idx = self._ram(addr, len(words))
+        if isinstance(owner, SparseMemory_Wishbone):
+            for i, word in enumerate(words, start=idx):
+                owner.storage.write(i, word, 0b1111)
+            return
+
+        def command():
+            for i, word in enumerate(words, start=idx):
+                yield owner.mem[i].eq(word)
+        self.execute(command())
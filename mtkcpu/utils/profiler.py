@@ -0,0 +1,177 @@
+"""
+Program counter profiler - for each instruction address, number of cycles spent executing it and number
+of times it retired are gathered into a histogram, that is then symbolized with ELF's '.symtab'.
+
+Call stacks are reconstructed from the executed instructions - 'jal'/'jalr' with link register as 'rd'
+is a call, 'jalr' to the link register with 'rd' = 'x0' ('ret') and 'mret' are returns, and a trap
+enters the handler as if it was called. Instructions are taken from the initial memory content,
+thus self-modifying code, or code executing with address translation, is not understood.
+
+Results are a flat profile (per function) and folded stacks ('main;foo;bar <cycles>' lines, input of
+flamegraph.pl, speedscope and similar tools).
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from amaranth.sim.core import Passive
+from elftools.elf.elffile import ELFFile
+from elftools.elf.sections import SymbolTableSection
+
+from mtkcpu.cpu.cpu import MtkCpu
+from mtkcpu.cpu.isa import InstrType
+
+# Link registers, as of RISC-V calling convention ('ra' and alternate 't0').
+LINK_REGS = [1, 5]
+
+MRET = 0x3020_0073
+
+MAX_STACK_DEPTH = 256
+
+
+class ElfSymbols:
+    """
+    Function symbols (and global labels, for code written in assembly) of an ELF.
+    """
+    def __init__(self, elf_path: Path) -> None:
+        symbols: Dict[int, str] = {}
+        with open(elf_path, "rb") as f:
+            for section in ELFFile(f).iter_sections():
+                if not isinstance(section, SymbolTableSection):
+                    continue
+                for sym in section.iter_symbols():
+                    kind, bind = sym["st_info"]["type"], sym["st_info"]["bind"]
+                    if not sym.name or sym["st_shndx"] in ["SHN_UNDEF", "SHN_ABS"]:
+                        continue
+                    if kind == "STT_FUNC" or (kind == "STT_NOTYPE" and bind == "STB_GLOBAL"):
+                        # Functions take precedence over labels at the same address.
+                        if kind == "STT_FUNC" or sym["st_value"] not in symbols:
+                            symbols[sym["st_value"]] = sym.name
+        self.addrs = sorted(symbols)
+        self.names = [symbols[x] for x in self.addrs]
+
+    def lookup(self, addr: int) -> str:
+        idx = bisect_right(self.addrs, addr) - 1
+        return self.names[idx] if idx >= 0 else hex(addr)
+
+
+def is_call(instr: int) -> bool:
+    rd = (instr >> 7) & 0x1F
+    return instr & 0x7F in [InstrType.JAL, InstrType.JALR] and rd in LINK_REGS
+
+
+def is_return(instr: int) -> bool:
+    rd, rs1 = (instr >> 7) & 0x1F, (instr >> 15) & 0x1F
+    return (instr & 0x7F == InstrType.JALR and rd == 0 and rs1 in LINK_REGS) or instr == MRET
+
+
+class PcProfiler:
+    """
+    Passive simulation process (see 'process' method). Reads the main FSM state each cycle,
+    and the program counter once per instruction.
+    Cycles spent in Debug Mode are not accounted.
+    """
+    def __init__(self, cpu: MtkCpu, symbols: Optional[ElfSymbols] = None) -> None:
+        self.cpu = cpu
+        self.symbols = symbols
+        mem_config = cpu.mem_config
+        self.code = {mem_config.mem_addr + 4 * i: x for i, x in mem_config.mem_content_dict().items()}
+        # Histogram - {pc: cycles}, {pc: number of retired instructions}.
+        self.cycles: Dict[int, int] = defaultdict(int)
+        self.instret: Dict[int, int] = defaultdict(int)
+        # {call stack, with the function of the current instruction as the last one: cycles}
+        self.stack_cycles: Dict[Tuple[str, ...], int] = defaultdict(int)
+        self._symbol_cache: Dict[int, str] = {}
+
+    def symbol(self, pc: int) -> str:
+        if pc not in self._symbol_cache:
+            self._symbol_cache[pc] = self.symbols.lookup(pc) if self.symbols else hex(pc)
+        return self._symbol_cache[pc]
+
+    def process(self):
+        cpu = self.cpu
+
+        def aux():
+            yield Passive()
+            # Known only once the design is elaborated.
+            states = {v: k for k, v in cpu.main_fsm.encoding.items()}
+            # Instruction being executed (its pc, cycles so far and whether it executed or trapped).
+            pc, cycles, executed, trapped = None, 0, False, False
+            stack: List[str] = []
+            while True:
+                state = states[(yield cpu.main_fsm.state)]
+                if state == "HALTED":
+                    # Debugger might change the pc - start over once resumed.
+                    pc = None
+                    yield
+                    continue
+                if state == "CHECK_SHOULD_HALT" or (state == "FETCH" and pc is None):
+                    # New instruction (or the first one after resuming from Debug Mode).
+                    new_pc = yield cpu.pc
+                    if pc is not None:
+                        self._account(pc, cycles, retired=executed and not trapped, stack=stack)
+                        if trapped:
+                            stack.append(self.symbol(new_pc))
+                        elif executed and is_call(self.code.get(pc, 0)):
+                            stack.append(self.symbol(new_pc))
+                        elif executed and is_return(self.code.get(pc, 0)) and len(stack) > 1:
+                            stack.pop()
+                        del stack[:-MAX_STACK_DEPTH]
+                    if not stack:
+                        stack.append(self.symbol(new_pc))
+                    pc, cycles, executed, trapped = new_pc, 0, False, False
+                cycles += 1
+                executed |= state == "EXECUTE"
+                trapped |= state == "TRAP"
+                yield
+        return aux
+
+    def _account(self, pc: int, cycles: int, retired: bool, stack: List[str]) -> None:
+        self.cycles[pc] += cycles
+        self.instret[pc] += retired
+        self.stack_cycles[(*stack[:-1], self.symbol(pc))] += cycles
+
+    # -- Results.
+
+    def flat_profile(self) -> List[Tuple[str, int, int]]:
+        """
+        Returns (function, cycles, retired instructions) tuples, the most cycles first.
+        """
+        res = defaultdict(lambda: [0, 0])
+        for pc, cycles in self.cycles.items():
+            entry = res[self.symbol(pc)]
+            entry[0] += cycles
+            entry[1] += self.instret[pc]
+        return sorted(((name, c, i) for name, (c, i) in res.items()), key=lambda x: -x[1])
+
+    def format_flat_profile(self, limit: Optional[int] = None) -> str:
+        total = sum(self.cycles.values()) or 1
+        header = f"{'%':>6} {'cycles':>10} {'instr':>9} {'CPI':>6}  function"
+        lines = [header, "-" * len(header)]
+        for name, cycles, instret in self.flat_profile()[:limit]:
+            cpi = f"{cycles / instret:.2f}" if instret else "-"
+            lines.append(f"{100 * cycles / total:>6.2f} {cycles:>10} {instret:>9} {cpi:>6}  {name}")
+        return "\n".join(lines)
+
+    def folded_stacks(self) -> List[str]:
+        return [f"{';'.join(stack)} {cycles}" for stack, cycles in sorted(self.stack_cycles.items())]
+
+    def save(self, prefix: Path) -> List[Path]:
+        """
+        Writes the histogram ('<prefix>.npz', with 'pc', 'cycles' and 'instret' arrays), flat profile ('<prefix>.txt')
+        and folded stacks ('<prefix>.folded'). Returns paths of the written files.
+        """
+        pcs = np.array(sorted(self.cycles), dtype=np.uint32)
+        paths = [prefix.with_suffix(x) for x in [".npz", ".txt", ".folded"]]
+        np.savez_compressed(
+            paths[0],
+            pc=pcs,
+            cycles=np.array([self.cycles[x] for x in pcs.tolist()], dtype=np.uint64),
+            instret=np.array([self.instret[x] for x in pcs.tolist()], dtype=np.uint64),
+        )
+        paths[1].write_text(self.format_flat_profile() + "\n")
+        paths[2].write_text("".join(x + "\n" for x in self.folded_stacks()))
+        return paths
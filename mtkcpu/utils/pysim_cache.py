@@ -0,0 +1,232 @@
+"""
+On-disk cache of Python code generated by Amaranth's simulator (pysim) for MtkCpu.
+
+Each 'Simulator(cpu)' turns every statement of the elaborated design into Python source
+and compiles it - for bigger memories that takes longer than the simulation itself.
+With the cache enabled (see 'get_simulator'), compiled code objects are stored together with
+the order of simulator's signal slots, so that next processes (pytest workers, 'mtkcpu sim' runs)
+only need to elaborate the design (caching the source only is not enough - compiling it takes most of the time).
+
+Signals are matched by their creation order (Signal.duid) within the design, which is deterministic
+for given sources and configuration. Cache key covers content of all mtkcpu source files,
+Amaranth and Python versions, the configuration and signals' reset values (these are baked into
+the generated code - including memory and register file content), so any change invalidates the cache automatically.
+For the cache to be effective with many different programs, load them at runtime instead (see CpuSimSession).
+
+The cache depends on pysim internals, thus it's only enabled for the Amaranth version it was written for
+(SUPPORTED_AMARANTH_VERSION), otherwise the regular Simulator is used. Entries are plain JSON, code is loaded
+only from files that no one but the current user could have written, and is checked to refer to nothing
+but what pysim's code generator emits (see '_load_code'), with builtins restricted.
+"""
+
+import base64
+import hashlib
+import json
+import marshal
+import os
+import stat
+import sys
+from dataclasses import astuple
+from functools import lru_cache
+from pathlib import Path
+from types import CodeType, FunctionType
+from typing import Dict, List, Optional, Set, Tuple
+
+import amaranth
+from amaranth.hdl.ast import Signal, SignalSet
+from amaranth.hdl.ir import Fragment
+from amaranth.sim import Simulator
+from amaranth.sim._pyrtl import PyRTLProcess, _ValueCompiler
+from amaranth.sim.pysim import PySimEngine
+
+import mtkcpu
+from mtkcpu.cpu.cpu import MtkCpu
+from mtkcpu.units.mmio.sparse_memory import SparseMemory_Wishbone, sparse_memories_process
+from mtkcpu.utils.misc import get_color_logging_object
+
+log = get_color_logging_object()
+
+# Directory to store the cache in. Caching is disabled if not set.
+PYSIM_CACHE_ENV = "MTKCPU_PYSIM_CACHE"
+
+CACHE_FORMAT_VERSION = 2
+
+# The cache relies on pysim internals - for other Amaranth versions the regular Simulator is used.
+SUPPORTED_AMARANTH_VERSION = "0.4.0"
+
+# The only builtins, and all names in general, that code generated by pysim refers to.
+ALLOWED_BUILTINS = {"bool": bool}
+ALLOWED_NAMES = {"slots", "curr", "next", "set", *ALLOWED_BUILTINS, *_ValueCompiler.helpers}
+
+
+@lru_cache()
+def sources_digest() -> str:
+    h = hashlib.sha256()
+    root = Path(mtkcpu.__file__).parent
+    for path in sorted(root.rglob("*.py")):
+        h.update(str(path.relative_to(root)).encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def design_signals(fragment: Fragment) -> List[Signal]:
+    """
+    Returns all signals that pysim allocates slots for, ordered by creation.
+    """
+    signals = SignalSet()
+
+    def collect(fragment: Fragment):
+        for domain_name, domain_signals in fragment.drivers.items():
+            signals.update(domain_signals)
+            if domain_name is not None:
+                domain = fragment.domains[domain_name]
+                signals.add(domain.clk)
+                if domain.rst is not None:
+                    signals.add(domain.rst)
+        for stmt in fragment.statements:
+            signals.update(stmt._lhs_signals())
+            signals.update(stmt._rhs_signals())
+        for subfragment, _ in fragment.subfragments:
+            collect(subfragment)
+
+    collect(fragment)
+    return sorted(signals, key=lambda s: s.duid)
+
+
+def _code_names(code: CodeType) -> Set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _check_entry_file(path: Path) -> None:
+    """
+    Cached code gets executed - accept only files that no one but the current user could have written.
+    """
+    st = path.stat()
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise ValueError("file is not owned by the current user")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError("file is writable by other users")
+
+
+def _load_code(data: str) -> CodeType:
+    """
+    Refuses code that the code generator wouldn't emit - it only ever accesses signal slots, the helpers
+    and a single builtin (and it's run with only that one available, see '_init_from_cache').
+    """
+    code = marshal.loads(base64.b64decode(data))
+    if not isinstance(code, CodeType):
+        raise ValueError(f"expected code object, got {type(code)}")
+    unexpected = _code_names(code) - ALLOWED_NAMES
+    if unexpected:
+        raise ValueError(f"unexpected names in the generated code: {sorted(unexpected)}")
+    return code
+
+
+class CachedPySimEngine(PySimEngine):
+    """
+    Use 'get_simulator' instead of instantiating directly.
+    """
+    cache_dir: Path
+    config_key: Tuple
+
+    def __init__(self, fragment):
+        signals = design_signals(fragment)
+
+        h = hashlib.sha256()
+        for x in [CACHE_FORMAT_VERSION, sources_digest(), amaranth.__version__, sys.version, repr(self.config_key), len(signals)]:
+            h.update(repr(x).encode())
+        h.update(repr([s.reset for s in signals]).encode())
+        path = self.cache_dir / f"{h.hexdigest()}.json"
+
+        self.cache_hit = False
+        if path.exists():
+            try:
+                self._init_from_cache(fragment, signals, path)
+                self.cache_hit = True
+                return
+            except Exception as e:
+                log.warning(f"Ignoring broken pysim cache entry {path}: {e!r}")
+        super().__init__(fragment)
+        try:
+            self._store(signals, path)
+        except Exception as e:
+            log.warning(f"Failed to store pysim cache entry {path}: {e!r}")
+
+    def _signature(self, signals: List[Signal]) -> List[Tuple[str, int]]:
+        return [[s.name, len(s)] for s in signals]
+
+    def _store(self, signals: List[Signal], path: Path):
+        rank = {s.duid: i for i, s in enumerate(signals)}
+        slots = self._state.slots
+        triggers: Dict[PyRTLProcess, List[Tuple[int, Optional[int]]]] = {p: [] for p in self._processes}
+        for idx, slot in enumerate(slots):
+            for process, trigger in slot.waiters.items():
+                triggers[process].append((idx, trigger))
+
+        entry = {
+            "signature": self._signature(signals),
+            "slot_ranks": [rank[slot.signal.duid] for slot in slots],
+            "processes": [
+                (p.is_comb, triggers[p], base64.b64encode(marshal.dumps(p.run.__code__)).decode())
+                for p in self._processes
+            ],
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Other processes might be reading or writing the same entry concurrently.
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry))
+        os.replace(tmp, path)
+
+    def _init_from_cache(self, fragment: Fragment, signals: List[Signal], path: Path):
+        _check_entry_file(path)
+        entry = json.loads(path.read_text())
+        if entry["signature"] != self._signature(signals):
+            raise ValueError("design signals don't match")
+        # Checked before touching any state, so that a bad entry falls back to the regular code generation.
+        processes = [(is_comb, triggers, _load_code(code)) for is_comb, triggers, code in entry["processes"]]
+
+        super().__init__(Fragment())
+        self._fragment = fragment
+        state = self._state
+        for rank in entry["slot_ranks"]:
+            state.get_signal(signals[rank])
+
+        for is_comb, triggers, code in processes:
+            process = PyRTLProcess(is_comb=is_comb)
+            for idx, trigger in triggers:
+                state.add_trigger(process, state.slots[idx].signal, trigger=trigger)
+            helpers = {"__builtins__": ALLOWED_BUILTINS, "slots": state.slots, **_ValueCompiler.helpers}
+            process.run = FunctionType(code, helpers)
+            self._processes.add(process)
+
+
+def get_simulator(cpu: MtkCpu, cache_dir: Optional[Path] = None) -> Simulator:
+    """
+    Returns Simulator for the 'cpu', with generated code taken from 'cache_dir'
+    (or PYSIM_CACHE_ENV environment variable) if available.
+    Processes servicing simulation-only peripherals (e.g. sparse memory) are already added.
+    """
+    if cache_dir is None and os.getenv(PYSIM_CACHE_ENV):
+        cache_dir = Path(os.environ[PYSIM_CACHE_ENV])
+    if cache_dir is not None and amaranth.__version__ != SUPPORTED_AMARANTH_VERSION:
+        log.warning(f"pysim cache supports Amaranth {SUPPORTED_AMARANTH_VERSION} only, got {amaranth.__version__} - caching disabled.")
+        cache_dir = None
+    if cache_dir is None:
+        sim = Simulator(cpu)
+    else:
+        mem_config = cpu.mem_config
+        engine = type(CachedPySimEngine.__name__, (CachedPySimEngine,), dict(
+            cache_dir=cache_dir,
+            config_key=(astuple(cpu.cpu_config), mem_config.mem_size_words, mem_config.mem_addr, mem_config.simulate, mem_config.sparse_latency),
+        ))
+        sim = Simulator(cpu, engine=engine)
+
+    # NOTE: 'cpu.arbiter' is available only after elaboration, done by the Simulator.
+    sparse_memories = [owner for owner, _ in cpu.arbiter.get_mmio_devices_config() if isinstance(owner, SparseMemory_Wishbone)]
+    if sparse_memories:
+        sim.add_sync_process(sparse_memories_process(sparse_memories))
+    return sim
@@ -0,0 +1,112 @@
+"""
+Golden database of MemTestCase cycle counts (see 'assert_mem_test') - number of cycles it took the CPU
+to write the checked register. Test timeouts only catch hangs, while the golden counts catch performance
+regressions, e.g. a load taking a cycle more.
+
+A test getting slower than its golden count by more than CYCLE_TOLERANCE_ENV (relative, 0 by default) fails,
+or only warns if CYCLE_REGRESSION_ENV is set to 'warn'. After an intentional change of timing,
+re-baseline with 'make update-cycle-golden' (runs tests with CYCLE_UPDATE_ENV set, see 'check_cycle_count',
+recording into a fresh file given by CYCLE_GOLDEN_ENV, that replaces the golden one only if all tests passed).
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import warnings
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+CYCLE_GOLDEN_VERSION = 1
+
+DEFAULT_GOLDEN = Path(__file__).parent / "mem_test_cycles.json"
+
+CYCLE_UPDATE_ENV = "MTKCPU_UPDATE_CYCLE_GOLDEN"
+# Path of the golden file, DEFAULT_GOLDEN if not set.
+CYCLE_GOLDEN_ENV = "MTKCPU_CYCLE_GOLDEN"
+CYCLE_TOLERANCE_ENV = "MTKCPU_CYCLE_TOLERANCE"
+CYCLE_REGRESSION_ENV = "MTKCPU_CYCLE_REGRESSION"
+
+
+class CycleCountWarning(UserWarning):
+    pass
+
+
+def golden_key(name: str) -> str:
+    """
+    Case name, prefixed with currently running test's file and function (case names are unique only within a test).
+    """
+    # e.g. 'mtkcpu/tests/test_memory.py::test_memory[test_case0] (call)'
+    test_id = os.environ.get("PYTEST_CURRENT_TEST", "").split(" ")[0]
+    if not test_id:
+        return name
+    path, _, function = test_id.partition("::")
+    return f"{Path(path).name}::{function.split('[')[0]}::{name}"
+
+
+def load_golden(path: Path) -> Dict[str, int]:
+    if not path.exists():
+        return {}
+    golden = json.loads(path.read_text())
+    if golden.get("version") != CYCLE_GOLDEN_VERSION:
+        raise ValueError(f"{path}: unsupported golden file version {golden.get('version')}, expected {CYCLE_GOLDEN_VERSION}.")
+    return golden["cycles"]
+
+
+@lru_cache(maxsize=None)
+def _load_golden_cached(path: Path) -> Dict[str, int]:
+    return load_golden(path)
+
+
+def save_golden(cycles: Dict[str, int], path: Path) -> None:
+    golden = {
+        "version": CYCLE_GOLDEN_VERSION,
+        "cycles": dict(sorted(cycles.items())),
+    }
+    path.write_text(json.dumps(golden, indent=2) + "\n")
+
+
+def update_golden(key: str, cycles: int, path: Path) -> None:
+    """
+    Stores a single count - safe to be called from parallel test processes.
+    """
+    with open(Path(tempfile.gettempdir()) / f"{path.name}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        golden = load_golden(path)
+        golden[key] = cycles
+        save_golden(golden, path)
+    _load_golden_cached.cache_clear()
+
+
+def check_cycle_count(name: str, cycles: int, path: Optional[Path] = None) -> None:
+    """
+    Compares 'cycles' with the golden count (see the module docstring), or records it if CYCLE_UPDATE_ENV is set.
+    Tests missing in the golden file only emit a warning.
+    """
+    if path is None:
+        path = Path(os.environ.get(CYCLE_GOLDEN_ENV, DEFAULT_GOLDEN))
+    key = golden_key(name)
+    if os.environ.get(CYCLE_UPDATE_ENV):
+        update_golden(key, cycles, path=path)
+        return
+
+    golden = _load_golden_cached(path).get(key)
+    if golden is None:
+        warnings.warn(f"{key}: no golden cycle count in {path}, got {cycles} cycles.", CycleCountWarning)
+        return
+
+    tolerance = float(os.environ.get(CYCLE_TOLERANCE_ENV, 0))
+    if cycles <= golden * (1 + tolerance):
+        return
+    msg = (
+        f"{key}: took {cycles} cycles, golden count is {golden} ({cycles / golden - 1:+.0%}, tolerance {tolerance:.0%}). "
+        f"Run 'make update-cycle-golden' if it's intentional."
+    )
+    mode = os.environ.get(CYCLE_REGRESSION_ENV, "fail")
+    if mode == "warn":
+        warnings.warn(msg, CycleCountWarning)
+    elif mode == "fail":
+        raise AssertionError(msg)
+    else:
+        raise ValueError(f"Unknown {CYCLE_REGRESSION_ENV} value '{mode}', expected 'fail' or 'warn'.")
@@ -10,6 +10,7 @@ from mtkcpu.utils.misc import get_color_logging_object, get_members
 from mtkcpu.cpu.cpu import MtkCpu
 from mtkcpu.units.debug.types import DMI_reg_kinds
 from mtkcpu.utils.tests.sim_tests import get_state_name
+from mtkcpu.utils.tests.monitor_hub import MonitorHub, monitor
 from mtkcpu.cpu.isa import Funct3
 from mtkcpu.units.csr.csr_handlers import DCSR, DPC
 
@@ -97,46 +98,30 @@ class DMI_Monitor(Elaboratable):
         return m
 
 def monitor_cmderr(dmi_monitor: DMI_Monitor):
-    def aux():
-        yield Passive()
-
-        prev_cmderr = None
-        while True:
-            cmderr = yield dmi_monitor.cur_ABSTRACTCS_latched.cmderr
+    @monitor
+    def aux(hub: MonitorHub):
+        def on_cmderr(cmderr, prev_cmderr):
             if cmderr == ABSTRACTCS_Layout.CMDERR.OTHER:
                 raise ValueError("cmderror OTHER detected! Probably not implemented scenario happened")
-            if cmderr != ABSTRACTCS_Layout.CMDERR.NO_ERR and prev_cmderr != cmderr:
+            if cmderr != ABSTRACTCS_Layout.CMDERR.NO_ERR:
                 logging.warn(f"cmderr == {cmderr}")
-            prev_cmderr = cmderr
-            yield
+        hub.on_change(dmi_monitor.cur_ABSTRACTCS_latched.cmderr, on_cmderr)
     return aux
 
 def monitor_cpu_dm_if_error(dmi_monitor: DMI_Monitor):
-    def aux():
-        yield Passive()
-
+    @monitor
+    def aux(hub: MonitorHub):
         cpu_if = dmi_monitor.cpu.running_state_interface
-        
-        while True:
-            
-            related_signals = ["haltreq", "haltack", "resumereq", "resumeack"]
+        related_signals = ["haltreq", "haltack", "resumereq", "resumeack"]
 
-            for x in related_signals:
-                val = yield getattr(cpu_if, x)
-                locals()[x] = val
-            
-            if (yield cpu_if.error_sticky):
-                lst = []
-                for name in related_signals:
-                    lst.append(f"{name}={locals()[name]}({locals()[f'prev_{name}']})")
+        def on_error(_):
+            lst = []
+            for name in related_signals:
+                lst.append(f"{name}={(yield getattr(cpu_if, name))}")
+            msg = ", ".join(lst)
+            raise ValueError(f"CpuRunningStateExternalInterface misuse detected! {msg}")
 
-                msg = ", ".join(lst)
-                raise ValueError(f"CpuRunningStateExternalInterface misuse detected! {msg}")
-            
-            for x in related_signals:
-                locals()[f"prev_{x}"] = val
-                
-            yield
+        hub.on([cpu_if.error_sticky], bool, on_error)
     return aux
 
 
@@ -202,34 +187,31 @@ def monitor_abstractauto(dmi_monitor: DMI_Monitor):
         from beepy import beep
     except Exception:
         beep = lambda *_ : None
-    def aux():
-        yield Passive()
-
-        while True:
-            new_dmi_transaction = yield dmi_monitor.new_dmi_transaction
-            if new_dmi_transaction:
-                op   = yield dmi_monitor.cur_dmi_bus.op
-                addr = yield dmi_monitor.cur_dmi_bus.address
-                if (op, addr) == (DMIOp.WRITE, DMIReg.ABSTRACTAUTO):
-                        for _ in range(4):
-                            logging.warn("")
-                        struct = dmi_monitor.cpu.debug.dmi_regs[DMIReg.COMMAND]
-                        reg_dump = debug_inspect_applied_struct(struct, (yield struct.as_value()))
-                        logging.warn(f"COMMAND during ABSTRACTAUTO write: {reg_dump}")
-                if (op, addr) == (DMIOp.WRITE, DMIReg.DMCONTROL):
-                    cpu_dmactive = yield dmi_monitor.cpu.debug.dmi_regs[DMIReg.DMCONTROL].dmactive
-                    value = yield dmi_monitor.cur_dmi_bus.data
-                    write_dmactive = yield dmi_monitor.cur_DMCONTROL.dmactive
-                    from multiprocessing import Process
-                    # Process(target=beep, args=(6,)).start()
-                    logging.info(f"<< >> CPU dmactive {cpu_dmactive}, write dmactive {write_dmactive} << >>")
-                    if value & 0x2:
-                        # ndmreset is 0x2.
-                        Process(target=beep, args=(4,)).start()
-                        for _ in range(4):
-                            logging.info("<< >> << >>")
-
-            yield
+    @monitor
+    def aux(hub: MonitorHub):
+        def on_transaction(_):
+            op   = yield dmi_monitor.cur_dmi_bus.op
+            addr = yield dmi_monitor.cur_dmi_bus.address
+            if (op, addr) == (DMIOp.WRITE, DMIReg.ABSTRACTAUTO):
+                for _ in range(4):
+                    logging.warn("")
+                struct = dmi_monitor.cpu.debug.dmi_regs[DMIReg.COMMAND]
+                reg_dump = debug_inspect_applied_struct(struct, (yield struct.as_value()))
+                logging.warn(f"COMMAND during ABSTRACTAUTO write: {reg_dump}")
+            if (op, addr) == (DMIOp.WRITE, DMIReg.DMCONTROL):
+                cpu_dmactive = yield dmi_monitor.cpu.debug.dmi_regs[DMIReg.DMCONTROL].dmactive
+                value = yield dmi_monitor.cur_dmi_bus.data
+                write_dmactive = yield dmi_monitor.cur_DMCONTROL.dmactive
+                from multiprocessing import Process
+                # Process(target=beep, args=(6,)).start()
+                logging.info(f"<< >> CPU dmactive {cpu_dmactive}, write dmactive {write_dmactive} << >>")
+                if value & 0x2:
+                    # ndmreset is 0x2.
+                    Process(target=beep, args=(4,)).start()
+                    for _ in range(4):
+                        logging.info("<< >> << >>")
+
+        hub.on([dmi_monitor.new_dmi_transaction], bool, on_transaction)
     return aux
 
 def pprint_bin_chunked(val: int, bits_high_to_low: list[int]) -> str:
@@ -258,125 +240,132 @@ class Color:
     blue = "\x1b[34m"
 
 def print_dmi_transactions(dmi_monitor: DMI_Monitor):
-    def aux():
-        yield Passive()
-
+    @monitor
+    def aux(hub: MonitorHub):
         def print_fn(s: str):
             logging.info(s)
 
+        READ_TIMEOUT = 1000
         last_data0 = None
-        while True:
-            new_dmi_transaction = yield dmi_monitor.new_dmi_transaction
-            if new_dmi_transaction:
-                op   = yield dmi_monitor.cur_dmi_bus.op
-                addr = yield dmi_monitor.cur_dmi_bus.address
-                value = yield dmi_monitor.cur_dmi_bus.data
-                if op in [DMIOp.READ, DMIOp.WRITE]:
-                    action = "reading" if op == DMIOp.READ else "writing"
-                    try:
-                        struct, reg_dump = None, None
-                        addr = DMIReg(addr)
-                        struct = dmi_monitor.cpu.debug.dmi_regs[addr]
-                    except Exception as e:
-                        print_fn(f"Either unknown DMI reg {addr} or not registered in DMI_reg_kinds.")
-                    
-                    if op == DMIOp.WRITE and struct is not None:
-                        reg_dump = debug_inspect_applied_struct(struct, value)
-                        reg_dump = reg_dump.replace("resumereq=0x1", f"{Color.cyan}resumereq=0x1{Color.green}")
-                        reg_dump = reg_dump.replace("haltreq=0x1", f"{Color.blue}haltreq=0x1{Color.green}")
-
-                    msg = f"(mtime={(yield dmi_monitor.cpu.mtime)})DMI: {action}, address: {addr!r}"
-                    if op == DMIOp.WRITE:
-                        msg += f", value: {hex(value)} aka {_bin(value)}, dump {reg_dump}"
-                    print_fn(msg)
-
-                    if op == DMIOp.READ:
-                        if struct is None:
-                            print_fn(f"Skipping waiting for DMI READ to complete "
-                                     f"as DMI REG {addr} is not implemented, so no dump can be created.")
-                            yield
-                            continue
-                        timeout = 1000
-                        for _ in range(timeout):
-                            dr_capture = yield dmi_monitor.cpu.debug.jtag.jtag_fsm_capture_dr
-                            if dr_capture:
-                                break
-                            else:
-                                yield
-                        else:
-                            raise ValueError(f"After DMI READ testbenched expected DR capture to happen in {timeout} cycles, but it didn't happen.")
-
-                        # TODO - the 2 bits offset is because 'dr' is 41 bits (7 addr, 32 data, 2 op_type)
-                        dr = (yield dmi_monitor.cpu.debug.jtag.dr) >> 2
-                        reg_dump = debug_inspect_applied_struct(struct, dr)
-                        logging.warn(f"DMI READ RESPONSE to address: {addr!r}, value: {hex(dr)} aka {_bin(dr)}, dump {reg_dump}")
-                        continue
-
-                    assert op != DMIOp.READ
-
-                    if addr == DMIReg.DATA0 and op == DMIOp.WRITE:
-                        last_data0 = value
-                        logging.critical(f"SETTING DATA0 to {hex(last_data0)}")
-
-                    if addr == DMIReg.COMMAND:
-                        assert op == DMIOp.WRITE
-                        acc_reg = dmi_monitor.cur_COMMAND.control
-                        regno = yield acc_reg.regno
-                        write = yield acc_reg.write
-                        transfer = yield acc_reg.transfer
-                        if transfer:
-                            if write:
-                                logging.critical(f"DMI WRITE, addr: {hex(regno)}, DATA0: {hex(last_data0)}")
-                            else:
-                                logging.critical(f"DMI READ, addr: {hex(regno)}")
-                                
-                    
-                    if addr == DMIReg.DMCONTROL and op == DMIOp.WRITE:
-                        haltreq = yield dmi_monitor.cur_DMCONTROL.haltreq
-                        resumereq = yield dmi_monitor.cur_DMCONTROL.resumereq
-                        cpu_dmactive = yield dmi_monitor.cpu.debug.dmi_regs[DMIReg.DMCONTROL].dmactive
-                        if (not cpu_dmactive) and (haltreq or resumereq):
-                            raise ValueError(f"Likely a bug in CPU implementation: Attempt to (haltreq={haltreq}, resumereq={resumereq}) when cpu's dmactive=0!")
-                        cpu_halted = yield dmi_monitor.cpu.running_state.halted
-                        if haltreq and cpu_halted:
-                            logging.critical(f"Possibly a bug in CPU or in debugger: Attempt to haltreq when cpu is already halted!")
-                            # prev_state = None
-                            # prev_jtag_tap_dmi_bus = 0
-                            # while True:
-                            #     fsm = dmi_monitor.cpu.debug.fsm
-                            #     state = get_state_name(fsm, (yield fsm.state))
-                            #     if state != prev_state:
-                            #         mtime = yield dmi_monitor.cpu.mtime
-                            #         logging.critical(f"mtime={mtime}, entry to state {state}")
-                            #         prev_state = state
-                            #     haltack =       yield dmi_monitor.cpu.running_state_interface.haltack
-                            #     resumeack =     yield dmi_monitor.cpu.running_state_interface.resumeack
-                            #     cmd_finished =  yield dmi_monitor.cpu.debug.controller.command_finished
-                            #     cmd_err =       yield dmi_monitor.cpu.debug.controller.command_err
-                            #     if haltack or cmd_err or cmd_finished or resumeack:
-                            #         logging.critical(f"(mtime={(yield dmi_monitor.cpu.mtime)}) haltack {haltack}, resumeack {resumeack}, cmderr: {cmd_err}, cmd_finished: {cmd_finished}")
-                            #     if cmd_finished:
-                            #         raise ValueError("OK")
-                                
-                            #     jtag_tap_dmi_bus    = yield dmi_monitor.cpu.debug.jtag.regs[JtagIR.DMI].w.as_value()
-                            #     update              = yield dmi_monitor.cpu.debug.jtag.regs[JtagIR.DMI].update
-                            #     if update:
-                            #         logging.critical(f"(mtime={(yield dmi_monitor.cpu.mtime)}) UPDATE!")
-                            #     if jtag_tap_dmi_bus != prev_jtag_tap_dmi_bus:
-                            #         dmi_bus_bit_mask = [7, 32, 2]  # 7 bit addr, 32 bit data, 2 bit op
-                            #         logging.critical(f"(mtime={(yield dmi_monitor.cpu.mtime)}) BUS was {pprint_bin_chunked(prev_jtag_tap_dmi_bus, dmi_bus_bit_mask)}, now is {pprint_bin_chunked(jtag_tap_dmi_bus, dmi_bus_bit_mask)} (aka {hex(jtag_tap_dmi_bus)})")
-                            #         prev_jtag_tap_dmi_bus = jtag_tap_dmi_bus
-
-                            #     yield
-                    
-                    from riscvmodel.code import decode
-                    if addr in [DMIReg.PROGBUF0 + i for i in range(16)] and op == DMIOp.WRITE:
-                        try:
-                            ins_str = f"{decode(value)}  <{hex(value)}>"
-                        except Exception:
-                            ins_str = f"Unknown: {hex(value)}"
-                        logging.critical(f"PROGBUF{addr - DMIReg.PROGBUF0} write: {ins_str}")
-            yield
+        # (address, struct, cycles left) of a DMI READ waiting for the response (DR capture).
+        pending_read = None
+
+        def on_cycle(dr_capture):
+            nonlocal pending_read
+            if pending_read is None:
+                return
+            addr, struct, cycles_left = pending_read
+            if not dr_capture:
+                if cycles_left == 1:
+                    raise ValueError(f"After DMI READ testbenched expected DR capture to happen in {READ_TIMEOUT} cycles, but it didn't happen.")
+                pending_read = addr, struct, cycles_left - 1
+                return
+            pending_read = None
+            # TODO - the 2 bits offset is because 'dr' is 41 bits (7 addr, 32 data, 2 op_type)
+            dr = (yield dmi_monitor.cpu.debug.jtag.dr) >> 2
+            reg_dump = debug_inspect_applied_struct(struct, dr)
+            logging.warn(f"DMI READ RESPONSE to address: {addr!r}, value: {hex(dr)} aka {_bin(dr)}, dump {reg_dump}")
+
+        def on_transaction(_):
+            nonlocal last_data0, pending_read
+            if pending_read is not None:
+                return
+            op   = yield dmi_monitor.cur_dmi_bus.op
+            addr = yield dmi_monitor.cur_dmi_bus.address
+            value = yield dmi_monitor.cur_dmi_bus.data
+            if op not in [DMIOp.READ, DMIOp.WRITE]:
+                return
+            action = "reading" if op == DMIOp.READ else "writing"
+            try:
+                struct, reg_dump = None, None
+                addr = DMIReg(addr)
+                struct = dmi_monitor.cpu.debug.dmi_regs[addr]
+            except Exception as e:
+                print_fn(f"Either unknown DMI reg {addr} or not registered in DMI_reg_kinds.")
+            
+            if op == DMIOp.WRITE and struct is not None:
+                reg_dump = debug_inspect_applied_struct(struct, value)
+                reg_dump = reg_dump.replace("resumereq=0x1", f"{Color.cyan}resumereq=0x1{Color.green}")
+                reg_dump = reg_dump.replace("haltreq=0x1", f"{Color.blue}haltreq=0x1{Color.green}")
+
+            msg = f"(mtime={(yield dmi_monitor.cpu.mtime)})DMI: {action}, address: {addr!r}"
+            if op == DMIOp.WRITE:
+                msg += f", value: {hex(value)} aka {_bin(value)}, dump {reg_dump}"
+            print_fn(msg)
+
+            if op == DMIOp.READ:
+                if struct is None:
+                    print_fn(f"Skipping waiting for DMI READ to complete "
+                             f"as DMI REG {addr} is not implemented, so no dump can be created.")
+                    return
+                # Response gets logged by 'on_cycle', starting from the current cycle.
+                pending_read = addr, struct, READ_TIMEOUT
+                return
+
+            if addr == DMIReg.DATA0 and op == DMIOp.WRITE:
+                last_data0 = value
+                logging.critical(f"SETTING DATA0 to {hex(last_data0)}")
+
+            if addr == DMIReg.COMMAND:
+                assert op == DMIOp.WRITE
+                acc_reg = dmi_monitor.cur_COMMAND.control
+                regno = yield acc_reg.regno
+                write = yield acc_reg.write
+                transfer = yield acc_reg.transfer
+                if transfer:
+                    if write:
+                        logging.critical(f"DMI WRITE, addr: {hex(regno)}, DATA0: {hex(last_data0)}")
+                    else:
+                        logging.critical(f"DMI READ, addr: {hex(regno)}")
+            
+            if addr == DMIReg.DMCONTROL and op == DMIOp.WRITE:
+                haltreq = yield dmi_monitor.cur_DMCONTROL.haltreq
+                resumereq = yield dmi_monitor.cur_DMCONTROL.resumereq
+                cpu_dmactive = yield dmi_monitor.cpu.debug.dmi_regs[DMIReg.DMCONTROL].dmactive
+                if (not cpu_dmactive) and (haltreq or resumereq):
+                    raise ValueError(f"Likely a bug in CPU implementation: Attempt to (haltreq={haltreq}, resumereq={resumereq}) when cpu's dmactive=0!")
+                cpu_halted = yield dmi_monitor.cpu.running_state.halted
+                if haltreq and cpu_halted:
+                    logging.critical(f"Possibly a bug in CPU or in debugger: Attempt to haltreq when cpu is already halted!")
+                    # prev_state = None
+                    # prev_jtag_tap_dmi_bus = 0
+                    # while True:
+                    #     fsm = dmi_monitor.cpu.debug.fsm
+                    #     state = get_state_name(fsm, (yield fsm.state))
+                    #     if state != prev_state:
+                    #         mtime = yield dmi_monitor.cpu.mtime
+                    #         logging.critical(f"mtime={mtime}, entry to state {state}")
+                    #         prev_state = state
+                    #     haltack =       yield dmi_monitor.cpu.running_state_interface.haltack
+                    #     resumeack =     yield dmi_monitor.cpu.running_state_interface.resumeack
+                    #     cmd_finished =  yield dmi_monitor.cpu.debug.controller.command_finished
+                    #     cmd_err =       yield dmi_monitor.cpu.debug.controller.command_err
+                    #     if haltack or cmd_err or cmd_finished or resumeack:
+                    #         logging.critical(f"(mtime={(yield dmi_monitor.cpu.mtime)}) haltack {haltack}, resumeack {resumeack}, cmderr: {cmd_err}, cmd_finished: {cmd_finished}")
+                    #     if cmd_finished:
+                    #         raise ValueError("OK")
+
+                    #     jtag_tap_dmi_bus    = yield dmi_monitor.cpu.debug.jtag.regs[JtagIR.DMI].w.as_value()
+                    #     update              = yield dmi_monitor.cpu.debug.jtag.regs[JtagIR.DMI].update
+                    #     if update:
+                    #         logging.critical(f"(mtime={(yield dmi_monitor.cpu.mtime)}) UPDATE!")
+                    #     if jtag_tap_dmi_bus != prev_jtag_tap_dmi_bus:
+                    #         dmi_bus_bit_mask = [7, 32, 2]  # 7 bit addr, 32 bit data, 2 bit op
+                    #         logging.critical(f"(mtime={(yield dmi_monitor.cpu.mtime)}) BUS was {pprint_bin_chunked(prev_jtag_tap_dmi_bus, dmi_bus_bit_mask)}, now is {pprint_bin_chunked(jtag_tap_dmi_bus, dmi_bus_bit_mask)} (aka {hex(jtag_tap_dmi_bus)})")
+                    #         prev_jtag_tap_dmi_bus = jtag_tap_dmi_bus
+
+                    #     yield
+            
+            from riscvmodel.code import decode
+            if addr in [DMIReg.PROGBUF0 + i for i in range(16)] and op == DMIOp.WRITE:
+                try:
+                    ins_str = f"{decode(value)}  <{hex(value)}>"
+                except Exception:
+                    ins_str = f"Unknown: {hex(value)}"
+                logging.critical(f"PROGBUF{addr - DMIReg.PROGBUF0} write: {ins_str}")
+
+        hub.on([dmi_monitor.new_dmi_transaction], bool, on_transaction)
+        hub.on([dmi_monitor.cpu.debug.jtag.jtag_fsm_capture_dr], None, on_cycle)
     return aux
 
 def dmi_op_wait_for_cmderr(dmi_monitor: DMI_Monitor, expected_cmderr: int, timeout: int = 40):
@@ -468,6 +457,23 @@ def informative_monitors(dmi_monitor: DMI_Monitor):
         monitor_cpu_and_dm_state(dmi_monitor=dmi_monitor),
     ]
 
+def jtag_test_monitors(dmi_monitor: DMI_Monitor):
+    """
+    Monitors used by the JTAG (openOCD) test.
+    """
+    return [
+        monitor_cmderr(dmi_monitor),
+        monitor_cpu_dm_if_error(dmi_monitor),
+        monitor_cpu_and_dm_state(dmi_monitor),
+        monitor_pc_and_main_fsm(cpu=dmi_monitor.cpu),
+        print_dmi_transactions(dmi_monitor),
+        monitor_writes_to_gpr(dmi_monitor, gpr_num=8),
+        monitor_halt_or_resume_req_get_ack(dmi_monitor),
+        monitor_writes_to_dcsr(dmi_monitor=dmi_monitor),
+        monitor_abstractauto(dmi_monitor=dmi_monitor),
+        bus_capture_write_transactions(cpu=dmi_monitor.cpu, output_dict=dict()),
+    ]
+
 def few_ticks(n=10):
     for _ in range(n):
         yield
@@ -501,81 +507,71 @@ def activate_DM_and_halt_via_dmi(dmi_monitor: DMI_Monitor):
     yield from dmi_op_wait_for_success(dmi_monitor=dmi_monitor, timeout=20)
 
 def monitor_cpu_and_dm_state(dmi_monitor: DMI_Monitor):
-    def aux():
-        yield Passive()
+    @monitor
+    def aux(hub: MonitorHub):
+        def on_dmactive(dmactive, prev_dmactive):
+            mtime = yield dmi_monitor.cpu.mtime
+            repr = "active" if dmactive else "inactive"
+            note = "from initial" if prev_dmactive is None else ""
+            logging.info(f"(mtime={mtime}) DM changed state {note} to {repr}")
 
-        prev_cpu_state = None
-        prev_dmactive = None
-        while True:
-            dmactive = yield dmi_monitor.cpu.debug.dmi_regs[DMIReg.DMCONTROL].dmactive
+        def on_cpu_state(cpu_state, prev_cpu_state):
             mtime = yield dmi_monitor.cpu.mtime
-            if dmactive != prev_dmactive:
-                repr = "active" if dmactive else "inactive"
-                note = "from initial" if prev_dmactive is None else ""
-                logging.info(f"(mtime={mtime}) DM changed state {note} to {repr}")
-            prev_dmactive = dmactive
-            
-            cpu_state = yield dmi_monitor.cpu.running_state.halted
-            if cpu_state != prev_cpu_state:
-                repr = "halted" if cpu_state else "running"
-                note = "from initial" if prev_cpu_state is None else ""
-                logging.info(f"(mtime={mtime}) CPU changed state {note} to {repr}")
-            prev_cpu_state = cpu_state
-
-            yield
+            repr = "halted" if cpu_state else "running"
+            note = "from initial" if prev_cpu_state is None else ""
+            logging.info(f"(mtime={mtime}) CPU changed state {note} to {repr}")
+
+        hub.on_change(dmi_monitor.cpu.debug.dmi_regs[DMIReg.DMCONTROL].dmactive, on_dmactive)
+        hub.on_change(dmi_monitor.cpu.running_state.halted, on_cpu_state)
     return aux
 
 
 def monitor_halt_or_resume_req_get_ack(dmi_monitor: DMI_Monitor, timeout_ticks: int = 20):
-    def aux():
-        yield Passive()
-
-        while True:
-            haltreq = yield dmi_monitor.cpu.running_state_interface.haltreq
-            resumereq = yield dmi_monitor.cpu.running_state_interface.resumereq
-
-            # NOTE: it is legal for debugger to set 'resumereq' when the hart is not halted (it just has no effect)
-            # (analogically with 'haltreq'). Actually, openOCD does this at some point..
-
-            # TODO: maybe it could be relaxed.
-            assert not (haltreq and resumereq)
-
-            if haltreq:
-                halted = yield dmi_monitor.cpu.running_state.halted 
-                if not halted:
-                    for _ in range(timeout_ticks):
-                        ack = yield dmi_monitor.cpu.running_state_interface.haltack
-                        if ack:
-                            break
-                        yield
-                    else:
-                        raise ValueError(f"haltreq didnt get an ack in {timeout_ticks} ticks!")
-
-            if resumereq:
-                halted = yield dmi_monitor.cpu.running_state.halted 
-                if halted:
-                    for _ in range(timeout_ticks):
-                        ack = yield dmi_monitor.cpu.running_state_interface.resumeack
-                        if ack:
-                            break
-                        yield
-                    else:
-                        raise ValueError(f"resumereq didnt get an ack in {timeout_ticks} ticks!")
-            yield
+    @monitor
+    def aux(hub: MonitorHub):
+        cpu_if = dmi_monitor.cpu.running_state_interface
+        # (ack signal, cycles left) of a request waiting for the ack.
+        waiting = None
+
+        def on_cycle(haltreq, resumereq):
+            nonlocal waiting
+            if waiting is None:
+                # NOTE: it is legal for debugger to set 'resumereq' when the hart is not halted (it just has no effect)
+                # (analogically with 'haltreq'). Actually, openOCD does this at some point..
+
+                # TODO: maybe it could be relaxed.
+                assert not (haltreq and resumereq)
+
+                if not (haltreq or resumereq):
+                    return
+                halted = yield dmi_monitor.cpu.running_state.halted
+                if haltreq and not halted:
+                    waiting = cpu_if.haltack, timeout_ticks
+                elif resumereq and halted:
+                    waiting = cpu_if.resumeack, timeout_ticks
+                else:
+                    return
+
+            ack_signal, cycles_left = waiting
+            if (yield ack_signal):
+                waiting = None
+            elif cycles_left == 1:
+                req = "haltreq" if ack_signal is cpu_if.haltack else "resumereq"
+                raise ValueError(f"{req} didnt get an ack in {timeout_ticks} ticks!")
+            else:
+                waiting = ack_signal, cycles_left - 1
+
+        hub.on([cpu_if.haltreq, cpu_if.resumereq], None, on_cycle)
     return aux
 
 
 def monitor_writes_to_gpr(dmi_monitor: DMI_Monitor, gpr_num: int):
-    def aux():
-        yield Passive()
-        prev_x = 0
+    @monitor
+    def aux(hub: MonitorHub):
         assert gpr_num in range(1, 33)
-        while True:
-            x = yield dmi_monitor.cpu.regs._array._inner[gpr_num]
-            if x != prev_x:
-                logging.critical(f">>> {hex(x)} written to x{gpr_num}")
-                prev_x = x
-            yield
+        def on_write(x, _):
+            logging.critical(f">>> {hex(x)} written to x{gpr_num}")
+        hub.on_change(dmi_monitor.cpu.regs._array._inner[gpr_num], on_write, initial=0)
     return aux
 
 def monitor_writes_to_dcsr(dmi_monitor: DMI_Monitor):
@@ -583,30 +579,29 @@ def monitor_writes_to_dcsr(dmi_monitor: DMI_Monitor):
     dcsr_addr = DCSR.addr
     dpc_addr = DPC.addr
     
-    def aux():
-        yield Passive()
+    @monitor
+    def aux(hub: MonitorHub):
         csr_unit = dmi_monitor.cpu.csr_unit
-        while True:
-            csr_unit_active = yield csr_unit.en
+
+        def on_csr_unit_active(_):
             csr_idx         = yield csr_unit.csr_idx
             funct3          = yield csr_unit.func3
             rs1             = yield csr_unit.rs1
             rs1val          = yield csr_unit.rs1val
-            if csr_unit_active:
-                if funct3 in [Funct3.CSRRS, Funct3.CSRRSI]:
-                    if rs1val == 0:
-                        yield
-                        continue # not interesting - only read.
-                    if csr_idx == dcsr_addr:
-                        logging.critical(f"------       DCSR write: {Funct3(funct3)}, rs1 {rs1}, rs1val {rs1val}")
-                    elif csr_idx == dpc_addr:
-                        logging.critical(f"------       DPC write: {Funct3(funct3)}, rs1 {rs1}, rs1val {rs1val}")
-                if funct3 in [Funct3.CSRRW]:
-                    if csr_idx == dcsr_addr:
-                        logging.critical(f"------       DCSR write: {Funct3(funct3)}, rs1 {rs1}, rs1val {rs1val}")
-                if funct3 in [Funct3.CSRRWI]:
-                    raise NotImplementedError()
-            yield
+            if funct3 in [Funct3.CSRRS, Funct3.CSRRSI]:
+                if rs1val == 0:
+                    return # not interesting - only read.
+                if csr_idx == dcsr_addr:
+                    logging.critical(f"------       DCSR write: {Funct3(funct3)}, rs1 {rs1}, rs1val {rs1val}")
+                elif csr_idx == dpc_addr:
+                    logging.critical(f"------       DPC write: {Funct3(funct3)}, rs1 {rs1}, rs1val {rs1val}")
+            if funct3 in [Funct3.CSRRW]:
+                if csr_idx == dcsr_addr:
+                    logging.critical(f"------       DCSR write: {Funct3(funct3)}, rs1 {rs1}, rs1val {rs1val}")
+            if funct3 in [Funct3.CSRRWI]:
+                raise NotImplementedError()
+
+        hub.on([csr_unit.en], bool, on_csr_unit_active)
     return aux
 
 def monitor_pc_and_main_fsm(cpu: MtkCpu, log_fn : Optional[Callable[[str], None]] = None, wait_for_first_haltreq: bool = True, regs_verbose: list[str] = []):
@@ -615,17 +610,8 @@ def monitor_pc_and_main_fsm(cpu: MtkCpu, log_fn : Optional[Callable[[str], None]
     from riscvmodel.code import decode
     log_fn = log_fn or (lambda x: logging.critical(f"\t\t\t\t {x}"))
     
-    def aux():
-        yield Passive()
-
-        if wait_for_first_haltreq:
-            # To avoid spam, wait till first haltreq debugger event.
-            while True:
-                haltreq = yield cpu.running_state_interface.haltreq
-                if haltreq:
-                    break
-                yield
-        
+    @monitor
+    def aux(hub: MonitorHub):
         def disas(instr: int) -> str:
             try:
                 res = str(decode(instr))
@@ -634,13 +620,14 @@ def monitor_pc_and_main_fsm(cpu: MtkCpu, log_fn : Optional[Callable[[str], None]
             return res
 
         prev_state = None
-        while True:
-            instr = yield cpu.instr
-            state = get_state_name(cpu.main_fsm, (yield cpu.main_fsm.state))
-            pc = (yield cpu.pc)
 
-            if state == "FETCH" and state != prev_state:
-                # log_fn(f"detected state change: {prev_state} -> FETCH. pc changed from {prev_pc} to {pc}.")
+        def on_state(state):
+            nonlocal prev_state
+            state = get_state_name(cpu.main_fsm, state)
+            if state == prev_state:
+                return
+            # log_fn(f"detected state change: {prev_state} -> FETCH. pc changed from {prev_pc} to {pc}.")
+            if state == "FETCH":
                 regs_str = ""
                 if regs_verbose:
                     from mtkcpu.tests.instr_trace_compare import reg_abi_name_to_phys
@@ -649,18 +636,37 @@ def monitor_pc_and_main_fsm(cpu: MtkCpu, log_fn : Optional[Callable[[str], None]
                         value = yield cpu.regs._array[phys_nr]
                         regs_str += f"{abi_name}={hex(value)},"
                     log_fn(f"{'':70} {regs_str}")
-            if state == "DECODE" and state != prev_state:
+            if state == "DECODE":
+                instr = yield cpu.instr
+                pc = yield cpu.pc
                 dis = disas(instr)
                 log_fn(f"{hex(pc):10}: {hex(instr):30}: {dis:30}")
-            if state == "TRAP" and state != prev_state:
-
+            if state == "TRAP":
+                instr = yield cpu.instr
+                pc = yield cpu.pc
                 is_irq = yield cpu.csr_unit.mcause.as_view().interrupt
                 cause = yield cpu.csr_unit.mcause.as_view().ecode
                 cause_str = IrqCause(cause) if is_irq else TrapCause(cause)
 
                 log_fn(f"TRAP at pc {hex(pc)} at state {prev_state}, instr {hex(instr)}. cause: {str(cause_str)}")
             prev_state = state
-            yield
+
+        if not wait_for_first_haltreq:
+            hub.on([cpu.main_fsm.state], None, on_state)
+            return
+
+        # To avoid spam, wait till first haltreq debugger event.
+        halt_requested = False
+
+        def on_haltreq(_):
+            nonlocal halt_requested
+            if not halt_requested:
+                halt_requested = True
+                hub.on([cpu.main_fsm.state], None, on_state)
+                # Trigger registered above starts sampling in the next cycle.
+                yield from on_state((yield cpu.main_fsm.state))
+
+        hub.on([cpu.running_state_interface.haltreq], bool, on_haltreq)
     return aux
 
 
@@ -668,24 +674,24 @@ def monitor_pc_and_main_fsm(cpu: MtkCpu, log_fn : Optional[Callable[[str], None]
 # Almost-duplicate of mtkcpu.utils.tests.utils.capture_write_transactions, that captures only EBR transactions,
 # but heavily used, so cannot easily change it.
 def bus_capture_write_transactions(cpu : MtkCpu, output_dict: dict):
-    def f():
-        yield Passive()
+    @monitor
+    def f(hub: MonitorHub):
         gb = cpu.arbiter.generic_bus
-        
-        while(True):
-            en = yield gb.en
+
+        # NOTE: interconnect is work in progress, that's the reason for the 'if'.
+        gb_mode_30_bit = gb.addr.shape() == unsigned(30)
+        if not gb_mode_30_bit:
+            assert gb.addr.shape() == unsigned(32)
+
+        def on_ack(en, ack):
             store = yield gb.store
             addr = yield gb.addr
-            ack = yield gb.ack
             mask = yield gb.mask
 
-            # NOTE: interconnect is work in progress, that's the reason for the 'if'.
-            if gb.addr.shape() == unsigned(30):
+            if gb_mode_30_bit:
                 addr = addr << 2
-            else:
-                assert gb.addr.shape() == unsigned(32)
 
-            if en and ack and (store or addr >= 0x8000_2000):
+            if store or addr >= 0x8000_2000:
                 data = yield gb.write_data
 
                 if not store:
@@ -696,5 +702,6 @@ def bus_capture_write_transactions(cpu : MtkCpu, output_dict: dict):
 
                 # TODO - it doesn't support mask at all..
                 output_dict[addr] = data
-            yield
+
+        hub.on([gb.en, gb.ack], lambda en, ack: en and ack, on_ack)
     return f
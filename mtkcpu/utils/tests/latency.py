@@ -0,0 +1,185 @@
+"""
+Bus latency injection - stresses MtkCpu with non-ideal memory timing, while keeping failures reproducible.
+
+Latencies are drawn from a LatencyDistribution in NumPy blocks (not one random call per cycle),
+by generators derived from a single seed. The seed is logged (and stored in LatencyInjector.seed) whenever
+it's not passed explicitly, so that any failing simulation can be replayed with exactly the same timing.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+from amaranth.sim import Settle
+from amaranth.sim.core import Passive
+
+from mtkcpu.cpu.cpu import MtkCpu
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyDistribution(ABC):
+    """
+    Number of extra cycles, that a bus transaction is delayed by.
+    """
+    @abstractmethod
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        pass
+
+
+@dataclass(frozen=True)
+class FixedLatency(LatencyDistribution):
+    cycles: int
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return np.full(n, self.cycles, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class UniformLatency(LatencyDistribution):
+    low: int
+    high: int  # inclusive
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return rng.integers(self.low, self.high, size=n, endpoint=True)
+
+
+@dataclass(frozen=True)
+class GeometricLatency(LatencyDistribution):
+    """
+    Transaction completes in each cycle with probability 'p'.
+    """
+    p: float
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return rng.geometric(self.p, size=n) - 1
+
+
+@dataclass(frozen=True)
+class BurstyLatency(LatencyDistribution):
+    """
+    Mostly 'fast' transactions, with bursts of consecutive 'slow' ones (e.g. contention with other bus master).
+    A burst starts at each transaction with 'burst_prob' probability, and lasts for geometrically
+    distributed number of transactions, 'mean_burst_len' on average.
+    """
+    fast: int
+    slow: int
+    burst_prob: float
+    mean_burst_len: float
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        starts = np.flatnonzero(rng.random(n) < self.burst_prob)
+        ends = np.minimum(starts + rng.geometric(1 / self.mean_burst_len, size=len(starts)), n)
+        # +1 at each burst start, -1 past its end - positive prefix sum means 'inside a burst'.
+        edges = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(edges, starts, 1)
+        np.add.at(edges, ends, -1)
+        return np.where(np.cumsum(edges[:n]) > 0, self.slow, self.fast)
+
+
+@dataclass(frozen=True)
+class RegionLatency(LatencyDistribution):
+    """
+    Different distribution for each address range ([start, end) tuples, absolute addresses),
+    'default' for addresses not covered by any.
+    """
+    regions: List[Tuple[int, int, LatencyDistribution]]
+    default: LatencyDistribution = field(default_factory=lambda: FixedLatency(0))
+
+    def distributions(self) -> List[LatencyDistribution]:
+        return [dist for _, _, dist in self.regions] + [self.default]
+
+    def select(self, addr: int) -> int:
+        """
+        Returns index into 'distributions()'.
+        """
+        for i, (start, end, _) in enumerate(self.regions):
+            if start <= addr < end:
+                return i
+        return len(self.regions)
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        raise TypeError("RegionLatency depends on transaction address, use LatencyInjector.next instead.")
+
+
+class _LatencyStream:
+    def __init__(self, distribution: LatencyDistribution, rng: np.random.Generator, block_size: int) -> None:
+        self.distribution = distribution
+        self.rng = rng
+        self.block_size = block_size
+        self.block: List[int] = []
+        self.pos = 0
+
+    def next(self) -> int:
+        if self.pos == len(self.block):
+            # NOTE: Python ints are much cheaper to handle in simulation processes than NumPy scalars.
+            self.block = self.distribution.sample(self.rng, self.block_size).tolist()
+            self.pos = 0
+        res = self.block[self.pos]
+        self.pos += 1
+        return res
+
+
+class LatencyInjector:
+    """
+    Source of per-transaction latencies, reproducible with 'seed'.
+
+    Each distribution of RegionLatency gets its own stream (spawned from the same seed), so that
+    latencies of one region don't depend on the number of accesses to another.
+    """
+    def __init__(self, distribution: LatencyDistribution, seed: Optional[int] = None, block_size: int = 1024) -> None:
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+            logger.info(f"Bus latency injection seed: {seed}")
+        self.distribution = distribution
+        self.seed = seed
+        distributions = distribution.distributions() if isinstance(distribution, RegionLatency) else [distribution]
+        self.streams = [
+            _LatencyStream(dist, np.random.default_rng(seq), block_size)
+            for dist, seq in zip(distributions, np.random.SeedSequence(seed).spawn(len(distributions)))
+        ]
+
+    def next(self, addr: int) -> int:
+        if isinstance(self.distribution, RegionLatency):
+            return self.streams[self.distribution.select(addr)].next()
+        return self.streams[0].next()
+
+    def process(self, cpu: MtkCpu, regions: Optional[List[str]] = None):
+        """
+        Passive process, that delays each transaction to MMIO devices (all by default, otherwise
+        those with 'regions' basenames) by holding their WishboneSlave.stall for the drawn number of cycles.
+        Delay is added on top of device's own latency. Requires CPU_Config.sim_bus_stall to be set.
+        """
+        if not cpu.cpu_config.sim_bus_stall:
+            raise ValueError("Bus latency injection requires MtkCpu built with 'sim_bus_stall' set!")
+
+        def aux():
+            yield Passive()
+            slaves = [
+                (owner.get_wb_slave_bus(), space.first_valid_addr_incl)
+                for owner, space in cpu.arbiter.get_mmio_devices_config()
+                if regions is None or space.basename in regions
+            ]
+            remaining: List[Optional[int]] = [None] * len(slaves)
+            stalled = [False] * len(slaves)
+            while True:
+                # Address decoding is combinational.
+                yield Settle()
+                for i, (wb_slave, start_addr) in enumerate(slaves):
+                    if not (yield wb_slave.wb_bus.cyc):
+                        remaining[i] = None
+                        stall = False
+                    else:
+                        if remaining[i] is None:
+                            # Slave's 'adr' is relative to the beginning of its region.
+                            remaining[i] = self.next(start_addr + (yield wb_slave.wb_bus.adr))
+                        stall = remaining[i] > 0
+                        if stall:
+                            remaining[i] -= 1
+                    if stall != stalled[i]:
+                        yield wb_slave.stall.eq(stall)
+                        stalled[i] = stall
+                yield
+        return aux
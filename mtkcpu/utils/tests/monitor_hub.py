@@ -0,0 +1,183 @@
+"""
+Event-driven simulation monitors. Every signal read from a simulation process costs a pysim expression
+compilation, and every process a coroutine switch per cycle - a testbench running a dozen of per-cycle polling
+monitors spends most of its time on them, not on simulating the design.
+
+MonitorHub is a single passive process that once per cycle samples a deduplicated set of trigger signals
+(slices of the same signal, e.g. fields of a data.View, are read once), evaluates registered triggers
+and dispatches their callbacks. Values needed only once a trigger fires are read lazily by the callback.
+
+Monitors are defined with the 'monitor' decorator, so that they are still regular processes, but processes lists
+passed through 'merge_monitors' get all their monitors run by a single hub.
+"""
+
+import inspect
+from typing import Callable, Dict, Generator, Hashable, List, Optional, Sequence
+
+from amaranth.hdl.ast import Signal, Slice, Value
+from amaranth.sim import Passive
+
+# Callback, that can be a generator - it can yield Values (reads only) to get their current value.
+Callback = Callable[..., Optional[Generator]]
+
+
+def _signal_key(value: Value) -> Hashable:
+    return ("signal", value.duid)
+
+
+class _Sampled:
+    """
+    Value sampled by the hub - 'base' (Signal, or any other Value) gets read, and the value is extracted with shift and mask.
+    """
+    def __init__(self, value: Value) -> None:
+        self.shift = 0
+        self.width = len(value)
+        while isinstance(value, Slice):
+            self.shift += value.start
+            value = value.value
+        self.base = value
+        self.base_key = _signal_key(value) if isinstance(value, Signal) else ("value", id(value))
+        self.mask = (1 << self.width) - 1
+        self.whole = self.shift == 0 and self.width == len(value)
+
+    def extract(self, base_value: int) -> int:
+        if self.whole:
+            # Keeps the sign of signed values.
+            return base_value
+        return (base_value >> self.shift) & self.mask
+
+
+class _Trigger:
+    def __init__(self, values: List[_Sampled], condition: Optional[Callable[..., bool]], callback: Callback) -> None:
+        self.values = values
+        self.condition = condition
+        self.callback = callback
+
+
+class MonitorHub:
+    """
+    Runs triggers, registered with 'on' and 'on_change', from a single passive process ('process').
+    Triggers can be registered during simulation too (e.g. by a callback).
+
+    Callbacks can't wait for clock edges - state that spans many cycles has to be kept by the monitor itself.
+    Exceptions raised by callbacks propagate to the simulator, the same way as from any other process.
+    """
+
+    def __init__(self) -> None:
+        self._bases: Dict[Hashable, Value] = {}
+        self._triggers: List[_Trigger] = []
+        # Values of the current cycle, by base key.
+        self._current: Dict[Hashable, int] = {}
+        self.cycles = 0
+
+    def _sample(self, value: Value) -> _Sampled:
+        sampled = _Sampled(Value.cast(value))
+        self._bases.setdefault(sampled.base_key, sampled.base)
+        return sampled
+
+    def on(self, values: Sequence[Value], condition: Optional[Callable[..., bool]], callback: Callback) -> _Trigger:
+        """
+        Every cycle, 'values' are sampled, and if 'condition(*values)' is true (or 'condition' is None),
+        'callback(*values)' is called. Returned trigger can be passed to 'remove'.
+        """
+        trigger = _Trigger(values=[self._sample(x) for x in values], condition=condition, callback=callback)
+        self._triggers.append(trigger)
+        return trigger
+
+    def remove(self, trigger: _Trigger) -> None:
+        """
+        Unregisters 'trigger', values sampled only for it are not read anymore.
+        """
+        self._triggers.remove(trigger)
+        used = {x.base_key for t in self._triggers for x in t.values}
+        self._bases = {k: v for k, v in self._bases.items() if k in used}
+
+    def on_change(self, value: Value, callback: Callback, initial: Optional[int] = None) -> None:
+        """
+        Calls 'callback(value, prev_value)' whenever 'value' differs from the previous cycle's one
+        ('initial' for the first cycle, None makes the first cycle always trigger).
+        """
+        prev = [initial]
+
+        def on_changed(x: int):
+            prev_value, prev[0] = prev[0], x
+            return callback(x, prev_value)
+
+        self.on([value], lambda x: x != prev[0], on_changed)
+
+    def read(self, value: Value) -> Generator:
+        """
+        Current value of 'value' - taken from this cycle's samples if available.
+        """
+        sampled = _Sampled(Value.cast(value))
+        if sampled.base_key not in self._current:
+            self._current[sampled.base_key] = yield sampled.base
+        return sampled.extract(self._current[sampled.base_key])
+
+    def _dispatch(self, result: Optional[Generator]) -> Generator:
+        if not inspect.isgenerator(result):
+            return
+        response = None
+        while True:
+            try:
+                command = result.send(response)
+            except StopIteration:
+                return
+            if not isinstance(command, Value):
+                raise TypeError(f"Monitor callbacks can only read values, got {command!r} (from {result!r}).")
+            response = yield from self.read(command)
+
+    def step(self) -> Generator:
+        """
+        Samples all values and runs triggers once - for processes driving the hub on their own (see 'process').
+        """
+        current = self._current = {}
+        # NOTE: dict might grow while iterating, if a callback registers a trigger.
+        for key, base in list(self._bases.items()):
+            current[key] = yield base
+        for trigger in list(self._triggers):
+            args = [x.extract(current[x.base_key]) for x in trigger.values]
+            if trigger.condition is None or trigger.condition(*args):
+                yield from self._dispatch(trigger.callback(*args))
+        self.cycles += 1
+
+    def process(self) -> Generator:
+        yield Passive()
+        while True:
+            yield from self.step()
+            yield
+
+
+def monitor(setup: Callable[[MonitorHub], None]) -> Callable:
+    """
+    Turns 'setup' (function registering triggers on a hub) into a process running its own hub.
+    Such processes are recognized by 'merge_monitors'.
+    """
+    def process():
+        hub = MonitorHub()
+        setup(hub)
+        yield from hub.process()
+    process.monitor_setup = setup
+    return process
+
+
+def is_monitor(process: Callable) -> bool:
+    return hasattr(process, "monitor_setup")
+
+
+def merge_monitors(processes: List[Callable]) -> List[Callable]:
+    """
+    Replaces all monitors (see 'monitor') from 'processes' with a single one, placed at the first monitor's position.
+    """
+    monitors = [x for x in processes if is_monitor(x)]
+    if len(monitors) < 2:
+        return processes
+
+    def setup(hub: MonitorHub):
+        for x in monitors:
+            x.monitor_setup(hub)
+
+    merged = monitor(setup)
+    first = processes.index(monitors[0])
+    others = [x for x in processes if not is_monitor(x)]
+    return [*others[:first], merged, *others[first:]]
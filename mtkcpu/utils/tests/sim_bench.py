@@ -0,0 +1,327 @@
+"""
+Simulation throughput benchmark - runs a fixed set of workloads on MtkCpu RTL simulation (the same way
+'mtkcpu sim' does, with HTIF host process) and measures how long the elaboration, simulator startup
+(pysim code generation) and the simulation itself take.
+
+Report is a JSON-serializable dict, that can be compared against a stored baseline (see 'compare'):
+times ('*_s') must not grow, and throughputs ('*_per_s') must not drop by more than given tolerance.
+"""
+
+import io
+import json
+import logging
+import platform
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from amaranth import Fragment
+from amaranth.lib import data
+from amaranth.sim import Simulator
+from amaranth.sim.core import Passive
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.cpu.priv_isa import PrivModeBits, PTE_Layout
+from mtkcpu.units.csr.types import MSTATUS_Layout
+from mtkcpu.units.mmio.htif import HtifHost
+from mtkcpu.units.mmio.uart import BAUD_DIVISOR_FRAC_BITS
+from mtkcpu.utils.common import MEM_START_ADDR
+from mtkcpu.utils.tests.dmi_utils import (
+    DMI_Monitor,
+    activate_DM_and_halt_via_dmi,
+    dmi_bus_reset,
+    dmi_bus_trigger_transaction,
+    dmi_op_wait_for_success,
+    dmi_write_access_register_command,
+    dmi_write_data0,
+    few_ticks,
+    gpr_to_dmi_access_register_regno,
+    jtag_test_monitors,
+)
+from mtkcpu.utils.tests.monitor_hub import merge_monitors
+from mtkcpu.utils.tests.utils import MemTestCase, MemTestSourceType, get_mem_test_config
+
+SIM_BENCH_REPORT_VERSION = 1
+
+DEFAULT_BASELINE = Path(__file__).parent / "sim_bench_baseline.json"
+
+# Differences in elaboration/startup times below that are considered noise.
+MIN_TIME_DELTA_S = 0.25
+
+# Identity-mapped 4 MiB superpage, accessible from user mode.
+USER_SUPERPAGE_PTE = PTE_Layout.const({
+    "v": 1, "r": 1, "w": 1, "x": 1, "u": 1, "a": 1, "d": 1,
+    "ppn1": MEM_START_ADDR >> 22,
+    "ppn0": 0,
+}).as_value().value
+
+MPP_OFFSET = data.Layout.cast(MSTATUS_Layout)["mpp"].offset
+
+
+@dataclass
+class SimBenchWorkload:
+    name: str
+    # Assembly of the program (see MemTestSourceType.RAW).
+    source: str
+    mem_size_kb: int = 1
+    with_virtual_memory: bool = False
+    # Debug Module scenarios - simulated design is wrapped with DMI_Monitor,
+    # that is passed to 'processes' (the ones to be added to the simulator, besides the HTIF host).
+    with_debug: bool = False
+    processes: Optional[Callable[[DMI_Monitor], List[Callable]]] = None
+
+    def cpu_config(self) -> CPU_Config:
+        return CPU_Config(
+            with_debug=self.with_debug,
+            dev_mode=False,
+            pc_reset_value=MEM_START_ADDR,
+            with_virtual_memory=self.with_virtual_memory,
+            sim_htif=True,
+        )
+
+
+def dm_access_register_loop(dmi_monitor: DMI_Monitor) -> List[Callable]:
+    """
+    Halts the CPU and keeps on writing GPRs with the Access Register abstract command, as a debugger would.
+    """
+    def aux():
+        yield Passive()
+        yield from activate_DM_and_halt_via_dmi(dmi_monitor=dmi_monitor)
+        pattern = 0
+        while True:
+            pattern += 1
+            yield from dmi_write_data0(dmi_monitor=dmi_monitor, value=pattern)
+            yield from dmi_bus_trigger_transaction(dmi_monitor=dmi_monitor)
+            yield from dmi_op_wait_for_success(dmi_monitor=dmi_monitor)
+            yield from dmi_bus_reset(dmi_monitor=dmi_monitor)
+            yield from dmi_write_access_register_command(
+                dmi_monitor=dmi_monitor,
+                write=True,
+                regno=gpr_to_dmi_access_register_regno(1 + pattern % 31),
+            )
+            yield from few_ticks(5)
+            yield from dmi_bus_trigger_transaction(dmi_monitor=dmi_monitor)
+            yield from dmi_op_wait_for_success(dmi_monitor=dmi_monitor)
+            yield from dmi_bus_reset(dmi_monitor=dmi_monitor)
+    return [aux]
+
+
+def dm_access_register_loop_monitored(dmi_monitor: DMI_Monitor) -> List[Callable]:
+    """
+    The same as 'dm_access_register_loop', with all the monitors of the JTAG test running.
+    """
+    return [*dm_access_register_loop(dmi_monitor), *jtag_test_monitors(dmi_monitor)]
+
+
+ALU_LOOP = """
+    start:
+        li x1, 0x1234
+    loop:
+        addi x2, x2, 3
+        xor x3, x3, x2
+        slli x4, x3, 2
+        sub x5, x4, x1
+        or x6, x5, x2
+        j loop
+"""
+
+WORKLOADS = [
+    SimBenchWorkload(
+        name="alu_loop",
+        source=ALU_LOOP,
+    ),
+    SimBenchWorkload(
+        name="load_store_loop",
+        source="""
+            start:
+                la x1, data
+            loop:
+                lw x2, 0(x1)
+                addi x2, x2, 1
+                sw x2, 4(x1)
+                lb x3, 5(x1)
+                sh x3, 8(x1)
+                j loop
+            .align 4
+            data:
+                .fill 4, 4, 0
+        """,
+    ),
+    SimBenchWorkload(
+        name="uart_print",
+        # Busy-waits for the transmitter, with baud rate of clock frequency / 4.
+        source=f"""
+            start:
+                li x1, 0x70000000
+                li x2, {4 << BAUD_DIVISOR_FRAC_BITS}
+                sw x2, 0x10(x1)
+                li x3, 0x41
+            loop:
+                lw x4, 0(x1)
+                bnez x4, loop
+                sw x3, 8(x1)
+                j loop
+        """,
+    ),
+    SimBenchWorkload(
+        name="vm_user_loop",
+        # Every user mode access (including instruction fetch) goes through the page-walk.
+        source=f"""
+            start:
+                la x1, root_pt
+                srli x1, x1, 12
+                li x2, 0x80000000
+                or x1, x1, x2
+                csrw satp, x1
+                la x1, user_loop
+                csrw mepc, x1
+                li x1, {PrivModeBits.USER << MPP_OFFSET}
+                csrw mstatus, x1
+                la x1, data
+                mret
+            user_loop:
+                lw x2, 0(x1)
+                addi x2, x2, 1
+                sw x2, 0(x1)
+                j user_loop
+            data:
+                .word 0
+            .align 12
+            root_pt:
+                .fill {MEM_START_ADDR >> 22}, 4, 0
+                .word {USER_SUPERPAGE_PTE}
+        """,
+        mem_size_kb=8,
+        with_virtual_memory=True,
+    ),
+    SimBenchWorkload(
+        name="jtag_dm",
+        source=ALU_LOOP,
+        with_debug=True,
+        processes=dm_access_register_loop,
+    ),
+    SimBenchWorkload(
+        name="jtag_dm_monitors",
+        source=ALU_LOOP,
+        with_debug=True,
+        processes=dm_access_register_loop_monitored,
+    ),
+]
+
+
+def run_workload(workload: SimBenchWorkload, num_cycles: int) -> Dict[str, float]:
+    mem_config = get_mem_test_config(MemTestCase(
+        name=workload.name,
+        source_type=MemTestSourceType.RAW,
+        source=workload.source,
+        reg_init=None,
+        mem_size_kb=workload.mem_size_kb,
+    ))
+
+    start = time.perf_counter()
+    cpu = MtkCpu(mem_config=mem_config, cpu_config=workload.cpu_config())
+    top = DMI_Monitor(cpu=cpu) if workload.with_debug else cpu
+    fragment = Fragment.get(top, platform=None)
+    elaborated = time.perf_counter()
+
+    sim = Simulator(fragment)
+    sim.add_clock(1e-6)
+    host = HtifHost(cpu, max_cycles=num_cycles, console=io.StringIO())
+    sim.add_sync_process(host.process())
+    for p in merge_monitors(workload.processes(top) if workload.processes else []):
+        sim.add_sync_process(p)
+    started = time.perf_counter()
+
+    # Monitors' logging (see 'jtag_test_monitors') is not what's being measured.
+    logging.disable(logging.CRITICAL)
+    try:
+        sim.run()
+    finally:
+        logging.disable(logging.NOTSET)
+    finished = time.perf_counter()
+
+    run_s = finished - started
+    return {
+        "elaboration_s": elaborated - start,
+        "startup_s": started - elaborated,
+        "run_s": run_s,
+        "cycles": host.cycles,
+        "instructions": host.instret,
+        "cycles_per_s": host.cycles / run_s,
+        "instructions_per_s": host.instret / run_s,
+    }
+
+
+def run_sim_bench(num_cycles: int = 20_000, names: Optional[List[str]] = None, repeat: int = 1) -> dict:
+    """
+    Runs workloads (all of them, unless 'names' are given), each 'repeat' times - best result of each metric is reported.
+    """
+    workloads = {x.name: x for x in WORKLOADS}
+    for name in names or []:
+        if name not in workloads:
+            raise ValueError(f"Unknown workload {name}, known ones are: {list(workloads)}")
+
+    results = {}
+    for name in names or workloads:
+        runs = [run_workload(workloads[name], num_cycles=num_cycles) for _ in range(repeat)]
+        results[name] = {
+            key: (max if key.endswith("_per_s") else min)(x[key] for x in runs)
+            for key in runs[0]
+        }
+    return {
+        "version": SIM_BENCH_REPORT_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "num_cycles": num_cycles,
+        "workloads": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Returns list of regressions - metrics worse than in the 'baseline' by more than 'tolerance' (relative,
+    and for times, by at least MIN_TIME_DELTA_S).
+    Workloads missing in either report are skipped.
+    """
+    regressions = []
+    for name, metrics in report["workloads"].items():
+        if name not in baseline["workloads"]:
+            continue
+        for key, value in metrics.items():
+            base = baseline["workloads"][name].get(key)
+            if not base:
+                continue
+            if key.endswith("_per_s"):
+                change = base / value - 1 if value else float("inf")
+            elif key.endswith("_s") and key != "run_s":
+                if value - base < MIN_TIME_DELTA_S:
+                    continue
+                change = value / base - 1
+            else:
+                continue
+            if change > tolerance:
+                regressions.append(f"{name}.{key}: {value:.4g} vs baseline {base:.4g} ({change:+.0%} worse, tolerance {tolerance:.0%})")
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    header = f"{'workload':<18} {'elab [s]':>9} {'startup [s]':>12} {'cycles/s':>10} {'instr/s':>10}"
+    lines = [header, "-" * len(header)]
+    for name, x in report["workloads"].items():
+        lines.append(
+            f"{name:<18} {x['elaboration_s']:>9.2f} {x['startup_s']:>12.2f} "
+            f"{x['cycles_per_s']:>10.0f} {x['instructions_per_s']:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+def save_report(report: dict, path: Path) -> None:
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def load_report(path: Path) -> dict:
+    report = json.loads(path.read_text())
+    if report.get("version") != SIM_BENCH_REPORT_VERSION:
+        raise ValueError(f"{path}: unsupported report version {report.get('version')}, expected {SIM_BENCH_REPORT_VERSION}.")
+    return report
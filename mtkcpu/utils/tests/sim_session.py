@@ -0,0 +1,122 @@
+from contextlib import nullcontext
+from dataclasses import astuple
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.iss.checkpoint import Checkpoint, restore_rtl
+from mtkcpu.utils.common import EBRMemConfig
+from mtkcpu.utils.cpu_sim import MtkCpuSim
+from mtkcpu.utils.tests.monitor_hub import merge_monitors
+from mtkcpu.utils.waveform import WaveformCapture
+
+
+class CpuSimSession:
+    """
+    MtkCpu simulation, that is elaborated once and reused for running many programs.
+
+    Elaboration (and pysim code generation) takes much longer than simulating a typical MemTestCase,
+    so instead of baking program into EBRMemConfig.mem_content_words, memory and register file
+    are zero-initialized, and get populated at the very beginning of each 'run' (before the first clock edge),
+    through the session's MtkCpuSim ('cpu_sim'). Between runs whole design is reset to its initial state.
+    Program can also be started from an architectural checkpoint (see 'run_checkpoint').
+
+    As Amaranth's Simulator doesn't allow for removing processes, a fixed number of process 'slots'
+    is registered up-front - each run assigns its own processes to them.
+    """
+
+    MAX_PROCESSES = 8
+
+    _sessions: Dict[Tuple, "CpuSimSession"] = {}
+
+    def __init__(self, cpu_config: CPU_Config, mem_size_words: int, mem_addr: int, sparse_latency: Optional[int] = None) -> None:
+        self.mem_config = EBRMemConfig(
+            mem_size_words=mem_size_words,
+            mem_content_words=None,
+            mem_addr=mem_addr,
+            simulate=True,
+            sparse_latency=sparse_latency,
+        )
+        self.cpu = MtkCpu(mem_config=self.mem_config, cpu_config=cpu_config, reg_init=[0] * 32)
+        self.cpu_sim = MtkCpuSim(self.cpu)
+        self.sim = self.cpu_sim.sim
+
+        self.processes: List[Callable] = []
+        self.cpu_sim.add_processes([self.slot(i) for i in range(self.MAX_PROCESSES)])
+        self.num_runs = 0
+
+    @classmethod
+    def get(cls, cpu_config: CPU_Config, mem_size_words: int, mem_addr: int, sparse_latency: Optional[int] = None) -> "CpuSimSession":
+        """
+        Returns session cached for given configuration, creating one if needed.
+        """
+        key = (astuple(cpu_config), mem_size_words, mem_addr, sparse_latency)
+        if key not in cls._sessions:
+            cls._sessions[key] = cls(cpu_config=cpu_config, mem_size_words=mem_size_words, mem_addr=mem_addr, sparse_latency=sparse_latency)
+        return cls._sessions[key]
+
+    def load(self, mem_content: Dict[int, int], reg_init: Sequence[int]) -> None:
+        # Contiguous ranges are written at once.
+        for _, group in groupby(enumerate(sorted(mem_content)), key=lambda x: x[1] - x[0]):
+            idxs = [idx for _, idx in group]
+            self.cpu_sim.write_mem(self.mem_config.mem_addr + 4 * idxs[0], [mem_content[idx] for idx in idxs])
+        self.cpu_sim.write_gprs(reg_init)
+
+    def slot(self, i: int) -> Callable:
+        def aux():
+            if i < len(self.processes):
+                yield from self.processes[i]()
+        return aux
+
+    def run(
+            self,
+            mem_config: EBRMemConfig,
+            reg_init: Sequence[int],
+            processes: List[Callable],
+            waveform: Optional[WaveformCapture] = None,
+            drive: Optional[Callable[[MtkCpuSim], Any]] = None,
+        ) -> Any:
+        """
+        Runs program from 'mem_config' (must match session's memory address and size) until
+        all active 'processes' finish, or as 'drive' decides (e.g. 'lambda s: s.run_until_pc(addr)'), returning its result.
+        Processes are added the same way as with 'Simulator.add_sync_process' (monitors get merged, see 'merge_monitors').
+        """
+        if waveform is not None and waveform.sampled:
+            processes = [*processes, waveform.process()]
+        layout = lambda cfg: (cfg.mem_addr, cfg.mem_size_words, cfg.sparse_latency)
+        if layout(mem_config) != layout(self.mem_config):
+            raise ValueError(f"Memory layout mismatch, session was created for {self.mem_config}, got {mem_config}!")
+        processes = merge_monitors(processes)
+        if len(processes) > self.MAX_PROCESSES:
+            raise ValueError(f"At most {self.MAX_PROCESSES} processes are supported, got {len(processes)}!")
+
+        load = lambda: self.load(mem_content=mem_config.mem_content_dict(), reg_init=reg_init)
+        return self._run(processes=processes, load=load, waveform=waveform, drive=drive)
+
+    def run_checkpoint(self, checkpoint: Checkpoint, processes: List[Callable], drive: Optional[Callable[[MtkCpuSim], Any]] = None) -> Any:
+        """
+        The same as 'run', but the program starts from the 'checkpoint' (see 'restore_rtl'), instead of the reset state.
+        """
+        processes = merge_monitors(processes)
+        if len(processes) > self.MAX_PROCESSES:
+            raise ValueError(f"At most {self.MAX_PROCESSES} processes are supported, got {len(processes)}!")
+        checkpoint.check_mem_layout(self.mem_config.mem_addr, self.mem_config.mem_size_words)
+        load = lambda: self.cpu_sim.execute(restore_rtl(self.cpu, checkpoint)())
+        return self._run(processes=processes, load=load, drive=drive)
+
+    def _run(
+            self,
+            processes: List[Callable],
+            load: Callable[[], None],
+            waveform: Optional[WaveformCapture] = None,
+            drive: Optional[Callable[[MtkCpuSim], Any]] = None,
+        ) -> Any:
+        self.processes = processes
+        if self.num_runs:
+            self.cpu_sim.reset()
+        self.num_runs += 1
+
+        drive = drive or MtkCpuSim.run
+        with waveform.capture(self.sim) if waveform is not None else nullcontext():
+            load()
+            return drive(self.cpu_sim)
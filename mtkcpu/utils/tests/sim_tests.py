@@ -10,6 +10,7 @@ from amaranth.hdl.ir import Elaboratable, Fragment
 
 
 from mtkcpu.cpu.cpu import MtkCpu
+from mtkcpu.utils.tests.latency import GeometricLatency, LatencyInjector
 from mtkcpu.utils.tests.memory import MemoryContents, MemState
 from mtkcpu.units.debug.top import DMIReg
 from mtkcpu.units.debug.impl_config import PROGBUF_MMIO_ADDR
@@ -215,12 +216,16 @@ def get_sel_bus_mask(sel):
 def get_sim_memory_test(
     cpu: MtkCpu,
     mem_dict: Optional[MemoryContents],
+    latency: Optional[LatencyInjector] = None,
 ):
+    if latency is None:
+        # each cycle the transaction completes with 0.4 probability.
+        latency = LatencyInjector(GeometricLatency(p=0.4))
+
     def mem_test():
         yield Passive()
         # yield Tick()
         # yield Settle()
-        p = 0.4  # .5 # probability of mem access in current cycle
         state = MemState.FREE
 
         arbiter = cpu.arbiter
@@ -228,10 +233,6 @@ def get_sim_memory_test(
         bus = arbiter.wb_bus
 
         while True:  # infinite loop is ok, I'm passive.
-            import numpy.random as random
-
-            rdy = random.choice((0, 1), p=[1 - p, p])
-
             if state == MemState.FREE:
                 ack = yield bus.ack
                 if ack:
@@ -247,6 +248,8 @@ def get_sim_memory_test(
                     raise ValueError(
                         "ERROR (TODO handle): simultaneous 'read' and 'write' detected."
                     )
+                if read or write:
+                    remaining = latency.next(mem_addr)
                 if read:
                     state = MemState.BUSY_READ
                 elif write:
@@ -256,7 +259,9 @@ def get_sim_memory_test(
                     print(f"=== PROGBUF: putting {data} in {mem_addr}")
             else:
                 # request processing
-                if rdy:  # random indicated transaction done in current cycle
+                if remaining:
+                    remaining -= 1
+                else:
                     yield bus.ack.eq(1)
                     sel = yield bus.sel
                     mask = get_sel_bus_mask(sel)
@@ -275,14 +280,53 @@ def get_sim_memory_test(
     return mem_test
 
 
+# Cycles added to test's timeout, when waiting for the register write.
+REG_TEST_TIMEOUT_EXTRA = 25
+
+
+def check_reg_write(name: str, reg_num: int, val: int, expected_val: Any) -> None:
+    """
+    Exits with an error message if 'val' written to the 'reg_num' register is not 'expected_val'
+    (compared as 32-bit signed integers, or checked if callable).
+    """
+    if isinstance(expected_val, Callable):
+        cond = not expected_val(val)
+    else:
+        # anything that implements '=='
+
+        # trim to 32 bits
+        from ctypes import c_int32
+        expected_val = c_int32(expected_val).value
+        val = c_int32(val).value
+
+        cond = val != expected_val
+
+    if cond:
+        # TODO that mechanism for now allows for only one write to observed register per test,
+        # extend it if neccessary.
+        print(
+            f"== ERROR: Expected data write to reg x{reg_num} of value {hex(expected_val)},"
+            f" got value {hex(val)}.. \n== fail test: {name}\n"
+        )
+        print(
+            f"{format(expected_val, '32b')} vs {format(val, '32b')}"
+        )
+        exit(1)
+
+
 def get_sim_register_test(
     name: str,
     cpu: MtkCpu,
     timeout_cycles: int,
     reg_num: Optional[int],
     expected_val: Any,
-    default_timeout_extra: int = 25,
+    default_timeout_extra: int = REG_TEST_TIMEOUT_EXTRA,
+    cycles_reference: Optional[dict] = None,
 ):
+    """
+    If 'cycles_reference' is passed, number of cycles it took to write the 'reg_num' register
+    is stored there (under "cycles" key).
+    """
     check_reg_content = reg_num is not None
 
     def reg_test(timeout=default_timeout_extra + timeout_cycles, expected_val=expected_val):
@@ -290,35 +334,16 @@ def get_sim_register_test(
         yield Tick()
         yield Settle()
 
-        for _ in range(timeout):
+        for cycle in range(timeout):
             en = yield cpu.reg_write_port.en
             if en == 1:
                 addr = yield cpu.reg_write_port.addr
                 if addr == reg_num:
                     val = yield cpu.reg_write_port.data
-                    if isinstance(expected_val, Callable):
-                        cond = not expected_val(val)
-                    else:
-                        # anything that implements '=='
-
-                        # trim to 32 bits
-                        from ctypes import c_int32
-                        expected_val = c_int32(expected_val).value
-                        val = c_int32(val).value
-
-                        cond = val != expected_val
-
-                    if check_reg_content and cond:
-                        # TODO that mechanism for now allows for only one write to observed register per test,
-                        # extend it if neccessary.
-                        print(
-                            f"== ERROR: Expected data write to reg x{addr} of value {hex(expected_val)},"
-                            f" got value {hex(val)}.. \n== fail test: {name}\n"
-                        )
-                        print(
-                            f"{format(expected_val, '32b')} vs {format(val, '32b')}"
-                        )
-                        exit(1)
+                    if check_reg_content:
+                        check_reg_write(name=name, reg_num=reg_num, val=val, expected_val=expected_val)
+                    if cycles_reference is not None:
+                        cycles_reference["cycles"] = cycle
                     return
             yield Tick()
 
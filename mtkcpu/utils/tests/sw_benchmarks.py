@@ -0,0 +1,254 @@
+"""
+Standard CPU benchmarks (CoreMark and Dhrystone, see sw/coremark and sw/dhrystone) - built with the RISC-V toolchain
+and run on MtkCpu RTL simulation (the same way 'mtkcpu sim' does, with HTIF host process and simulation-only UART).
+
+Benchmarks time themselves in clock cycles (see 'get_cycles' in sw/bsp/utils.h), so the scores are per MHz of the clock
+and exact - simulation is cycle-accurate. Firmware exits with non-zero code if the benchmark's self-check failed.
+
+Scores of the reduced-size runs are stored in a reference file (see 'compare'). As they depend on the compiler,
+the toolchain version is stored too - the reference is meant to be recorded with the pinned one ('make fetch-gcc'),
+by 'mtkcpu bench-sw --quick --update_reference'.
+"""
+
+import io
+import json
+import re
+import subprocess
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import Dict, List, Optional
+
+from mtkcpu.cpu.cpu import CPU_Config, MtkCpu
+from mtkcpu.global_config import Config
+from mtkcpu.units.mmio.htif import HTIF_ADDR, HtifHost, elf_symbol
+from mtkcpu.utils.common import MEM_START_ADDR
+from mtkcpu.utils.linker import write_linker_script
+from mtkcpu.utils.tests.utils import TOOLCHAIN
+
+SW_BENCH_REFERENCE_VERSION = 1
+
+DEFAULT_REFERENCE = Path(__file__).parent / "sw_benchmarks_reference.json"
+
+
+@dataclass
+class SwBenchmark:
+    # Name of the project in sw/ directory.
+    name: str
+    # Name of the score, as printed by the firmware.
+    score_name: str
+    # Regular expressions matching the score and number of cycles measured, in firmware's output.
+    score_regex: str
+    cycles_regex: str
+    # Make variables of the standard run, and of a reduced one, that is fast enough to be simulated in tests.
+    make_vars: Dict[str, int] = field(default_factory=dict)
+    quick_make_vars: Dict[str, int] = field(default_factory=dict)
+    mem_size_kb: int = 64
+
+    @property
+    def project_dir(self) -> Path:
+        return Config.sw_dir / self.name
+
+
+BENCHMARKS = [
+    SwBenchmark(
+        name="dhrystone",
+        score_name="DMIPS/MHz",
+        score_regex=r"DMIPS/MHz: (\d+\.\d+)",
+        cycles_regex=r"Cycles for \d+ runs: +(\d+)",
+        make_vars={"NUMBER_OF_RUNS": 2000},
+        quick_make_vars={"NUMBER_OF_RUNS": 2},
+    ),
+    SwBenchmark(
+        name="coremark",
+        score_name="CoreMark/MHz",
+        score_regex=r"CoreMark/MHz +: (\d+\.\d+)",
+        cycles_regex=r"Total ticks +: (\d+)",
+        make_vars={"ITERATIONS": 10, "TOTAL_DATA_SIZE": 2000},
+        # NOTE: CoreMark's score is comparable with other CPUs only for the standard data size.
+        quick_make_vars={"ITERATIONS": 1, "TOTAL_DATA_SIZE": 600},
+    ),
+]
+
+
+def get_benchmark(name: str) -> SwBenchmark:
+    benchmarks = {x.name: x for x in BENCHMARKS}
+    if name not in benchmarks:
+        raise ValueError(f"Unknown benchmark {name}, known ones are: {list(benchmarks)}")
+    return benchmarks[name]
+
+
+def toolchain_version() -> str:
+    """
+    First line of the C++ compiler's '--version' output.
+    """
+    out = subprocess.check_output([f"{TOOLCHAIN}-g++", "--version"], text=True)
+    return out.splitlines()[0].strip()
+
+
+def build_benchmark(benchmark: SwBenchmark, make_vars: Dict[str, int], build_dir: Path) -> Path:
+    """
+    Build happens in 'build_dir' instead of project's one, so that differently configured builds can run in parallel.
+    Firmware is built for simulation with HTIF, so that it can exit with the self-check result (see 'sim_exit').
+    Returns .elf path, previously asserting that it exists.
+    """
+    with NamedTemporaryFile(suffix=".ld") as f:
+        linker_script = Path(f.name).absolute()
+        write_linker_script(out_path=linker_script, mem_addr=MEM_START_ADDR, mem_size_kb=benchmark.mem_size_kb)
+        args = " ".join(f"{k}={v}" for k, v in make_vars.items())
+        process = subprocess.run(
+            f"make -B LINKER_SCRIPT={linker_script} OBJDIR={build_dir.absolute()} HTIF_BASE={hex(HTIF_ADDR)} {args}",
+            cwd=benchmark.project_dir,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+    if process.returncode:
+        raise ValueError(f"Compilation of {benchmark.name} failed:\n{process.stdout}")
+
+    elf_path = build_dir / f"{benchmark.name}.elf"
+    assert elf_path.exists()
+    return elf_path
+
+
+def run_benchmark(benchmark: SwBenchmark, quick: bool = False, max_cycles: Optional[int] = None) -> dict:
+    """
+    Builds and simulates the benchmark, returns its result: score, number of cycles measured by the firmware
+    (only the timed part), total number of simulated cycles, firmware's exit code and output.
+    """
+    from mtkcpu.cli.top import get_board_mem_config, sim
+
+    make_vars = benchmark.quick_make_vars if quick else benchmark.make_vars
+    with TemporaryDirectory() as build_dir:
+        elf_path = build_benchmark(benchmark, make_vars=make_vars, build_dir=Path(build_dir))
+        # Sparse memory of latency 1 behaves the same as the Block RAM, but is much faster to simulate.
+        mem_config = get_board_mem_config(elf_path=elf_path, num_bytes=benchmark.mem_size_kb * 1024, sparse_latency=1)
+        symbols = {name: elf_symbol(elf_path, name) for name in ["tohost", "fromhost"]}
+
+    cpu_config = CPU_Config(
+        with_debug=False,
+        dev_mode=False,
+        pc_reset_value=MEM_START_ADDR,
+        with_virtual_memory=False,
+        sim_fast_console=True,
+        sim_htif=True,
+    )
+    cpu = MtkCpu(mem_config=mem_config, cpu_config=cpu_config)
+    htif = HtifHost(
+        cpu,
+        max_cycles=max_cycles,
+        tohost_addr=symbols["tohost"],
+        fromhost_addr=symbols["fromhost"],
+        console=io.StringIO(),
+    )
+    uart = io.StringIO()
+    with redirect_stdout(uart):
+        sim(cpu=cpu, verbose=False, with_uart=True, htif=htif)
+    output = uart.getvalue()
+
+    score = re.search(benchmark.score_regex, output)
+    cycles = re.search(benchmark.cycles_regex, output)
+    return {
+        "make_vars": make_vars,
+        "score": score and float(score.group(1)),
+        "cycles": cycles and int(cycles.group(1)),
+        "sim_cycles": htif.cycles,
+        "exit_code": htif.status,
+        "output": output,
+    }
+
+
+def run_benchmark_iss(benchmark: SwBenchmark, make_vars: Dict[str, int], max_instructions: int = 100_000_000) -> dict:
+    """
+    Builds and runs the benchmark on the instruction-set simulator - fast enough for the standard-size runs,
+    but its cycle counts (thus scores) are meaningless. Returns firmware's exit code and output.
+    """
+    from mtkcpu.cli.top import get_board_mem_config
+    from mtkcpu.iss.iss import MtkCpuIss
+
+    with TemporaryDirectory() as build_dir:
+        elf_path = build_benchmark(benchmark, make_vars=make_vars, build_dir=Path(build_dir))
+        mem_config = get_board_mem_config(elf_path=elf_path, num_bytes=benchmark.mem_size_kb * 1024)
+    output = []
+    iss = MtkCpuIss(
+        mem_config=mem_config,
+        cpu_config=CPU_Config(
+            with_debug=False,
+            dev_mode=False,
+            pc_reset_value=MEM_START_ADDR,
+            with_virtual_memory=False,
+            sim_htif=True,
+        ),
+        uart_tx_callback=lambda byte: output.append(chr(byte)),
+    )
+    iss.run(max_instructions=max_instructions)
+    return {
+        "make_vars": make_vars,
+        "exit_code": iss.exit_code,
+        "output": "".join(output),
+    }
+
+
+def run_sw_benchmarks(names: Optional[List[str]] = None, quick: bool = False, max_cycles: Optional[int] = None) -> dict:
+    results = {}
+    for name in names or [x.name for x in BENCHMARKS]:
+        results[name] = run_benchmark(get_benchmark(name), quick=quick, max_cycles=max_cycles)
+    return {
+        "version": SW_BENCH_REFERENCE_VERSION,
+        "toolchain": toolchain_version(),
+        "benchmarks": results,
+    }
+
+
+def compare(report: dict, reference: dict, tolerance: float) -> List[str]:
+    """
+    Returns list of differences - scores (and cycle counts, as printed scores are rounded) off the 'reference' ones
+    by more than 'tolerance' (relative).
+    Results are compared only for benchmarks run with the same make variables.
+    Raises ValueError if the reports come from different toolchains - their scores are not comparable.
+    """
+    if report["toolchain"] != reference["toolchain"]:
+        raise ValueError(f"Reports come from different toolchains: {report['toolchain']} vs reference {reference['toolchain']}!")
+    differences = []
+    for name, result in report["benchmarks"].items():
+        base = reference["benchmarks"].get(name)
+        if base is None or base["make_vars"] != result["make_vars"]:
+            continue
+        for key in ["score", "cycles"]:
+            value = result[key] or 0
+            if abs(value - base[key]) > tolerance * base[key]:
+                differences.append(f"{name}.{key}: {value} vs reference {base[key]} (tolerance {tolerance:.0%})")
+    return differences
+
+
+def format_report(report: dict) -> str:
+    lines = [f"toolchain: {report['toolchain']}"]
+    for name, x in report["benchmarks"].items():
+        benchmark = get_benchmark(name)
+        make_vars = " ".join(f"{k}={v}" for k, v in x["make_vars"].items())
+        lines.append(
+            f"{name:<10} {benchmark.score_name}: {x['score']} ({x['cycles']} cycles measured, "
+            f"{x['sim_cycles']} simulated, exit code {x['exit_code']}, {make_vars})"
+        )
+    return "\n".join(lines)
+
+
+def save_report(report: dict, path: Path) -> None:
+    # Firmware's output is not stored, as it contains nothing that the rest of the report doesn't.
+    report = {
+        **report,
+        "benchmarks": {
+            name: {k: v for k, v in x.items() if k != "output"}
+            for name, x in report["benchmarks"].items()
+        },
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def load_report(path: Path) -> dict:
+    report = json.loads(path.read_text())
+    if report.get("version") != SW_BENCH_REFERENCE_VERSION:
+        raise ValueError(f"{path}: unsupported report version {report.get('version')}, expected {SW_BENCH_REFERENCE_VERSION}.")
+    return report
@@ -22,14 +22,20 @@ from amaranth.sim._pycoro import PyCoroProcess
 from mtkcpu.asm.asm_dump import dump_asm
 from mtkcpu.cpu.cpu import MtkCpu
 from mtkcpu.global_config import Config
+from mtkcpu.iss.lockstep import LockstepChecker
+from mtkcpu.utils.tests.sim_session import CpuSimSession
 from mtkcpu.units.csr.csr import CsrUnit
 from mtkcpu.units.exception import ExceptionUnit
 from mtkcpu.utils.common import CODE_START_ADDR, MEM_START_ADDR, EBRMemConfig, read_elf
 from mtkcpu.utils.decorators import parametrized, rename
+from mtkcpu.utils.tests.latency import LatencyDistribution, LatencyInjector
+from mtkcpu.utils.tests.cycle_golden import check_cycle_count
 from mtkcpu.utils.tests.memory import MemoryContents
+from mtkcpu.utils.tests.monitor_hub import MonitorHub, merge_monitors, monitor
 from mtkcpu.utils.tests.registers import RegistryContents
-from mtkcpu.utils.tests.sim_tests import (get_sim_memory_test,
-                                          get_sim_register_test,
+from mtkcpu.utils.tests.sim_tests import (REG_TEST_TIMEOUT_EXTRA,
+                                          check_reg_write,
+                                          get_sim_memory_test,
                                           get_sim_jtag_controller)
 from mtkcpu.utils.tests.openocd_checkpoints import (dmcontrol_haltreq_written,
                                                     progbuf_written_and_started,
@@ -39,8 +45,12 @@ import mtkcpu.utils.tests.sim_tests as GLOBAL_SIM_NAMESPACE
 from mtkcpu.units.debug.types import *
 from mtkcpu.units.loadstore import MemoryArbiter, WishboneBusRecord
 from mtkcpu.units.mmio.gpio import GPIO_Wishbone
+from mtkcpu.units.mmio.sparse_memory import SparseMemory_Wishbone
 from mtkcpu.utils.tests.dmi_utils import *
 from mtkcpu.utils.misc import get_color_logging_object
+from mtkcpu.utils.pysim_cache import get_simulator
+from mtkcpu.utils.cpu_sim import MtkCpuSim
+from mtkcpu.utils.waveform import WaveformCapture, default_cpu_traces
 from mtkcpu.cpu.cpu import CPU_Config
 from mtkcpu.units.debug.impl_config import TOOLCHAIN
 
@@ -75,100 +85,87 @@ class MemTestCase:
     reg_init: Optional[RegistryContents] = None
     mem_size_kb: int = 1
     shift_mem_content: bool = True # 0x1000 becomes 0x8000_1000 if mem. start address is 0x8000_0000
+    lockstep: bool = True # check each retired instruction against the instruction-set simulator
+    sparse_mem_latency: Optional[int] = None # use sparse memory model with given latency, see EBRMemConfig.sparse_latency
+    bus_latency: Optional[LatencyDistribution] = None # extra latency injected into every MMIO transaction, see LatencyInjector
+    bus_latency_seed: Optional[int] = None # random if not set (logged, for reproduction)
 
 @dataclass(frozen=True)
 class ComponentTestbenchCase:
     name: str
     component_type : Elaboratable
 
-def check_addr_translation_errors(cpu : MtkCpu) -> OrderedDict:
-    def f():
-        yield Passive()
-        while(True):
-            err = yield cpu.arbiter.error_code
-            if err:
-                raise ValueError(f"addr translation error code: {err}")
-            yield
+def check_addr_translation_errors(cpu : MtkCpu) -> Callable:
+    @monitor
+    def f(hub: MonitorHub):
+        def on_error(err):
+            raise ValueError(f"addr translation error code: {err}")
+        hub.on([cpu.arbiter.error_code], bool, on_error)
     return f
 
 
-def print_mem_transactions(cpu : MtkCpu) -> OrderedDict:
-    def f():
-        yield Passive()
+def print_mem_transactions(cpu : MtkCpu) -> Callable:
+    @monitor
+    def f(hub: MonitorHub):
         gb = cpu.arbiter.generic_bus
+        gb_mode_30_bit = gb.addr.shape() == unsigned(30)
 
-        while(True):
-            if (yield gb.en):
-                store = yield gb.store
-                addr = yield gb.addr
-                mask = yield gb.mask
-                if store:
-                    assert mask # TODO: LOAD is always 4 byte, so maybe rename to 'write_mask'?
-                write_data = yield gb.write_data
-
-                prefix = "STORE" if store else "LOAD"
-                gb_mode_30_bit = gb.addr.shape() == unsigned(30)
-
-                addr = addr << 2 if gb_mode_30_bit else addr
-
-                print(f"{prefix} addr {hex(addr)}, mask {mask} write_data: {hex(write_data) if store else ''}")
-                while (yield gb.en):
-                    yield
-            yield
+        def on_en(en, prev_en):
+            if not en or prev_en:
+                return
+            store = yield gb.store
+            addr = yield gb.addr
+            mask = yield gb.mask
+            if store:
+                assert mask # TODO: LOAD is always 4 byte, so maybe rename to 'write_mask'?
+            write_data = yield gb.write_data
+
+            prefix = "STORE" if store else "LOAD"
+            addr = addr << 2 if gb_mode_30_bit else addr
+
+            print(f"{prefix} addr {hex(addr)}, mask {mask} write_data: {hex(write_data) if store else ''}")
+        hub.on_change(gb.en, on_en)
     return f
 
 
-def capture_write_transactions(cpu : MtkCpu, dict_reference : OrderedDict) -> OrderedDict:
-    def f():
-        yield Passive()
+def capture_write_transactions(cpu : MtkCpu, dict_reference : OrderedDict) -> Callable:
+    @monitor
+    def f(hub: MonitorHub):
         content = dict_reference
         from mtkcpu.units.loadstore import EBR_Wishbone
         ebr: EBR_Wishbone = cpu.arbiter.ebr
+
+        if isinstance(ebr, SparseMemory_Wishbone):
+            bus = ebr.get_wb_slave_bus().wb_bus
+
+            def on_write_ack(ack, we):
+                # content is already updated when the transaction gets acknowledged.
+                bus_addr = yield bus.adr
+                content[bus_addr] = ebr.storage.read(bus_addr >> 2)
+            hub.on([bus.ack, bus.we], lambda ack, we: ack and we, on_write_ack)
+            return
+
         wp = ebr.wp
         mem = ebr.mem._array
+        # (memory index, bus address) of the write that gets visible in the next cycle.
+        pending = []
 
-        def apply_bitmask(A, B):
-            assert B == (B & 0b1111)
-            result = 0
-            for i in range(4):
-                if B & (1 << i):
-                    result |= (A & (0xFF << (i * 8)))
-            return result
-
-        while(True):
-            mask = yield wp.en
-            if mask:
-                wp_addr = yield wp.addr
-                bus_addr = yield ebr._wb_slave_bus.wb_bus.adr
-                
-                # coherence check beween bus and wp
-                assert bus_addr % 4 == 0
-                assert (bus_addr >> 2) == wp_addr
-                
-                # find first non-zero bit
-                if mask & 0b1:
-                    offset = 0
-                elif mask & 0b10:
-                    offset = 1
-                elif mask & 0b100:
-                    offset = 2
-                elif mask & 0b1000:
-                    offset = 3
-                else:
-                    assert False
-                
-                data_before_write = yield mem[wp_addr]
-                yield
-                data_after_write = yield mem[wp_addr]
+        def on_cycle():
+            if pending:
+                wp_addr, bus_addr = pending.pop()
+                content[bus_addr] = yield mem[wp_addr]
 
-                # all_ones_u32_mask = apply_bitmask(0xffff_ffff, mask)
-                # new_data = apply_bitmask(data, mask)
+        def on_write(mask):
+            wp_addr = yield wp.addr
+            bus_addr = yield ebr._wb_slave_bus.wb_bus.adr
 
-                # real_addr = bus_addr + offset
-                # assert real_addr not in content
-                # content[real_addr] = apply_bitmask(data, mask)
-                content[bus_addr] = data_after_write
-            yield
+            # coherence check beween bus and wp
+            assert bus_addr % 4 == 0
+            assert (bus_addr >> 2) == wp_addr
+            pending.append((wp_addr, bus_addr))
+
+        hub.on([], None, on_cycle)
+        hub.on([wp.en], bool, on_write)
     return f
 
 def reg_test(
@@ -180,21 +177,28 @@ def reg_test(
     reg_init: RegistryContents,
     mem_cfg: EBRMemConfig,
     verbose: bool = False,
-):
-    
-    cpu = MtkCpu(
-        reg_init=reg_init.reg,
-        mem_config=mem_cfg,
+    lockstep: bool = False,
+    bus_latency: Optional[LatencyDistribution] = None,
+    bus_latency_seed: Optional[int] = None,
+) -> Optional[int]:
+    """
+    Returns number of cycles it took to write the 'reg_num' register (None if it's not checked).
+    """
+    # The CPU is elaborated once per configuration, program is loaded at the beginning of simulation.
+    session = CpuSimSession.get(
         cpu_config=CPU_Config(
             dev_mode=False,
             with_debug=False,
             pc_reset_value=CODE_START_ADDR,
             with_virtual_memory=True,
-        )
+            sim_bus_stall=bus_latency is not None,
+        ),
+        mem_size_words=mem_cfg.mem_size_words,
+        mem_addr=mem_cfg.mem_addr,
+        sparse_latency=mem_cfg.sparse_latency,
     )
-
-    sim = Simulator(cpu)
-    sim.add_clock(1e-6)
+    cpu = session.cpu
+    processes = []
 
     assert (reg_num is None and expected_val is None) or (
         reg_num is not None and expected_val is not None
@@ -207,19 +211,27 @@ def reg_test(
     # sim.add_sync_process(get_sim_memory_test(cpu=cpu, mem_dict=mem_dict))
     # instead only collect write transactions directly on a bus.
     result_mem = {}
-    sim.add_sync_process(capture_write_transactions(cpu=cpu, dict_reference=result_mem))
-    # sim.add_sync_process(print_mem_transactions(cpu=cpu))
-    sim.add_sync_process(check_addr_translation_errors(cpu=cpu))
+    processes.append(capture_write_transactions(cpu=cpu, dict_reference=result_mem))
+    # processes.append(print_mem_transactions(cpu=cpu))
+    processes.append(check_addr_translation_errors(cpu=cpu))
+    if lockstep:
+        processes.append(LockstepChecker(cpu, mem_config=mem_cfg, reg_init=reg_init.reg).process)
+    if bus_latency is not None:
+        processes.append(LatencyInjector(bus_latency, seed=bus_latency_seed).process(cpu))
     
-    sim.add_sync_process(
-        get_sim_register_test(
-            name=name,
-            cpu=cpu,
-            reg_num=reg_num,
-            expected_val=expected_val,
-            timeout_cycles=timeout_cycles,
-        )
-    )
+    def drive(cpu_sim: MtkCpuSim) -> Optional[int]:
+        timeout = REG_TEST_TIMEOUT_EXTRA + timeout_cycles
+        if reg_num is None:
+            cpu_sim.step_cycles(timeout)
+            return None
+        port = cpu.reg_write_port
+        try:
+            cycles = cpu_sim.run_until(lambda en, addr: en and addr == reg_num, [port.en, port.addr], max_cycles=timeout)
+        except TimeoutError:
+            print(f"== ERROR: Test timeouted! No register write observed. Test: {name}\n")
+            exit(1)
+        check_reg_write(name=name, reg_num=reg_num, val=cpu_sim.read(port.data), expected_val=expected_val)
+        return cycles
 
     csr_unit : CsrUnit = cpu.csr_unit
     # frag = Fragment.get(cpu, platform=None)
@@ -270,12 +282,19 @@ def reg_test(
     # s = verilog.convert(cpu)
     # open("cpu.v", "w").write(s)
 
-    with sim.write_vcd("cpu.vcd", "cpu.gtkw", traces=sim_traces):
-        sim.run()
+    cycles = session.run(
+        mem_config=mem_cfg,
+        reg_init=reg_init.reg,
+        processes=processes,
+        waveform=WaveformCapture(name=name, traces=sim_traces, pc=cpu.pc),
+        drive=drive,
+    )
 
     if expected_mem is not None:
         MemoryContents(result_mem).assert_equality(expected_mem)
 
+    return cycles
+
 
 def get_code_mem(case: MemTestCase, mem_size_kb: int) -> MemoryContents:
     if case.source_type == MemTestSourceType.TEXT:
@@ -306,6 +325,21 @@ def get_code_mem(case: MemTestCase, mem_size_kb: int) -> MemoryContents:
     else:
         assert False
 
+def wb_transaction(bus: WishboneBusRecord, addr: int, write_data: int = None, timeout: int = 20, sel: int = 0b1111):
+    yield bus.cyc.eq(1)
+    yield bus.adr.eq(addr)
+    yield bus.sel.eq(sel)
+    yield bus.we.eq(write_data is not None)
+    yield bus.dat_w.eq(write_data or 0)
+    for _ in range(timeout):
+        yield
+        if (yield bus.ack):
+            read_data = yield bus.dat_r
+            yield bus.cyc.eq(0)
+            yield
+            return read_data
+    raise TimeoutError(f"No wishbone ack for address {hex(addr)} in {timeout} cycles!")
+
 def gpio_tb():
     led1, led2 = Signal(), Signal()
     bus  = WishboneBusRecord()
@@ -428,7 +462,8 @@ def unit_testbench(case: ComponentTestbenchCase):
     sim.add_clock(1e-6)
     sim.add_sync_process(f)
 
-    with sim.write_vcd(f"{case.name}.vcd"):
+    waveform = WaveformCapture(name=case.name)
+    with waveform.capture(sim):
         sim.run()
 
 
@@ -482,7 +517,7 @@ def cpu_testbench_test(case : CpuTestbenchCase):
         mem_config=mem_cfg
     )
 
-    sim = Simulator(cpu)
+    sim = get_simulator(cpu)
     sim.add_clock(1e-6)
 
     def get_last_instr_addr(elfpath : Path):
@@ -535,46 +570,105 @@ def cpu_testbench_test(case : CpuTestbenchCase):
         assert False, elf_path_str
 
     sim.add_sync_process(f)
-    
-    with sim.write_vcd("cpu.vcd"):
+
+    waveform = WaveformCapture(name=case.name, traces=default_cpu_traces(cpu), pc=cpu.pc)
+    waveform.add_to(sim)
+    with waveform.capture(sim):
         sim.run()
-    print("== Waveform dumped to cpu.vcd file")
 
 
-def assert_mem_test(case: MemTestCase):
-    name = case.name
-    reg_init = case.reg_init or RegistryContents.empty()
+def get_mem_test_config(case: MemTestCase) -> EBRMemConfig:
     mem_init = case.mem_init or MemoryContents.empty()
     
-    if case.mem_size_kb > 1:
+    if case.mem_size_kb > 1 and case.sparse_mem_latency is None:
         # otherwise, it raises RecursionError
         import sys
         sys.setrecursionlimit(10**6)
 
     program = get_code_mem(case, mem_size_kb=case.mem_size_kb)
-    if case.mem_init and case.shift_mem_content:
-        case.mem_init.shift_addresses(MEM_START_ADDR)
+    if case.shift_mem_content:
+        # NOTE: don't modify 'case.mem_init' in place, as the same case might be simulated more than once.
+        mem_init = MemoryContents(memory=dict(mem_init.memory))
+        mem_init.shift_addresses(MEM_START_ADDR)
     program.patch(mem_init, can_overlap=False)
     if program.size == 0:
         raise ValueError("Memory content cannot be empty! At least single instruction must be present.")
 
-    mem_cfg = EBRMemConfig.from_mem_dict(
+    return EBRMemConfig.from_mem_dict(
         start_addr=MEM_START_ADDR,
         num_bytes=1024 * case.mem_size_kb,
         simulate=True,
-        mem_dict=program
+        mem_dict=program,
+        sparse_latency=case.sparse_mem_latency,
     )
 
-    reg_test(
-        name=name,
+
+def assert_mem_test(case: MemTestCase):
+    """
+    Besides checking the results, compares the number of cycles the test took with the golden one
+    (see mtkcpu/utils/tests/cycle_golden.py).
+    """
+    cycles = reg_test(
+        name=case.name,
         timeout_cycles=case.timeout,
         reg_num=case.out_reg,
         expected_val=case.out_val,
         expected_mem=case.mem_out,
-        reg_init=reg_init,
-        mem_cfg=mem_cfg,
+        reg_init=case.reg_init or RegistryContents.empty(),
+        mem_cfg=get_mem_test_config(case),
         verbose=True,
+        lockstep=case.lockstep,
+        bus_latency=case.bus_latency,
+        bus_latency_seed=case.bus_latency_seed,
     )
+    # Timing is not reproducible with randomly seeded bus latency.
+    if cycles is not None and (case.bus_latency is None or case.bus_latency_seed is not None):
+        check_cycle_count(name=case.name, cycles=cycles)
+
+
+def assert_iss_mem_test(case: MemTestCase, default_timeout: int = 1000):
+    """
+    Runs MemTestCase on the instruction-set simulator, with the same checks as 'assert_mem_test' does.
+    'case.timeout' (in CPU cycles) is used as instruction limit.
+    """
+    from mtkcpu.iss.iss import MtkCpuIss
+    from ctypes import c_int32
+
+    reg_init = case.reg_init or RegistryContents.empty()
+    mem_cfg = get_mem_test_config(case)
+    iss = MtkCpuIss(
+        mem_config=mem_cfg,
+        cpu_config=CPU_Config(
+            dev_mode=False,
+            with_debug=False,
+            pc_reset_value=CODE_START_ADDR,
+            with_virtual_memory=True,
+        ),
+        reg_init=list(reg_init.reg),
+    )
+
+    result_mem = {}
+    for _ in range(case.timeout or default_timeout):
+        retired = iss.step()
+        if retired.store is not None:
+            addr, _, _ = retired.store
+            if mem_cfg.mem_addr <= addr < mem_cfg.last_valid_addr_excl:
+                result_mem[addr - mem_cfg.mem_addr] = iss.phys_read(addr, fault=None)
+        if case.out_reg is not None and retired.rd == case.out_reg:
+            if isinstance(case.out_val, Callable):
+                assert case.out_val(retired.rd_val), f"{case.name}: unexpected x{case.out_reg} value {hex(retired.rd_val)}"
+            else:
+                assert c_int32(retired.rd_val).value == c_int32(case.out_val).value, \
+                    f"{case.name}: expected x{case.out_reg} == {hex(case.out_val)}, got {hex(retired.rd_val)}"
+            break
+        if iss.halted:
+            break
+    else:
+        if case.out_reg is not None:
+            raise AssertionError(f"{case.name}: x{case.out_reg} was not written in {case.timeout} instructions!")
+
+    if case.mem_out is not None:
+        MemoryContents(result_mem).assert_equality(case.mem_out)
 
 
 def create_jtag_simulator(monitor: DMI_Monitor, cpu: MtkCpu) -> Tuple[Simulator, list[Signal]]:
@@ -816,17 +910,8 @@ def assert_jtag_test(
         get_sim_jtag_controller(cpu=cpu),
 
         # all processes below are Passive.
-        monitor_cmderr(dmi_monitor),
-        monitor_cpu_dm_if_error(dmi_monitor),
-        monitor_cpu_and_dm_state(dmi_monitor),
-        monitor_pc_and_main_fsm(cpu=cpu),
-        print_dmi_transactions(dmi_monitor),
-        monitor_writes_to_gpr(dmi_monitor, gpr_num=8),
-        monitor_halt_or_resume_req_get_ack(dmi_monitor),
         get_sim_memory_test(cpu=cpu, mem_dict=MemoryContents.empty()),
-        monitor_writes_to_dcsr(dmi_monitor=dmi_monitor),
-        monitor_abstractauto(dmi_monitor=dmi_monitor),
-        bus_capture_write_transactions(cpu=dmi_monitor.cpu, output_dict=dict()),
+        *jtag_test_monitors(dmi_monitor),
     ]
 
     def tck_timeouted(generator_fn: Callable, timeout: int):
@@ -947,10 +1032,13 @@ def assert_jtag_test(
             log_sink=Path("ckpt.log").open("w")),
         )
 
-    for p in processes:
+    # Monitors are run by a single process (see MonitorHub).
+    for p in merge_monitors(processes):
         sim.add_sync_process(p)
-    
-    with sim.write_vcd("jtag.vcd", "jtag.gtkw", traces=vcd_traces):
+
+    waveform = WaveformCapture(name="jtag", traces=vcd_traces, pc=cpu.pc)
+    waveform.add_to(sim)
+    with waveform.capture(sim):
         sim.run()
 
 
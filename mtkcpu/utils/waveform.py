@@ -0,0 +1,273 @@
+"""
+Opt-in waveform capture of simulations.
+
+Tracing is configured by a spec string (see 'TraceConfig.parse'), either passed explicitly
+(e.g. 'mtkcpu sim --trace ...') or taken from TRACE_ENV environment variable (tests):
+
+* 'none' (default) - nothing is dumped,
+* 'full' - all signals, whole simulation (Amaranth's VCD writer),
+* 'window:<first cycle>:<num cycles>' - only given cycles,
+* 'trigger:<pc>[:<cycles before>[:<cycles after>]]' - cycles around the first time CPU reaches 'pc',
+* 'ring:<num cycles>' - last cycles before simulation failed (nothing is dumped if it succeeded),
+* 'npz' - whole simulation, in compact columnar format (see mtkcpu.utils.columnar_trace), for long runs.
+
+All but 'full' record only 'traces' signals, sampled once per clock cycle (VCD time unit is one cycle),
+so that the overhead is proportional to the number of signals of interest, not to the design size.
+
+Artifacts are stored in per-test directories (see 'artifacts_dir'), so that parallel
+pytest workers don't overwrite each other's files.
+"""
+
+import os
+import re
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Sequence, Tuple
+
+from amaranth.hdl.ast import Cat, Signal
+from amaranth.sim import Settle, Simulator
+from amaranth.sim.core import Passive
+
+from mtkcpu.utils.columnar_trace import ChangeRecorder
+from mtkcpu.utils.misc import get_color_logging_object
+
+log = get_color_logging_object()
+
+# Trace spec for tests, see module docstring.
+TRACE_ENV = "MTKCPU_TRACE"
+# Root directory for simulation artifacts.
+TRACE_DIR_ENV = "MTKCPU_TRACE_DIR"
+DEFAULT_TRACE_DIR = Path("sim_artifacts")
+
+
+class TraceMode(str, Enum):
+    NONE = "none"
+    FULL = "full"
+    WINDOW = "window"
+    TRIGGER = "trigger"
+    RING = "ring"
+    NPZ = "npz"
+
+
+@dataclass(frozen=True)
+class TraceConfig:
+    mode: TraceMode = TraceMode.NONE
+    first_cycle: int = 0 # WINDOW
+    num_cycles: int = 0 # WINDOW, RING: length, TRIGGER: cycles after the trigger
+    trigger_pc: Optional[int] = None # TRIGGER
+    pre_trigger_cycles: int = 0 # TRIGGER
+
+    @staticmethod
+    def parse(spec: str) -> "TraceConfig":
+        mode, *params = spec.split(":")
+        try:
+            mode = TraceMode(mode)
+            params = [int(x, 0) for x in params]
+        except ValueError:
+            raise ValueError(f"Invalid trace spec '{spec}', see {__name__} docstring for the syntax.")
+        expected_params = {
+            TraceMode.NONE: (0, 0),
+            TraceMode.FULL: (0, 0),
+            TraceMode.WINDOW: (2, 2),
+            TraceMode.TRIGGER: (1, 3),
+            TraceMode.RING: (1, 1),
+            TraceMode.NPZ: (0, 0),
+        }
+        lo, hi = expected_params[mode]
+        if not lo <= len(params) <= hi:
+            raise ValueError(f"Trace mode '{mode.value}' takes {lo}..{hi} parameters, got spec '{spec}'.")
+
+        if mode == TraceMode.WINDOW:
+            return TraceConfig(mode=mode, first_cycle=params[0], num_cycles=params[1])
+        if mode == TraceMode.TRIGGER:
+            # Defaults for omitted trailing parameters.
+            pc, pre, post = params + [100, 1000][len(params) - 1:]
+            return TraceConfig(mode=mode, trigger_pc=pc, pre_trigger_cycles=pre, num_cycles=post)
+        if mode == TraceMode.RING:
+            return TraceConfig(mode=mode, num_cycles=params[0])
+        return TraceConfig(mode=mode)
+
+    @staticmethod
+    def from_env() -> "TraceConfig":
+        return TraceConfig.parse(os.environ.get(TRACE_ENV, TraceMode.NONE.value))
+
+
+def artifacts_dir() -> Path:
+    """
+    TRACE_DIR_ENV (DEFAULT_TRACE_DIR if not set) subdirectory, named after the currently running test (if any).
+    """
+    root = Path(os.environ.get(TRACE_DIR_ENV, DEFAULT_TRACE_DIR))
+    # e.g. 'mtkcpu/tests/test_memory.py::test_memory[test_case0] (call)'
+    test_id = os.environ.get("PYTEST_CURRENT_TEST", "").split(" ")[0]
+    return root / re.sub(r"[^\w.\-]+", "_", test_id) if test_id else root
+
+
+def default_cpu_traces(cpu) -> List[Signal]:
+    """
+    Signals worth looking at in a typical MtkCpu simulation.
+    """
+    bus = cpu.arbiter.wb_bus
+    return [
+        cpu.pc,
+        cpu.instr,
+        cpu.main_fsm.state,
+        bus.cyc, bus.we, bus.adr, bus.sel, bus.dat_w, bus.dat_r, bus.ack,
+        cpu.reg_write_port.en, cpu.reg_write_port.addr, cpu.reg_write_port.data,
+    ]
+
+
+class WaveformCapture:
+    """
+    Usage - instead of wrapping 'sim.run()' in 'sim.write_vcd(...)':
+
+        waveform = WaveformCapture(name="cpu", traces=[...], pc=cpu.pc)
+        waveform.add_to(sim)
+        with waveform.capture(sim):
+            sim.run()
+
+    'config' is taken from TRACE_ENV environment variable if not set. 'pc' is required for TRIGGER mode only.
+    """
+    def __init__(
+            self,
+            name: str,
+            traces: Sequence[Signal] = (),
+            pc: Optional[Signal] = None,
+            config: Optional[TraceConfig] = None,
+            directory: Optional[Path] = None,
+        ) -> None:
+        self.config = config or TraceConfig.from_env()
+        self.name = re.sub(r"[^\w.\-]+", "_", name)
+        self.traces = list(traces)
+        self.pc = pc
+        self.directory = directory
+
+        # NOTE: TRACE_ENV applies to all simulations, don't fail those not supporting given mode.
+        unsupported = None
+        if self.config.mode == TraceMode.TRIGGER and pc is None:
+            unsupported = "no PC signal"
+        elif self.sampled and not self.traces:
+            unsupported = "no 'traces' signals"
+        if unsupported:
+            log.warning(f"Trace mode '{self.config.mode.value}' is not supported for '{name}' simulation ({unsupported}), disabling tracing.")
+            self.config = TraceConfig()
+        self.dumped = False
+        # (cycle, 'traces' concatenated) pairs.
+        self.samples: Deque[Tuple[int, int]] = deque(maxlen=self.config.num_cycles if self.config.mode == TraceMode.RING else None)
+        # NPZ mode only, samples are not kept.
+        self.recorder = ChangeRecorder(self.traces) if self.config.mode == TraceMode.NPZ else None
+
+    @property
+    def sampled(self) -> bool:
+        return self.config.mode in [TraceMode.WINDOW, TraceMode.TRIGGER, TraceMode.RING, TraceMode.NPZ]
+
+    def path(self, suffix: str) -> Path:
+        directory = self.directory or artifacts_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{self.name}{suffix}"
+
+    def process(self) -> Optional[Callable]:
+        """
+        Passive sync process sampling 'traces', None if not needed for the configured mode.
+        """
+        if not self.sampled:
+            return None
+        cfg = self.config
+        # Single read per cycle is much cheaper than one per signal.
+        traces = Cat(*self.traces)
+
+        def aux():
+            yield Passive()
+            samples = self.samples
+            if cfg.mode == TraceMode.TRIGGER:
+                # Last cycles before the trigger.
+                samples = deque(maxlen=cfg.pre_trigger_cycles)
+            triggered_at = None
+            # Sync processes start after the first clock edge.
+            cycle = 1
+            while True:
+                yield Settle()
+                if cfg.mode == TraceMode.WINDOW:
+                    if cycle >= cfg.first_cycle + cfg.num_cycles:
+                        # Simulation might never end (e.g. 'mtkcpu sim').
+                        self.dump()
+                        return
+                    record = cycle >= cfg.first_cycle
+                elif cfg.mode == TraceMode.TRIGGER:
+                    if triggered_at is None and (yield self.pc) == cfg.trigger_pc:
+                        triggered_at = cycle
+                        self.samples.extend(samples)
+                        samples = self.samples
+                    if triggered_at is not None and cycle >= triggered_at + cfg.num_cycles:
+                        self.dump()
+                        return
+                    record = True
+                else:
+                    record = True
+                if self.recorder is not None:
+                    self.recorder.add(cycle, (yield traces))
+                elif record:
+                    samples.append((cycle, (yield traces)))
+                cycle += 1
+                yield
+        return aux
+
+    def add_to(self, sim: Simulator) -> None:
+        process = self.process()
+        if process is not None:
+            sim.add_sync_process(process)
+
+    def values(self, sample: int) -> List[int]:
+        """
+        Splits sample into values of 'traces'.
+        """
+        res = []
+        for signal in self.traces:
+            res.append(sample & ((1 << len(signal)) - 1))
+            sample >>= len(signal)
+        return res
+
+    def dump(self) -> Optional[Path]:
+        self.dumped = True
+        recorder = self.recorder
+        if recorder is None:
+            recorder = ChangeRecorder(self.traces)
+            for cycle, sample in self.samples:
+                recorder.add(cycle, sample)
+        if recorder.start is None:
+            log.warning(f"No cycles were recorded for '{self.name}' waveform (trace config: {self.config}).")
+            return None
+        trace = recorder.trace()
+        if self.recorder is not None:
+            path = self.path(".npz")
+            trace.save(path)
+        else:
+            path = self.path(".vcd")
+            trace.to_vcd(path, self.path(".gtkw"))
+        print(f"== Waveform dumped to {path}")
+        return path
+
+    @contextmanager
+    def capture(self, sim: Simulator):
+        """
+        Context manager for 'sim.run()'. Waveform of WINDOW and TRIGGER modes is dumped as soon as
+        it's complete (or when simulation ends), of NPZ mode - when simulation ends,
+        of RING mode - only if simulation raised (including 'exit' calls).
+        """
+        mode = self.config.mode
+        if mode == TraceMode.FULL:
+            vcd, gtkw = self.path(".vcd"), self.path(".gtkw")
+            with sim.write_vcd(str(vcd), str(gtkw), traces=self.traces):
+                yield
+            print(f"== Waveform dumped to {vcd}")
+            return
+        try:
+            yield
+        except BaseException:
+            if self.sampled and not self.dumped:
+                self.dump()
+            raise
+        if mode in [TraceMode.WINDOW, TraceMode.TRIGGER, TraceMode.NPZ] and not self.dumped:
+            self.dump()
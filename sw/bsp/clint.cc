@@ -0,0 +1,18 @@
+// Code automatically generated, do not modify!
+
+#include "clint.h"
+/* Machine Software Interrupt Pending - write 1 to the lowest bit to raise the interrupt, 0 to clear it. */
+const void* msip_addr = (void*) __msip_addr;
+
+/* Lower 32 bits of 'mtimecmp'. Timer interrupt is pending as long as mtime >= mtimecmp. */
+const void* mtimecmp_lo_addr = (void*) __mtimecmp_lo_addr;
+
+/* Upper 32 bits of 'mtimecmp'. */
+const void* mtimecmp_hi_addr = (void*) __mtimecmp_hi_addr;
+
+/* Lower 32 bits of free running 'mtime' counter. */
+const void* mtime_lo_addr = (void*) __mtime_lo_addr;
+
+/* Upper 32 bits of free running 'mtime' counter. */
+const void* mtime_hi_addr = (void*) __mtime_hi_addr;
+
@@ -0,0 +1,18 @@
+// Code automatically generated, do not modify!
+
+#include "periph_baseaddr.h"
+/* Machine Software Interrupt Pending - write 1 to the lowest bit to raise the interrupt, 0 to clear it. */
+#define __msip_addr (clint_base + 0x0)
+
+/* Lower 32 bits of 'mtimecmp'. Timer interrupt is pending as long as mtime >= mtimecmp. */
+#define __mtimecmp_lo_addr (clint_base + 0x4000)
+
+/* Upper 32 bits of 'mtimecmp'. */
+#define __mtimecmp_hi_addr (clint_base + 0x4004)
+
+/* Lower 32 bits of free running 'mtime' counter. */
+#define __mtime_lo_addr (clint_base + 0xbff8)
+
+/* Upper 32 bits of free running 'mtime' counter. */
+#define __mtime_hi_addr (clint_base + 0xbffc)
+
@@ -1,10 +1,31 @@
 // Code automatically generated, do not modify!
 
 #include "gpio.h"
-/* State of all GPIO signals (either high or low). */
+/* State of all GPIO signals (either high or low). Write sets all outputs at once. */
 const void* gpio_state_addr = (void*) __gpio_state_addr;
 
 constexpr unsigned led_r_0__o___gpio_state_addr_offset = (unsigned) __led_r_0__o___gpio_state_addr_offset;
 
 constexpr unsigned led_g_0__o___gpio_state_addr_offset = (unsigned) __led_g_0__o___gpio_state_addr_offset;
 
+/* Write only - outputs with corresponding bits set are driven high, the rest stay untouched. */
+const void* gpio_set_addr = (void*) __gpio_set_addr;
+
+/* Write only - outputs with corresponding bits set are driven low, the rest stay untouched. */
+const void* gpio_clear_addr = (void*) __gpio_clear_addr;
+
+/* Write only - outputs with corresponding bits set are inverted, the rest stay untouched. */
+const void* gpio_toggle_addr = (void*) __gpio_toggle_addr;
+
+/* Rising edge latches - bit is set on rising edge of the corresponding signal. Write 1 to clear. */
+const void* gpio_rise_addr = (void*) __gpio_rise_addr;
+
+/* Falling edge latches - bit is set on falling edge of the corresponding signal. Write 1 to clear. */
+const void* gpio_fall_addr = (void*) __gpio_fall_addr;
+
+/* Interrupt is raised as long as any enabled rising edge latch is set. */
+const void* gpio_rise_irq_en_addr = (void*) __gpio_rise_irq_en_addr;
+
+/* Interrupt is raised as long as any enabled falling edge latch is set. */
+const void* gpio_fall_irq_en_addr = (void*) __gpio_fall_irq_en_addr;
+
@@ -1,10 +1,31 @@
 // Code automatically generated, do not modify!
 
 #include "periph_baseaddr.h"
-/* State of all GPIO signals (either high or low). */
+/* State of all GPIO signals (either high or low). Write sets all outputs at once. */
 #define __gpio_state_addr (gpio_base + 0x0)
 
 #define __led_r_0__o___gpio_state_addr_offset 0
 
 #define __led_g_0__o___gpio_state_addr_offset 1
 
+/* Write only - outputs with corresponding bits set are driven high, the rest stay untouched. */
+#define __gpio_set_addr (gpio_base + 0x4)
+
+/* Write only - outputs with corresponding bits set are driven low, the rest stay untouched. */
+#define __gpio_clear_addr (gpio_base + 0x8)
+
+/* Write only - outputs with corresponding bits set are inverted, the rest stay untouched. */
+#define __gpio_toggle_addr (gpio_base + 0xc)
+
+/* Rising edge latches - bit is set on rising edge of the corresponding signal. Write 1 to clear. */
+#define __gpio_rise_addr (gpio_base + 0x10)
+
+/* Falling edge latches - bit is set on falling edge of the corresponding signal. Write 1 to clear. */
+#define __gpio_fall_addr (gpio_base + 0x14)
+
+/* Interrupt is raised as long as any enabled rising edge latch is set. */
+#define __gpio_rise_irq_en_addr (gpio_base + 0x18)
+
+/* Interrupt is raised as long as any enabled falling edge latch is set. */
+#define __gpio_fall_irq_en_addr (gpio_base + 0x1c)
+
@@ -4,3 +4,8 @@
 #define ebr_base 0x80000000
 #define gpio_base 0x90000000
 #define debug_ebr_base 0xde88
+#define clint_base 0x2000000
+#define plic_base 0xc000000
+
+/* Frequency of the CPU clock, 'mtime' is incremented once per cycle. */
+#define clk_freq_hz 12000000
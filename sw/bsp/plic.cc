@@ -0,0 +1,40 @@
+// Code automatically generated, do not modify!
+
+#include "plic.h"
+/* Priority of interrupt source 1, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_1_addr = (void*) __priority_1_addr;
+
+/* Priority of interrupt source 2, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_2_addr = (void*) __priority_2_addr;
+
+/* Priority of interrupt source 3, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_3_addr = (void*) __priority_3_addr;
+
+/* Priority of interrupt source 4, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_4_addr = (void*) __priority_4_addr;
+
+/* Priority of interrupt source 5, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_5_addr = (void*) __priority_5_addr;
+
+/* Priority of interrupt source 6, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_6_addr = (void*) __priority_6_addr;
+
+/* Priority of interrupt source 7, 3 bits wide. Zero means 'never interrupt'. */
+const void* priority_7_addr = (void*) __priority_7_addr;
+
+/* Read only - bit 'i' set means that interrupt source 'i' is pending. */
+const void* pending_addr = (void*) __pending_addr;
+
+/* Bit 'i' set means that interrupt source 'i' is enabled. */
+const void* enable_addr = (void*) __enable_addr;
+
+/* Only sources with priority strictly greater than threshold can interrupt. */
+const void* threshold_addr = (void*) __threshold_addr;
+
+/* Read claims the highest priority pending source and returns its ID (0 if none). Write of claimed ID signals that the interrupt handling is completed. */
+const void* claim_complete_addr = (void*) __claim_complete_addr;
+
+constexpr unsigned claim_complete_uart = (unsigned) __claim_complete_uart;
+
+constexpr unsigned claim_complete_gpio = (unsigned) __claim_complete_gpio;
+
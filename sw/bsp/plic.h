@@ -0,0 +1,40 @@
+// Code automatically generated, do not modify!
+
+#include "periph_baseaddr.h"
+/* Priority of interrupt source 1, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_1_addr (plic_base + 0x4)
+
+/* Priority of interrupt source 2, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_2_addr (plic_base + 0x8)
+
+/* Priority of interrupt source 3, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_3_addr (plic_base + 0xc)
+
+/* Priority of interrupt source 4, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_4_addr (plic_base + 0x10)
+
+/* Priority of interrupt source 5, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_5_addr (plic_base + 0x14)
+
+/* Priority of interrupt source 6, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_6_addr (plic_base + 0x18)
+
+/* Priority of interrupt source 7, 3 bits wide. Zero means 'never interrupt'. */
+#define __priority_7_addr (plic_base + 0x1c)
+
+/* Read only - bit 'i' set means that interrupt source 'i' is pending. */
+#define __pending_addr (plic_base + 0x1000)
+
+/* Bit 'i' set means that interrupt source 'i' is enabled. */
+#define __enable_addr (plic_base + 0x2000)
+
+/* Only sources with priority strictly greater than threshold can interrupt. */
+#define __threshold_addr (plic_base + 0x200000)
+
+/* Read claims the highest priority pending source and returns its ID (0 if none). Write of claimed ID signals that the interrupt handling is completed. */
+#define __claim_complete_addr (plic_base + 0x200004)
+
+#define __claim_complete_uart 0x1
+
+#define __claim_complete_gpio 0x2
+
@@ -7,3 +7,26 @@ const void* tx_busy_addr = (void*) __tx_busy_addr;
 /* Data byte to be sent. Width of this register is 8 bits. */
 const void* tx_data_addr = (void*) __tx_data_addr;
 
+/* Read/write - number of clock cycles per bit, as a fixed-point number with 4 fractional bits. Integer part must be non-zero. Reset value is 0x683. Write it only when tx_busy is zero. */
+const void* baud_divisor_addr = (void*) __baud_divisor_addr;
+
+constexpr unsigned baud_divisor_9600 = (unsigned) __baud_divisor_9600;
+
+constexpr unsigned baud_divisor_19200 = (unsigned) __baud_divisor_19200;
+
+constexpr unsigned baud_divisor_57600 = (unsigned) __baud_divisor_57600;
+
+constexpr unsigned baud_divisor_115200 = (unsigned) __baud_divisor_115200;
+
+constexpr unsigned baud_divisor_230400 = (unsigned) __baud_divisor_230400;
+
+constexpr unsigned baud_divisor_460800 = (unsigned) __baud_divisor_460800;
+
+constexpr unsigned baud_divisor_921600 = (unsigned) __baud_divisor_921600;
+
+constexpr unsigned baud_divisor_1000000 = (unsigned) __baud_divisor_1000000;
+
+constexpr unsigned baud_divisor_2000000 = (unsigned) __baud_divisor_2000000;
+
+constexpr unsigned baud_divisor_3000000 = (unsigned) __baud_divisor_3000000;
+
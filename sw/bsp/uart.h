@@ -7,3 +7,26 @@
 /* Data byte to be sent. Width of this register is 8 bits. */
 #define __tx_data_addr (uart_base + 0x8)
 
+/* Read/write - number of clock cycles per bit, as a fixed-point number with 4 fractional bits. Integer part must be non-zero. Reset value is 0x683. Write it only when tx_busy is zero. */
+#define __baud_divisor_addr (uart_base + 0x10)
+
+#define __baud_divisor_9600 0x4e20
+
+#define __baud_divisor_19200 0x2710
+
+#define __baud_divisor_57600 0xd05
+
+#define __baud_divisor_115200 0x683
+
+#define __baud_divisor_230400 0x341
+
+#define __baud_divisor_460800 0x1a1
+
+#define __baud_divisor_921600 0xd0
+
+#define __baud_divisor_1000000 0xc0
+
+#define __baud_divisor_2000000 0x60
+
+#define __baud_divisor_3000000 0x40
+
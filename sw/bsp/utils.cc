@@ -1,8 +1,10 @@
 #include <stdint.h>
 
+#include "utils.h"
 #include "periph_baseaddr.h"
 #include "gpio.h"
 #include "uart.h"
+#include "clint.h"
 
 #define __STRINGIFY(x) #x
 #define _STRINGIFY(x) __STRINGIFY(x)
@@ -11,26 +13,27 @@
 
 
 
-#define CYC_PER_INSTR 10
-constexpr uint32_t instr_per_ms = 1000 / CYC_PER_INSTR;
-
 void sleep(uint32_t ms) {
-    volatile auto num_instr = instr_per_ms * ms;
-    while (num_instr) {
-        num_instr--;
+    // 'mtime' is incremented every CPU clock cycle.
+    constexpr uint32_t cycles_per_ms = clk_freq_hz / 1000;
+    auto mtime = (volatile uint32_t*)__mtime_lo_addr;
+    for (; ms; ms--) {
+        uint32_t start = *mtime;
+        while (*mtime - start < cycles_per_ms);
     }
 }
 
-// int print(const char *format, ...) {
-//     // TODO 
-//     return 1;
-// }
-
 void uart_putc(char c) {
     while(*((volatile uint32_t*)__tx_busy_addr));
     *((volatile uint8_t*)__tx_data_addr) = c;
 }
 
+void uart_set_baud_divisor(uint32_t divisor) {
+    // changing bit period in the middle of a frame would corrupt it.
+    while(*((volatile uint32_t*)__tx_busy_addr));
+    *((volatile uint32_t*)__baud_divisor_addr) = divisor;
+}
+
 void print(const char* msg) {
     char c;
     while(c = *(msg++)) {
@@ -39,6 +42,119 @@ void print(const char* msg) {
     uart_putc('\n');
 }
 
+// NOTE: rv32i has no division instruction, thus digits are computed by repeated subtraction.
+static void print_number(uint32_t value, bool hex, bool upper, bool negative, uint32_t width, char pad) {
+    static const uint32_t powers_of_10[] = {1000000000, 100000000, 10000000, 1000000, 100000, 10000, 1000, 100, 10, 1};
+    const char *digits = upper ? "0123456789ABCDEF" : "0123456789abcdef";
+    char buf[10];
+    uint32_t len = 0;
+    if (hex) {
+        for (int shift = 28; shift >= 0; shift -= 4) {
+            uint32_t digit = (value >> shift) & 0xF;
+            if (digit || len || !shift) {
+                buf[len++] = digits[digit];
+            }
+        }
+    } else {
+        for (auto power : powers_of_10) {
+            uint32_t digit = 0;
+            while (value >= power) {
+                value -= power;
+                digit++;
+            }
+            if (digit || len || power == 1) {
+                buf[len++] = digits[digit];
+            }
+        }
+    }
+    if (negative && pad == '0') {
+        uart_putc('-');
+    }
+    for (uint32_t i = len + negative; i < width; i++) {
+        uart_putc(pad);
+    }
+    if (negative && pad != '0') {
+        uart_putc('-');
+    }
+    for (uint32_t i = 0; i < len; i++) {
+        uart_putc(buf[i]);
+    }
+}
+
+void vprint_fmt(const char *format, va_list args) {
+    char c;
+    while ((c = *(format++))) {
+        if (c != '%') {
+            uart_putc(c);
+            continue;
+        }
+        char pad = ' ';
+        uint32_t width = 0;
+        if (*format == '0') {
+            pad = '0';
+            format++;
+        }
+        while (*format >= '0' && *format <= '9') {
+            width = 10 * width + *(format++) - '0';
+        }
+        // 'long' is of the same size as 'int'.
+        if (*format == 'l') {
+            format++;
+        }
+        switch (c = *(format++)) {
+            case 'c':
+                uart_putc(va_arg(args, int));
+                break;
+            case 's': {
+                const char *s = va_arg(args, const char*);
+                while (*s) {
+                    uart_putc(*(s++));
+                }
+                break;
+            }
+            case 'd':
+            case 'i': {
+                int32_t value = va_arg(args, int32_t);
+                print_number(value < 0 ? -(uint32_t)value : value, false, false, value < 0, width, pad);
+                break;
+            }
+            case 'u':
+                print_number(va_arg(args, uint32_t), false, false, false, width, pad);
+                break;
+            case 'x':
+            case 'X':
+                print_number(va_arg(args, uint32_t), true, c == 'X', false, width, pad);
+                break;
+            case '\0':
+                return;
+            default:
+                uart_putc(c);
+        }
+    }
+}
+
+void print_fmt(const char *format, ...) {
+    va_list args;
+    va_start(args, format);
+    vprint_fmt(format, args);
+    va_end(args);
+}
+
+uint32_t get_cycles() {
+    uint32_t cycles;
+    // CSRNonStandardIndex.MTIME
+    asm volatile ("csrr %0, 0x7c0" : "=r"(cycles));
+    return cycles;
+}
+
+#ifdef htif_base
+void sim_exit(uint32_t code) {
+    // HTIF 'tohost' register - odd value ends the simulation.
+    *((volatile uint32_t*)htif_base) = (code << 1) | 1;
+    while(true) {}
+}
+#endif
+
 static void _assert(int x, const char *msg) {
   if (!x) {
     print(msg);
@@ -46,23 +162,19 @@ static void _assert(int x, const char *msg) {
   }
 }
 
-static inline uint32_t all_ones_but_one(uint32_t zero_offset) {
-    ASSERT(zero_offset < 32);
-    return 0xffffffff ^ (1 << zero_offset);
-}
-
-void gpio_set_state(uint32_t offset, bool high) {
-    auto gpio_state = (volatile uint32_t*)__gpio_state_addr;
-    auto old_value_masked = *gpio_state & all_ones_but_one(offset);
-    *gpio_state = old_value_masked | ((high ? 1 : 0) << offset);
-}
-
 void gpio_on(uint32_t offset) {
-    gpio_set_state(offset, true);
+    ASSERT(offset < 32);
+    *((volatile uint32_t*)__gpio_set_addr) = 1 << offset;
 }
 
 void gpio_off(uint32_t offset) {
-    gpio_set_state(offset, false);
+    ASSERT(offset < 32);
+    *((volatile uint32_t*)__gpio_clear_addr) = 1 << offset;
+}
+
+void gpio_toggle(uint32_t offset) {
+    ASSERT(offset < 32);
+    *((volatile uint32_t*)__gpio_toggle_addr) = 1 << offset;
 }
 
 void enable_green_led() {
@@ -80,4 +192,46 @@ void enable_red_led() {
 
 void disable_red_led() {
     gpio_off(__led_r_0__o___gpio_state_addr_offset);
-}
\ No newline at end of file
+}
+
+#if defined(__GNUC__) && !defined(__clang__)
+// Otherwise the compiler would replace the loops below with calls to the very functions they implement.
+#define NO_LOOP_PATTERNS __attribute__((optimize("no-tree-loop-distribute-patterns")))
+#else
+#define NO_LOOP_PATTERNS
+#endif
+
+extern "C" {
+
+NO_LOOP_PATTERNS void *memcpy(void *dest, const void *src, size_t n) {
+    auto d = (uint8_t*)dest;
+    auto s = (const uint8_t*)src;
+    while (n--) {
+        *(d++) = *(s++);
+    }
+    return dest;
+}
+
+NO_LOOP_PATTERNS void *memset(void *dest, int c, size_t n) {
+    auto d = (uint8_t*)dest;
+    while (n--) {
+        *(d++) = c;
+    }
+    return dest;
+}
+
+NO_LOOP_PATTERNS char *strcpy(char *dest, const char *src) {
+    char *d = dest;
+    while ((*(d++) = *(src++)));
+    return dest;
+}
+
+int strcmp(const char *s1, const char *s2) {
+    while (*s1 && *s1 == *s2) {
+        s1++;
+        s2++;
+    }
+    return *(const uint8_t*)s1 - *(const uint8_t*)s2;
+}
+
+}
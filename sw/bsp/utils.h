@@ -1,21 +1,48 @@
 #include "periph_baseaddr.h"
 #include "gpio.h"
 #include "stdint.h"
+#include <stdarg.h>
+#include <stddef.h>
 
-void sleep(uint32_t us);
-
-// int print(const char *format, ...); // TODO
+void sleep(uint32_t ms);
 
 void print(const char *msg);
 
+// Formatted print to UART. Supported conversions are %c, %s, %d, %i, %u, %x and %X,
+// with optional '0' flag, field width and 'l' length modifier.
+void print_fmt(const char *format, ...);
+
+void vprint_fmt(const char *format, va_list args);
+
+// Number of clock cycles elapsed (lower 32 bits of 'mtime'), read from non-standard CSR.
+uint32_t get_cycles();
+
+#ifdef htif_base
+// Simulation-only (see mtkcpu/units/mmio/htif.py, BSP generated with 'gen_bsp --sim_htif' or built with HTIF_BASE set) - ends the simulation with given exit code.
+void sim_exit(uint32_t code);
+#endif
+
+// 'divisor' is either one of '__baud_divisor_*' defines from uart.h, or a custom value.
+void uart_set_baud_divisor(uint32_t divisor);
+
 void gpio_on(uint32_t offset);
 
 void gpio_off(uint32_t offset);
 
+void gpio_toggle(uint32_t offset);
+
 void enable_green_led();
 
 void disable_green_led();
 
 void enable_red_led();
 
-void disable_red_led();
\ No newline at end of file
+void disable_red_led();
+
+// Freestanding implementations of the few C library functions, that the compiler might emit calls to.
+extern "C" {
+void *memcpy(void *dest, const void *src, size_t n);
+void *memset(void *dest, int c, size_t n);
+char *strcpy(char *dest, const char *src);
+int strcmp(const char *s1, const char *s2);
+}
@@ -30,6 +30,11 @@ CCFLAGS += -fno-exceptions # don't create .eh-frame sections etc; reduces code s
 CCFLAGS += -I../bsp/
 CCFLAGS += -Isrc/ # working directory
 
+# Simulation only (see mtkcpu/units/mmio/htif.py) - HTIF base address, makes 'sim_exit' available.
+ifneq ($(HTIF_BASE),)
+CCFLAGS += -Dhtif_base=$(HTIF_BASE)
+endif
+
 SRCS := $(wildcard src/*.cc) \
 	$(wildcard src/*.S) \
         ../bsp/start.S \
@@ -0,0 +1,267 @@
+/*
+ ****************************************************************************
+ *
+ *                   "DHRYSTONE" Benchmark Program
+ *                   -----------------------------
+ *
+ *  Version:    C, Version 2.1
+ *
+ *  File:       dhry_1.c (part 2 of 3)
+ *
+ *  Date:       May 25, 1988
+ *
+ *  Author:     Reinhold P. Weicker
+ *
+ ****************************************************************************
+ */
+
+#include "dhry.h"
+
+/* Global Variables: */
+
+Rec_Pointer     Ptr_Glob,
+                Next_Ptr_Glob;
+int             Int_Glob;
+Boolean         Bool_Glob;
+char            Ch_1_Glob,
+                Ch_2_Glob;
+int             Arr_1_Glob [50];
+int             Arr_2_Glob [50] [50];
+
+static Rec_Type Glob_Rec, Next_Glob_Rec;
+
+/* Final values are printed only if they differ from the expected ones - printing is slow in simulation. */
+static int check(const char *name, int value, int expected) {
+  if (value == expected)
+    return 0;
+  print_fmt("%s %d\n        should be:   %d\n", name, value, expected);
+  return 1;
+}
+
+static int check_str(const char *name, const char *value, const char *expected) {
+  if (strcmp(value, expected) == 0)
+    return 0;
+  print_fmt("%s %s\n        should be:   %s\n", name, value, expected);
+  return 1;
+}
+
+int main ()
+/*****/
+
+  /* main program, corresponds to procedures        */
+  /* Main and Proc_0 in the Ada version             */
+{
+        One_Fifty       Int_1_Loc;
+        One_Fifty       Int_2_Loc;
+        One_Fifty       Int_3_Loc;
+        char            Ch_Index;
+        Enumeration     Enum_Loc;
+        Str_30          Str_1_Loc;
+        Str_30          Str_2_Loc;
+        int             Run_Index;
+        int             Number_Of_Runs = NUMBER_OF_RUNS;
+        uint32_t        Begin_Time, End_Time, User_Time;
+
+  /* Initializations */
+
+  Next_Ptr_Glob = &Next_Glob_Rec;
+  Ptr_Glob = &Glob_Rec;
+
+  Ptr_Glob->Ptr_Comp                    = Next_Ptr_Glob;
+  Ptr_Glob->Discr                       = Ident_1;
+  Ptr_Glob->variant.var_1.Enum_Comp     = Ident_3;
+  Ptr_Glob->variant.var_1.Int_Comp      = 40;
+  strcpy (Ptr_Glob->variant.var_1.Str_Comp,
+          "DHRYSTONE PROGRAM, SOME STRING");
+  strcpy (Str_1_Loc, "DHRYSTONE PROGRAM, 1'ST STRING");
+
+  Arr_2_Glob [8][7] = 10;
+        /* Was missing in published program. Without this statement,    */
+        /* Arr_2_Glob [8][7] would have an undefined value.             */
+        /* Warning: With 16-Bit processors and Number_Of_Runs > 32000,  */
+        /* overflow may occur for this array element.                   */
+
+  print_fmt ("\nDhrystone Benchmark, Version 2.1 (Language: C)\n");
+  print_fmt ("Execution starts, %d runs through Dhrystone\n", Number_Of_Runs);
+
+  /***************/
+  /* Start timer */
+  /***************/
+
+  Begin_Time = get_cycles();
+
+  for (Run_Index = 1; Run_Index <= Number_Of_Runs; ++Run_Index)
+  {
+    Proc_5();
+    Proc_4();
+      /* Ch_1_Glob == 'A', Ch_2_Glob == 'B', Bool_Glob == true */
+    Int_1_Loc = 2;
+    Int_2_Loc = 3;
+    strcpy (Str_2_Loc, "DHRYSTONE PROGRAM, 2'ND STRING");
+    Enum_Loc = Ident_2;
+    Bool_Glob = ! Func_2 (Str_1_Loc, Str_2_Loc);
+      /* Bool_Glob == 1 */
+    while (Int_1_Loc < Int_2_Loc)  /* loop body executed once */
+    {
+      Int_3_Loc = 5 * Int_1_Loc - Int_2_Loc;
+        /* Int_3_Loc == 7 */
+      Proc_7 (Int_1_Loc, Int_2_Loc, &Int_3_Loc);
+        /* Int_3_Loc == 7 */
+      Int_1_Loc += 1;
+    } /* while */
+      /* Int_1_Loc == 3, Int_2_Loc == 3, Int_3_Loc == 7 */
+    Proc_8 (Arr_1_Glob, Arr_2_Glob, Int_1_Loc, Int_3_Loc);
+      /* Int_Glob == 5 */
+    Proc_1 (Ptr_Glob);
+    for (Ch_Index = 'A'; Ch_Index <= Ch_2_Glob; ++Ch_Index)
+                             /* loop body executed twice */
+    {
+      if (Enum_Loc == Func_1 (Ch_Index, 'C'))
+          /* then, not executed */
+        {
+        Proc_6 (Ident_1, &Enum_Loc);
+        strcpy (Str_2_Loc, "DHRYSTONE PROGRAM, 3'RD STRING");
+        Int_2_Loc = Run_Index;
+        Int_Glob = Run_Index;
+        }
+    }
+      /* Int_1_Loc == 3, Int_2_Loc == 3, Int_3_Loc == 7 */
+    Int_2_Loc = Int_2_Loc * Int_1_Loc;
+    Int_1_Loc = Int_2_Loc / Int_3_Loc;
+    Int_2_Loc = 7 * (Int_2_Loc - Int_3_Loc) - Int_1_Loc;
+      /* Int_1_Loc == 1, Int_2_Loc == 13, Int_3_Loc == 7 */
+    Proc_2 (&Int_1_Loc);
+      /* Int_1_Loc == 5 */
+
+  } /* loop "for Run_Index" */
+
+  /**************/
+  /* Stop timer */
+  /**************/
+
+  End_Time = get_cycles();
+  User_Time = End_Time - Begin_Time;
+
+  print_fmt ("Execution ends\n");
+  int errors = 0;
+  errors += check ("Int_Glob:           ", Int_Glob, 5);
+  errors += check ("Bool_Glob:          ", Bool_Glob, 1);
+  errors += check ("Ch_1_Glob:          ", Ch_1_Glob, 'A');
+  errors += check ("Ch_2_Glob:          ", Ch_2_Glob, 'B');
+  errors += check ("Arr_1_Glob[8]:      ", Arr_1_Glob[8], 7);
+  errors += check ("Arr_2_Glob[8][7]:   ", Arr_2_Glob[8][7], Number_Of_Runs + 10);
+  errors += check ("Ptr_Glob->Discr:    ", Ptr_Glob->Discr, 0);
+  errors += check ("  Enum_Comp:        ", Ptr_Glob->variant.var_1.Enum_Comp, 2);
+  errors += check ("  Int_Comp:         ", Ptr_Glob->variant.var_1.Int_Comp, 17);
+  errors += check_str ("  Str_Comp:         ", Ptr_Glob->variant.var_1.Str_Comp, "DHRYSTONE PROGRAM, SOME STRING");
+  errors += check ("Next_Ptr_Glob->Discr:", Next_Ptr_Glob->Discr, 0);
+  errors += check ("  Enum_Comp:        ", Next_Ptr_Glob->variant.var_1.Enum_Comp, 1);
+  errors += check ("  Int_Comp:         ", Next_Ptr_Glob->variant.var_1.Int_Comp, 18);
+  errors += check_str ("  Str_Comp:         ", Next_Ptr_Glob->variant.var_1.Str_Comp, "DHRYSTONE PROGRAM, SOME STRING");
+  errors += check ("Int_1_Loc:          ", Int_1_Loc, 5);
+  errors += check ("Int_2_Loc:          ", Int_2_Loc, 13);
+  errors += check ("Int_3_Loc:          ", Int_3_Loc, 7);
+  errors += check ("Enum_Loc:           ", Enum_Loc, 1);
+  errors += check_str ("Str_1_Loc:          ", Str_1_Loc, "DHRYSTONE PROGRAM, 1'ST STRING");
+  errors += check_str ("Str_2_Loc:          ", Str_2_Loc, "DHRYSTONE PROGRAM, 2'ND STRING");
+
+  /* Score per MHz of the clock, with three decimal places. */
+  uint32_t dhrystones_per_mhz = (uint64_t)Number_Of_Runs * 1000000 / User_Time;
+  uint32_t dmips_per_mhz_milli = (uint64_t)Number_Of_Runs * 1000000 * 1000 / ((uint64_t)User_Time * VAX_DHRYSTONES_PER_SECOND);
+  print_fmt ("Cycles for %d runs:  %u\n", Number_Of_Runs, User_Time);
+  print_fmt ("Dhrystones per Second per MHz: %u\n", dhrystones_per_mhz);
+  print_fmt ("DMIPS/MHz: %u.%03u\n", dmips_per_mhz_milli / 1000, dmips_per_mhz_milli % 1000);
+  if (errors) {
+    print_fmt ("%d final values of the variables used in the benchmark are wrong!\n", errors);
+  }
+#ifdef htif_base
+  sim_exit(errors);
+#endif
+  return errors;
+}
+
+
+void Proc_1 (Rec_Pointer Ptr_Val_Par)
+/******************/
+    /* executed once */
+{
+  Rec_Pointer Next_Record = Ptr_Val_Par->Ptr_Comp;
+                                        /* == Ptr_Glob_Next */
+  /* Local variable, initialized with Ptr_Val_Par->Ptr_Comp,    */
+  /* corresponds to "rename" in Ada, "with" in Pascal           */
+
+  *Ptr_Val_Par->Ptr_Comp = *Ptr_Glob;
+  Ptr_Val_Par->variant.var_1.Int_Comp = 5;
+  Next_Record->variant.var_1.Int_Comp
+        = Ptr_Val_Par->variant.var_1.Int_Comp;
+  Next_Record->Ptr_Comp = Ptr_Val_Par->Ptr_Comp;
+  Proc_3 (&Next_Record->Ptr_Comp);
+    /* Ptr_Val_Par->Ptr_Comp->Ptr_Comp
+                        == Ptr_Glob->Ptr_Comp */
+  if (Next_Record->Discr == Ident_1)
+    /* then, executed */
+  {
+    Next_Record->variant.var_1.Int_Comp = 6;
+    Proc_6 (Ptr_Val_Par->variant.var_1.Enum_Comp,
+           &Next_Record->variant.var_1.Enum_Comp);
+    Next_Record->Ptr_Comp = Ptr_Glob->Ptr_Comp;
+    Proc_7 (Next_Record->variant.var_1.Int_Comp, 10,
+           &Next_Record->variant.var_1.Int_Comp);
+  }
+  else /* not executed */
+    *Ptr_Val_Par = *Ptr_Val_Par->Ptr_Comp;
+} /* Proc_1 */
+
+
+void Proc_2 (One_Fifty *Int_Par_Ref)
+/******************/
+    /* executed once */
+    /* *Int_Par_Ref == 1, becomes 4 */
+{
+  One_Fifty  Int_Loc;
+  Enumeration   Enum_Loc;
+
+  Int_Loc = *Int_Par_Ref + 10;
+  do /* executed once */
+    if (Ch_1_Glob == 'A')
+      /* then, executed */
+    {
+      Int_Loc -= 1;
+      *Int_Par_Ref = Int_Loc - Int_Glob;
+      Enum_Loc = Ident_1;
+    } /* if */
+  while (Enum_Loc != Ident_1); /* true */
+} /* Proc_2 */
+
+
+void Proc_3 (Rec_Pointer *Ptr_Ref_Par)
+/******************/
+    /* executed once */
+    /* Ptr_Ref_Par becomes Ptr_Glob */
+{
+  if (Ptr_Glob != Null)
+    /* then, executed */
+    *Ptr_Ref_Par = Ptr_Glob->Ptr_Comp;
+  Proc_7 (10, Int_Glob, &Ptr_Glob->variant.var_1.Int_Comp);
+} /* Proc_3 */
+
+
+void Proc_4 () /* without parameters */
+/*******/
+    /* executed once */
+{
+  Boolean Bool_Loc;
+
+  Bool_Loc = Ch_1_Glob == 'A';
+  Bool_Glob = Bool_Loc | Bool_Glob;
+  Ch_2_Glob = 'B';
+} /* Proc_4 */
+
+
+void Proc_5 () /* without parameters */
+/*******/
+    /* executed once */
+{
+  Ch_1_Glob = 'A';
+  Bool_Glob = false;
+} /* Proc_5 */